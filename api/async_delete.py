@@ -16,6 +16,9 @@ from database.db_conf import get_db
 from database.models import Flight
 from config import settings
 from redis_queue_system.redis_queue import redis_queue
+from api.flight_cache import live_flight_cache
+from api.race_index import race_index
+from database.retention import delete_flight_row, iter_delete_flight_points
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/tracking")
@@ -24,6 +27,33 @@ security = HTTPBearer()
 # Store deletion status in Redis
 deletion_status = {}
 
+async def delete_flight_with_progress(db, flight: Flight, deletion_id: str, points_before: int = 0) -> int:
+    """
+    Delete a flight's points in bounded batches (database/retention.py), reporting the
+    running total as points_deleted in the deletion status, then the flight row
+    """
+    flight_uuid = flight.id
+    batches = iter_delete_flight_points(db, flight)
+    points_deleted = 0
+    while True:
+        # Each batch is a synchronous DELETE and commit: run it in a thread so live ingest
+        # and other requests on this worker go on in between
+        deleted = await asyncio.to_thread(next, batches, None)
+        if deleted is None:
+            break
+        points_deleted = deleted
+        await redis_queue.redis_client.hset(
+            f"deletion:{deletion_id}",
+            "points_deleted", str(points_before + points_deleted)
+        )
+
+    def delete_row():
+        delete_flight_row(db, flight_uuid)
+        db.commit()
+
+    await asyncio.to_thread(delete_row)
+    return points_deleted
+
 async def delete_flight_admin_background(
     flight_uuid: str,
     deletion_id: str
@@ -31,12 +61,8 @@ async def delete_flight_admin_background(
     """Admin background task to delete a flight by UUID only"""
     db = None
     try:
-        # Use connection pool properly for background task
-        from database.db_conf import Session, engine
-        from sqlalchemy import text
-
-        # Dispose of stale connections before starting
-        engine.dispose()
+        # Own session from the pool for the background task
+        from database.db_conf import Session
         db = Session()
         
         # Update status
@@ -67,16 +93,10 @@ async def delete_flight_admin_background(
         pilot_name = flight.pilot_name or "Unknown"
         source = flight.source
 
-        # Delete the flight (cascade will delete all track points)
-        # Use a shorter transaction to avoid locking
-        db.delete(flight)
-        db.flush()  # Execute delete but don't commit yet
-
-        # Small delay to allow other operations
-        await asyncio.sleep(0.1)
-
-        # Now commit the transaction
-        db.commit()
+        # Delete the points in short batches, then the flight row
+        live_flight_cache.invalidate(flight.flight_id)
+        await race_index.discard(flight.race_id, flight.pilot_id, flight.id)
+        await delete_flight_with_progress(db, flight, deletion_id)
         
         # Update final status
         await redis_queue.redis_client.hset(
@@ -120,12 +140,8 @@ async def delete_single_flight_background(
     """Background task to delete a single flight with potentially thousands of points"""
     db = None
     try:
-        # Use connection pool properly for background task
-        from database.db_conf import Session, engine
-        from sqlalchemy import text
-
-        # Dispose of stale connections before starting
-        engine.dispose()
+        # Own session from the pool for the background task
+        from database.db_conf import Session
         db = Session()
         
         # Update status
@@ -159,16 +175,10 @@ async def delete_single_flight_background(
         total_points = flight.total_points or 0
         pilot_name = flight.pilot_name or "Unknown"
 
-        # Delete the flight (cascade will delete all track points)
-        # Use a shorter transaction to avoid locking
-        db.delete(flight)
-        db.flush()  # Execute delete but don't commit yet
-
-        # Small delay to allow other operations
-        await asyncio.sleep(0.1)
-
-        # Now commit the transaction
-        db.commit()
+        # Delete the points in short batches, then the flight row
+        live_flight_cache.invalidate(flight.flight_id)
+        await race_index.discard(flight.race_id, flight.pilot_id, flight.id)
+        await delete_flight_with_progress(db, flight, deletion_id)
         
         # Update final status
         await redis_queue.redis_client.hset(
@@ -210,12 +220,8 @@ async def delete_pilot_flights_background(
     """Background task to delete pilot flights"""
     db = None
     try:
-        # Use connection pool properly for background task
-        from database.db_conf import Session, engine
-        from sqlalchemy import text
-
-        # Dispose of stale connections before starting
-        engine.dispose()
+        # Own session from the pool for the background task
+        from database.db_conf import Session
         db = Session()
         
         # Update status
@@ -248,32 +254,20 @@ async def delete_pilot_flights_background(
         deleted_count = 0
         total_points = 0
         
-        # Delete in smaller batches to avoid locking
+        # One flight at a time, its points in short batches
+        points_deleted = 0
         for flight in flights:
             total_points += flight.total_points or 0
-            db.delete(flight)
+            live_flight_cache.invalidate(flight.flight_id)
+            await race_index.discard(flight.race_id, flight.pilot_id, flight.id)
+            points_deleted += await delete_flight_with_progress(db, flight, deletion_id, points_deleted)
             deleted_count += 1
 
-            # Commit every 3 flights to reduce transaction time
-            # This prevents long-running locks on the database
-            if deleted_count % 3 == 0:
-                db.flush()  # Execute pending deletes
-                await asyncio.sleep(0.05)  # Brief pause to allow other operations
-                db.commit()
-
-                # Update progress
-                await redis_queue.redis_client.hset(
-                    f"deletion:{deletion_id}",
-                    "progress", f"{deleted_count}/{len(flights)}"
-                )
-
-                # Longer pause every 10 flights to prevent overwhelming the database
-                if deleted_count % 10 == 0:
-                    await asyncio.sleep(0.2)
-
-        # Final commit for any remaining flights
-        if deleted_count % 3 != 0:
-            db.commit()
+            # Update progress
+            await redis_queue.redis_client.hset(
+                f"deletion:{deletion_id}",
+                "progress", f"{deleted_count}/{len(flights)}"
+            )
         
         # Update final status
         await redis_queue.redis_client.hset(
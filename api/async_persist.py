@@ -0,0 +1,357 @@
+"""
+Asynchronous persistence of live device flights as uploads, returning 202 Accepted immediately
+
+Live points are subject to the retention policy; persisting copies a device flight's
+points into uploaded_track_points under a '<device>_upload' flight. The copy is one
+INSERT ... SELECT per flight inside Postgres, so no point travels through Python or the
+Redis upload queue, and each flight is replaced atomically in its own transaction.
+Progress is kept in Redis (persist:{persist_id}) like async deletions.
+"""
+from fastapi import APIRouter, HTTPException, Security, Depends, BackgroundTasks, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, List, Optional
+from jwt.exceptions import PyJWTError
+import jwt
+import logging
+import asyncio
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+
+from database.db_conf import get_db
+from database.models import Flight, FlightStats, UploadedTrackPoint
+from redis_queue_system.redis_queue import redis_queue
+from api.auth import decode_api_token
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/tracking")
+security = HTTPBearer()
+
+# Upload source of each persistable device live source
+UPLOAD_SOURCES = {
+    'flymaster_live': 'flymaster_upload',
+    'tk905b_live': 'tk905b_upload',
+    'digifly_live': 'digifly_upload'
+}
+
+# Status hashes expire this long after the operation ends
+STATUS_TTL_SECONDS = 3600
+
+# Recompute the upload flight's fixes and point count from its points in one statement
+# (the per-row insert trigger leaves last_fix at whichever row it saw last)
+REFRESH_FLIGHT_SQL = text("""
+    UPDATE flights f
+    SET first_fix = (
+            SELECT json_build_object('lat', p.lat, 'lon', p.lon, 'elevation', p.elevation, 'datetime', p.datetime::text)
+            FROM uploaded_track_points p WHERE p.flight_uuid = f.id ORDER BY p.datetime LIMIT 1),
+        last_fix = (
+            SELECT json_build_object('lat', p.lat, 'lon', p.lon, 'elevation', p.elevation, 'datetime', p.datetime::text)
+            FROM uploaded_track_points p WHERE p.flight_uuid = f.id ORDER BY p.datetime DESC LIMIT 1),
+        total_points = (SELECT count(*) FROM uploaded_track_points p WHERE p.flight_uuid = f.id)
+    WHERE f.id = :upload_uuid
+""")
+
+
+def copy_points_sql(start_datetime: Optional[datetime], end_datetime: Optional[datetime]):
+    """
+    INSERT ... SELECT of one live flight's points into its upload flight. The time range is
+    only added when given, so TimescaleDB can exclude chunks at plan time.
+    """
+    conditions = ["flight_uuid = :flight_uuid"]
+    if start_datetime:
+        conditions.append("datetime >= :start_datetime")
+    if end_datetime:
+        conditions.append("datetime <= :end_datetime")
+    return text(f"""
+        INSERT INTO uploaded_track_points
+            (datetime, device_id, flight_uuid, flight_id, lat, lon, elevation, barometric_altitude, geom)
+        SELECT datetime, device_id, :upload_uuid, :upload_flight_id, lat, lon, elevation, barometric_altitude, geom
+        FROM live_track_points
+        WHERE {' AND '.join(conditions)}
+        ORDER BY datetime
+        ON CONFLICT (flight_id, lat, lon, datetime) DO NOTHING
+    """)
+
+
+def persistable(flight: Flight) -> bool:
+    """Only device-specific live flights (e.g. flymaster_live, tk905b_live) are persisted"""
+    return '_live' in flight.source and 'upload' not in flight.source
+
+
+def persist_flight(db: Session, flight: Flight, start_datetime: Optional[datetime] = None,
+                   end_datetime: Optional[datetime] = None) -> Optional[Dict]:
+    """
+    Replace the upload copy of a live flight with its (time filtered) live points, in one
+    transaction. Returns None, leaving any existing copy alone, if no point is in range.
+    """
+    upload_flight_id = f"{flight.flight_id}-upload"
+    upload_source = UPLOAD_SOURCES.get(flight.source, 'upload')
+
+    upload_flight = db.query(Flight).filter(
+        Flight.flight_id == upload_flight_id,
+        Flight.source == upload_source
+    ).first()
+    if not upload_flight:
+        # Uploaded flights are closed immediately since upload is complete
+        upload_flight = Flight(
+            flight_id=upload_flight_id,
+            race_uuid=flight.race_uuid,
+            race_id=flight.race_id,
+            pilot_id=flight.pilot_id,
+            pilot_name=flight.pilot_name,
+            created_at=flight.created_at,
+            source=upload_source,
+            device_id=flight.device_id,
+            closed_at=datetime.now(timezone.utc),
+            closed_by='upload_complete'
+        )
+        db.add(upload_flight)
+        db.flush()
+
+    # Always a full replacement, regardless of the time filter
+    db.query(UploadedTrackPoint).filter(
+        UploadedTrackPoint.flight_uuid == upload_flight.id
+    ).delete(synchronize_session=False)
+
+    points_copied = db.execute(copy_points_sql(start_datetime, end_datetime), {
+        'flight_uuid': flight.id,
+        'upload_uuid': upload_flight.id,
+        'upload_flight_id': upload_flight_id,
+        'start_datetime': start_datetime,
+        'end_datetime': end_datetime
+    }).rowcount
+    if not points_copied:
+        db.rollback()
+        return None
+
+    db.execute(REFRESH_FLIGHT_SQL, {'upload_uuid': upload_flight.id})
+    # Rebuilt from the new points on the next read (api/flight_stats.py)
+    db.query(FlightStats).filter(
+        FlightStats.flight_uuid == upload_flight.id
+    ).delete(synchronize_session=False)
+    db.commit()
+
+    return {
+        "original_flight_id": flight.flight_id,
+        "upload_flight_id": upload_flight_id,
+        "upload_flight_uuid": str(upload_flight.id),
+        "pilot": flight.pilot_name,
+        "device": flight.device_id,
+        "points_copied": points_copied
+    }
+
+
+def _persist_flight_by_id(flight_uuid: UUID, start_datetime: Optional[datetime],
+                          end_datetime: Optional[datetime]) -> Optional[Dict]:
+    from database.db_conf import Session as DbSession
+
+    with DbSession() as db:
+        flight = db.query(Flight).filter(Flight.id == flight_uuid).first()
+        if not flight:
+            return None
+        try:
+            return persist_flight(db, flight, start_datetime, end_datetime)
+        except Exception:
+            db.rollback()
+            raise
+
+
+async def persist_flights_background(
+    flight_uuids: List[UUID],
+    persist_id: str,
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None
+):
+    """Background task persisting flights one transaction at a time, with progress in Redis"""
+    key = f"persist:{persist_id}"
+    try:
+        await redis_queue.redis_client.hset(key, mapping={
+            "status": "processing",
+            "started_at": datetime.utcnow().isoformat(),
+            "progress": f"0/{len(flight_uuids)}"
+        })
+
+        flights_processed = 0
+        flights_skipped = 0
+        points_copied = 0
+        for index, flight_uuid in enumerate(flight_uuids, 1):
+            # The copy runs in Postgres; keep the event loop free while it does
+            details = await asyncio.to_thread(_persist_flight_by_id, flight_uuid, start_datetime, end_datetime)
+            if details:
+                flights_processed += 1
+                points_copied += details['points_copied']
+                logger.debug(f"Persisted {details['points_copied']} points of flight {details['original_flight_id']}")
+            else:
+                flights_skipped += 1
+
+            await redis_queue.redis_client.hset(key, mapping={
+                "progress": f"{index}/{len(flight_uuids)}",
+                "flights_processed": str(flights_processed),
+                "flights_skipped": str(flights_skipped),
+                "points_copied": str(points_copied)
+            })
+
+        await redis_queue.redis_client.hset(key, mapping={
+            "status": "completed",
+            "completed_at": datetime.utcnow().isoformat()
+        })
+        await redis_queue.redis_client.expire(key, STATUS_TTL_SECONDS)
+
+        logger.warning(f"Persisted {flights_processed} live flights ({points_copied} points, "
+                       f"{flights_skipped} without points in range) for operation {persist_id}")
+
+    except Exception as e:
+        logger.error(f"Background flight persistence failed: {e}")
+        await redis_queue.redis_client.hset(key, mapping={
+            "status": "failed",
+            "error": str(e),
+            "failed_at": datetime.utcnow().isoformat()
+        })
+        await redis_queue.redis_client.expire(key, STATUS_TTL_SECONDS)
+
+
+async def _accept(persist_id: str, flights: List[Flight], background_tasks: BackgroundTasks,
+                  start_datetime: Optional[datetime], end_datetime: Optional[datetime], **fields) -> Dict:
+    await redis_queue.redis_client.hset(
+        f"persist:{persist_id}",
+        mapping={
+            "status": "accepted",
+            "flights_total": str(len(flights)),
+            "start_datetime": start_datetime.isoformat() if start_datetime else "",
+            "end_datetime": end_datetime.isoformat() if end_datetime else "",
+            "created_at": datetime.utcnow().isoformat(),
+            **fields
+        }
+    )
+    background_tasks.add_task(
+        persist_flights_background,
+        [flight.id for flight in flights],
+        persist_id,
+        start_datetime,
+        end_datetime
+    )
+    return {
+        "persist_id": persist_id,
+        "flights_total": len(flights),
+        "status_url": f"/tracking/persist-status/{persist_id}",
+        "date_filter": {
+            "start": start_datetime.isoformat() if start_datetime else None,
+            "end": end_datetime.isoformat() if end_datetime else None
+        } if (start_datetime or end_datetime) else None
+    }
+
+
+def _verify_admin_token(credentials: HTTPAuthorizationCredentials):
+    try:
+        decode_api_token(credentials.credentials)
+    except (PyJWTError, jwt.ExpiredSignatureError):
+        raise HTTPException(status_code=403, detail="Invalid or expired token")
+
+
+@router.post("/admin/persist-live-flight", status_code=status.HTTP_202_ACCEPTED)
+async def persist_live_flight(
+    flight_uuid: str,
+    background_tasks: BackgroundTasks,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: Session = Depends(get_db),
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None
+):
+    """
+    Persist a device live flight (flymaster_live, tk905b_live, ...) as a '[device]_upload'
+    flight so its points survive the live retention policy. The original live flight and
+    points are preserved; an existing upload copy is replaced.
+
+    Returns 202 Accepted immediately; check progress via GET /persist-status/{persist_id}
+
+    Parameters:
+    - flight_uuid: Required - The UUID of the specific flight to persist
+    - start_datetime: Optional - Only persist points after this time
+    - end_datetime: Optional - Only persist points before this time
+    """
+    _verify_admin_token(credentials)
+
+    try:
+        flight_uuid_obj = UUID(flight_uuid)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid flight UUID format")
+
+    flight = db.query(Flight).filter(Flight.id == flight_uuid_obj).first()
+    if not flight:
+        raise HTTPException(status_code=404, detail=f"Flight with UUID {flight_uuid} not found")
+
+    if 'upload' in flight.source:
+        return {
+            "success": True,
+            "message": f"Flight {flight_uuid} is already persisted (source: {flight.source})",
+            "flights_total": 0
+        }
+    if not persistable(flight):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Flight {flight_uuid} cannot be persisted (source: {flight.source}). Only device-specific "
+                   f"live flights (e.g., flymaster_live, tk905b_live) can be persisted."
+        )
+
+    return {
+        "success": True,
+        "message": f"Persistence of flight {flight_uuid} accepted ({flight.total_points or 0} live points)",
+        **await _accept(str(uuid4()), [flight], background_tasks, start_datetime, end_datetime,
+                        flight_uuid=flight_uuid, pilot_name=flight.pilot_name or "Unknown",
+                        source=flight.source)
+    }
+
+
+@router.post("/admin/persist-race-flights/{race_id}", status_code=status.HTTP_202_ACCEPTED)
+async def persist_race_flights(
+    race_id: str,
+    background_tasks: BackgroundTasks,
+    credentials: HTTPAuthorizationCredentials = Security(security),
+    db: Session = Depends(get_db),
+    start_datetime: Optional[datetime] = None,
+    end_datetime: Optional[datetime] = None
+):
+    """
+    Persist every device live flight of a race in one background operation, optionally
+    limited to points between start_datetime and end_datetime.
+
+    Returns 202 Accepted immediately; check progress via GET /persist-status/{persist_id}
+    """
+    _verify_admin_token(credentials)
+
+    flights = [flight for flight in db.query(Flight).filter(
+        Flight.race_id == race_id,
+        Flight.source.like('%\\_live')
+    ).order_by(Flight.created_at).all() if persistable(flight)]
+
+    if not flights:
+        return {
+            "success": False,
+            "message": f"No device live flights found for race {race_id}",
+            "flights_total": 0
+        }
+
+    return {
+        "success": True,
+        "message": f"Persistence of {len(flights)} device live flights of race {race_id} accepted",
+        **await _accept(str(uuid4()), flights, background_tasks, start_datetime, end_datetime, race_id=race_id)
+    }
+
+
+@router.get("/persist-status/{persist_id}")
+async def get_persist_status(persist_id: str):
+    """Check the status of an async persistence operation"""
+    status_data = await redis_queue.redis_client.hgetall(f"persist:{persist_id}")
+
+    if not status_data:
+        raise HTTPException(
+            status_code=404,
+            detail="Persist ID not found or expired"
+        )
+
+    return {
+        k.decode() if isinstance(k, bytes) else k:
+        v.decode() if isinstance(v, bytes) else v
+        for k, v in status_data.items()
+    }
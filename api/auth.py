@@ -3,7 +3,12 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from datetime import datetime, timezone, timedelta
 import jwt
 from typing import Dict, Optional
+import hashlib
 import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
 from config import settings
 from fastapi.security import APIKeyQuery
 
@@ -12,6 +17,176 @@ logger = logging.getLogger(__name__)
 
 security = HTTPBearer()
 
+# Contest/viewer tokens are issued for this audience and issuer
+API_AUDIENCE = "api.hikeandfly.app"
+API_ISSUER = "hikeandfly.app"
+
+# Verified claims are reused until the token expires, at most this long
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '300'))
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache of verified token claims keyed by token hash.
+    Entries expire at the token's exp or after the TTL, whichever comes first,
+    so a cached token is never accepted past its expiry.
+    Only successfully verified tokens are cached.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'decodes': 0,
+            'decode_seconds': 0.0
+        }
+
+    @staticmethod
+    def _key(kind: str, token: str) -> tuple:
+        return (kind, hashlib.sha256(token.encode()).digest())
+
+    def get(self, kind: str, token: str) -> Optional[Dict]:
+        key = self._key(kind, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            claims, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return claims
+
+    def put(self, kind: str, token: str, claims: Dict, decode_seconds: float):
+        expires_at = time.time() + self.ttl
+        exp = claims.get('exp')
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+
+        key = self._key(kind, token)
+        with self._lock:
+            self.stats['decodes'] += 1
+            self.stats['decode_seconds'] += decode_seconds
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict:
+        """Cache statistics, including the decode time saved by hits"""
+        with self._lock:
+            stats = dict(self.stats)
+            size = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        avg_decode = stats['decode_seconds'] / stats['decodes'] if stats['decodes'] else 0.0
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'ttl_seconds': self.ttl,
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'expired': stats['expired'],
+            'evictions': stats['evictions'],
+            'hit_ratio': round(stats['hits'] / lookups, 4) if lookups else 0.0,
+            'avg_decode_ms': round(avg_decode * 1000, 4),
+            'decode_ms_saved': round(stats['hits'] * avg_decode * 1000, 2)
+        }
+
+
+token_cache = VerifiedTokenCache()
+
+
+def decode_api_token(token: str) -> Dict:
+    """
+    Decode an api.hikeandfly.app token, reusing verified claims when cached.
+    Raises the usual jwt exceptions for expired or invalid tokens.
+    """
+    claims = token_cache.get('api', token)
+    if claims is not None:
+        return claims
+
+    start = time.perf_counter()
+    claims = jwt.decode(
+        token,
+        settings.SECRET_KEY,
+        algorithms=["HS256"],
+        audience=API_AUDIENCE,
+        issuer=API_ISSUER
+    )
+    token_cache.put('api', token, claims, time.perf_counter() - start)
+    return claims
+
+
+def verify_contest_token(token: str) -> Dict:
+    """Verify a contest token and return its claims, raising 401/403 HTTPExceptions"""
+    try:
+        token_data = decode_api_token(token)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(
+            status_code=401,
+            detail="Token has expired"
+        )
+    except jwt.PyJWTError as e:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Invalid token: {str(e)}"
+        )
+
+    if not token_data.get("sub", "").startswith("contest:"):
+        raise HTTPException(
+            status_code=403,
+            detail="Invalid token subject - must be contest-specific"
+        )
+
+    return token_data
+
+
+async def require_contest_token(
+    credentials: HTTPAuthorizationCredentials = Security(security)
+) -> Dict:
+    """Dependency verifying a contest token from the Authorization header"""
+    return verify_contest_token(credentials.credentials)
+
+
+async def require_api_token(
+    credentials: HTTPAuthorizationCredentials = Security(security)
+) -> Dict:
+    """Dependency verifying an api.hikeandfly.app token from the Authorization header"""
+    try:
+        return decode_api_token(credentials.credentials)
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(
+            status_code=401,
+            detail="Token has expired"
+        )
+    except jwt.PyJWTError as e:
+        raise HTTPException(
+            status_code=401,
+            detail=f"Invalid token: {str(e)}"
+        )
+
+
+def contest_race_id(token_data: Dict) -> str:
+    """Race ID of a verified contest token"""
+    return token_data["sub"].split(":")[1]
+
 
 class TokenVerifier:
     def __init__(self):
@@ -20,12 +195,18 @@ class TokenVerifier:
 
     async def __call__(self, token: str) -> Dict:
         """Verify a raw token string"""
+        cached = token_cache.get('tracking', token)
+        if cached is not None:
+            return cached
+
         try:
+            start = time.perf_counter()
             payload = jwt.decode(
                 token,
                 self.secret_key,
                 algorithms=[self.algorithm]
             )
+            decode_seconds = time.perf_counter() - start
 
             # Check for all required fields
             required_fields = [
@@ -59,7 +240,7 @@ class TokenVerifier:
                 )
 
             # Return a validated payload with explicit field structure
-            return {
+            validated = {
                 "pilot_id": payload["pilot_id"],
                 "race_id": payload["race_id"],
                 "pilot_name": payload["pilot_name"],
@@ -76,7 +257,9 @@ class TokenVerifier:
                     "upload": payload["endpoints"]["upload"]
                 }
             }
-            
+            token_cache.put('tracking', token, validated, decode_seconds)
+            return validated
+
         except jwt.ExpiredSignatureError:
             raise HTTPException(
                 status_code=401,
@@ -0,0 +1,230 @@
+"""
+Cross-worker coordination of live broadcasts
+Every worker process keeps its own websockets, but the update of a race should only be
+computed once. Broadcasters take a per-race lease in Redis (SET NX PX, renewed while
+they keep computing); the worker holding it computes the update and publishes the
+serialized payload on a Redis channel, and every worker, the leader included, fans it
+out to its local sockets. Replica polling no longer grows with the number of workers.
+
+Without Redis every worker is its own leader and payloads are delivered in-process.
+"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import redis.asyncio as redis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# A leader that stops renewing its lease (stopped, crashed) is replaced after this long
+BROADCAST_LEASE_SECONDS = int(os.getenv('BROADCAST_LEASE_SECONDS', '30'))
+
+# Wait before resubscribing after the listener lost its connection
+LISTENER_RETRY_SECONDS = 1
+
+LEASE_PREFIX = 'broadcast_lease:'
+CHANNEL_PREFIX = 'broadcast:'
+
+# Renew the lease if we hold it, otherwise take it if it is free
+# KEYS: lease key; ARGV: worker id, ttl ms
+LEAD_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Give the lease up if we still hold it
+# KEYS: lease key; ARGV: worker id
+RESIGN_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# handler(key, payload, local): local is True for payloads this worker published
+Handler = Callable[[str, bytes, bool], Awaitable[None]]
+
+
+class BroadcastBus:
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.client: Optional[redis.Redis] = None
+        self._pubsub = None
+        self._subscribed = False
+        self._task = None
+        self._handlers: Dict[str, Handler] = {}
+        self._leases: Set[str] = set()
+        self.stats = {
+            'leads': 0,
+            'follows': 0,
+            'published': 0,
+            'delivered': 0,
+            'delivered_locally': 0,
+            'listener_restarts': 0,
+            'errors': 0
+        }
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        """Deliver payloads published on topic (any worker) to handler"""
+        self._handlers[topic] = handler
+
+    async def start(self):
+        if self._task is not None:
+            return
+        try:
+            # Payloads are binary frames, so this client doesn't decode responses
+            self.client = redis.from_url(settings.get_redis_url(), decode_responses=False)
+            await self.client.ping()
+            await self._subscribe()
+            self._task = asyncio.create_task(self._listen())
+            logger.info(f"Broadcast bus started (worker {self.worker_id})")
+        except Exception as e:
+            logger.warning(f"Broadcast bus without Redis, broadcasting in-process only: {e}")
+            self.client = None
+
+    async def stop(self):
+        for name in list(self._leases):
+            await self.resign(name)
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.close()
+            self._pubsub = None
+            self._subscribed = False
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def lead(self, name: str) -> bool:
+        """Take or renew the lease on a job; True if this worker should compute it"""
+        if self.client is None:
+            return True
+        try:
+            leading = bool(await self.client.eval(LEAD_SCRIPT, 1, f'{LEASE_PREFIX}{name}', self.worker_id,
+                                                  BROADCAST_LEASE_SECONDS * 1000))
+        except Exception as e:
+            # Computing twice beats not broadcasting at all
+            self.stats['errors'] += 1
+            logger.error(f"Broadcast lease check failed for {name}: {e}")
+            return True
+        if leading:
+            self._leases.add(name)
+            self.stats['leads'] += 1
+        else:
+            self._leases.discard(name)
+            self.stats['follows'] += 1
+        return leading
+
+    async def resign(self, name: str) -> None:
+        """Hand a job over to the next worker that asks for it"""
+        self._leases.discard(name)
+        if self.client is None:
+            return
+        try:
+            await self.client.eval(RESIGN_SCRIPT, 1, f'{LEASE_PREFIX}{name}', self.worker_id)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Broadcast lease release failed for {name}: {e}")
+
+    def held(self, prefix: str = '') -> Set[str]:
+        return {name for name in self._leases if name.startswith(prefix)}
+
+    @property
+    def listening(self) -> bool:
+        """True while payloads published on Redis reach this worker's handlers"""
+        return self._task is not None and not self._task.done() and self._subscribed
+
+    async def publish(self, topic: str, key: str, payload: bytes) -> None:
+        """Send a payload to the topic's handler in every worker"""
+        self.stats['published'] += 1
+        if self.client is not None:
+            if self._task is not None and self._task.done():
+                self._restart_listener()
+            try:
+                await self.client.publish(f'{CHANNEL_PREFIX}{topic}:{key}',
+                                          self.worker_id.encode('utf-8') + b'\n' + payload)
+                if self.listening:
+                    return
+                # The other workers have it, but this worker's listener won't hand it back
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Broadcast publish failed on {topic}, delivering locally: {e}")
+        self.stats['delivered_locally'] += 1
+        await self._deliver(topic, key, payload, True)
+
+    def _restart_listener(self):
+        error = None if self._task.cancelled() else self._task.exception()
+        logger.error(f"Broadcast listener stopped ({error!r}), restarting it")
+        self.stats['listener_restarts'] += 1
+        self._subscribed = False
+        self._task = asyncio.create_task(self._listen())
+
+    async def _subscribe(self):
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.close()
+            except Exception:
+                pass
+        self._pubsub = self.client.pubsub()
+        await self._pubsub.psubscribe(f'{CHANNEL_PREFIX}*')
+        self._subscribed = True
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self._subscribed:
+                    await self._subscribe()
+                async for message in self._pubsub.listen():
+                    if message.get('type') != 'pmessage':
+                        continue
+                    try:
+                        topic, key = message['channel'].decode('utf-8')[len(CHANNEL_PREFIX):].split(':', 1)
+                        origin, payload = message['data'].split(b'\n', 1)
+                        await self._deliver(topic, key, payload, origin.decode('utf-8') == self.worker_id)
+                    except Exception as e:
+                        self.stats['errors'] += 1
+                        logger.error(f"Error delivering broadcast: {e}")
+                logger.warning("Broadcast subscription ended, resubscribing")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Broadcast listener lost its subscription, resubscribing: {e}")
+            # Publishes are delivered locally until the subscription is back
+            self._subscribed = False
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+
+    async def _deliver(self, topic: str, key: str, payload: bytes, local: bool) -> None:
+        handler = self._handlers.get(topic)
+        if handler is None:
+            return
+        await handler(key, payload, local)
+        self.stats['delivered'] += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'worker_id': self.worker_id,
+            'redis': self.client is not None,
+            'listening': self.listening,
+            'leases': sorted(self._leases)
+        }
+
+
+broadcast_bus = BroadcastBus()
@@ -0,0 +1,305 @@
+"""
+Competition delay line for live fixes
+Fixes enter a per-race buffer ordered by release time (fix time + TRACKING_DELAY_SECONDS)
+as soon as they are committed, and a timer releases them exactly when their delay
+expires. Released fixes move into a short in-memory window per flight that the live
+broadcaster serves from, each race's delay cutoff advances with its releases (tiles and
+ETags use it instead of "now - delay"), and listeners such as tile cache invalidation
+are called with every release.
+
+Release timing only depends on the clock passed in, so release(now) is deterministic.
+The buffer is per process: fixes admitted by one worker are forwarded to the others
+over the broadcast bus, and flights the line has not seen since startup are seeded
+from the database by their first reader.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import os
+import time
+from bisect import insort
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterable, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Released fixes kept per flight for the broadcaster
+DELAY_LINE_WINDOW_POINTS = int(os.getenv('DELAY_LINE_WINDOW_POINTS', '300'))
+# Windows of flights without released fixes for this long are dropped
+DELAY_LINE_IDLE_SECONDS = int(os.getenv('DELAY_LINE_IDLE_SECONDS', str(6 * 3600)))
+# Longest the timer sleeps when nothing is pending
+IDLE_WAIT_SECONDS = 60
+
+
+def _fix(point) -> SimpleNamespace:
+    """Fix as datetime/lat/lon/elevation attributes, from an inserted row or a point dict"""
+    if isinstance(point, dict):
+        when = point['datetime']
+        if isinstance(when, str):
+            when = datetime.fromisoformat(when.replace('Z', '+00:00'))
+        return SimpleNamespace(datetime=when, lat=point['lat'], lon=point['lon'], elevation=point.get('elevation'))
+    return SimpleNamespace(datetime=point.datetime, lat=point.lat, lon=point.lon, elevation=point.elevation)
+
+
+def _sort_key(fix) -> tuple:
+    return fix.datetime, fix.lat, fix.lon
+
+
+class DelayLine:
+    def __init__(self, delay: Optional[float] = None, clock: Callable[[], float] = time.time):
+        self.delay = settings.TRACKING_DELAY_SECONDS if delay is None else delay
+        self.clock = clock
+        self.started_at = clock()
+        self._pending: List[tuple] = []  # (release epoch, seq, race_id, flight_uuid, fix)
+        self._seq = itertools.count()
+        self._windows: Dict[str, List] = {}  # flight_uuid -> released fixes, oldest first
+        self._seeded = set()
+        self._last_release: Dict[str, float] = {}  # flight_uuid -> clock of its last release
+        self._cutoffs: Dict[str, float] = {}  # race_id -> delay cutoff epoch
+        self._versions: Dict[str, int] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._listeners: List[Callable] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._outbox: List[tuple] = []  # admitted here, to forward to other workers
+        self._task = None
+        self.stats = {
+            'admitted': 0,
+            'released': 0,
+            'releases': 0,
+            'seeded_flights': 0,
+            'window_hits': 0,
+            'window_misses': 0,
+            'pruned_flights': 0,
+            'forwarded': 0,
+            'received': 0,
+            'listener_errors': 0
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self._task is None:
+            from api.broadcast_bus import broadcast_bus
+            broadcast_bus.subscribe('fixes', self._receive)
+            self.started_at = self.clock()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Delay line started ({self.delay}s)")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def add_listener(self, callback: Callable) -> None:
+        """Call `await callback(race_id, {flight_uuid: [fixes]})` after every release of a race"""
+        self._listeners.append(callback)
+
+    def admit(self, race_id: str, flight_uuid, points: Iterable, forward: bool = True) -> int:
+        """Buffer committed fixes of a flight until their delay expires (and forward them to other workers)"""
+        flight_uuid = str(flight_uuid)
+        head = self._pending[0][0] if self._pending else None
+        fixes = [_fix(point) for point in points]
+        for fix in fixes:
+            heapq.heappush(self._pending, (fix.datetime.timestamp() + self.delay, next(self._seq),
+                                           race_id, flight_uuid, fix))
+        self.stats['admitted'] += len(fixes)
+        if not fixes or self._wakeup is None:
+            return len(fixes)
+        if forward:
+            self._outbox.append((race_id, flight_uuid, fixes))
+        # Wake the timer to forward the fixes, or if they are due before the one it sleeps for
+        if forward or head is None or self._pending[0][0] < head:
+            self._wakeup.set()
+        return len(fixes)
+
+    def admit_batch(self, races: Dict, inserted) -> int:
+        """Buffer inserted rows (with flight_uuid) of the flights in races ({flight_uuid: race_id})"""
+        by_flight: Dict = {}
+        for point in inserted:
+            if point.flight_uuid in races:
+                by_flight.setdefault(point.flight_uuid, []).append(point)
+        return sum(self.admit(races[flight_uuid], flight_uuid, points)
+                   for flight_uuid, points in by_flight.items())
+
+    def next_due(self) -> Optional[float]:
+        return self._pending[0][0] if self._pending else None
+
+    def release(self, now: Optional[float] = None) -> Dict[str, Dict[str, List]]:
+        """Release every fix whose delay has expired at `now`; returns them by race and flight"""
+        now = self.clock() if now is None else now
+        released: Dict[str, Dict[str, List]] = {}
+        while self._pending and self._pending[0][0] <= now:
+            _, _, race_id, flight_uuid, fix = heapq.heappop(self._pending)
+            released.setdefault(race_id, {}).setdefault(flight_uuid, []).append(fix)
+
+        for race_id, flights in released.items():
+            for flight_uuid, fixes in flights.items():
+                window = self._windows.setdefault(flight_uuid, [])
+                for fix in fixes:
+                    if window and _sort_key(fix) <= _sort_key(window[-1]):
+                        if any(_sort_key(fix) == _sort_key(known) for known in window):
+                            continue
+                        insort(window, fix, key=_sort_key)
+                    else:
+                        window.append(fix)
+                del window[:-DELAY_LINE_WINDOW_POINTS]
+                self._last_release[flight_uuid] = now
+                self.stats['released'] += len(fixes)
+            self._cutoffs[race_id] = now - self.delay
+            self._versions[race_id] = self._versions.get(race_id, 0) + 1
+            event = self._events.pop(race_id, None)
+            if event is not None:
+                event.set()
+        if released:
+            self.stats['releases'] += 1
+        return released
+
+    def cutoff(self, race_id: str) -> datetime:
+        """
+        Newest fix time a race shows: the delay cutoff of its last release. Until the first
+        delay has passed since startup, fixes committed before startup are released by time
+        (and always, while the line isn't running).
+        """
+        if not self.running:
+            return datetime.fromtimestamp(self.clock() - self.delay, timezone.utc)
+        floor = min(self.clock() - self.delay, self.started_at)
+        return datetime.fromtimestamp(max(self._cutoffs.get(race_id, floor), floor), timezone.utc)
+
+    def version(self, race_id: str) -> int:
+        return self._versions.get(race_id, 0)
+
+    async def wait(self, race_id: str, version: int, timeout: float) -> int:
+        """Wait until the race has releases newer than version (or timeout); returns its version"""
+        if self.version(race_id) == version:
+            event = self._events.setdefault(race_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.version(race_id)
+
+    def window(self, flight_uuid, since: Optional[datetime] = None, min_points: int = 0) -> Optional[List]:
+        """
+        Released fixes of a flight, oldest first, or None when memory can't answer: the line
+        isn't running, the flight hasn't been seeded, the window starts after `since` or
+        (without since) holds fewer than min_points fixes.
+        """
+        flight_uuid = str(flight_uuid)
+        window = self._windows.get(flight_uuid)
+        if not self.running or flight_uuid not in self._seeded or not window or \
+                (since is not None and window[0].datetime > since) or \
+                (since is None and len(window) < min_points):
+            self.stats['window_misses'] += 1
+            return None
+        self.stats['window_hits'] += 1
+        return list(window)
+
+    def seed(self, flight_uuid, rows: Iterable) -> None:
+        """Merge fixes read from the database (all up to the race cutoff) into a flight's window"""
+        flight_uuid = str(flight_uuid)
+        known = {_sort_key(fix) for fix in self._windows.get(flight_uuid, [])}
+        window = sorted(self._windows.get(flight_uuid, []) +
+                        [fix for fix in map(_fix, rows) if _sort_key(fix) not in known], key=_sort_key)
+        self._windows[flight_uuid] = window[-DELAY_LINE_WINDOW_POINTS:]
+        self._last_release.setdefault(flight_uuid, self.clock())
+        if flight_uuid not in self._seeded:
+            self._seeded.add(flight_uuid)
+            self.stats['seeded_flights'] += 1
+
+    def forget(self, flight_uuid) -> None:
+        """Drop a flight's window (deleted or idle flights); it is seeded again by its next reader"""
+        flight_uuid = str(flight_uuid)
+        self._windows.pop(flight_uuid, None)
+        self._seeded.discard(flight_uuid)
+        self._last_release.pop(flight_uuid, None)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        now = self.clock() if now is None else now
+        idle = [flight_uuid for flight_uuid, released_at in self._last_release.items()
+                if now - released_at > DELAY_LINE_IDLE_SECONDS]
+        for flight_uuid in idle:
+            self.forget(flight_uuid)
+        self.stats['pruned_flights'] += len(idle)
+        return len(idle)
+
+    async def _run(self):
+        last_prune = self.clock()
+        while True:
+            try:
+                if self._outbox:
+                    await self._forward()
+                due = self.next_due()
+                timeout = IDLE_WAIT_SECONDS if due is None else max(0.0, due - self.clock())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+                released = self.release()
+                for race_id, flights in released.items():
+                    await self._notify(race_id, flights)
+
+                if self.clock() - last_prune > IDLE_WAIT_SECONDS:
+                    last_prune = self.clock()
+                    self.prune()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error in delay line: {e}")
+                await asyncio.sleep(1)
+
+    async def _forward(self) -> None:
+        from api.broadcast_bus import broadcast_bus
+
+        outbox, self._outbox = self._outbox, []
+        if broadcast_bus.client is None:
+            return
+        payload = [[race_id, flight_uuid, [[fix.datetime.isoformat(), float(fix.lat), float(fix.lon),
+                                            None if fix.elevation is None else float(fix.elevation)]
+                                           for fix in fixes]]
+                   for race_id, flight_uuid, fixes in outbox]
+        await broadcast_bus.publish('fixes', 'admitted', json.dumps(payload).encode('utf-8'))
+        self.stats['forwarded'] += sum(len(fixes) for _, _, fixes in outbox)
+
+    async def _receive(self, key: str, payload: bytes, local: bool) -> None:
+        """Admit fixes committed by other workers"""
+        if local:
+            return
+        for race_id, flight_uuid, fixes in json.loads(payload):
+            self.stats['received'] += self.admit(race_id, flight_uuid, [
+                {'datetime': when, 'lat': lat, 'lon': lon, 'elevation': elevation}
+                for when, lat, lon, elevation in fixes], forward=False)
+
+    async def _notify(self, race_id: str, flights: Dict[str, List]) -> None:
+        for callback in self._listeners:
+            try:
+                await callback(race_id, flights)
+            except Exception as e:
+                self.stats['listener_errors'] += 1
+                logger.error(f"Delay line listener failed for race {race_id}: {e}")
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'running': self.running,
+            'delay_seconds': self.delay,
+            'pending': len(self._pending),
+            'flights': len(self._windows),
+            'races': len(self._versions)
+        }
+
+
+delay_line = DelayLine()
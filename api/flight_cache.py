@@ -0,0 +1,171 @@
+"""
+Race/flight resolution cache for live tracking ingest
+Maps a client flight_id to its flight UUID, owner and closed state so repeated
+/tracking/live posts skip the race and flight lookups. Misses resolve race and
+flight with a single INSERT ... ON CONFLICT ... RETURNING statement.
+"""
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from threading import Lock
+from typing import Dict, Optional
+from uuid import uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Flights closed or deleted by another worker are noticed within this window
+FLIGHT_CACHE_TTL = int(os.getenv('FLIGHT_CACHE_TTL', '60'))
+FLIGHT_CACHE_SIZE = int(os.getenv('FLIGHT_CACHE_SIZE', '20000'))
+
+UPSERT_FLIGHT_SQL = text("""
+    WITH race AS (
+        INSERT INTO races (id, race_id, name, date, end_date, timezone, location, created_at)
+        VALUES (:race_uuid, :race_id, :race_name, :race_date, :race_end_date,
+                :race_timezone, :race_location, :now)
+        ON CONFLICT (race_id) DO UPDATE SET race_id = EXCLUDED.race_id
+        RETURNING id
+    )
+    INSERT INTO flights (id, flight_id, race_uuid, race_id, pilot_id, pilot_name,
+                         created_at, source, device_id, total_points)
+    SELECT :flight_uuid, :flight_id, race.id, :race_id, :pilot_id, :pilot_name,
+           :now, :source, :device_id, 0
+    FROM race
+    ON CONFLICT (flight_id, source) DO UPDATE SET
+        pilot_name = CASE WHEN flights.pilot_id = EXCLUDED.pilot_id
+                          THEN EXCLUDED.pilot_name ELSE flights.pilot_name END
+    RETURNING id, pilot_id, pilot_name, closed_at, closed_by, total_points
+""")
+
+
+class LiveFlightCache:
+    """In-process cache of resolved live flights keyed by (flight_id, source)"""
+
+    def __init__(self, ttl: int = FLIGHT_CACHE_TTL, maxsize: int = FLIGHT_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: Dict[tuple, Dict] = {}
+        self._lock = Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'upserts': 0,
+            'invalidations': 0
+        }
+
+    def get(self, flight_id: str, source: str = 'live') -> Optional[Dict]:
+        key = (flight_id, source)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() >= entry['expires_at']:
+                self._entries.pop(key, None)
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            return entry
+
+    def resolve(self, db: Session, flight_id: str, pilot_id: str, pilot_name: str,
+                race_id: str, race_data: Dict, device_id: str, source: str = 'live') -> Dict:
+        """
+        Return the cached flight entry, upserting race and flight on a miss.
+        A pilot name change also forces the upsert so the stored name follows the token.
+        """
+        entry = self._cached(flight_id, source, pilot_id, pilot_name)
+        if entry is not None:
+            return entry
+
+        row = db.execute(UPSERT_FLIGHT_SQL, self._upsert_params(
+            flight_id, pilot_id, pilot_name, race_id, race_data, device_id, source)).fetchone()
+        db.commit()
+        return self._store(flight_id, source, row)
+
+    async def resolve_async(self, db: AsyncSession, flight_id: str, pilot_id: str, pilot_name: str,
+                            race_id: str, race_data: Dict, device_id: str, source: str = 'live') -> Dict:
+        """resolve() for async sessions"""
+        entry = self._cached(flight_id, source, pilot_id, pilot_name)
+        if entry is not None:
+            return entry
+
+        result = await db.execute(UPSERT_FLIGHT_SQL, self._upsert_params(
+            flight_id, pilot_id, pilot_name, race_id, race_data, device_id, source))
+        row = result.fetchone()
+        await db.commit()
+        return self._store(flight_id, source, row)
+
+    def _cached(self, flight_id, source, pilot_id, pilot_name) -> Optional[Dict]:
+        entry = self.get(flight_id, source)
+        if entry is not None and (entry['pilot_id'] != pilot_id or entry['pilot_name'] == pilot_name):
+            return entry
+        return None
+
+    @staticmethod
+    def _upsert_params(flight_id, pilot_id, pilot_name, race_id, race_data, device_id, source) -> Dict:
+        return {
+            'race_uuid': uuid4(),
+            'race_id': race_id,
+            'race_name': race_data['name'],
+            'race_date': datetime.fromisoformat(race_data['date']),
+            'race_end_date': datetime.fromisoformat(race_data['end_date']),
+            'race_timezone': race_data['timezone'],
+            'race_location': race_data['location'],
+            'flight_uuid': uuid4(),
+            'flight_id': flight_id,
+            'pilot_id': pilot_id,
+            'pilot_name': pilot_name,
+            'source': source,
+            'device_id': device_id,
+            'now': datetime.now(timezone.utc)
+        }
+
+    def _store(self, flight_id, source, row) -> Dict:
+        entry = {
+            'uuid': row.id,
+            'pilot_id': row.pilot_id,
+            'pilot_name': row.pilot_name,
+            'closed_at': row.closed_at,
+            'closed_by': row.closed_by,
+            'total_points': row.total_points or 0,
+            'expires_at': time.time() + self.ttl
+        }
+
+        with self._lock:
+            self.stats['upserts'] += 1
+            if len(self._entries) >= self.maxsize:
+                self._evict_expired()
+            if len(self._entries) >= self.maxsize:
+                # Still full - drop the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k]['expires_at'])
+                del self._entries[oldest]
+            self._entries[(flight_id, source)] = entry
+
+        return entry
+
+    def invalidate(self, flight_id: str, source: Optional[str] = None):
+        """Forget a flight after it is closed, deleted or reassigned"""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == flight_id and (source is None or k[1] == source)]
+            for key in keys:
+                del self._entries[key]
+            self.stats['invalidations'] += len(keys)
+
+    def _evict_expired(self):
+        now = time.time()
+        for key in [k for k, v in self._entries.items() if v['expires_at'] <= now]:
+            del self._entries[key]
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'size': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+
+live_flight_cache = LiveFlightCache()
@@ -1,7 +1,17 @@
 import logging
+import asyncio
+import json
+from collections import deque
 from typing import Dict, List, Optional, Tuple, Literal
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import math
+import numpy as np
+from uuid import UUID
+
+from sqlalchemy import text
+
+from redis_queue_system.redis_queue import redis_queue
+from utils.track_kernels import point_arrays, segment_dynamics
 
 # Define the flight states
 FlightState = Literal['flying', 'walking',
@@ -23,6 +33,20 @@ FLYING_BUFFER_TIME = timedelta(seconds=60)
 ALTITUDE_CHANGE_WINDOW = timedelta(seconds=30)
 # inactivity threshold for live flights
 INACTIVITY_THRESHOLD = timedelta(minutes=5)
+# points kept per flight by the incremental state engine
+STATE_WINDOW_POINTS = 20
+# seconds between batched state recomputations
+STATE_UPDATE_INTERVAL = 10
+# Redis keys of the windows shared by all workers and of the flights awaiting recomputation
+STATE_KEY_PREFIX = 'flight_state:'
+STATE_DIRTY_KEY = f'{STATE_KEY_PREFIX}dirty'
+# Hash of each flight's last computed state, and sorted set of flights by the time of their newest point
+STATE_LAST_KEY = f'{STATE_KEY_PREFIX}last'
+STATE_ACTIVE_KEY = f'{STATE_KEY_PREFIX}active'
+# points kept per shared window, with room for batches pushed out of order by other workers
+SHARED_WINDOW_POINTS = 2 * STATE_WINDOW_POINTS
+# dirty flights a worker claims per flush
+STATE_CLAIM_BATCH = 5000
 
 logger = logging.getLogger(__name__)
 
@@ -74,75 +98,59 @@ def detect_flight_state(
     if not track_points or len(track_points) < min_points:
         return previous_state or 'unknown', {'confidence': 'low', 'reason': 'insufficient_data'}
 
-    # Sort track points by datetime
-    sorted_points = sorted(track_points, key=lambda p:
-                           datetime.fromisoformat(
-                               p['datetime'].replace('Z', '+00:00'))
-                           if isinstance(p['datetime'], str) else p['datetime'])
-
-    # Calculate speeds between consecutive points
-    speeds = []
-    altitude_changes = []
-    total_distance = 0
-    total_time = 0
-
-    for i in range(1, len(sorted_points)):
-        p1 = sorted_points[i-1]
-        p2 = sorted_points[i]
-
-        # Get timestamps
-        t1 = p1['datetime'] if isinstance(p1['datetime'], datetime) else datetime.fromisoformat(
-            p1['datetime'].replace('Z', '+00:00'))
-        t2 = p2['datetime'] if isinstance(p2['datetime'], datetime) else datetime.fromisoformat(
-            p2['datetime'].replace('Z', '+00:00'))
-
-        time_diff = (t2 - t1).total_seconds()
-        if time_diff <= 0:
-            continue  # Skip invalid time differences
-
-        # Calculate distance
-        distance = calculate_distance(
-            p1['lat'], p1['lon'], p2['lat'], p2['lon'])
-        total_distance += distance
-        total_time += time_diff
-
-        # Calculate speed
-        speed = calculate_speed(distance, time_diff)
-        speeds.append(speed)
-
-        # Calculate altitude change
-        if 'elevation' in p1 and 'elevation' in p2 and p1['elevation'] is not None and p2['elevation'] is not None:
-            alt_change = p2['elevation'] - p1['elevation']
-            altitude_changes.append((alt_change, time_diff, t2))
-
-    if not speeds:
+    # Parse each timestamp once and compute all segments with the array kernels
+    epoch, lat, lon, elevation = point_arrays(track_points)
+    order = np.argsort(epoch, kind='stable')
+    epoch, lat, lon, elevation = epoch[order], lat[order], lon[order], elevation[order]
+    segments = segment_dynamics(epoch, lat, lon, elevation)
+
+    # Skip invalid time differences
+    valid = segments['time_diff'] > 0
+    speeds = segments['speed'][valid]
+
+    if not speeds.size:
         return previous_state or 'unknown', {'confidence': 'low', 'reason': 'no_speed_data'}
 
     # Calculate average speed
-    avg_speed = sum(speeds) / len(speeds)
-    max_speed = max(speeds)
+    avg_speed = float(speeds.mean())
+    max_speed = float(speeds.max())
 
     # Calculate average speed over the entire track
+    total_distance = float(segments['distance'][valid].sum())
+    total_time = float(segments['time_diff'][valid].sum())
     overall_avg_speed = total_distance / total_time if total_time > 0 else 0
 
     # Check for significant altitude changes in recent points
     recent_altitude_change = 0
-    if altitude_changes:
-        latest_time = altitude_changes[-1][2]
-        window_start = latest_time - ALTITUDE_CHANGE_WINDOW
-        recent_changes = [change for change, _,
-                          t in altitude_changes if t >= window_start]
-        if recent_changes:
-            recent_altitude_change = sum(recent_changes)
-
+    with_altitude = valid & ~np.isnan(elevation[:-1]) & ~np.isnan(elevation[1:])
+    if with_altitude.any():
+        changes = np.diff(elevation)[with_altitude]
+        change_times = epoch[1:][with_altitude]
+        window_start = change_times[-1] - ALTITUDE_CHANGE_WINDOW.total_seconds()
+        recent_altitude_change = float(changes[change_times >= window_start].sum())
+
+    return classify_flight_state(avg_speed, max_speed, overall_avg_speed, int(speeds.size),
+                                 recent_altitude_change, previous_state, min_points)
+
+
+def classify_flight_state(
+    avg_speed: float,
+    max_speed: float,
+    overall_avg_speed: float,
+    speed_count: int,
+    recent_altitude_change: float,
+    previous_state: Optional[FlightState] = None,
+    min_points: int = MIN_POINTS_FOR_STATE
+) -> Tuple[FlightState, Dict]:
+    """Map window speed/altitude statistics to a flight state"""
     # Determine state based on speeds and altitude changes
     state_info = {
         'avg_speed': avg_speed,
         'max_speed': max_speed,
         'overall_avg_speed': overall_avg_speed,
-        'speed_count': len(speeds),
+        'speed_count': speed_count,
         'altitude_change': recent_altitude_change,
-        'confidence': 'high' if len(speeds) >= min_points else 'medium'
+        'confidence': 'high' if speed_count >= min_points else 'medium'
     }
 
     # State determination logic
@@ -327,3 +335,426 @@ def detect_flight_state_from_db(flight_uuid, db, recent_points_limit=20):
     state, state_info = detect_flight_state(formatted_points)
 
     return state, state_info
+
+
+def _point_time(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+class FlightStateWindow:
+    """
+    Rolling window of a flight's most recent points.
+    Speed, distance and altitude-change sums are updated in O(1) per point, so the
+    state can be evaluated without re-sorting or re-running haversine over the window.
+    Points older than the newest one are ignored.
+    """
+
+    def __init__(self, max_points: int = STATE_WINDOW_POINTS):
+        self.max_points = max_points
+        self.points = deque()         # (datetime, lat, lon, elevation)
+        self.segments = deque()       # (seq, speed, distance, time_diff)
+        self.max_speeds = deque()     # (seq, speed), decreasing speeds
+        self.alt_changes = deque()    # (seq, datetime, altitude change)
+        self.seq = 0
+        self.state: Optional[FlightState] = None
+        self.speed_sum = 0.0
+        self.distance_sum = 0.0
+        self.time_sum = 0.0
+        self.alt_sum = 0.0
+
+    def add(self, when, lat: float, lon: float, elevation: Optional[float]) -> bool:
+        t = _point_time(when)
+        if self.points and t <= self.points[-1][0]:
+            return False
+
+        if self.points:
+            t1, lat1, lon1, elev1 = self.points[-1]
+            time_diff = (t - t1).total_seconds()
+            distance = calculate_distance(lat1, lon1, lat, lon)
+            speed = calculate_speed(distance, time_diff)
+
+            self.seq += 1
+            self.segments.append((self.seq, speed, distance, time_diff))
+            self.speed_sum += speed
+            self.distance_sum += distance
+            self.time_sum += time_diff
+
+            while self.max_speeds and self.max_speeds[-1][1] <= speed:
+                self.max_speeds.pop()
+            self.max_speeds.append((self.seq, speed))
+
+            if elev1 is not None and elevation is not None:
+                change = elevation - elev1
+                self.alt_changes.append((self.seq, t, change))
+                self.alt_sum += change
+                window_start = t - ALTITUDE_CHANGE_WINDOW
+                while self.alt_changes[0][1] < window_start:
+                    self.alt_sum -= self.alt_changes.popleft()[2]
+
+        self.points.append((t, lat, lon, elevation))
+        if len(self.points) > self.max_points:
+            self.points.popleft()
+            self._drop_oldest_segment()
+        return True
+
+    def _drop_oldest_segment(self):
+        seq, speed, distance, time_diff = self.segments.popleft()
+        self.speed_sum -= speed
+        self.distance_sum -= distance
+        self.time_sum -= time_diff
+        if self.max_speeds and self.max_speeds[0][0] <= seq:
+            self.max_speeds.popleft()
+        while self.alt_changes and self.alt_changes[0][0] <= seq:
+            self.alt_sum -= self.alt_changes.popleft()[2]
+
+    @property
+    def last_time(self) -> Optional[datetime]:
+        return self.points[-1][0] if self.points else None
+
+    def evaluate(
+        self,
+        previous_state: Optional[FlightState] = None,
+        min_points: int = MIN_POINTS_FOR_STATE
+    ) -> Tuple[FlightState, Dict]:
+        """Same result as detect_flight_state over the window's points"""
+        if len(self.points) < min_points:
+            return previous_state or 'unknown', {'confidence': 'low', 'reason': 'insufficient_data'}
+        if not self.segments:
+            return previous_state or 'unknown', {'confidence': 'low', 'reason': 'no_speed_data'}
+
+        count = len(self.segments)
+        overall_avg_speed = self.distance_sum / self.time_sum if self.time_sum > 0 else 0
+        return classify_flight_state(self.speed_sum / count, self.max_speeds[0][1], overall_avg_speed,
+                                     count, self.alt_sum if self.alt_changes else 0, previous_state,
+                                     min_points)
+
+
+class FlightStateEngine:
+    """
+    Incremental flight state for live flights.
+    Ingest endpoints feed new points with add_points(); states of flights that received
+    points are recomputed at most once per interval and written to the flights table in
+    one batched UPDATE, off the event loop. Each state is computed from the flight's
+    previous one, so launch and landing transitions are detected, and flights that stop
+    sending points are marked inactive once the inactivity threshold has passed.
+
+    With several workers a flight's points arrive at whichever worker took the request,
+    so each worker pushes its new points to a shared per-flight window in Redis and marks
+    the flight dirty there. Every flush claims dirty flights with SPOP, so each state is
+    computed by one worker from all of the flight's recent points. Without Redis the
+    windows are kept in this worker's memory, which is only complete with one worker.
+    """
+
+    def __init__(self, interval: int = STATE_UPDATE_INTERVAL):
+        self.interval = interval
+        self.windows: Dict = {}
+        self.pending: Dict = {}
+        self.unseeded = set()
+        self.idle: Dict = {}
+        self.running = False
+        self._task = None
+        self.stats = {
+            'points_added': 0,
+            'points_ignored': 0,
+            'flushes': 0,
+            'states_written': 0,
+            'flights_seeded': 0,
+            'flights_claimed': 0,
+            'flights_inactive': 0,
+            'redis_errors': 0,
+            'errors': 0
+        }
+
+    @property
+    def client(self):
+        return redis_queue.redis_client
+
+    def add_points(self, flight_uuid, points: List[Dict]):
+        """Add points (dicts with datetime, lat, lon, elevation) and mark the flight for recomputation"""
+        self.pending.setdefault(UUID(str(flight_uuid)), []).extend(
+            (_point_time(point['datetime']), float(point['lat']), float(point['lon']),
+             float(point['elevation']) if point.get('elevation') is not None else None)
+            for point in points)
+        self.stats['points_added'] += len(points)
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Flight state engine started (interval: {self.interval}s)")
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Persist whatever is pending
+        await self.flush()
+        logger.info("Flight state engine stopped")
+
+    async def _run(self):
+        while self.running:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error flushing flight states: {e}")
+
+    async def flush(self):
+        """Recompute dirty flights and persist their states in one transaction"""
+        pending, self.pending = self.pending, {}
+        idle, self.idle = self.idle, {}
+        claimed = None
+        if self.client is not None:
+            try:
+                claimed = await self._shared_windows(pending)
+                idle.update(await self._shared_idle())
+            except Exception as e:
+                self.stats['redis_errors'] += 1
+                logger.warning(f"Shared flight state windows unavailable, using local ones: {e}")
+        if claimed is None:
+            claimed_locally = self._local_windows(pending)
+            idle.update(self._evict_idle(pending))
+        windows, unseeded = claimed if claimed is not None else claimed_locally
+        if not windows and not idle:
+            return
+
+        try:
+            if unseeded:
+                stored = await asyncio.to_thread(_load_recent_points, unseeded)
+                for flight_uuid in unseeded:
+                    windows[flight_uuid] = _seeded(windows[flight_uuid], stored.get(flight_uuid, []))
+                    if claimed is None:
+                        self.windows[flight_uuid] = windows[flight_uuid]
+                        self.unseeded.discard(flight_uuid)
+                self.stats['flights_seeded'] += len(unseeded)
+
+            # Flights new to this engine continue from the state stored with them
+            stateless = [flight_uuid for flight_uuid, window in windows.items() if window.state is None]
+            if stateless:
+                stored_states = await asyncio.to_thread(_load_states, stateless)
+                for flight_uuid in stateless:
+                    windows[flight_uuid].state = stored_states.get(flight_uuid)
+
+            now = datetime.now(timezone.utc).isoformat()
+            rows = []
+            for flight_uuid, window in windows.items():
+                state, state_info = window.evaluate(window.state)
+                window.state = state
+                state_info['last_updated'] = now
+                state_info['state'] = state
+                rows.append({'id': flight_uuid, 'state': json.dumps(state_info)})
+            for flight_uuid, (last_time, previous_state) in idle.items():
+                rows.append({'id': flight_uuid, 'state': json.dumps({
+                    'state': 'inactive',
+                    'confidence': 'high',
+                    'reason': 'connection_lost',
+                    'last_updated': now,
+                    'last_active': last_time.isoformat(),
+                    'previous_state': previous_state
+                })})
+
+            await asyncio.to_thread(_write_states, rows)
+            self.stats['flushes'] += 1
+            self.stats['states_written'] += len(rows)
+            self.stats['flights_inactive'] += len(idle)
+        except Exception:
+            # Retry these flights on the next flush
+            for flight_uuid in windows:
+                self.pending.setdefault(flight_uuid, [])
+            self.idle.update(idle)
+            raise
+
+        if claimed is not None and windows:
+            try:
+                await self.client.hset(STATE_LAST_KEY, mapping={
+                    str(flight_uuid): window.state for flight_uuid, window in windows.items()})
+            except Exception as e:
+                self.stats['redis_errors'] += 1
+                logger.warning(f"Could not share computed flight states: {e}")
+
+    def _local_windows(self, pending: Dict) -> Tuple[Dict, List]:
+        """
+        Add pending points to this worker's windows. Returns the windows of the flights
+        that got some, and those of them still to be seeded with stored points.
+        """
+        windows = {}
+        for flight_uuid, points in pending.items():
+            window = self.windows.get(flight_uuid)
+            if window is None:
+                window = self.windows[flight_uuid] = FlightStateWindow()
+                self.unseeded.add(flight_uuid)
+            self._add(window, points)
+            windows[flight_uuid] = window
+        return windows, [flight_uuid for flight_uuid in windows if flight_uuid in self.unseeded]
+
+    async def _shared_windows(self, pending: Dict) -> Tuple[Dict, List]:
+        """
+        Push pending points to Redis, then claim dirty flights and load their windows.
+        Returns them like _local_windows.
+        """
+        if pending:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for flight_uuid, points in pending.items():
+                    key = f'{STATE_KEY_PREFIX}{flight_uuid}'
+                    if points:
+                        pipe.rpush(key, *(json.dumps([t.isoformat(), lat, lon, elevation])
+                                          for t, lat, lon, elevation in points))
+                        pipe.ltrim(key, -SHARED_WINDOW_POINTS, -1)
+                        pipe.expire(key, int(INACTIVITY_THRESHOLD.total_seconds()))
+                    pipe.sadd(STATE_DIRTY_KEY, str(flight_uuid))
+                    if points:
+                        newest = max(point[0] for point in points).timestamp()
+                        pipe.zadd(STATE_ACTIVE_KEY, {str(flight_uuid): newest}, gt=True)
+                await pipe.execute()
+        # Shared windows replace the local ones
+        self.windows.clear()
+        self.unseeded.clear()
+
+        claimed = await self.client.spop(STATE_DIRTY_KEY, STATE_CLAIM_BATCH) or []
+        if not claimed:
+            return {}, []
+        self.stats['flights_claimed'] += len(claimed)
+        async with self.client.pipeline(transaction=False) as pipe:
+            for flight_uuid in claimed:
+                pipe.lrange(f'{STATE_KEY_PREFIX}{flight_uuid}', 0, -1)
+            pipe.hmget(STATE_LAST_KEY, claimed)
+            *stored, states = await pipe.execute()
+
+        windows = {}
+        for flight_uuid, entries, state in zip(claimed, stored, states):
+            window = windows[UUID(flight_uuid)] = FlightStateWindow()
+            window.state = state.decode() if isinstance(state, bytes) else state
+            self._add(window, [(_point_time(t), lat, lon, elevation)
+                               for t, lat, lon, elevation in map(json.loads, entries)])
+        # Fewer points than a full window: the flight is new or its window expired
+        return windows, [flight_uuid for flight_uuid, window in windows.items()
+                         if len(window.points) < STATE_WINDOW_POINTS]
+
+    def _add(self, window: FlightStateWindow, points):
+        for t, lat, lon, elevation in sorted(points, key=lambda point: point[0]):
+            if not window.add(t, lat, lon, elevation):
+                self.stats['points_ignored'] += 1
+
+    async def _shared_idle(self) -> Dict:
+        """
+        Claim flights whose newest shared point is older than the inactivity threshold.
+        Returns {flight_uuid: (last point time, last state)} of the flights this worker removed.
+        """
+        cutoff = (datetime.now(timezone.utc) - INACTIVITY_THRESHOLD).timestamp()
+        candidates = await self.client.zrangebyscore(
+            STATE_ACTIVE_KEY, '-inf', cutoff, start=0, num=STATE_CLAIM_BATCH, withscores=True)
+        if not candidates:
+            return {}
+        async with self.client.pipeline(transaction=False) as pipe:
+            for flight_uuid, _ in candidates:
+                pipe.zrem(STATE_ACTIVE_KEY, flight_uuid)
+            pipe.hmget(STATE_LAST_KEY, [flight_uuid for flight_uuid, _ in candidates])
+            *removed, states = await pipe.execute()
+
+        # Only the worker whose ZREM removed a flight marks it inactive
+        idle = {}
+        for (flight_uuid, last_time), was_removed, state in zip(candidates, removed, states):
+            if was_removed:
+                flight_uuid = flight_uuid.decode() if isinstance(flight_uuid, bytes) else flight_uuid
+                idle[UUID(flight_uuid)] = (datetime.fromtimestamp(last_time, timezone.utc),
+                                           state.decode() if isinstance(state, bytes) else state)
+        if idle:
+            await self.client.hdel(STATE_LAST_KEY, *(str(flight_uuid) for flight_uuid in idle))
+        return idle
+
+    def _evict_idle(self, pending: Dict) -> Dict:
+        """
+        Drop windows of flights without points for longer than the inactivity threshold.
+        Returns {flight_uuid: (last point time, last state)} of the dropped flights.
+        """
+        cutoff = datetime.now(timezone.utc) - INACTIVITY_THRESHOLD
+        idle = {}
+        for flight_uuid in [f for f, w in self.windows.items()
+                            if f not in pending and w.last_time and w.last_time < cutoff]:
+            window = self.windows.pop(flight_uuid)
+            self.unseeded.discard(flight_uuid)
+            idle[flight_uuid] = (window.last_time, window.state)
+        return idle
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'flights_tracked': len(self.windows),
+            'pending': len(self.pending),
+            'running': self.running
+        }
+
+
+def _seeded(window: FlightStateWindow, stored: List) -> FlightStateWindow:
+    """Window of a flight's stored points merged with the ones it already holds"""
+    seeded = FlightStateWindow()
+    seeded.state = window.state
+    for t, lat, lon, elevation in sorted(stored + list(window.points), key=lambda point: point[0]):
+        seeded.add(t, lat, lon, elevation)
+    return seeded
+
+
+def _load_recent_points(flight_uuids: List) -> Dict:
+    """Most recent stored points of each flight as (datetime, lat, lon, elevation), one query for all"""
+    from database.db_replica import PrimarySession
+
+    with PrimarySession() as db:
+        result = db.execute(text("""
+            SELECT flight_uuid, datetime, lat, lon, elevation FROM (
+                SELECT flight_uuid, datetime, lat, lon, elevation,
+                       row_number() OVER (PARTITION BY flight_uuid ORDER BY datetime DESC) AS rn
+                FROM live_track_points
+                WHERE flight_uuid = ANY(:ids) AND datetime > now() - interval '1 hour'
+            ) recent
+            WHERE rn <= :limit
+            ORDER BY flight_uuid, datetime
+        """), {'ids': list(flight_uuids), 'limit': STATE_WINDOW_POINTS})
+
+        stored: Dict = {}
+        for row in result:
+            stored.setdefault(row.flight_uuid, []).append(
+                (row.datetime, float(row.lat), float(row.lon),
+                 float(row.elevation) if row.elevation is not None else None))
+        return stored
+
+
+def _load_states(flight_uuids: List) -> Dict:
+    """State each flight was last stored with, one query for all"""
+    from database.db_replica import PrimarySession
+
+    with PrimarySession() as db:
+        result = db.execute(text(
+            "SELECT id, flight_state->>'state' AS state FROM flights WHERE id = ANY(:ids)"
+        ), {'ids': list(flight_uuids)})
+        # A flight that was marked inactive starts over when its points resume
+        return {row.id: row.state for row in result if row.state and row.state != 'inactive'}
+
+
+def _write_states(rows: List[Dict]):
+    """Write computed states in one transaction; uploaded flights keep their final state"""
+    if not rows:
+        return
+    from database.db_replica import PrimarySession
+
+    with PrimarySession() as db:
+        try:
+            db.execute(text(
+                "UPDATE flights SET flight_state = CAST(:state AS JSON) "
+                "WHERE id = :id AND COALESCE(flight_state->>'state', '') <> 'uploaded'"
+            ), rows)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+
+flight_state_engine = FlightStateEngine()
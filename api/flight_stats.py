@@ -0,0 +1,309 @@
+"""
+Materialized per-flight track statistics
+Every point insert extends its flights' flight_stats rows from the fixes it actually
+inserted (INSERT ... RETURNING), in the same transaction, so previews and listings read
+distance, duration, altitude, speed and gain/loss by primary key instead of scanning the
+track. A batch arriving out of order leaves the row behind, as does anything else that
+changes a track (deletions): its point count no longer matches the flight's
+trigger-maintained total_points, so reads leave it out and a background task recounts
+the flight from the point table once it has had no batches for FLIGHT_STATS_REBUILD_DELAY.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from database.models import Flight, FlightStats, LiveTrackPoint, UploadedTrackPoint
+from utils.track_kernels import segment_dynamics, to_epoch
+
+logger = logging.getLogger(__name__)
+
+# Consecutive elevation changes up to this many meters are GPS noise, not gain or loss
+ELEVATION_DEAD_BAND = 1.0
+# Seconds without out-of-order batches before a flight is recounted, so a chunked upload
+# is recounted once rather than per chunk
+FLIGHT_STATS_REBUILD_DELAY = int(os.getenv('FLIGHT_STATS_REBUILD_DELAY', '10'))
+
+STAT_FIELDS = ('point_count', 'start_time', 'end_time', 'distance', 'max_speed', 'min_elevation',
+               'max_elevation', 'elevation_gain', 'elevation_loss', 'last_lat', 'last_lon', 'last_elevation')
+
+
+def point_model_for(flight):
+    """Point table of a flight: live sources ('live', 'tk905b_live', 'flymaster_live') or uploads"""
+    return LiveTrackPoint if 'live' in flight.source else UploadedTrackPoint
+
+
+def stats_columns(point_model) -> tuple:
+    """Columns a point insert returns (RETURNING) for FlightStatsStore.apply"""
+    return point_model.flight_uuid, point_model.datetime, point_model.lat, point_model.lon, point_model.elevation
+
+
+def summarize(times: List[datetime], lat: np.ndarray, lon: np.ndarray, alt: np.ndarray) -> Dict:
+    """Statistics of a time-sorted run of fixes, in flight_stats columns"""
+    dynamics = segment_dynamics(to_epoch(times), lat, lon, alt)
+    climb = np.diff(alt)
+    known = alt[~np.isnan(alt)]
+    last_elevation = alt[-1]
+    return {
+        'point_count': len(times),
+        'start_time': times[0],
+        'end_time': times[-1],
+        'distance': float(dynamics['distance'].sum()),
+        'max_speed': float(dynamics['speed'].max()) if len(times) > 1 else 0.0,
+        'min_elevation': float(known.min()) if len(known) else None,
+        'max_elevation': float(known.max()) if len(known) else None,
+        # NaN differences (unknown elevation on either side) compare False and count as 0
+        'elevation_gain': float(climb[climb > ELEVATION_DEAD_BAND].sum()),
+        'elevation_loss': float(-climb[climb < -ELEVATION_DEAD_BAND].sum()),
+        'last_lat': float(lat[-1]),
+        'last_lon': float(lon[-1]),
+        'last_elevation': None if np.isnan(last_elevation) else float(last_elevation)
+    }
+
+
+def _arrays(points) -> tuple:
+    times = [point.datetime for point in points]
+    lat = np.array([point.lat for point in points], dtype=float)
+    lon = np.array([point.lon for point in points], dtype=float)
+    alt = np.array([point.elevation for point in points], dtype=float)
+    return times, lat, lon, alt
+
+
+def _none_to_nan(value: Optional[float]) -> float:
+    return np.nan if value is None else value
+
+
+def extend(current: FlightStats, points) -> None:
+    """Continue current's sums with time-sorted fixes that are all newer than current.end_time"""
+    times, lat, lon, alt = _arrays(points)
+    # Prepend the stored last fix so the segment joining the batches is counted
+    added = summarize([current.end_time] + times,
+                      np.concatenate(([current.last_lat], lat)),
+                      np.concatenate(([current.last_lon], lon)),
+                      np.concatenate(([_none_to_nan(current.last_elevation)], alt)))
+    current.point_count += len(points)
+    current.end_time = added['end_time']
+    current.distance += added['distance']
+    current.max_speed = max(current.max_speed or 0.0, added['max_speed'])
+    current.elevation_gain += added['elevation_gain']
+    current.elevation_loss += added['elevation_loss']
+    if added['min_elevation'] is not None:
+        current.min_elevation = added['min_elevation'] if current.min_elevation is None \
+            else min(current.min_elevation, added['min_elevation'])
+        current.max_elevation = added['max_elevation'] if current.max_elevation is None \
+            else max(current.max_elevation, added['max_elevation'])
+    current.last_lat = added['last_lat']
+    current.last_lon = added['last_lon']
+    current.last_elevation = added['last_elevation']
+    current.updated_at = datetime.now(timezone.utc)
+
+
+def compute(db: Session, point_model, flight_uuid) -> Dict:
+    """Statistics of a flight's whole track, read from its point table"""
+    points = db.query(point_model.datetime, point_model.lat, point_model.lon, point_model.elevation).filter(
+        point_model.flight_uuid == flight_uuid
+    ).order_by(point_model.datetime).all()
+    if not points:
+        return {field: None for field in STAT_FIELDS} | {
+            'point_count': 0, 'distance': 0.0, 'max_speed': 0.0, 'elevation_gain': 0.0, 'elevation_loss': 0.0}
+    return summarize(*_arrays(points))
+
+
+def format_stats(row: Optional[FlightStats]) -> Dict:
+    """The track preview 'stats' object; empty for flights without fixes"""
+    if row is None or not row.point_count:
+        return {}
+    duration = (row.end_time - row.start_time).total_seconds()
+    hours, remainder = divmod(int(duration), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    avg_speed = row.distance / duration if duration > 0 else 0
+    elevation_range = row.max_elevation - row.min_elevation if row.min_elevation is not None else None
+
+    def rounded(value, digits=1):
+        return round(float(value), digits) if value is not None else None
+
+    return {
+        "distance": {
+            "meters": round(row.distance, 2),
+            "kilometers": round(row.distance / 1000, 2)
+        },
+        "duration": {
+            "seconds": int(duration),
+            "formatted": f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+        },
+        "speed": {
+            "avg_m_s": round(avg_speed, 2),
+            "avg_km_h": round(avg_speed * 3.6, 2),
+            "max_m_s": round(row.max_speed, 2),
+            "max_km_h": round(row.max_speed * 3.6, 2)
+        },
+        "elevation": {
+            "min": rounded(row.min_elevation),
+            "max": rounded(row.max_elevation),
+            "range": rounded(elevation_range),
+            "gain": rounded(row.elevation_gain),
+            "loss": rounded(row.elevation_loss)
+        },
+        "points": {
+            "total": row.point_count
+        },
+        "timestamps": {
+            "start": row.start_time.isoformat(),
+            "end": row.end_time.isoformat()
+        }
+    }
+
+
+class FlightStatsStore:
+    def __init__(self, rebuild_delay: int = FLIGHT_STATS_REBUILD_DELAY):
+        self.rebuild_delay = rebuild_delay
+        # flight UUID -> (point model, monotonic time it was last found stale)
+        self.pending: Dict = {}
+        self.running = False
+        self._task = None
+        self.stats = {
+            'batches': 0,
+            'extended': 0,
+            'started': 0,
+            'rebuilt': 0,
+            'read_hits': 0,
+            'read_misses': 0,
+            'errors': 0
+        }
+
+    def apply(self, db: Session, point_model, inserted) -> None:
+        """
+        Fold freshly inserted fixes (rows with flight_uuid, datetime, lat, lon and elevation,
+        as returned by the insert) into their flights' stats. Call before the batch commits:
+        the stats rows are locked until then, so concurrent batches of a flight serialize.
+        """
+        by_flight = defaultdict(list)
+        for point in inserted:
+            by_flight[point.flight_uuid].append(point)
+        if not by_flight:
+            return
+        self.stats['batches'] += 1
+
+        # Create missing rows first so there always is a row to lock
+        db.execute(insert(FlightStats).values(
+            [{'flight_uuid': flight_uuid} for flight_uuid in by_flight]
+        ).on_conflict_do_nothing(index_elements=['flight_uuid']))
+        rows = db.query(FlightStats).filter(
+            FlightStats.flight_uuid.in_(list(by_flight))
+        ).order_by(FlightStats.flight_uuid).with_for_update().all()
+
+        for current in rows:
+            points = sorted(by_flight[current.flight_uuid], key=lambda point: point.datetime)
+            if not current.point_count:
+                # New row: the batch is the track so far
+                self._store(current, summarize(*_arrays(points)))
+                self.stats['started'] += 1
+            elif current.end_time is not None and points[0].datetime > current.end_time:
+                extend(current, points)
+                self.stats['extended'] += 1
+            else:
+                # A batch reaching back into the track: leave the row behind (it no longer
+                # matches total_points) and recount once the flight's batches stop
+                self.schedule(current.flight_uuid, point_model)
+
+    def get_many(self, db: Session, flights: Iterable[Flight], rebuild: bool = True) -> Dict:
+        """
+        Stats rows of the given flights, keyed by flight UUID. Missing or stale rows are
+        left out, and scheduled for a background rebuild when rebuild is set.
+        """
+        flights = [flight for flight in flights if flight.total_points]
+        if not flights:
+            return {}
+        rows = {row.flight_uuid: row for row in db.query(FlightStats).filter(
+            FlightStats.flight_uuid.in_([flight.id for flight in flights])).all()}
+
+        stale = [flight for flight in flights
+                 if flight.id not in rows or rows[flight.id].point_count != flight.total_points]
+        self.stats['read_hits'] += len(flights) - len(stale)
+        self.stats['read_misses'] += len(stale)
+        for flight in stale:
+            rows.pop(flight.id, None)
+            if rebuild:
+                # Due right away, unless batches of the flight are still arriving
+                self.pending.setdefault(flight.id, (point_model_for(flight), time.monotonic() - self.rebuild_delay))
+        return rows
+
+    def get(self, db: Session, flight: Flight) -> Optional[FlightStats]:
+        return self.get_many(db, [flight]).get(flight.id)
+
+    @staticmethod
+    def _store(current: FlightStats, values: Dict) -> None:
+        for field, value in values.items():
+            setattr(current, field, value)
+        current.updated_at = datetime.now(timezone.utc)
+
+    # ---- background rebuilds ----
+
+    def schedule(self, flight_uuid, point_model) -> None:
+        """(Re)start the flight's rebuild delay"""
+        self.pending[flight_uuid] = (point_model, time.monotonic())
+
+    def rebuild(self, flight_uuid, point_model) -> None:
+        """Recount a flight's stats from its point table, in a transaction of its own"""
+        from database.db_replica import PrimarySession
+
+        with PrimarySession() as db:
+            db.execute(insert(FlightStats).values(flight_uuid=flight_uuid).on_conflict_do_nothing(
+                index_elements=['flight_uuid']))
+            # Locked before counting, so a batch committing meanwhile extends the recount
+            current = db.query(FlightStats).filter(
+                FlightStats.flight_uuid == flight_uuid).with_for_update().one()
+            self._store(current, compute(db, point_model, flight_uuid))
+            db.commit()
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Flight stats rebuilds started (delay: {self.rebuild_delay}s)")
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Flight stats rebuilds stopped")
+
+    async def _run(self):
+        while self.running:
+            await asyncio.sleep(max(1, self.rebuild_delay // 3))
+            now = time.monotonic()
+            ready = [key for key, (_, touched) in list(self.pending.items()) if now - touched >= self.rebuild_delay]
+            for key in ready:
+                point_model, touched = self.pending[key]
+                try:
+                    await asyncio.to_thread(self.rebuild, key, point_model)
+                    self.stats['rebuilt'] += 1
+                    # Keep it pending if another batch reached back during the rebuild
+                    if self.pending.get(key, (None, None))[1] == touched:
+                        del self.pending[key]
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    # Dropped (a deleted flight fails for good); the next stale read or
+                    # out-of-order batch schedules it again
+                    if self.pending.get(key, (None, None))[1] == touched:
+                        del self.pending[key]
+                    logger.error(f"Error rebuilding flight stats of {key}: {e}")
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'pending_rebuilds': len(self.pending)}
+
+
+flight_stats_store = FlightStatsStore()
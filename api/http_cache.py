@@ -0,0 +1,106 @@
+"""
+HTTP conditional caching helpers for track and tile endpoints
+Version tokens come from data the handlers already load (the flight row's total_points
+and last_fix, kept current by the point triggers), so an unchanged resource is answered
+with 304 Not Modified before any point or tile query runs.
+"""
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+logger = logging.getLogger(__name__)
+
+# Live flights change every few seconds: always revalidate, never share (token protected)
+LIVE_CACHE_CONTROL = "private, no-cache"
+# Uploaded flights are immutable once stored; still token protected, so no shared caches
+UPLOAD_CACHE_CONTROL = "private, max-age=300"
+# Track tiles keep their short shared lifetime; uploaded tracks no longer change
+TILE_CACHE_CONTROL = "public, max-age=10"
+UPLOADED_TILE_CACHE_CONTROL = "public, max-age=300"
+# Scoring data is unauthenticated and only changes through explicit PUT/DELETE/batch calls
+SCORING_CACHE_CONTROL = "public, max-age=300"
+
+stats = {
+    'not_modified': 0,
+    'full_responses': 0
+}
+
+
+def make_etag(*parts) -> str:
+    """Strong, quoted ETag over the given version parts"""
+    raw = '|'.join('' if part is None else str(part) for part in parts)
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against an ETag (quoted or bare)"""
+    if not if_none_match:
+        return False
+    etag = etag.strip('"')
+    candidates = [tag.strip().removeprefix('W/').strip('"') for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+def flight_last_modified(flight) -> Optional[datetime]:
+    """Time of the flight's newest fix, from the trigger maintained last_fix column"""
+    if not flight.last_fix or not flight.last_fix.get('datetime'):
+        return None
+    try:
+        value = datetime.fromisoformat(flight.last_fix['datetime'].replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def flight_version(flight) -> str:
+    """Cheap version token for a flight's points: changes with every stored fix"""
+    last_fix = flight.last_fix['datetime'] if flight.last_fix else None
+    return f"{flight.id}:{flight.total_points}:{last_fix}"
+
+
+def cache_control_for(flight) -> str:
+    return UPLOAD_CACHE_CONTROL if flight.source == 'upload' else LIVE_CACHE_CONTROL
+
+
+def check_not_modified(request: Request, etag: str, cache_control: str,
+                       last_modified: Optional[datetime] = None) -> Tuple[Optional[Response], Dict[str, str]]:
+    """
+    Build the validator headers for a response and evaluate the request's preconditions.
+    Returns (304 response or None, headers). If-None-Match takes precedence over
+    If-Modified-Since, as in RFC 9110.
+    """
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified.astimezone(timezone.utc), usegmt=True)
+
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        fresh = etag_matches(if_none_match, etag)
+    else:
+        fresh = False
+        if_modified_since = request.headers.get('if-modified-since')
+        if if_modified_since and last_modified is not None:
+            try:
+                fresh = last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                fresh = False
+
+    if fresh:
+        stats['not_modified'] += 1
+        return Response(status_code=304, headers=headers), headers
+    stats['full_responses'] += 1
+    return None, headers
+
+
+def get_stats() -> Dict:
+    total = stats['not_modified'] + stats['full_responses']
+    return {
+        **stats,
+        'not_modified_ratio': round(stats['not_modified'] / total, 4) if total else 0.0
+    }
@@ -16,6 +16,15 @@ from database.db_conf import get_db
 from database.models import LiveTrackPoint, UploadedTrackPoint, Flight, Race
 from redis_queue_system.redis_queue import redis_queue, QUEUE_NAMES
 from monitoring.datadog_integration import datadog_metrics
+from api.auth import token_cache
+from services.geocoding_service import geocoding_service
+from services.xcontest_service import xcontest_service
+from api import http_cache
+from api.flight_stats import flight_stats_store
+from api.race_index import race_index
+from api.delay_line import delay_line
+from api.broadcast_bus import broadcast_bus
+from ws_tile_conn import tile_manager
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -62,6 +71,15 @@ class PlatformMonitor:
                 'gps_tcp_server': gps_metrics,
                 'database': db_metrics,
                 'queues': queue_metrics,
+                'auth': token_cache.get_stats(),
+                'geocoding': geocoding_service.get_stats(),
+                'xcontest': xcontest_service.get_stats(),
+                'http_cache': http_cache.get_stats(),
+                'flight_stats': flight_stats_store.get_stats(),
+                'race_index': race_index.get_stats(),
+                'delay_line': delay_line.get_stats(),
+                'broadcast_bus': broadcast_bus.get_stats(),
+                'live_broadcast': tile_manager.get_broadcast_stats(),
                 'platform_health': platform_health
             }
         except Exception as e:
@@ -161,8 +179,12 @@ class PlatformMonitor:
     async def get_upload_metrics(self, db: Session) -> Dict[str, Any]:
         """Get metrics for file upload system"""
         try:
-            # Get upload statistics
-            total_upload_count = db.query(func.count(func.distinct(UploadedTrackPoint.flight_id))).scalar() or 0
+            # Get upload statistics (from the flights table: counting distinct flight_ids over
+            # uploaded_track_points would decompress every compressed chunk)
+            total_upload_count = db.query(func.count(Flight.id)).filter(
+                Flight.source.contains('upload'),
+                Flight.total_points > 0
+            ).scalar() or 0
             
             # Recent uploads (last hour)
             recent_cutoff = datetime.utcnow() - timedelta(hours=1)
@@ -268,39 +290,55 @@ class PlatformMonitor:
                     'connections_total': 0
                 }
             
-            # Get table sizes
+            # Get table sizes (row estimates: COUNT(*) would decompress every compressed chunk)
             table_sizes = {}
-            tables = ['live_track_points', 'uploaded_track_points', 'flights', 'races']
+            tables = ['live_track_points', 'uploaded_track_points', 'scoring_tracks', 'flights', 'races']
             for table in tables:
-                result = db.execute(
-                    text(f"SELECT COUNT(*) FROM {table}")
-                )
+                try:
+                    result = db.execute(
+                        text("SELECT approximate_row_count(CAST(:table AS regclass))"), {'table': table}
+                    )
+                except Exception:
+                    # Without TimescaleDB
+                    db.rollback()
+                    result = db.execute(
+                        text(f"SELECT COUNT(*) FROM {table}")
+                    )
                 table_sizes[table] = result.scalar() or 0
             
             metrics['table_sizes'] = table_sizes
             
-            # Check TimescaleDB compression
+            # Check TimescaleDB compression (policies in sql/compression_policies.sql)
             try:
                 compression_result = db.execute(
                     text("""
-                        SELECT hypertable_name, 
-                               before_compression_total_bytes,
-                               after_compression_total_bytes
-                        FROM timescaledb_information.compression_stats
-                        WHERE hypertable_name IN ('live_track_points', 'uploaded_track_points')
+                        SELECT h.hypertable_name,
+                               s.total_chunks,
+                               s.number_compressed_chunks,
+                               s.before_compression_total_bytes,
+                               s.after_compression_total_bytes,
+                               hypertable_size(format('%I.%I', h.hypertable_schema, h.hypertable_name)::regclass) AS total_bytes
+                        FROM timescaledb_information.hypertables h
+                        CROSS JOIN LATERAL hypertable_compression_stats(
+                            format('%I.%I', h.hypertable_schema, h.hypertable_name)::regclass) s
+                        WHERE h.hypertable_name IN ('live_track_points', 'uploaded_track_points', 'scoring_tracks')
                     """)
                 )
                 compression_stats = []
                 for row in compression_result:
+                    stats = {
+                        'table': row.hypertable_name,
+                        'chunks': row.total_chunks,
+                        'compressed_chunks': row.number_compressed_chunks,
+                        'total_bytes': row.total_bytes
+                    }
                     if row.before_compression_total_bytes:
                         compression_ratio = 1 - (row.after_compression_total_bytes / row.before_compression_total_bytes)
-                        compression_stats.append({
-                            'table': row.hypertable_name,
-                            'compression_ratio': round(compression_ratio * 100, 2)
-                        })
+                        stats['compression_ratio'] = round(compression_ratio * 100, 2)
+                    compression_stats.append(stats)
                 metrics['compression'] = compression_stats
             except:
-                pass  # TimescaleDB might not be available
+                db.rollback()  # TimescaleDB might not be available
             
             # Report to Datadog
             await datadog_metrics.report_database_metrics({
@@ -423,7 +461,8 @@ async def get_monitoring_dashboard(
             'scoring': results[2] if not isinstance(results[2], Exception) else {'error': str(results[2])},
             'gps_tcp_server': results[3] if not isinstance(results[3], Exception) else {'error': str(results[3])},
             'database': results[4] if not isinstance(results[4], Exception) else {'error': str(results[4])},
-            'queues': results[5] if not isinstance(results[5], Exception) else {'error': str(results[5])}
+            'queues': results[5] if not isinstance(results[5], Exception) else {'error': str(results[5])},
+            'auth': token_cache.get_stats()
         }
         
         # Calculate overall platform health
@@ -512,6 +551,14 @@ async def get_queue_metrics() -> Dict[str, Any]:
     return health
 
 
+@router.get("/metrics/auth")
+async def get_auth_metrics() -> Dict[str, Any]:
+    """Get verified-token cache metrics including decode time saved"""
+    stats = token_cache.get_stats()
+    stats['timestamp'] = datetime.utcnow().isoformat()
+    return stats
+
+
 @router.get("/metrics/devices")
 async def get_device_metrics(
     db: Session = Depends(get_db),
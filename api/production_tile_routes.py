@@ -10,6 +10,7 @@ from datetime import datetime, timezone, timedelta
 from database.db_replica import get_read_db_with_fallback
 from database.models import Race, Flight
 from ws_tile_conn import tile_manager
+from utils.ws_frames import negotiate_binary
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -20,14 +21,16 @@ router = APIRouter()
 async def websocket_live_endpoint(
     websocket: WebSocket,
     race_id: str,
-    client_id: str = Query(...)
+    client_id: str = Query(...),
+    protocol: Optional[str] = Query(None, description="'binary' for binary frames (or offer subprotocol hfss-frames.v1)")
 ):
     """WebSocket endpoint for production tile-based live tracking"""
-    await websocket.accept()
+    subprotocol, binary = negotiate_binary(websocket, protocol)
+    await websocket.accept(subprotocol=subprotocol)
     
     try:
         # Connect to tile manager
-        await tile_manager.connect(websocket, race_id, client_id)
+        await tile_manager.connect(websocket, race_id, client_id, binary=binary)
         
         # Handle messages
         while True:
@@ -0,0 +1,325 @@
+"""
+Per-race index of each pilot's current live flight, kept in Redis
+For every race a hash maps pilot_id to the pilot's current flight (uuid, names, source,
+first/last fix, point count, flight state and dynamics) and a sorted set orders the
+pilots by last fix time. The point processor updates both after every committed batch,
+so viewer endpoints and broadcasters read the newest flight per pilot with one or two
+Redis calls instead of scanning flights with an unindexed last_fix JSON filter.
+
+The index is rebuilt from the database on startup and then periodically. Readers get
+None and fall back to their database queries until a rebuild has completed, whenever the
+ready marker is gone (Redis lost the index), for races without entries, and without Redis.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from database.models import Flight
+from redis_queue_system.redis_queue import redis_queue
+from utils.flight_dynamics import calculate_flight_dynamics_from_dicts
+
+logger = logging.getLogger(__name__)
+
+# Races without new fixes for this long drop out of Redis
+RACE_INDEX_TTL = int(os.getenv('RACE_INDEX_TTL', str(3 * 24 * 3600)))
+# Flights with a last fix within this many hours are loaded by the startup rebuild
+RACE_INDEX_REBUILD_HOURS = int(os.getenv('RACE_INDEX_REBUILD_HOURS', '48'))
+# The index is rebuilt this often; the ready marker outlives two rebuilds, so it only
+# disappears when Redis lost the index (flush, eviction, restart without persistence)
+RACE_INDEX_REBUILD_SECONDS = int(os.getenv('RACE_INDEX_REBUILD_SECONDS', '3600'))
+RACE_INDEX_READY_TTL = 2 * RACE_INDEX_REBUILD_SECONDS
+
+KEY_PREFIX = 'race_index:'
+READY_KEY = f'{KEY_PREFIX}ready'
+
+# Replace a pilot's entry unless it holds a flight with a newer last fix
+# KEYS: pilots hash, last fix zset; ARGV: pilot_id, last fix epoch, uuid, entry JSON, ttl
+UPSERT_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[2], ARGV[1])
+if score and tonumber(score) > tonumber(ARGV[2]) then
+    local current = redis.call('HGET', KEYS[1], ARGV[1])
+    if current and cjson.decode(current)['uuid'] ~= ARGV[3] then
+        return 0
+    end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[4])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+redis.call('EXPIRE', KEYS[2], ARGV[5])
+return 1
+"""
+
+# Remove a pilot's entry if it still points at the given flight
+# KEYS: pilots hash, last fix zset; ARGV: pilot_id, uuid
+DISCARD_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if current and cjson.decode(current)['uuid'] == ARGV[2] then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+
+def _keys(race_id: str):
+    return f'{KEY_PREFIX}{race_id}:pilots', f'{KEY_PREFIX}{race_id}:last_fix'
+
+
+def _fix_time(fix: Dict) -> datetime:
+    return datetime.fromisoformat(fix['datetime'].replace('Z', '+00:00'))
+
+
+def _as_flight(entry: Dict) -> SimpleNamespace:
+    """Index entry as a read-only stand-in for a Flight row (same attribute names)"""
+    return SimpleNamespace(
+        id=UUID(entry['uuid']),
+        race_id=entry['race_id'],
+        pilot_id=entry['pilot_id'],
+        pilot_name=entry['pilot_name'],
+        source=entry['source'],
+        created_at=datetime.fromisoformat(entry['created_at']) if entry['created_at'] else None,
+        first_fix=entry['first_fix'],
+        last_fix=entry['last_fix'],
+        total_points=entry['total_points'],
+        flight_state=entry['flight_state'],
+        dynamics=entry['dynamics']
+    )
+
+
+class RaceIndex:
+    def __init__(self):
+        self._ready = False
+        self._task = None
+        self._rebuild_now = asyncio.Event()
+        self.stats = {
+            'updates': 0,
+            'stale_updates': 0,
+            'discards': 0,
+            'reads': 0,
+            'fallbacks': 0,
+            'rebuilds': 0,
+            'rebuilt_flights': 0,
+            'errors': 0
+        }
+
+    @property
+    def client(self):
+        return redis_queue.redis_client
+
+    async def start(self):
+        """Rebuild the index in the background; readers use the database until it is done"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._rebuild_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _rebuild_loop(self):
+        while True:
+            await self._rebuild_task()
+            try:
+                # Rebuild early when a reader finds the index gone
+                await asyncio.wait_for(self._rebuild_now.wait(), RACE_INDEX_REBUILD_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._rebuild_now.clear()
+
+    async def _rebuild_task(self):
+        try:
+            await self.rebuild()
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Race index rebuild failed: {e}")
+
+    async def rebuild(self):
+        """Load the newest live flight of every pilot with recent fixes from the database"""
+        if self.client is None:
+            return
+        # The scan is a synchronous query over the day's flights: keep it off the event loop
+        entries = await asyncio.to_thread(self._newest_entries)
+
+        # Upserts keep entries that ingest made newer while the rebuild was running
+        await self._write(entries)
+        await self.client.set(READY_KEY, datetime.now(timezone.utc).isoformat(), ex=RACE_INDEX_READY_TTL)
+        self._ready = True
+        self.stats['rebuilds'] += 1
+        self.stats['rebuilt_flights'] += len(entries)
+        logger.info(f"Race index rebuilt: {len(entries)} current flights")
+
+    def _newest_entries(self) -> List[Dict]:
+        from database.db_replica import PrimarySession
+
+        since = datetime.now(timezone.utc) - timedelta(hours=RACE_INDEX_REBUILD_HOURS)
+        with PrimarySession() as db:
+            flights = db.query(Flight).filter(
+                Flight.source.contains('live'),
+                func.json_extract_path_text(Flight.last_fix, 'datetime') >= since.strftime('%Y-%m-%dT%H:%M:%SZ')
+            ).all()
+
+            newest: Dict = {}
+            for flight in flights:
+                key = (flight.race_id, str(flight.pilot_id))
+                if key not in newest or _fix_time(flight.last_fix) > _fix_time(newest[key].last_fix):
+                    newest[key] = flight
+            return [self._entry(flight) for flight in newest.values()]
+
+    async def record_batch(self, db: Session, inserted) -> Dict:
+        """
+        Update the entries of flights that just received fixes (rows with flight_uuid,
+        datetime, lat, lon and elevation, as returned by the committed insert).
+        Returns the race of each live flight in the batch ({flight_uuid: race_id}).
+        """
+        if not inserted:
+            return {}
+        by_flight: Dict = {}
+        for point in inserted:
+            by_flight.setdefault(point.flight_uuid, []).append(point)
+
+        # first_fix, last_fix and total_points are current after the commit (triggers)
+        flights = db.query(Flight).filter(Flight.id.in_(list(by_flight))).all()
+        races = {flight.id: flight.race_id for flight in flights if 'live' in flight.source}
+        if self.client is None:
+            return races
+        entries = []
+        for flight in flights:
+            if not flight.last_fix or 'live' not in flight.source:
+                continue
+            newest = sorted(by_flight[flight.id], key=lambda point: point.datetime, reverse=True)[:2]
+            recent = [{'lat': point.lat, 'lon': point.lon, 'elevation': point.elevation,
+                       'datetime': point.datetime} for point in newest]
+            entries.append(self._entry(flight, recent))
+        await self._write(entries)
+        return races
+
+    async def record_state(self, flight, state_info: Dict) -> None:
+        """Store a flight state written outside ingest (e.g. inactivity) on the pilot's entry"""
+        if self.client is None:
+            return
+        entry = self._entry(flight)
+        entry['flight_state'] = state_info
+        await self._write([entry])
+
+    def _entry(self, flight, recent: Optional[List[Dict]] = None) -> Dict:
+        # Index entries passed back in keep their dynamics
+        dynamics = getattr(flight, 'dynamics', None)
+        if recent and len(recent) >= 2:
+            dynamics = calculate_flight_dynamics_from_dicts(recent)
+        return {
+            'uuid': str(flight.id),
+            'race_id': flight.race_id,
+            'pilot_id': str(flight.pilot_id),
+            'pilot_name': flight.pilot_name,
+            'source': flight.source,
+            'created_at': flight.created_at.isoformat() if flight.created_at else None,
+            'first_fix': flight.first_fix,
+            'last_fix': flight.last_fix,
+            'total_points': flight.total_points,
+            'flight_state': flight.flight_state,
+            'dynamics': dynamics
+        }
+
+    async def _write(self, entries: List[Dict]) -> None:
+        if not entries:
+            return
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for entry in entries:
+                    pipe.eval(UPSERT_SCRIPT, 2, *_keys(entry['race_id']), entry['pilot_id'],
+                              _fix_time(entry['last_fix']).timestamp(), entry['uuid'],
+                              json.dumps(entry), RACE_INDEX_TTL)
+                results = await pipe.execute()
+            self.stats['updates'] += sum(1 for result in results if result)
+            self.stats['stale_updates'] += sum(1 for result in results if not result)
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Race index update failed: {e}")
+
+    async def discard(self, race_id: str, pilot_id, flight_uuid) -> None:
+        """Forget a deleted flight if it is its pilot's current flight"""
+        if self.client is None:
+            return
+        try:
+            if await self.client.eval(DISCARD_SCRIPT, 2, *_keys(race_id), str(pilot_id), str(flight_uuid)):
+                self.stats['discards'] += 1
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Race index discard failed: {e}")
+
+    async def _available(self, race_id: str) -> bool:
+        """
+        True when the index can answer for the race: it has been built (the ready marker
+        is still there, so Redis didn't lose it) and the race has entries
+        """
+        if self.client is None:
+            return False
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.exists(READY_KEY)
+            pipe.exists(_keys(race_id)[0])
+            ready, race_known = await pipe.execute()
+        if self._ready and not ready:
+            logger.warning("Race index ready marker is gone, rebuilding")
+            self._rebuild_now.set()
+        self._ready = bool(ready)
+        return self._ready and bool(race_known)
+
+    async def current_flights(self, race_id: str, since: datetime,
+                              until: Optional[datetime] = None) -> Optional[List[SimpleNamespace]]:
+        """
+        Current live flight of every pilot whose last fix is within [since, until],
+        newest last fix first. None when the index can't answer (use the database).
+        """
+        try:
+            if not await self._available(race_id):
+                self.stats['fallbacks'] += 1
+                return None
+            pilots_key, last_fix_key = _keys(race_id)
+            pilot_ids = await self.client.zrevrangebyscore(
+                last_fix_key, until.timestamp() if until else '+inf', since.timestamp())
+            entries = await self.client.hmget(pilots_key, pilot_ids) if pilot_ids else []
+            self.stats['reads'] += 1
+            return [_as_flight(json.loads(entry)) for entry in entries if entry]
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Race index read failed: {e}")
+            return None
+
+    async def current_flight_map(self, race_id: str, pilot_ids: Optional[Iterable[str]] = None) -> Optional[Dict[str, SimpleNamespace]]:
+        """Current live flight keyed by pilot_id (all pilots, or the given ones). None when unavailable."""
+        try:
+            if not await self._available(race_id):
+                self.stats['fallbacks'] += 1
+                return None
+            pilots_key = _keys(race_id)[0]
+            if pilot_ids is None:
+                entries = await self.client.hgetall(pilots_key)
+            else:
+                pilot_ids = [str(pilot_id) for pilot_id in pilot_ids]
+                values = await self.client.hmget(pilots_key, pilot_ids) if pilot_ids else []
+                entries = {pilot_id: value for pilot_id, value in zip(pilot_ids, values) if value}
+            self.stats['reads'] += 1
+            return {pilot_id: _as_flight(json.loads(entry)) for pilot_id, entry in entries.items()}
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"Race index read failed: {e}")
+            return None
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, 'ready': self._ready}
+
+
+race_index = RaceIndex()
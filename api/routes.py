@@ -1,18 +1,24 @@
-from api.flight_state import determine_if_landed, detect_flight_state
+from api.flight_state import determine_if_landed, detect_flight_state, flight_state_engine
 from fastapi import APIRouter, Depends, HTTPException, Query, Security, WebSocket, WebSocketDisconnect, Response, UploadFile, File, Form, Request
 from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from database.schemas import LiveTrackingRequest, LiveTrackPointCreate, FlightResponse, TrackUploadRequest, NotificationCommand, SubscriptionRequest, UnsubscriptionRequest, NotificationRequest, SentNotificationResponse, TrackingTokenRequest, TrackingTokenResponse
 from database.models import UploadedTrackPoint, Flight, LiveTrackPoint, Race, NotificationTokenDB, SentNotification, DeviceRegistration
 from typing import Dict, Optional, List
-from database.db_replica import get_db, get_replica_db, get_read_db_with_fallback, get_replica_health
+from database.db_replica import get_db, get_replica_db, get_replica_health, get_async_db, get_async_replica_db, async_replica_db_context
 import logging
-from api.auth import verify_tracking_token
+from api.auth import verify_tracking_token, require_contest_token, verify_contest_token, decode_api_token, contest_race_id
+from api.flight_cache import live_flight_cache
+from api.flight_stats import flight_stats_store, format_stats, stats_columns
+from api.race_index import race_index
+from api.delay_line import delay_line
+from api.http_cache import check_not_modified, make_etag, flight_version, flight_last_modified, cache_control_for, TILE_CACHE_CONTROL, UPLOADED_TILE_CACHE_CONTROL
 from sqlalchemy.exc import SQLAlchemyError
 from uuid import uuid4
 from sqlalchemy.dialects.postgresql import insert
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy import text
+from sqlalchemy import text, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from datetime import datetime, timezone, timedelta, time
 import jwt
@@ -26,8 +32,12 @@ from aiohttp import ClientSession
 from jwt.exceptions import PyJWTError
 import asyncio
 import json
+import numpy as np
+import os
 import requests
 from ws_conn import manager
+from utils.track_kernels import simplify_indices
+from utils.viewport import overview_zoom, zoom_tolerance
 # Import Expo Push Notification modules
 from exponent_server_sdk import (
     DeviceNotRegisteredError,
@@ -37,6 +47,7 @@ from exponent_server_sdk import (
 )
 from zoneinfo import ZoneInfo
 # Import XContest service
+from services.geocoding_service import geocoding_service
 from services.xcontest_service import xcontest_service
 
 from .send_notifications import (
@@ -61,13 +72,42 @@ security = HTTPBearer()
 EXPO_BATCH_SIZE = 100  # Maximum batch size per Expo documentation
 EXPO_RATE_LIMIT_DELAY = 0.1  # Small delay between batches to avoid rate limiting
 
+# Track history in the tracking websocket's initial data is simplified to what is
+# visible at the client's zoom, at most this many points per pilot and in total
+INITIAL_TRACK_POINT_BUDGET = int(os.getenv('INITIAL_TRACK_POINT_BUDGET', '500'))
+INITIAL_TOTAL_POINT_BUDGET = int(os.getenv('INITIAL_TOTAL_POINT_BUDGET', '50000'))
+INITIAL_MIN_POINT_BUDGET = 50
+# Candidate points read per kept point: the simplification runs on a time-sampled track,
+# so building initial data costs the same however long the race has been running
+INITIAL_TRACK_SAMPLE_FACTOR = 4
+
+# Time-sampled track of every flight in one statement: for each of :samples evenly spaced
+# times between the flight's first and last fix, the first point at or after it (one index
+# probe per sample instead of a scan of the whole track)
+TRACK_SAMPLES_SQL = """
+    SELECT f.flight_uuid, p.datetime, p.lat, p.lon, p.elevation
+    FROM unnest(CAST(:flight_uuids AS uuid[]), CAST(:starts AS timestamptz[]), CAST(:ends AS timestamptz[]))
+        AS f(flight_uuid, start_time, end_time)
+    CROSS JOIN LATERAL generate_series(0, :samples - 1) AS s(i)
+    CROSS JOIN LATERAL (
+        SELECT t.datetime, t.lat, t.lon, t.elevation
+        FROM live_track_points t
+        WHERE t.flight_uuid = f.flight_uuid
+          AND t.datetime >= f.start_time + (f.end_time - f.start_time) * s.i / (:samples - 1)
+          AND t.datetime <= f.end_time
+        ORDER BY t.datetime
+        LIMIT 1
+    ) p
+    ORDER BY f.flight_uuid, p.datetime
+"""
+
 
 @router.post("/live", status_code=202)
 async def live_tracking(
     data: LiveTrackingRequest,
     token: str = Query(..., description="Authentication token"),
     token_data: Dict = Depends(verify_tracking_token),
-    db: Session = Depends(get_db)  # Use primary for writes
+    db: AsyncSession = Depends(get_async_db)  # Use primary for writes
 ):
     try:
         pilot_id = token_data['pilot_id']
@@ -75,79 +115,33 @@ async def live_tracking(
         pilot_name = token_data['pilot_name']
         race_data = token_data['race']
 
-        # Check/create race record
-        race = db.query(Race).filter(Race.race_id == race_id).first()
-        if not race:
-            race = Race(
-                race_id=race_id,
-                name=race_data['name'],
-                date=datetime.fromisoformat(race_data['date']),
-                end_date=datetime.fromisoformat(race_data['end_date']),
-                timezone=race_data['timezone'],
-                location=race_data['location']
-            )
-            db.add(race)
-            try:
-                db.commit()
-            except SQLAlchemyError as e:
-                db.rollback()
-                logger.error(f"Failed to create race record: {str(e)}")
-                raise HTTPException(
-                    status_code=500, detail="Failed to create race record")
-
-        flight = db.query(Flight).filter(
-            Flight.flight_id == data.flight_id).first()
-
         device_id = data.device_id if hasattr(
             data, 'device_id') else 'anonymous'
 
-        if not flight:
-
-            # Create flight without first_fix/last_fix/total_points
-            # These will be automatically updated by database triggers
-            flight = Flight(
-                flight_id=data.flight_id,
-                race_uuid=race.id,
-                race_id=race_id,
-                pilot_id=pilot_id,
-                pilot_name=pilot_name,
-                created_at=datetime.now(timezone.utc),
-                source='live',
-                device_id=device_id
+        # Resolve race and flight from the cache, upserting both on a miss
+        # Triggers will handle first_fix, last_fix, and total_points
+        try:
+            flight = await live_flight_cache.resolve_async(
+                db, data.flight_id, pilot_id, pilot_name, race_id, race_data, device_id)
+        except SQLAlchemyError as e:
+            await db.rollback()
+            logger.error(f"Failed to update flight: {str(e)}")
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to update flight record"
             )
-            db.add(flight)
 
-        elif flight.pilot_id != pilot_id:
+        if flight['pilot_id'] != pilot_id:
             raise HTTPException(
                 status_code=403,
                 detail="Not authorized to update this flight"
             )
-        else:
-            # Check if flight is closed
-            if flight.closed_at is not None:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Flight is closed ({flight.closed_by}) and cannot accept new track points"
-                )
-
-            # Only update pilot name if it changed
-            # Triggers will handle first_fix, last_fix, and total_points
-            if flight.pilot_name != pilot_name:
-                flight.pilot_name = pilot_name
 
-        try:
-            db.commit()
-            # Refresh the flight object to get the actual UUID from database
-            db.refresh(flight)
-            # Flight must be committed before we can reference it in track points
-            logger.info(
-                f"Successfully created/updated flight record: {data.flight_id} with UUID: {flight.id}")
-        except SQLAlchemyError as e:
-            db.rollback()
-            logger.error(f"Failed to update flight: {str(e)}")
+        # Check if flight is closed
+        if flight['closed_at'] is not None:
             raise HTTPException(
-                status_code=500,
-                detail="Failed to update flight record"
+                status_code=400,
+                detail=f"Flight is closed ({flight['closed_by']}) and cannot accept new track points"
             )
 
         # Prepare track points data for queueing (as dictionaries, not SQLAlchemy models)
@@ -155,7 +149,7 @@ async def live_tracking(
         for point in data.track_points:
             point_data = {
                 "flight_id": data.flight_id,
-                "flight_uuid": flight.id,
+                "flight_uuid": flight['uuid'],
                 "datetime": datetime.fromisoformat(
                     point['datetime'].replace('Z', '+00:00'))
                 .astimezone(timezone.utc)
@@ -180,8 +174,9 @@ async def live_tracking(
             )
 
             if queued:
-                # Flight is already committed, update state asynchronously
-                asyncio.create_task(update_flight_state(flight.id, source='live'))
+                # Flight state is recomputed in batches by the state engine
+                flight['total_points'] += len(track_points_data)
+                flight_state_engine.add_points(flight['uuid'], track_points_data)
                 logger.info(
                     f"Successfully queued {len(track_points_data)} track points for flight {data.flight_id}")
 
@@ -190,17 +185,25 @@ async def live_tracking(
                     'message': f'Live tracking data queued for processing ({len(track_points_data)} points)',
                     'flight_id': data.flight_id,
                     'pilot_name': pilot_name,
-                    'total_points': flight.total_points,
+                    'total_points': flight['total_points'],
                     'queued': True
                 }
             else:
                 # Fallback to direct insertion if queueing fails
                 stmt = insert(LiveTrackPoint).on_conflict_do_nothing(
                     index_elements=['flight_id', 'lat', 'lon', 'datetime']
-                )
-                db.execute(stmt, track_points_data)
-                db.commit()
-                asyncio.create_task(update_flight_state(flight.id, source='live'))
+                ).returning(*stats_columns(LiveTrackPoint))
+                # asyncpg needs datetime objects rather than ISO strings
+                inserted = (await db.execute(stmt, [
+                    {**point, 'datetime': datetime.strptime(point['datetime'], '%Y-%m-%dT%H:%M:%SZ')
+                     .replace(tzinfo=timezone.utc)}
+                    for point in track_points_data
+                ])).all()
+                await db.run_sync(flight_stats_store.apply, LiveTrackPoint, inserted)
+                await db.commit()
+                delay_line.admit(race_id, flight['uuid'], track_points_data)
+                flight['total_points'] += len(track_points_data)
+                flight_state_engine.add_points(flight['uuid'], track_points_data)
                 logger.info(
                     f"Successfully saved track points for flight {data.flight_id} (fallback)")
 
@@ -209,17 +212,19 @@ async def live_tracking(
                     'message': f'Live tracking data processed ({len(track_points_data)} points)',
                     'flight_id': data.flight_id,
                     'pilot_name': pilot_name,
-                    'total_points': flight.total_points,
+                    'total_points': flight['total_points'],
                     'queued': False
                 }
         except SQLAlchemyError as e:
-            db.rollback()
+            await db.rollback()
             logger.error(f"Failed to save track points: {str(e)}")
             raise HTTPException(
                 status_code=500,
                 detail="Failed to save track points"
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Unexpected error in live_tracking: {str(e)}")
         raise HTTPException(
@@ -390,8 +395,9 @@ async def upload_track(
                     # Fallback to direct insertion if queueing fails
                     stmt = insert(UploadedTrackPoint).on_conflict_do_nothing(
                         index_elements=['flight_id', 'lat', 'lon', 'datetime']
-                    )
-                    db.execute(stmt, points_data)
+                    ).returning(*stats_columns(UploadedTrackPoint))
+                    inserted = db.execute(stmt, points_data).all()
+                    flight_stats_store.apply(db, UploadedTrackPoint, inserted)
                     db.commit()
 
                     # Asynchronously update the flight state with 'upload' source
@@ -445,6 +451,8 @@ async def get_flights(
         query = query.order_by(Flight.created_at.desc())
 
         flights = query.all()
+        # Stored statistics; missing rows are rebuilt in the background on the primary
+        flight_stats = flight_stats_store.get_many(db, flights)
 
         return {
             'success': True,
@@ -460,7 +468,8 @@ async def get_flights(
                 'total_points': flight.total_points,
                 'first_fix': flight.first_fix,
                 'last_fix': flight.last_fix,
-                'flight_state': flight.flight_state
+                'flight_state': flight.flight_state,
+                'stats': format_stats(flight_stats.get(flight.id))
             } for flight in flights]
         }
 
@@ -495,6 +504,14 @@ async def get_pilot_race_tracks(
             Flight.source.contains('upload')  # Get all tracks containing 'upload'
         ).order_by(Flight.created_at.desc()).all()
 
+        # Resolve all start locations concurrently - launch sites mostly hit the cache
+        located = [flight for flight in flights if flight.first_fix and flight.last_fix]
+        resolved = await geocoding_service.reverse_many(
+            (float(flight.first_fix['lat']), float(flight.first_fix['lon'])) for flight in located)
+        locations = {flight.id: location for flight, location in zip(located, resolved)}
+        # Precomputed statistics, one primary key lookup for all flights
+        flight_stats = flight_stats_store.get_many(db, located)
+
         # Format track information
         tracks = []
         for flight in flights:
@@ -512,32 +529,9 @@ async def get_pilot_race_tracks(
             minutes, seconds = divmod(remainder, 60)
             duration = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
 
-            # Get location name from Google Geocoding API
-            lat = float(flight.first_fix['lat'])
-            lon = float(flight.first_fix['lon'])
-            location_name = None
-
-            try:
-                async with ClientSession() as session:  # Create new session for each request
-                    url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={lat},{lon}&key={settings.GOOGLE_MAPS_API_KEY}"
-                    async with session.get(url) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            if data['results']:
-                                # Get the most relevant result (first one)
-                                address_components = data['results'][0]['address_components']
-                                for component in address_components:
-                                    if 'locality' in component['types']:
-                                        location_name = component['long_name']
-                                        break
-                                    elif 'administrative_area_level_2' in component['types']:
-                                        location_name = component['long_name']
-                                        break
-                                    elif 'administrative_area_level_1' in component['types']:
-                                        location_name = component['long_name']
-                                        break
-            except Exception as e:
-                logger.error(f"Error fetching location name: {str(e)}")
+            # Location name from the geocode cache (resolved for all flights above)
+            location = locations.get(flight.id)
+            location_name = location['location_name'] if location else None
 
             def calculate_distance(lat1, lon1, lat2, lon2):
                 R = 6371000  # Earth's radius in meters
@@ -563,6 +557,7 @@ async def get_pilot_race_tracks(
             # Calculate speeds (m/s)
             avg_speed = distance / \
                 duration_td.total_seconds() if duration_td.total_seconds() > 0 else 0
+            track_stats = flight_stats.get(flight.id)
 
             tracks.append({
                 'flight_id': flight.flight_id,
@@ -574,8 +569,10 @@ async def get_pilot_race_tracks(
                 'duration': duration,
                 'distance': round(distance, 2),  # Distance in meters
                 'avg_speed': round(avg_speed * 3.6, 2),  # Convert to km/h
-                'max_altitude': 0,
-                'max_speed': 0,
+                'track_distance': round(track_stats.distance, 2) if track_stats else None,  # Meters along the track
+                'max_altitude': round(track_stats.max_elevation, 1) if track_stats and track_stats.max_elevation is not None else 0,
+                'max_speed': round(track_stats.max_speed * 3.6, 2) if track_stats else 0,  # km/h
+                'elevation_gain': round(track_stats.elevation_gain, 1) if track_stats else None,
                 'total_points': flight.total_points,
                 'location': location_name  # Add the location name to the response
 
@@ -629,6 +626,7 @@ async def delete_track(
         total_points = 0
         deleted_info = {'live': 0, 'upload': 0}
         race_uuid = None
+        deleted_uuids = [flight.id for flight in flights]
 
         # Delete all matching flights
         for flight in flights:
@@ -650,6 +648,9 @@ async def delete_track(
                         f"Deleted race {race_id} as it had no more associated flights")
 
         db.commit()
+        live_flight_cache.invalidate(flight_id)
+        for flight_uuid in deleted_uuids:
+            await race_index.discard(race_id, pilot_id, flight_uuid)
 
         logger.info(
             f"Deleted {len(flights)} flights with id {flight_id} and {total_points} track points")
@@ -680,7 +681,7 @@ async def delete_track_uuid(
     flight_uuid: UUID,
     source: str = Query(..., regex="^.*(?:live|upload).*$",
                         description="Track source (must contain 'live' or 'upload')"),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ):
     """
@@ -689,36 +690,7 @@ async def delete_track_uuid(
     Source parameter determines whether to delete 'live' or 'upload' track.
     """
     try:
-        # Get token from Authorization header and verify it
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-            race_id = token_data["sub"].split(":")[1]
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
+        race_id = contest_race_id(token_data)
 
         # Verify the track belongs to this race and matches the specified source
         flight = db.query(Flight).filter(
@@ -735,6 +707,8 @@ async def delete_track_uuid(
 
         total_points = flight.total_points
         race_uuid = flight.race_uuid
+        deleted_flight_id = flight.flight_id
+        deleted_pilot_id = flight.pilot_id
 
         # Delete the flight
         db.delete(flight)
@@ -752,6 +726,8 @@ async def delete_track_uuid(
                         f"Deleted race {race_id} as it had no more associated flights")
 
         db.commit()
+        live_flight_cache.invalidate(deleted_flight_id, source)
+        await race_index.discard(race_id, deleted_pilot_id, flight_uuid)
 
         logger.info(
             f"Deleted {source} flight {flight_uuid} with {total_points} track points")
@@ -780,10 +756,12 @@ async def delete_track_uuid(
 @router.get("/live/points/{flight_uuid}")
 async def get_live_points(
     flight_uuid: UUID,
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    request: Request,
+    response: Response,
+    token_data: Dict = Depends(require_contest_token),
     last_fix_dt: Optional[str] = Query(
         None, description="Only return points after this time (ISO 8601 format, e.g. 2025-01-25T06:00:00Z)"),
-    db: Session = Depends(get_replica_db)  # Use read replica
+    db: AsyncSession = Depends(get_async_replica_db)  # Use read replica
 ):
     """
     Get all live tracking points for a specific flight in GeoJSON format.
@@ -791,36 +769,7 @@ async def get_live_points(
     Returns points with 1-second sampling and optional barometric altitude.
     """
     try:
-        # Get token from Authorization header and verify it
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-            race_id = token_data["sub"].split(":")[1]
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
+        race_id = contest_race_id(token_data)
 
         # Convert last_fix_time if provided
         last_fix_datetime = None
@@ -829,10 +778,10 @@ async def get_live_points(
                 last_fix_dt.replace('Z', '+00:00'))
 
         # Get flight from database
-        flight = db.query(Flight).filter(
+        flight = (await db.execute(select(Flight).where(
             Flight.id == flight_uuid,
             Flight.source.contains('live')
-        ).first()
+        ))).scalars().first()
 
         if not flight:
             raise HTTPException(
@@ -840,8 +789,16 @@ async def get_live_points(
                 detail="Flight not found in live collection"
             )
 
+        # Answer unchanged flights from the client's copy before querying points
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('live-points', flight_version(flight), last_fix_dt),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
         # Base query
-        query = db.query(LiveTrackPoint).filter(
+        query = select(LiveTrackPoint).where(
             LiveTrackPoint.flight_uuid == flight_uuid
         )
 
@@ -859,11 +816,11 @@ async def get_live_points(
 
         # Apply the time filter and order the results
         # Remove the func.timezone() call since we're already handling UTC conversion
-        query = query.filter(
+        query = query.where(
             LiveTrackPoint.datetime > filter_time
         ).order_by(LiveTrackPoint.datetime)
 
-        track_points = query.all()
+        track_points = (await db.execute(query)).scalars().all()
 
         # Ensure all points have timezone information
         all_points = []
@@ -954,10 +911,12 @@ async def get_live_points(
 @router.get("/live/points/{flight_uuid}/raw")
 async def get_live_points_raw(
     flight_uuid: UUID,
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    request: Request,
+    response: Response,
+    token_data: Dict = Depends(require_contest_token),
     last_fix_dt: Optional[str] = Query(
         None, description="Only return points after this time (ISO 8601 format, e.g. 2025-01-25T06:00:00Z)"),
-    db: Session = Depends(get_replica_db)  # Use read replica
+    db: AsyncSession = Depends(get_async_replica_db)  # Use read replica
 ):
     """
     Get all live tracking points for a specific flight in raw format.
@@ -965,42 +924,13 @@ async def get_live_points_raw(
     Returns points with datetime, lat, lon, and elevation.
     """
     try:
-        # Get token from Authorization header and verify it
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-            race_id = token_data["sub"].split(":")[1]
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
+        race_id = contest_race_id(token_data)
 
         # Get flight from database
-        flight = db.query(Flight).filter(
+        flight = (await db.execute(select(Flight).where(
             Flight.id == flight_uuid,
             Flight.source.contains('live')
-        ).first()
+        ))).scalars().first()
 
         if not flight:
             raise HTTPException(
@@ -1008,8 +938,18 @@ async def get_live_points_raw(
                 detail="Flight not found in live collection"
             )
 
-        # Base query
-        query = db.query(LiveTrackPoint).filter(
+        # Answer unchanged flights from the client's copy before querying points
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('live-points-raw', flight_version(flight), last_fix_dt),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
+        # Base query - only the columns returned
+        query = select(
+            LiveTrackPoint.datetime, LiveTrackPoint.lat, LiveTrackPoint.lon, LiveTrackPoint.elevation
+        ).where(
             LiveTrackPoint.flight_uuid == flight_uuid
         )
 
@@ -1017,11 +957,11 @@ async def get_live_points_raw(
         if last_fix_dt:
             filter_time = datetime.fromisoformat(
                 last_fix_dt.replace('Z', '+00:00')).astimezone(timezone.utc)
-            query = query.filter(LiveTrackPoint.datetime > filter_time)
+            query = query.where(LiveTrackPoint.datetime > filter_time)
 
         # Order the results by datetime
         query = query.order_by(LiveTrackPoint.datetime)
-        track_points = query.all()
+        track_points = (await db.execute(query)).all()
 
         if not track_points:
             logger.warning(
@@ -1061,7 +1001,9 @@ async def get_live_points_raw(
 @router.get("/upload/points/{flight_uuid}")
 async def get_uploaded_points(
     flight_uuid: UUID,
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    request: Request,
+    response: Response,
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ):
     """
@@ -1070,35 +1012,6 @@ async def get_uploaded_points(
     Returns points with 1-second sampling and optional barometric altitude.
     """
     try:
-        # Get token from Authorization header and verify it
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
-
         # Get flight from database
         flight = db.query(Flight).filter(
             Flight.id == flight_uuid,
@@ -1111,6 +1024,14 @@ async def get_uploaded_points(
                 detail="Flight not found in upload collection"
             )
 
+        # Answer unchanged flights from the client's copy before querying points
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('upload-points', flight_version(flight)),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
         # Get all track points for this flight
         track_points = db.query(UploadedTrackPoint).filter(
             UploadedTrackPoint.flight_uuid == flight_uuid
@@ -1195,7 +1116,9 @@ async def get_uploaded_points(
 @router.get("/upload/points/{flight_uuid}/raw")
 async def get_uploaded_points_raw(
     flight_uuid: UUID,
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    request: Request,
+    response: Response,
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ):
     """
@@ -1204,35 +1127,6 @@ async def get_uploaded_points_raw(
     Returns points with datetime, lat, lon, and elevation.
     """
     try:
-        # Get token from Authorization header and verify it
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
-
         # Get flight from database
         flight = db.query(Flight).filter(
             Flight.id == flight_uuid,
@@ -1245,6 +1139,14 @@ async def get_uploaded_points_raw(
                 detail="Flight not found in upload collection"
             )
 
+        # Answer unchanged flights from the client's copy before querying points
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('upload-points-raw', flight_version(flight)),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
         # Get all track points for this flight
         track_points = db.query(UploadedTrackPoint).filter(
             UploadedTrackPoint.flight_uuid == flight_uuid
@@ -1354,7 +1256,7 @@ async def get_live_users(
     closetime: Optional[str] = Query(
         None, description="End time for tracking window (ISO 8601 format, e.g. 2025-01-25T06:00:00Z)"),
     source: Optional[str] = Query(None, regex="^.*(?:live|upload).*$"),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_replica_db)  # Use read replica
 ):
     """
@@ -1373,36 +1275,7 @@ async def get_live_users(
             closetime_dt = datetime.fromisoformat(
                 closetime.strip().replace('Z', '+00:00'))
 
-        # Validate JWT token
-        token = credentials.credentials
-        try:
-            payload = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not payload.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-            race_id = payload["sub"].split(":")[1]
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
+        race_id = contest_race_id(token_data)
 
         # Get all active flights for this race within the time window
         flights = (
@@ -1425,25 +1298,12 @@ async def get_live_users(
             "pilots": {}
         }
 
-        # First pass: Group flights by pilot and find most recent live fix
-        pilot_latest_fixes = {}  # Store the most recent live fix for each pilot
+        # States of pilots' current live flights come from the race index, so only
+        # older flights query their recent points
+        current_flights = await race_index.current_flight_map(
+            race_id, {str(flight.pilot_id) for flight in flights}) or {}
 
-        for flight in flights:
-            pilot_id = str(flight.pilot_id)
-            # Only consider live flights for lastLoc
-            if 'live' in flight.source and flight.last_fix:  # Includes tk905b_live, flymaster_live
-                current_fix_time = datetime.fromisoformat(
-                    flight.last_fix['datetime'].replace('Z', '+00:00'))
-
-                if pilot_id not in pilot_latest_fixes or \
-                   current_fix_time > datetime.fromisoformat(pilot_latest_fixes[pilot_id]['datetime'].replace('Z', '+00:00')):
-                    pilot_latest_fixes[pilot_id] = {
-                        'fix': flight.last_fix,
-                        'datetime': flight.last_fix['datetime'],
-                        'pilot_name': flight.pilot_name
-                    }
-
-        # Second pass: Build response
+        # Build response
 
         for flight in flights:
             pilot_id = str(flight.pilot_id)
@@ -1454,7 +1314,12 @@ async def get_live_users(
 
             # Create flight_info dictionary
             # Get flight state
-            state, state_info = get_flight_state(flight.id, db)
+            current = current_flights.get(pilot_id)
+            if current is not None and current.id == flight.id and current.flight_state:
+                state_info = current.flight_state
+                state = state_info.get('state', 'unknown')
+            else:
+                state, state_info = get_flight_state(flight.id, db)
 
             flight_info = {
                 "uuid": str(flight.id),
@@ -1588,150 +1453,254 @@ async def get_debug_points(
         )
 
 
+def _track_history_points(points) -> List[Dict]:
+    """trackHistory entries for (datetime, lat, lon, elevation) rows"""
+    return [{
+        "lat": float(point.lat),
+        "lon": float(point.lon),
+        "elevation": float(point.elevation) if point.elevation is not None else 0,
+        "datetime": point.datetime.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    } for point in points]
+
+
+def _fix_datetime(fix: Dict) -> datetime:
+    return datetime.fromisoformat(fix['datetime'].replace('Z', '+00:00'))
+
+
+async def _sampled_track_points(db: AsyncSession, flights: List[Flight], samples: int) -> Dict[str, List]:
+    """
+    (datetime, lat, lon, elevation) rows of each flight, at most `samples` of them spread
+    evenly in time from its first to its last fix, keyed by flight uuid
+    """
+    if not flights:
+        return {}
+    rows = (await db.execute(text(TRACK_SAMPLES_SQL), {
+        'flight_uuids': [flight.id for flight in flights],
+        'starts': [_fix_datetime(flight.first_fix) for flight in flights],
+        'ends': [_fix_datetime(flight.last_fix) for flight in flights],
+        'samples': max(samples, 2)
+    })).all()
+    tracks = {}
+    for row in rows:
+        track = tracks.setdefault(str(row.flight_uuid), [])
+        # Samples falling in a gap resolve to the same point
+        if not track or track[-1].datetime != row.datetime:
+            track.append(row)
+    return tracks
+
+
+async def _full_track_message(race_id: str, flight_uuid) -> Dict:
+    """track_history message with every point of a live flight in the race"""
+    try:
+        flight_id = UUID(str(flight_uuid))
+    except ValueError:
+        return {"type": "error", "message": "Invalid flight uuid"}
+    async with async_replica_db_context() as db:
+        flight_race = (await db.execute(
+            select(Flight.race_id).where(Flight.id == flight_id)
+        )).scalar()
+        if flight_race != race_id:
+            return {"type": "error", "message": "Flight not found in this race"}
+        track_points = (await db.execute(
+            select(LiveTrackPoint.datetime, LiveTrackPoint.lat,
+                   LiveTrackPoint.lon, LiveTrackPoint.elevation)
+            .where(LiveTrackPoint.flight_uuid == flight_id)
+            .order_by(LiveTrackPoint.datetime)
+        )).all()
+    return {
+        "type": "track_history",
+        "uuid": str(flight_id),
+        "trackHistory": _track_history_points(track_points),
+        "totalPoints": len(track_points)
+    }
+
+
+async def _track_message_loop(websocket: WebSocket, race_id: str, client_id: str):
+    """Keep a tracking connection alive and handle client messages"""
+    while True:
+        try:
+            # Wait for messages with timeout
+            data = await asyncio.wait_for(websocket.receive_text(), timeout=30)
+
+            # Message handling remains unchanged...
+            try:
+                message = json.loads(data)
+                message_type = message.get("type")
+
+                if message_type == "ping":
+                    await websocket.send_json({"type": "pong", "timestamp": datetime.now(timezone.utc).isoformat()})
+
+                elif message_type == "request_refresh":
+                    # Handle refresh
+                    pass
+
+                elif message_type == "viewport":
+                    # Only pilots inside {"bbox": [west, south, east, north], "zoom": z}
+                    # from now on; a null bbox subscribes to the whole race again
+                    key = manager.set_viewport(websocket, message.get("bbox"), message.get("zoom"))
+                    await websocket.send_json({"type": "viewport_ack", "filtered": key is not None})
+
+                elif message_type == "request_track":
+                    # Full resolution track of one pilot: {"uuid": flight uuid}
+                    await websocket.send_json(await _full_track_message(race_id, message.get("uuid")))
+
+            except json.JSONDecodeError:
+                await websocket.send_json({"type": "error", "message": "Invalid message format"})
+
+        except asyncio.TimeoutError:
+            # No message received within timeout period
+            # Send a heartbeat to check if connection is still alive
+            try:
+                await websocket.send_json({"type": "heartbeat", "timestamp": datetime.now(timezone.utc).isoformat()})
+            except Exception:
+                # Connection is likely dead
+                logger.warning(
+                    f"Connection to client {client_id} timed out")
+                break
+
+
 @router.websocket("/ws/track/{race_id}")
 async def websocket_tracking_endpoint(
     websocket: WebSocket,
     race_id: str,
     client_id: str = Query(...),
-    token: str = Query(...)
+    token: str = Query(...),
+    zoom: Optional[int] = Query(None, ge=0, le=20, description="Map zoom the initial tracks are simplified for"),
+    session: Optional[str] = Query(None, description="Replay session from initial_data, to resume"),
+    last_seq: Optional[int] = Query(None, description="Last track_update seq applied, to resume")
 ):
-    """WebSocket endpoint for real-time tracking updates"""
-    # Don't use Depends for database in WebSocket - manage session manually
-    db = None
+    """
+    WebSocket endpoint for real-time tracking updates. Reconnecting clients pass the
+    session and the last seq they applied and only get the updates they missed, or a
+    fresh initial_data if those are no longer in the replay log.
+    """
     try:
         # Verify token
         try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                await websocket.close(code=1008, reason="Invalid token")
-                return
-
-            token_race_id = token_data["sub"].split(":")[1]
-
-            # Verify race_id matches token
-            if race_id != token_race_id:
-                await websocket.close(code=1008, reason="Token not valid for this race")
-                return
-
-        except (PyJWTError, jwt.ExpiredSignatureError) as e:
+            token_data = verify_contest_token(token)
+        except HTTPException:
             await websocket.close(code=1008, reason="Invalid token")
             return
 
+        # Verify race_id matches token
+        if race_id != contest_race_id(token_data):
+            await websocket.close(code=1008, reason="Token not valid for this race")
+            return
+
         # Connect this client to the race
         await manager.connect(websocket, race_id, client_id)
 
-        # Current server time in UTC
-        current_time = datetime.now(timezone.utc)
-
-        # Get database session manually for WebSocket
-        # This avoids the "generator didn't stop" error with Depends
-        db = next(get_read_db_with_fallback())
-        
-        # Get race information including timezone
-        race = db.query(Race).filter(Race.race_id == race_id).first()
-        if not race or not race.timezone:
-            race_timezone = timezone.utc  # Default to UTC if race timezone not found
-        else:
-            # Get the timezone object from the race
-            # Requires Python 3.9+ with zoneinfo
-            race_timezone = ZoneInfo(race.timezone)
-
-        # Convert current time to race's local timezone
-        race_local_time = current_time.astimezone(race_timezone)
-
-        # Calculate the start and end of the current day in race's timezone
-        race_day_start = datetime.combine(
-            race_local_time.date(), time.min, tzinfo=race_timezone)
-        race_day_end = datetime.combine(
-            race_local_time.date(), time.max, tzinfo=race_timezone)
-
-        # Convert back to UTC for database query
-        utc_day_start = race_day_start.astimezone(timezone.utc)
-        utc_day_end = race_day_end.astimezone(timezone.utc)
-
-        # Get flights active today (with a small buffer before race day)
-        # Allow pilots who started slightly before race day
-        lookback_buffer = timedelta(hours=4)
-        flights = (
-            db.query(Flight)
-            .filter(
-                Flight.race_id == race_id,
-                # Either the flight was created today
-                ((Flight.created_at >= utc_day_start - lookback_buffer) &
-                 (Flight.created_at <= utc_day_end)) |
-                # OR the flight has a last_fix during today (for flights spanning overnight)
-                (func.json_extract_path_text(Flight.last_fix, 'datetime') >=
-                    utc_day_start.strftime('%Y-%m-%dT%H:%M:%SZ')) &
-                (func.json_extract_path_text(Flight.last_fix, 'datetime') <=
-                    utc_day_end.strftime('%Y-%m-%dT%H:%M:%SZ')),
-                Flight.source.contains('live')
-            )
-            .order_by(Flight.created_at.desc())
-            .all()
-        )
-
-        # Further filter to only pilots who have been active in the last hour
-        # active_threshold = current_time - timedelta(minutes=60)
-        # active_flights = []
-
-        # for flight in flights:
-        #     last_fix_time = datetime.fromisoformat(
-        #         flight.last_fix['datetime'].replace('Z', '+00:00')
-        #     ).astimezone(timezone.utc)
-
-        #     if last_fix_time >= active_threshold:
-        #         active_flights.append(flight)
-
-        # Process flights as before, but only using active_flights
-        pilot_latest_flights = {}
+        if session is not None and last_seq is not None and await manager.resume(websocket, race_id, session, last_seq):
+            manager.store_hfss_token(race_id, token)
+            await _track_message_loop(websocket, race_id, client_id)
+            return
 
-        for flight in flights:
-            pilot_id = str(flight.pilot_id)
-            
-            # Skip flights without fixes
-            if not flight.first_fix or not flight.last_fix:
-                continue
+        # Updates logged from here on may not be in the snapshot, so it resumes from here
+        replay_log = manager.replay_log(race_id)
+        replay_log_seq = replay_log.seq
 
-            # If we haven't seen this pilot yet, this is their most recent flight
-            if pilot_id not in pilot_latest_flights:
-                # Get track points for this flight ONLY (using flight_uuid to ensure we only get points from this flight)
-                track_points = db.query(LiveTrackPoint).filter(
-                    LiveTrackPoint.flight_uuid == flight.id
-                ).order_by(LiveTrackPoint.datetime).all()
-
-                # Downsample track points if there are too many
-                # Keep at most 1 point per 5 seconds to reduce data volume
-                downsampled_points = []
-                last_added_time = None
-
-                for i, point in enumerate(track_points):
-                    current_time = point.datetime
-                    is_last_point = (i == len(track_points) - 1)
-                    
-                    # Include point if it's the first, meets time threshold, or is the last point
-                    if last_added_time is None or (current_time - last_added_time).total_seconds() >= 3 or is_last_point:
-                        downsampled_points.append({
-                            "lat": float(point.lat),
-                            "lon": float(point.lon),
-                            "elevation": float(point.elevation) if point.elevation is not None else 0,
-                            "datetime": point.datetime.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-                        })
-                        last_added_time = current_time
+        # Current server time in UTC
+        current_time = datetime.now(timezone.utc)
 
-                # Store the actual last datetime from the downsampled points
+        # Build the snapshot on an async read session that is released before the
+        # connection enters its receive loop
+        async with async_replica_db_context() as db:
+            # Get race information including timezone
+            race = (await db.execute(select(Race).where(Race.race_id == race_id))).scalars().first()
+            if not race or not race.timezone:
+                race_timezone = timezone.utc  # Default to UTC if race timezone not found
+            else:
+                # Get the timezone object from the race
+                # Requires Python 3.9+ with zoneinfo
+                race_timezone = ZoneInfo(race.timezone)
+
+            # Convert current time to race's local timezone
+            race_local_time = current_time.astimezone(race_timezone)
+
+            # Calculate the start and end of the current day in race's timezone
+            race_day_start = datetime.combine(
+                race_local_time.date(), time.min, tzinfo=race_timezone)
+            race_day_end = datetime.combine(
+                race_local_time.date(), time.max, tzinfo=race_timezone)
+
+            # Convert back to UTC for database query
+            utc_day_start = race_day_start.astimezone(timezone.utc)
+            utc_day_end = race_day_end.astimezone(timezone.utc)
+
+            # Get flights active today (with a small buffer before race day)
+            # Allow pilots who started slightly before race day
+            lookback_buffer = timedelta(hours=4)
+            # Current flight per pilot from the race index, the flights scan is the fallback
+            flights = await race_index.current_flights(
+                race_id, utc_day_start - lookback_buffer, utc_day_end)
+            if flights is None:
+                flights = (await db.execute(
+                    select(Flight)
+                    .where(
+                        Flight.race_id == race_id,
+                        # Either the flight was created today
+                        ((Flight.created_at >= utc_day_start - lookback_buffer) &
+                         (Flight.created_at <= utc_day_end)) |
+                        # OR the flight has a last_fix during today (for flights spanning overnight)
+                        (func.json_extract_path_text(Flight.last_fix, 'datetime') >=
+                            utc_day_start.strftime('%Y-%m-%dT%H:%M:%SZ')) &
+                        (func.json_extract_path_text(Flight.last_fix, 'datetime') <=
+                            utc_day_end.strftime('%Y-%m-%dT%H:%M:%SZ')),
+                        Flight.source.contains('live')
+                    )
+                    .order_by(Flight.created_at.desc())
+                )).scalars().all()
+
+            # Further filter to only pilots who have been active in the last hour
+            # active_threshold = current_time - timedelta(minutes=60)
+            # active_flights = []
+
+            # for flight in flights:
+            #     last_fix_time = datetime.fromisoformat(
+            #         flight.last_fix['datetime'].replace('Z', '+00:00')
+            #     ).astimezone(timezone.utc)
+
+            #     if last_fix_time >= active_threshold:
+            #         active_flights.append(flight)
+
+            # Most recent flight with fixes per pilot
+            latest_flights = {}
+            for flight in flights:
+                if flight.first_fix and flight.last_fix:
+                    latest_flights.setdefault(str(flight.pilot_id), flight)
+
+            # Without a declared zoom, simplify for an overview of the whole race
+            if zoom is None:
+                zoom = overview_zoom([(fix['lat'], fix['lon']) for flight in latest_flights.values()
+                                      for fix in (flight.first_fix, flight.last_fix)])
+            point_budget = max(min(INITIAL_TRACK_POINT_BUDGET,
+                                   INITIAL_TOTAL_POINT_BUDGET // max(len(latest_flights), 1)),
+                               INITIAL_MIN_POINT_BUDGET)
+
+            sampled_tracks = await _sampled_track_points(
+                db, list(latest_flights.values()), point_budget * INITIAL_TRACK_SAMPLE_FACTOR)
+
+            pilot_latest_flights = {}
+
+            for pilot_id, flight in latest_flights.items():
+                track_points = sampled_tracks.get(str(flight.id), [])
+
+                # Keep the sampled points that are visible at this zoom (Douglas-Peucker with
+                # a one pixel tolerance), at most point_budget of them; the full track is
+                # available through a request_track message
+                simplified_points = []
+                if track_points:
+                    lat = np.fromiter((point.lat for point in track_points), dtype=np.float64, count=len(track_points))
+                    lon = np.fromiter((point.lon for point in track_points), dtype=np.float64, count=len(track_points))
+                    kept = simplify_indices(lat, lon, zoom_tolerance(zoom, float(lat[-1])), point_budget)
+                    simplified_points = _track_history_points(track_points[index] for index in kept)
+
+                # Store the actual last datetime from the simplified points (always the last point)
                 # This helps prevent overlap when incremental updates arrive
                 last_sent_datetime = None
-                if downsampled_points:
-                    last_sent_datetime = downsampled_points[-1]['datetime']
-                
+                if simplified_points:
+                    last_sent_datetime = simplified_points[-1]['datetime']
+
                 pilot_latest_flights[pilot_id] = {
                     "uuid": str(flight.id),
                     "pilot_id": flight.pilot_id,
@@ -1748,9 +1717,9 @@ async def websocket_tracking_endpoint(
                         "elevation": flight.last_fix.get('elevation', 0),
                         "datetime": flight.last_fix['datetime']
                     },
-                    "trackHistory": downsampled_points,
-                    "totalPoints": len(track_points),
-                    "downsampledPoints": len(downsampled_points),
+                    "trackHistory": simplified_points,
+                    "totalPoints": flight.total_points or len(track_points),
+                    "downsampledPoints": len(simplified_points),
                     "source": "HFSS",  # Mark as HFSS data
                     "lastFixTime": flight.last_fix['datetime'],
                     "lastSentPointTime": last_sent_datetime,  # Track the actual last point sent
@@ -1810,49 +1779,27 @@ async def websocket_tracking_endpoint(
             "type": "initial_data",
             "race_id": race_id,
             "flights": consolidated_flight_data,
-            "active_viewers": manager.get_active_viewers(race_id)
+            "active_viewers": manager.get_active_viewers(race_id),
+            # Level of detail of the HFSS trackHistory
+            "lod": {"zoom": zoom, "budget": point_budget},
+            # Resume point: track updates after this seq follow the snapshot
+            "session": replay_log.session,
+            "seq": replay_log_seq
         })
         
-        # Track the last sent point time for each flight to prevent overlap with incremental updates
+        # Start incremental updates of flights the race isn't tracking yet after the snapshot.
+        # Flights already tracked keep their race-wide position, so other viewers don't miss
+        # points; updates may overlap this snapshot, clients skip points up to lastSentPointTime
         for flight_data in consolidated_flight_data:
-            if flight_data.get('source') == 'HFSS' and flight_data.get('lastSentPointTime'):
+            if (flight_data.get('source') == 'HFSS' and flight_data.get('lastSentPointTime')
+                    and manager.get_last_update_time(race_id, flight_data['uuid']) is None):
                 # Convert the ISO string back to datetime
                 last_sent_time = datetime.fromisoformat(
                     flight_data['lastSentPointTime'].replace('Z', '+00:00')
                 )
                 manager.add_pilot_with_sent_data(race_id, flight_data['uuid'], last_sent_time)
 
-        # Keep connection alive and handle client messages
-        while True:
-            try:
-                # Wait for messages with timeout
-                data = await asyncio.wait_for(websocket.receive_text(), timeout=30)
-
-                # Message handling remains unchanged...
-                try:
-                    message = json.loads(data)
-                    message_type = message.get("type")
-
-                    if message_type == "ping":
-                        await websocket.send_json({"type": "pong", "timestamp": datetime.now(timezone.utc).isoformat()})
-
-                    elif message_type == "request_refresh":
-                        # Handle refresh
-                        pass
-
-                except json.JSONDecodeError:
-                    await websocket.send_json({"type": "error", "message": "Invalid message format"})
-
-            except asyncio.TimeoutError:
-                # No message received within timeout period
-                # Send a heartbeat to check if connection is still alive
-                try:
-                    await websocket.send_json({"type": "heartbeat", "timestamp": datetime.now(timezone.utc).isoformat()})
-                except Exception:
-                    # Connection is likely dead
-                    logger.warning(
-                        f"Connection to client {client_id} timed out")
-                    break
+        await _track_message_loop(websocket, race_id, client_id)
 
     except WebSocketDisconnect:
         # Client disconnected
@@ -1864,13 +1811,6 @@ async def websocket_tracking_endpoint(
         except:
             pass
         await manager.disconnect(websocket, client_id)
-    finally:
-        # Always close the database session
-        if db:
-            try:
-                db.close()
-            except:
-                pass
 
 
 @router.post("/command/{race_id}")
@@ -1885,14 +1825,7 @@ async def send_command_notification(
         # Verify token
         token = credentials.credentials
         try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
+            token_data = decode_api_token(token)
 
             # # Check for admin privileges
             # if not token_data.get("admin", False):
@@ -2134,11 +2067,12 @@ async def get_postgis_track_tile(
     z: int,
     x: int,
     y: int,
+    request: Request,
     flight_id: str = Query(..., description="UUID of the flight to render"),
     source: str = Query(..., regex="^.*(?:live|upload).*$",
                         description="Source containing 'live' or 'upload'"),
     token_data: Dict = Depends(verify_tracking_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_replica_db)
 ):
     """
     Serve vector tiles for track points using PostGIS ST_AsMVT function.
@@ -2154,6 +2088,18 @@ async def get_postgis_track_tile(
         # Determine table name based on source
         table_name = "live_track_points" if source == "live" else "uploaded_track_points"
 
+        # Version the tile by the flight rows (trigger maintained) before rendering it
+        versions = (await db.execute(select(
+            Flight.id, Flight.total_points, Flight.last_fix, Flight.source
+        ).where(Flight.flight_id == flight_id))).all()
+        cache_control = TILE_CACHE_CONTROL if source == "live" else UPLOADED_TILE_CACHE_CONTROL
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('postgis-mvt', z, x, y, table_name, flight_id,
+                               *sorted(flight_version(row) for row in versions)),
+            cache_control)
+        if not_modified:
+            return not_modified
+
         # SQL query using ST_AsMVT
         # This generates MVT tiles with both points and lines
         query = f"""
@@ -2236,7 +2182,7 @@ async def get_postgis_track_tile(
         """
 
         # Execute the query and get the tile
-        result = db.execute(text(query)).fetchone()
+        result = (await db.execute(text(query))).fetchone()
 
         if result and result[0]:
             # Convert memoryview to bytes if necessary
@@ -2248,7 +2194,7 @@ async def get_postgis_track_tile(
                 content=tile_data,
                 media_type="application/x-protobuf",
                 headers={
-                    "Cache-Control": "public, max-age=10",  # Cache for 10 seconds
+                    **cache_headers,
                     "X-Tile-Cache": "HIT" if len(tile_data) > 0 else "MISS"
                 }
             )
@@ -2258,7 +2204,7 @@ async def get_postgis_track_tile(
                 content=b"",
                 media_type="application/x-protobuf",
                 headers={
-                    "Cache-Control": "public, max-age=10",  # Cache empty tiles too
+                    **cache_headers,  # Cache empty tiles too
                     "X-Tile-Cache": "EMPTY"
                 }
             )
@@ -2274,6 +2220,7 @@ async def get_daily_tracks_tile(
     z: int,
     x: int,
     y: int,
+    request: Request,
     race_id: str = Query(..., description="Race ID to filter tracks"),
     source: str = Query("live", regex="^.*(?:live|upload).*$",
                         description="Source containing 'live' or 'upload'"),
@@ -2282,7 +2229,7 @@ async def get_daily_tracks_tile(
     pilot_id: Optional[str] = Query(
         None, description="Optional pilot ID to filter tracks"),
     token_data: Dict = Depends(verify_tracking_token),
-    db: Session = Depends(get_replica_db)  # Use read replica for heavy PostGIS queries
+    db: AsyncSession = Depends(get_async_replica_db)  # Use read replica for heavy PostGIS queries
 ):
     """
     Serve vector tiles for all tracks from today for a specific race.
@@ -2294,7 +2241,7 @@ async def get_daily_tracks_tile(
     - source: Either 'live' or 'upload' to specify data source
     - date: Optional date parameter (YYYY-MM-DD). If not provided, uses today
     """
-    return await _generate_daily_tracks_tile(z, x, y, race_id, source, date, pilot_id, db)
+    return await _generate_daily_tracks_tile(z, x, y, race_id, source, date, pilot_id, db, request)
 
 
 @router.get("/public-mvt/{race_id}/{z}/{x}/{y}")
@@ -2303,13 +2250,14 @@ async def get_public_tracks_tile(
     z: int,
     x: int,
     y: int,
+    request: Request,
     source: str = Query("live", regex="^.*(?:live|upload).*$",
                         description="Source containing 'live' or 'upload'"),
     date: Optional[str] = Query(
         None, description="Date in YYYY-MM-DD format. If not provided, uses today"),
     pilot_id: Optional[str] = Query(
         None, description="Optional pilot ID to filter tracks"),
-    db: Session = Depends(get_replica_db)  # Use read replica for heavy PostGIS queries
+    db: AsyncSession = Depends(get_async_replica_db)  # Use read replica for heavy PostGIS queries
 ):
     # Log tile request pattern (temporarily for debugging)
     import time
@@ -2344,7 +2292,7 @@ async def get_public_tracks_tile(
     - date: Optional date parameter (YYYY-MM-DD). If not provided, uses today
     - pilot_id: Optional pilot ID to filter tracks
     """
-    return await _generate_daily_tracks_tile(z, x, y, race_id, source, date, pilot_id, db)
+    return await _generate_daily_tracks_tile(z, x, y, race_id, source, date, pilot_id, db, request)
 
 
 async def _generate_daily_tracks_tile(
@@ -2355,16 +2303,16 @@ async def _generate_daily_tracks_tile(
     source: str,
     date: Optional[str],
     pilot_id: Optional[str],
-    db: Session
+    db: AsyncSession,
+    request: Optional[Request] = None
 ):
     """
     Internal function to generate vector tiles for all tracks from today for a specific race.
     Applies tracking delay for competition integrity.
+    The ETag covers the selected flights' versions and, while any of them has fixes
+    newer than the race's delay cutoff, the cutoff itself (to the second).
     """
     try:
-        # Import settings for tracking delay
-        from config import settings
-
         # Determine table name based on source
         table_name = "live_track_points" if source == "live" else "uploaded_track_points"
 
@@ -2381,10 +2329,9 @@ async def _generate_daily_tracks_tile(
             # Use today's date
             target_date = datetime.now(timezone.utc).date()
 
-        # Calculate the delay cutoff time (only show points older than this)
-        delay_cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.TRACKING_DELAY_SECONDS)
-        # Don't log every tile request - too noisy
-        # logger.debug(f"Applying {settings.TRACKING_DELAY_SECONDS}s tracking delay to MVT tiles - cutoff: {delay_cutoff}")
+        # Only show points older than the race's delay cutoff, which advances when the
+        # delay line releases the race's fixes (not on every request)
+        delay_cutoff = delay_line.cutoff(race_id)
 
         # Calculate start and end of the specified date in UTC
         start_of_day = datetime.combine(
@@ -2392,21 +2339,28 @@ async def _generate_daily_tracks_tile(
         end_of_day = datetime.combine(
             target_date, time.max, tzinfo=timezone.utc)
 
-        # First, find all flights from today for this race
-        all_flights_today = db.query(Flight).filter(
-            Flight.race_id == race_id,
-            Flight.source.contains(source),  # Changed to LIKE for partial match
-            # Filter by pilot_id if it's provided
-            *([] if pilot_id is None else [Flight.pilot_id == pilot_id]),
-            # Either the flight was created today
-            ((Flight.created_at >= start_of_day) &
-             (Flight.created_at <= end_of_day)) |
-            # OR the flight has a last_fix during today
-            (func.json_extract_path_text(Flight.last_fix, 'datetime') >=
-                start_of_day.strftime('%Y-%m-%dT%H:%M:%SZ')) &
-            (func.json_extract_path_text(Flight.last_fix, 'datetime') <=
-                end_of_day.strftime('%Y-%m-%dT%H:%M:%SZ'))
-        ).all()
+        # First, find all flights from today for this race: today's live flights come
+        # from the race index (newest flight per pilot), anything else from the flights table
+        all_flights_today = None
+        if source == 'live' and not date:
+            all_flights_today = await race_index.current_flights(race_id, start_of_day, end_of_day)
+            if all_flights_today is not None and pilot_id is not None:
+                all_flights_today = [flight for flight in all_flights_today if flight.pilot_id == str(pilot_id)]
+        if all_flights_today is None:
+            all_flights_today = (await db.execute(select(Flight).where(
+                Flight.race_id == race_id,
+                Flight.source.contains(source),  # Changed to LIKE for partial match
+                # Filter by pilot_id if it's provided
+                *([] if pilot_id is None else [Flight.pilot_id == pilot_id]),
+                # Either the flight was created today
+                ((Flight.created_at >= start_of_day) &
+                 (Flight.created_at <= end_of_day)) |
+                # OR the flight has a last_fix during today
+                (func.json_extract_path_text(Flight.last_fix, 'datetime') >=
+                    start_of_day.strftime('%Y-%m-%dT%H:%M:%SZ')) &
+                (func.json_extract_path_text(Flight.last_fix, 'datetime') <=
+                    end_of_day.strftime('%Y-%m-%dT%H:%M:%SZ'))
+            ))).scalars().all()
 
         # Group flights by pilot_id and select only the newest one for each pilot
         pilot_newest_flights = {}
@@ -2430,6 +2384,19 @@ async def _generate_daily_tracks_tile(
             # No flights found, return empty tile
             return Response(content=b"", media_type="application/x-protobuf")
 
+        cache_headers = {"Cache-Control": TILE_CACHE_CONTROL}
+        if request is not None:
+            selected = [flight_data['flight'] for flight_data in pilot_newest_flights.values()]
+            delayed = any(flight_data['last_fix_time'] > delay_cutoff
+                          for flight_data in pilot_newest_flights.values())
+            not_modified, cache_headers = check_not_modified(
+                request, make_etag('daily-mvt', z, x, y, table_name,
+                                   *sorted(flight_version(flight) for flight in selected),
+                                   delay_cutoff.strftime('%Y-%m-%dT%H:%M:%S') if delayed else None),
+                TILE_CACHE_CONTROL)
+            if not_modified:
+                return not_modified
+
         # Format UUIDs as a string list for the SQL query
         flight_uuids_str = "', '".join(flight_uuids)
         if flight_uuids_str:
@@ -2691,7 +2658,7 @@ async def _generate_daily_tracks_tile(
         """
 
         # Execute the query and get the tile
-        result = db.execute(text(query)).fetchone()
+        result = (await db.execute(text(query))).fetchone()
 
         if result and result[0]:
             # Convert memoryview to bytes if necessary
@@ -2703,7 +2670,7 @@ async def _generate_daily_tracks_tile(
                 content=tile_data,
                 media_type="application/x-protobuf",
                 headers={
-                    "Cache-Control": "public, max-age=10",  # Cache for 10 seconds
+                    **cache_headers,
                     "X-Tile-Cache": "HIT" if len(tile_data) > 0 else "MISS"
                 }
             )
@@ -2713,7 +2680,7 @@ async def _generate_daily_tracks_tile(
                 content=b"",
                 media_type="application/x-protobuf",
                 headers={
-                    "Cache-Control": "public, max-age=10",  # Cache empty tiles too
+                    **cache_headers,  # Cache empty tiles too
                     "X-Tile-Cache": "EMPTY"
                 }
             )
@@ -2737,7 +2704,7 @@ async def get_track_preview(
     weight: int = Query(5, description="Weight/thickness of the track path"),
     max_points: int = Query(
         1000, description="Maximum number of points to use in the polyline"),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ):
     """
@@ -2747,37 +2714,13 @@ async def get_track_preview(
 
     Parameters:
     - flight_uuid: UUID of the flight
-    - width: Width of the preview image (default: 600)
-    - height: Height of the preview image (default: 400)
-    - color: Color of the track path in hex format (default: 0x0000ff - blue)
-    - weight: Weight/thickness of the track path (default: 5)
-    - max_points: Maximum number of points to use (default: 1000, reduces URL length)
-    """
-    try:
-        # Verify token
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expired")
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401, detail=f"Invalid token: {str(e)}")
-
+    - width: Width of the preview image (default: 600)
+    - height: Height of the preview image (default: 400)
+    - color: Color of the track path in hex format (default: 0x0000ff - blue)
+    - weight: Weight/thickness of the track path (default: 5)
+    - max_points: Maximum number of points to use (default: 1000, reduces URL length)
+    """
+    try:
         # Get flight from database
         flight = db.query(Flight).filter(
             Flight.id == flight_uuid
@@ -2792,74 +2735,11 @@ async def get_track_preview(
         # Get the encoded polyline for the flight with simplification
         if 'live' in flight.source:  # Handles 'live', 'tk905b_live', 'flymaster_live'
             func_name = 'generate_live_track_linestring'
-            table_name = 'live_track_points'
         else:  # source == 'upload'
             func_name = 'generate_uploaded_track_linestring'
-            table_name = 'uploaded_track_points'
-
-        # First get track statistics using PostGIS - fixed query to handle elevation gain/loss
-        stats_query = f"""
-        WITH track AS (
-            SELECT 
-                tp.datetime,
-                tp.elevation,
-                tp.geom
-            FROM {table_name} tp
-            WHERE tp.flight_uuid = '{flight_uuid}'
-            ORDER BY tp.datetime
-        ),
-        track_stats AS (
-            SELECT
-                -- Distance in meters
-                ST_Length(ST_MakeLine(geom)::geography) as distance,
-                -- Time values
-                MIN(datetime) as start_time,
-                MAX(datetime) as end_time,
-                -- Elevation values
-                MIN(elevation) as min_elevation,
-                MAX(elevation) as max_elevation,
-                MAX(elevation) - MIN(elevation) as elevation_range
-            FROM track
-        ),
-        -- Handle elevation gain/loss without using window functions inside aggregates
-        track_with_prev AS (
-            SELECT
-                datetime,
-                elevation,
-                LAG(elevation) OVER (ORDER BY datetime) as prev_elevation
-            FROM track
-        ),
-        elevation_changes AS (
-            SELECT
-                SUM(CASE WHEN (elevation - prev_elevation) > 1 THEN (elevation - prev_elevation) ELSE 0 END) as elevation_gain,
-                SUM(CASE WHEN (elevation - prev_elevation) < -1 THEN ABS(elevation - prev_elevation) ELSE 0 END) as elevation_loss
-            FROM track_with_prev
-            WHERE prev_elevation IS NOT NULL
-        )
-        SELECT
-            ts.distance,
-            ts.start_time,
-            ts.end_time,
-            EXTRACT(EPOCH FROM (ts.end_time - ts.start_time)) as duration_seconds,
-            ts.min_elevation,
-            ts.max_elevation,
-            ts.elevation_range,
-            ec.elevation_gain,
-            ec.elevation_loss,
-            -- Speed calculations
-            CASE
-                WHEN EXTRACT(EPOCH FROM (ts.end_time - ts.start_time)) > 0
-                THEN ts.distance / EXTRACT(EPOCH FROM (ts.end_time - ts.start_time))
-                ELSE 0
-            END as avg_speed_m_s,
-            COUNT(*) as total_points
-        FROM track_stats ts, elevation_changes ec, track
-        GROUP BY 
-            ts.distance, ts.start_time, ts.end_time, ts.min_elevation, 
-            ts.max_elevation, ts.elevation_range, ec.elevation_gain, ec.elevation_loss;
-        """
 
-        stats_result = db.execute(text(stats_query)).fetchone()
+        # Track statistics are maintained on insert (api/flight_stats.py)
+        stats = format_stats(flight_stats_store.get(db, flight))
 
         # Get the track geometry and simplify it for preview in a single query
         # This approach uses Douglas-Peucker algorithm with a dynamic tolerance
@@ -2997,71 +2877,11 @@ async def get_track_preview(
             "country": None
         }
 
-        try:
-            async with ClientSession() as session:
-                url = f"https://maps.googleapis.com/maps/api/geocode/json?latlng={start_location['lat']},{start_location['lon']}&key={settings.GOOGLE_MAPS_API_KEY}"
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        if data['results']:
-                            # Get the most relevant result (first one)
-                            result = data['results'][0]
-                            start_location["formatted_address"] = result['formatted_address']
-
-                            # Extract specific address components
-                            for component in result['address_components']:
-                                if 'locality' in component['types']:
-                                    start_location["locality"] = component['long_name']
-                                elif 'administrative_area_level_1' in component['types']:
-                                    start_location["administrative_area"] = component['long_name']
-                                elif 'country' in component['types']:
-                                    start_location["country"] = component['long_name']
-        except Exception as e:
-            logger.error(f"Error getting location data: {str(e)}")
-            # Continue even if geocoding fails
-
-        # Format flight statistics
-        stats = {}
-        if stats_result:
-            hours, remainder = divmod(int(stats_result.duration_seconds), 3600)
-            minutes, seconds = divmod(remainder, 60)
-
-            # Convert meters to kilometers
-            distance_km = float(stats_result.distance) / \
-                1000 if stats_result.distance else 0
-
-            # Convert m/s to km/h
-            avg_speed_kmh = float(stats_result.avg_speed_m_s) * \
-                3.6 if stats_result.avg_speed_m_s else 0
-
-            stats = {
-                "distance": {
-                    "meters": round(float(stats_result.distance), 2) if stats_result.distance else 0,
-                    "kilometers": round(distance_km, 2)
-                },
-                "duration": {
-                    "seconds": int(stats_result.duration_seconds) if stats_result.duration_seconds else 0,
-                    "formatted": f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-                },
-                "speed": {
-                    "avg_m_s": round(float(stats_result.avg_speed_m_s), 2) if stats_result.avg_speed_m_s else 0,
-                    "avg_km_h": round(avg_speed_kmh, 2)
-                },
-                "elevation": {
-                    "min": round(float(stats_result.min_elevation), 1) if stats_result.min_elevation is not None else None,
-                    "max": round(float(stats_result.max_elevation), 1) if stats_result.max_elevation is not None else None,
-                    "range": round(float(stats_result.elevation_range), 1) if stats_result.elevation_range is not None else None,
-                    "gain": round(float(stats_result.elevation_gain), 1) if stats_result.elevation_gain is not None else None,
-                    "loss": round(float(stats_result.elevation_loss), 1) if stats_result.elevation_loss is not None else None
-                },
-                "points": {
-                    "total": stats_result.total_points if hasattr(stats_result, 'total_points') else 0
-                },
-                "timestamps": {
-                    "start": stats_result.start_time.isoformat() if stats_result.start_time else None,
-                    "end": stats_result.end_time.isoformat() if stats_result.end_time else None
-                }
-            }
+        # Start location details from the geocode cache (None fields if it fails)
+        location = await geocoding_service.reverse(start_location['lat'], start_location['lon'])
+        if location:
+            for field in ('formatted_address', 'locality', 'administrative_area', 'country'):
+                start_location[field] = location[field]
 
         return {
             "flight_id": flight.flight_id,
@@ -3283,11 +3103,13 @@ async def get_track_preview_id(
 @router.get("/track-line/{flight_id}")
 async def get_track_linestring(
     flight_id: str,
+    request: Request,
+    response: Response,
     source: str = Query(..., regex="^.*(?:live|upload).*$",
                         description="Source containing 'live' or 'upload'"),
     simplify: bool = Query(
         False, description="Whether to simplify the track geometry. If true, provides sampled coordinates for better performance."),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ):
     """
@@ -3300,31 +3122,6 @@ async def get_track_linestring(
     - simplify: Optional parameter to simplify the line geometry (useful for large tracks)
     """
     try:
-        # Verify token
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expired")
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401, detail=f"Invalid token: {str(e)}"
-            )
-
         # Check if flight exists
         flight = db.query(Flight).filter(
             Flight.flight_id == flight_id,
@@ -3337,6 +3134,13 @@ async def get_track_linestring(
                 detail=f"Flight not found with ID {flight_id}"
             )
 
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('track-line', flight_version(flight), flight.pilot_name, simplify),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
         flight_uuid = str(flight.id)
 
         # Build query to get LineString
@@ -3471,9 +3275,11 @@ async def get_track_linestring(
 @router.get("/track-line-uuid/{flight_uuid}")
 async def get_track_linestring_by_uuid(
     flight_uuid: str,
+    request: Request,
+    response: Response,
     simplify: bool = Query(
         False, description="Whether to simplify the track geometry. If true, provides sampled coordinates for better performance."),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ):
     """
@@ -3485,31 +3291,6 @@ async def get_track_linestring_by_uuid(
     - simplify: Optional parameter to simplify the line geometry (useful for large tracks)
     """
     try:
-        # Verify token
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expired")
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401, detail=f"Invalid token: {str(e)}"
-            )
-
         # Check if flight exists by UUID
         flight = db.query(Flight).filter(
             Flight.id == flight_uuid
@@ -3521,6 +3302,13 @@ async def get_track_linestring_by_uuid(
                 detail=f"Flight not found with UUID {flight_uuid}"
             )
 
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('track-line-uuid', flight_version(flight), flight.pilot_name, simplify),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
         # Build query to get LineString
         if 'live' in flight.source:  # Handles 'live', 'tk905b_live', 'flymaster_live'
             func_name = 'generate_live_track_linestring'
@@ -3657,7 +3445,7 @@ async def get_flight_state_endpoint(
         False, description="Include state history in response"),
     history_points: int = Query(
         10, description="Number of history points to include if history=True"),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     source: str = Query(..., regex="^.*(?:live|upload).*$"),
     db: Session = Depends(get_db)
 ):
@@ -3666,36 +3454,7 @@ async def get_flight_state_endpoint(
     Requires JWT token in Authorization header (Bearer token).
     """
     try:
-        # Get token from Authorization header and verify it
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-            race_id = token_data["sub"].split(":")[1]
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
+        race_id = contest_race_id(token_data)
 
         # Get flight from database
         flight = db.query(Flight).filter(Flight.flight_id ==
@@ -3810,7 +3569,9 @@ async def update_flight_state(flight_uuid, source=None):
 @router.get("/flight/bounds/{flight_uuid}")
 async def get_flight_bounds(
     flight_uuid: UUID,
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    request: Request,
+    response: Response,
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ):
     """
@@ -3821,31 +3582,6 @@ async def get_flight_bounds(
     - flight_uuid: UUID of the flight
     """
     try:
-        # Verify token
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token expired")
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401, detail=f"Invalid token: {str(e)}"
-            )
-
         # Check if flight exists
         flight = db.query(Flight).filter(
             Flight.id == flight_uuid
@@ -3857,6 +3593,13 @@ async def get_flight_bounds(
                 detail=f"Flight not found with UUID {flight_uuid}"
             )
 
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('flight-bounds', flight_version(flight), flight.pilot_name),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
         # Determine which function to use based on flight source
         if 'live' in flight.source:  # Handles 'live', 'tk905b_live', 'flymaster_live'
             func_name = 'generate_live_track_linestring'
@@ -3931,6 +3674,8 @@ async def get_flight_bounds(
 @router.get("/flight/bounds/flightid/{flight_id}")
 async def get_flight_bounds_by_id(
     flight_id: str,
+    request: Request,
+    response: Response,
     source: str = Query(..., regex="^.*(?:live|upload).*$",
                         description="Source containing 'live' or 'upload'"),
     token_data: Dict = Depends(verify_tracking_token),
@@ -3957,6 +3702,13 @@ async def get_flight_bounds_by_id(
                 detail=f"Flight not found with ID {flight_id} and source {source}"
             )
 
+        not_modified, cache_headers = check_not_modified(
+            request, make_etag('flight-bounds', flight_version(flight), flight.pilot_name),
+            cache_control_for(flight), flight_last_modified(flight))
+        if not_modified:
+            return not_modified
+        response.headers.update(cache_headers)
+
         flight_uuid = str(flight.id)
 
         # Determine which function to use based on flight source
@@ -4039,14 +3791,7 @@ async def send_notification(
         # Existing auth logic remains the same
         token = credentials.credentials
         try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
+            token_data = decode_api_token(token)
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Token has expired")
         except PyJWTError as e:
@@ -4263,14 +4008,7 @@ async def get_sent_notifications(
         # Verify JWT token
         token = credentials.credentials
         try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
+            token_data = decode_api_token(token)
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Token has expired")
         except PyJWTError as e:
@@ -4351,14 +4089,7 @@ async def get_sent_notifications_count(
         # Verify JWT token
         token = credentials.credentials
         try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
+            token_data = decode_api_token(token)
         except jwt.ExpiredSignatureError:
             raise HTTPException(status_code=401, detail="Token has expired")
         except PyJWTError as e:
@@ -4965,16 +4696,18 @@ async def upload_digifly_data(
         )
 
         if queued:
-            asyncio.create_task(update_flight_state(flight.id, source='digifly_live'))
+            flight_state_engine.add_points(flight.id, track_points_data)
             logger.info(f"Successfully queued {len(track_points_data)} Digifly points for flight {flight_id}")
         else:
             # Fallback to direct insertion
             stmt = insert(LiveTrackPoint).on_conflict_do_nothing(
                 index_elements=['flight_id', 'lat', 'lon', 'datetime']
-            )
-            db.execute(stmt, track_points_data)
+            ).returning(*stats_columns(LiveTrackPoint))
+            inserted = db.execute(stmt, track_points_data).all()
+            flight_stats_store.apply(db, LiveTrackPoint, inserted)
             db.commit()
-            asyncio.create_task(update_flight_state(flight.id, source='digifly_live'))
+            delay_line.admit(race_id, flight.id, track_points_data)
+            flight_state_engine.add_points(flight.id, track_points_data)
             logger.info(f"Successfully saved Digifly points for flight {flight_id} (fallback)")
 
         return PlainTextResponse("OK", status_code=200)
@@ -4992,7 +4725,7 @@ async def upload_digifly_data(
 @router.get("/flymaster/points/{serial_id}/raw")
 async def flymaster_points(
     serial_id: int,
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     start_date: Optional[str] = Query(
         None, description="Start date filter (ISO 8601 format, e.g. 2025-06-08T09:31:22+03:00)"),
     end_date: Optional[str] = Query(
@@ -5006,35 +4739,6 @@ async def flymaster_points(
     Optional date filtering with start_date and end_date parameters.
     """
     try:
-        # Get token from Authorization header and verify it
-        token = credentials.credentials
-        try:
-            token_data = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-
-            if not token_data.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject - must be contest-specific"
-                )
-
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(
-                status_code=401,
-                detail="Token has expired"
-            )
-        except PyJWTError as e:
-            raise HTTPException(
-                status_code=401,
-                detail=f"Invalid token: {str(e)}"
-            )
-
         # Get all track points for this Flymaster device
         # First find flights for this device_id
         flights = db.query(Flight).filter(
@@ -5341,261 +5045,6 @@ async def get_tasks_by_race_id(
         )
 
 
-@router.post("/admin/persist-live-flight")
-async def persist_live_flight(
-    flight_uuid: str,
-    credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db),
-    start_datetime: Optional[datetime] = None,
-    end_datetime: Optional[datetime] = None
-):
-    """
-    Convert a specific live tracking flight to upload points for permanent storage.
-    Creates a duplicate flight record with source='[device]_upload' to distinguish from live data.
-    This prevents live data from being deleted after 5 days by the cleanup retention policy.
-    The original live flight and points are preserved.
-    
-    Parameters:
-    - flight_uuid: Required - The UUID of the specific flight to persist
-    - start_datetime: Optional - Only persist points after this time
-    - end_datetime: Optional - Only persist points before this time
-    """
-    # Verify JWT token
-    try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
-    except (PyJWTError, jwt.ExpiredSignatureError) as e:
-        raise HTTPException(status_code=403, detail="Invalid or expired token")
-    
-    try:
-        # Parse and validate the flight UUID
-        try:
-            import uuid
-            flight_uuid_obj = uuid.UUID(flight_uuid)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid flight UUID format")
-        
-        # Get the specific flight
-        flight = db.query(Flight).filter(Flight.id == flight_uuid_obj).first()
-        
-        if not flight:
-            return {
-                "success": False,
-                "message": f"Flight with UUID {flight_uuid} not found",
-                "flights_processed": 0,
-                "points_copied": 0
-            }
-        
-        # Check if it's already persisted (contains 'upload' in source)
-        if 'upload' in flight.source:
-            return {
-                "success": True,
-                "message": f"Flight {flight_uuid} is already persisted (source: {flight.source})",
-                "flights_processed": 0,
-                "points_copied": 0
-            }
-        
-        # Check if it's a device-specific live flight (contains '_live')
-        # We don't persist standard 'live' flights, only device-specific ones
-        if '_live' not in flight.source:
-            return {
-                "success": False,
-                "message": f"Flight {flight_uuid} cannot be persisted (source: {flight.source}). Only device-specific live flights (e.g., flymaster_live, tk905b_live) can be persisted.",
-                "flights_processed": 0,
-                "points_copied": 0
-            }
-        
-        # Process single flight
-        live_flights = [flight]
-        
-        total_points_copied = 0
-        flights_processed = 0
-        flight_details = []
-        
-        for flight in live_flights:
-            # Check if we already have a corresponding upload flight
-            upload_flight_id = f"{flight.flight_id}-upload"
-            
-            # Determine the upload source type based on the live source
-            if flight.source == 'flymaster_live':
-                upload_source = 'flymaster_upload'
-            elif flight.source == 'tk905b_live':
-                upload_source = 'tk905b_upload'
-            elif flight.source == 'digifly_live':
-                upload_source = 'digifly_upload'
-            else:
-                upload_source = 'upload'  # Default for standard 'live' source
-            
-            existing_upload_flight = db.query(Flight).filter(
-                Flight.flight_id == upload_flight_id,
-                Flight.source == upload_source
-            ).first()
-            
-            if not existing_upload_flight:
-                # Create a new flight record for the upload version
-                # Uploaded flights are closed immediately since upload is complete
-                upload_flight = Flight(
-                    flight_id=upload_flight_id,
-                    race_uuid=flight.race_uuid,
-                    race_id=flight.race_id,
-                    pilot_id=flight.pilot_id,
-                    pilot_name=flight.pilot_name,
-                    created_at=flight.created_at,
-                    source=upload_source,  # Mark as appropriate upload version
-                    device_id=flight.device_id,
-                    first_fix=flight.first_fix,
-                    last_fix=flight.last_fix,
-                    total_points=flight.total_points,
-                    closed_at=datetime.now(timezone.utc),
-                    closed_by='upload_complete'
-                )
-                db.add(upload_flight)
-                db.commit()
-                db.refresh(upload_flight)
-                logger.info(f"Created upload flight {upload_flight_id} with UUID {upload_flight.id}")
-            else:
-                upload_flight = existing_upload_flight
-                logger.info(f"Using existing upload flight {upload_flight_id}")
-            
-            # Get live points for this flight with optional datetime filters
-            points_query = db.query(LiveTrackPoint).filter(
-                LiveTrackPoint.flight_uuid == flight.id
-            )
-            
-            # Apply datetime filters if provided
-            if start_datetime:
-                points_query = points_query.filter(LiveTrackPoint.datetime >= start_datetime)
-            if end_datetime:
-                points_query = points_query.filter(LiveTrackPoint.datetime <= end_datetime)
-            
-            live_points = points_query.all()
-            
-            if not live_points:
-                logger.warning(f"No live points found for flight {flight.flight_id} with date filter - skipping")
-                continue
-            
-            # ALWAYS delete ALL existing upload points for this flight first
-            # This ensures a full replacement every time, regardless of date filters
-            deleted_count = db.query(UploadedTrackPoint).filter(
-                UploadedTrackPoint.flight_uuid == upload_flight.id
-            ).delete(synchronize_session=False)
-            
-            # Don't reset flight statistics here - let the trigger handle it
-            # We'll update them after queueing the points
-            db.commit()
-            logger.info(f"Cleared {deleted_count} existing upload points for flight {upload_flight.flight_id}")
-            
-            # Convert live points to upload points format with the upload flight UUID
-            upload_points = []
-            for point in live_points:
-                upload_point = {
-                    'flight_id': upload_flight.flight_id,  # Use upload flight ID
-                    'flight_uuid': str(upload_flight.id),   # Use upload flight UUID
-                    'datetime': point.datetime.isoformat() if hasattr(point.datetime, 'isoformat') else str(point.datetime),
-                    'lat': point.lat,
-                    'lon': point.lon,
-                    'elevation': point.elevation,
-                    'barometric_altitude': point.barometric_altitude
-                }
-                upload_points.append(upload_point)
-            
-            # Note: first_fix, last_fix, and total_points are automatically updated by database triggers
-            
-            # Queue upload points using Redis queue for batch processing
-            if upload_points:
-                from redis_queue_system.redis_queue import redis_queue
-                
-                # Split into chunks if needed (queue in batches of 100)
-                chunk_size = 100
-                for i in range(0, len(upload_points), chunk_size):
-                    chunk = upload_points[i:i + chunk_size]
-                    await redis_queue.queue_points(QUEUE_NAMES['upload'], chunk)
-                
-                points_added = len(upload_points)
-                total_points_copied += points_added
-                flights_processed += 1
-                
-                flight_details.append({
-                    "original_flight_id": flight.flight_id,
-                    "upload_flight_id": upload_flight.flight_id,
-                    "pilot": flight.pilot_name,
-                    "device": flight.device_id,
-                    "points_queued": points_added,
-                    "total_live_points": len(live_points)
-                })
-                
-                logger.debug(f"Queued {points_added} points for persistence from {flight.source} flight {flight.flight_id}")
-                
-                # After queueing points, update flight statistics
-                # The trigger will update these as points are inserted, but we set initial values
-                # to ensure consistency, especially for first_fix which should be from the earliest point
-                if upload_points:
-                    # Sort points by datetime to ensure we get the correct first and last
-                    sorted_points = sorted(upload_points, key=lambda x: x['datetime'])
-                    
-                    first_point_data = sorted_points[0]  # Earliest point
-                    last_point_data = sorted_points[-1]  # Latest point
-                    
-                    # Always update first_fix and last_fix based on the sorted points
-                    upload_flight.first_fix = {
-                        'lat': first_point_data['lat'],
-                        'lon': first_point_data['lon'],
-                        'elevation': first_point_data['elevation'],
-                        'datetime': first_point_data['datetime']
-                    }
-                    
-                    upload_flight.last_fix = {
-                        'lat': last_point_data['lat'],
-                        'lon': last_point_data['lon'],
-                        'elevation': last_point_data['elevation'],
-                        'datetime': last_point_data['datetime']
-                    }
-                    
-                    # Update total_points to match what we queued
-                    upload_flight.total_points = len(upload_points)
-                    
-                    logger.debug(f"Updated flight statistics for {upload_flight.flight_id}: "
-                               f"first_fix={first_point_data['datetime']}, "
-                               f"last_fix={last_point_data['datetime']}, "
-                               f"total_points={len(upload_points)}")
-        
-        db.commit()
-        
-        date_range_msg = ""
-        if start_datetime or end_datetime:
-            date_range_msg = f" (filtered: {start_datetime or 'start'} to {end_datetime or 'end'})"
-        
-        logger.warning(f"Admin persisted flight {flight_uuid}{date_range_msg}. Points: {total_points_copied}")
-        
-        return {
-            "success": True,
-            "message": f"Successfully queued flight {flight_uuid} for persistence{date_range_msg}",
-            "flight_uuid": flight_uuid,
-            "flights_processed": flights_processed,
-            "points_queued": total_points_copied,
-            "date_filter": {
-                "start": start_datetime.isoformat() if start_datetime else None,
-                "end": end_datetime.isoformat() if end_datetime else None
-            } if (start_datetime or end_datetime) else None,
-            "note": "Points are processed asynchronously via Redis queue. Duplicates are skipped automatically.",
-            "flight_details": flight_details
-        }
-        
-    except Exception as e:
-        db.rollback()
-        logger.error(f"Error persisting flight {flight_uuid}: {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Failed to persist flight {flight_uuid}: {str(e)}"
-        )
-
-
 # ============== Cache Management Endpoints ==============
 
 @router.post("/admin/invalidate-device-cache/{device_id}")
@@ -5610,14 +5059,7 @@ async def invalidate_device_cache(
     """
     # Verify JWT token
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -5676,14 +5118,7 @@ async def register_device(
     """
     # Verify admin JWT token (same as other management endpoints)
     try:
-        admin_token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        admin_token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired admin token")
     
@@ -5778,14 +5213,7 @@ async def list_all_devices(
     """
     # Verify admin JWT token (same as persist endpoint)
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -5838,14 +5266,7 @@ async def list_race_devices(
     """
     # Verify admin JWT token (same as persist endpoint)
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -5898,14 +5319,7 @@ async def activate_device(
     """
     # Verify admin JWT token (same as persist endpoint)
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -5976,14 +5390,7 @@ async def deactivate_device(
     """
     # Verify admin JWT token (same as persist endpoint)
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -6048,14 +5455,7 @@ async def activate_device_by_uuid(
     """
     # Verify admin JWT token (same as persist endpoint)
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -6125,14 +5525,7 @@ async def deactivate_device_by_uuid(
     """
     # Verify admin JWT token (same as persist endpoint)
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -6202,14 +5595,7 @@ async def activate_all_devices_for_race(
     """
     # Verify admin JWT token
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -6282,14 +5668,7 @@ async def deactivate_all_devices_for_race(
     """
     # Verify admin JWT token
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -6371,14 +5750,7 @@ async def delete_device_by_uuid(
     """
     # Verify admin JWT token
     try:
-        token_data = jwt.decode(
-            credentials.credentials,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app",
-            verify=True
-        )
+        token_data = decode_api_token(credentials.credentials)
     except (PyJWTError, jwt.ExpiredSignatureError) as e:
         raise HTTPException(status_code=403, detail="Invalid or expired token")
     
@@ -6508,6 +5880,7 @@ async def close_flight(
 
         db.commit()
         db.refresh(flight)
+        live_flight_cache.invalidate(flight.flight_id)
 
         logger.info(f"Flight {flight_id} closed manually by pilot {token_data['pilot_id']}")
 
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 import uuid
 from database.models import ScoringTracks
 from database.db_conf import get_db
 from database.db_replica import get_replica_db
 from database.schemas import (
+    ScoringTrackBase,
     ScoringTrackBatchCreate,
     ScoringTrackBatchResponse,
     FlightDeleteResponse,
@@ -17,29 +18,136 @@ from aiohttp import ClientSession
 from config import settings
 from uuid import UUID
 from sqlalchemy import text
+import asyncio
 import json
-from typing import Optional, List
+import os
+import zlib
+from typing import Dict, Optional, List
 
 from datetime import datetime, time, timezone
 
+from api.auth import require_api_token
+from api.scoring_tiles import scoring_tile_store
+from api.scoring_derivations import derive_scoring_fields
+from api.http_cache import check_not_modified, etag_matches, make_etag, SCORING_CACHE_CONTROL
+
 # Import queue system
 from redis_queue_system.redis_queue import redis_queue, QUEUE_NAMES
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Rows per multi-row INSERT; 1000 rows x 19 columns stays well below the bind parameter limit
+SCORING_INSERT_CHUNK_SIZE = 1000
+SCORING_STREAM_MAX_POINTS = int(os.getenv('SCORING_STREAM_MAX_POINTS', '500000'))
+# Limits on the streamed body after gunzipping, checked while it is read
+SCORING_STREAM_MAX_BYTES = int(os.getenv('SCORING_STREAM_MAX_BYTES', str(256 * 1024 * 1024)))
+SCORING_STREAM_MAX_LINE_BYTES = int(os.getenv('SCORING_STREAM_MAX_LINE_BYTES', str(64 * 1024)))
+# Most bytes one decompress call produces
+DECOMPRESS_CHUNK_SIZE = 64 * 1024
+
+
+def _insert_scoring_chunk(db: Session, rows: List[dict]) -> int:
+    """Insert rows in one statement, skipping duplicates; returns the number inserted"""
+    stmt = insert(ScoringTracks).values(rows).on_conflict_do_nothing(
+        index_elements=['flight_uuid', 'date_time', 'lat', 'lon']
+    ).returning(ScoringTracks.flight_uuid)
+    return len(db.execute(stmt).fetchall())
+
+
+def _commit_scoring_chunk(rows: List[dict]) -> int:
+    """_insert_scoring_chunk in a session and transaction of its own; returns the number inserted"""
+    from database.db_conf import Session as DbSession
+
+    with DbSession() as db:
+        inserted = _insert_scoring_chunk(db, rows)
+        db.commit()
+        return inserted
+
+
+def _invalidate_scoring_tiles(flight_uuid) -> None:
+    from database.db_conf import Session as DbSession
+
+    with DbSession() as db:
+        scoring_tile_store.invalidate(db, flight_uuid)
+        db.commit()
+
+
+async def _body_chunks(request: Request):
+    """
+    Chunks of the request body, gunzipped at most DECOMPRESS_CHUNK_SIZE bytes at a time.
+    Concatenated gzip members (as `cat a.gz b.gz` makes) are all decompressed; a corrupt
+    or truncated body is rejected with 400.
+    """
+    if 'gzip' not in request.headers.get('content-encoding', '').lower():
+        async for chunk in request.stream():
+            yield chunk
+        return
+
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    started = False
+    try:
+        async for chunk in request.stream():
+            while chunk:
+                started = True
+                yield decoder.decompress(chunk, DECOMPRESS_CHUNK_SIZE)
+                if decoder.eof:
+                    # Input past the end of a member starts the next one
+                    chunk = decoder.unused_data
+                    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                    started = False
+                else:
+                    chunk = decoder.unconsumed_tail
+        yield decoder.flush()
+    except zlib.error as e:
+        raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+    if started and not decoder.eof:
+        raise HTTPException(status_code=400, detail="Invalid gzip body: truncated")
+
+
+async def _ndjson_lines(request: Request, max_bytes: int = SCORING_STREAM_MAX_BYTES,
+                        max_line_bytes: int = SCORING_STREAM_MAX_LINE_BYTES):
+    """
+    Yield the non-empty lines of a streamed NDJSON body, gunzipping it on the fly.
+    A body larger than max_bytes (413) or a line longer than max_line_bytes (400) is
+    rejected as soon as it is read, so memory stays bounded whatever the client sends.
+    """
+    total = 0
+    pending = b''
+    async for data in _body_chunks(request):
+        total += len(data)
+        if total > max_bytes:
+            raise HTTPException(
+                status_code=413, detail=f"Stream exceeds maximum of {max_bytes} bytes"
+            )
+        pending += data
+        *lines, pending = pending.split(b'\n')
+        if len(pending) > max_line_bytes or any(len(line) > max_line_bytes for line in lines):
+            raise HTTPException(
+                status_code=400, detail=f"Stream line exceeds maximum of {max_line_bytes} bytes"
+            )
+        for line in lines:
+            if line.strip():
+                yield line
+    if pending.strip():
+        yield pending
+
 
 @router.post("/batch", status_code=201, response_model=ScoringTrackBatchResponse)
 async def create_scoring_track_batch(
     track_batch: ScoringTrackBatchCreate,
+    derive: bool = Query(
+        False, description="Compute speed, smoothed values, takeoff and in-flight flags server-side"),
     db: Session = Depends(get_db)
 ):
     """Insert a batch of scoring track points efficiently. 
     Optionally accepts existing flight_uuid for migration, otherwise generates a new UUID.
+    With derive=true the derived columns the client did not send are computed over the
+    whole batch (api/scoring_derivations.py).
     """
-    # Define max batch size constant
+    # Define max batch size constant (use /batch/stream for larger tracks)
     MAX_BATCH_SIZE = 10000
-    CHUNK_SIZE = 1000
+    CHUNK_SIZE = SCORING_INSERT_CHUNK_SIZE
     
     try:
         # Validate that we have track points to process
@@ -78,6 +186,9 @@ async def create_scoring_track_batch(
             track_data = track.model_dump(exclude={"geom"})
             track_objects.append(track_data)
 
+        if derive:
+            derive_scoring_fields(track_objects)
+
         # Bulk insert all track objects if we have any, ignoring conflicts
         if track_objects:
             # Try queueing first for better performance (only for smaller batches)
@@ -91,6 +202,7 @@ async def create_scoring_track_batch(
 
             if queued:
                 # Just commit the flight UUID generation, points will be processed in background
+                # (the point processor invalidates the flight's tiles once they are stored)
                 db.commit()
                 logger.info(
                     f"Queued {points_to_add} scoring points for background processing")
@@ -110,24 +222,8 @@ async def create_scoring_track_batch(
                 for i in range(0, len(track_objects), CHUNK_SIZE):
                     chunk = track_objects[i:i + CHUNK_SIZE]
                     
-                    # Count existing points before insertion to track duplicates
-                    existing_count_query = db.query(ScoringTracks).filter(
-                        ScoringTracks.flight_uuid == flight_uuid
-                    ).count()
-                    before_count = existing_count_query
-                    
-                    # Use on_conflict_do_nothing to handle duplicates
-                    stmt = insert(ScoringTracks).on_conflict_do_nothing(
-                        index_elements=['flight_uuid', 'date_time', 'lat', 'lon']
-                    )
-                    db.execute(stmt, chunk)
-                    
-                    # Count points after insertion to determine how many were added
-                    after_count = db.query(ScoringTracks).filter(
-                        ScoringTracks.flight_uuid == flight_uuid
-                    ).count()
-                    
-                    chunk_inserted = after_count - before_count
+                    # RETURNING yields only the rows actually inserted (duplicates are skipped)
+                    chunk_inserted = _insert_scoring_chunk(db, chunk)
                     chunk_skipped = len(chunk) - chunk_inserted
                     
                     points_added += chunk_inserted
@@ -135,6 +231,10 @@ async def create_scoring_track_batch(
                     
                     logger.debug(f"Chunk {i//CHUNK_SIZE + 1}: inserted {chunk_inserted}, skipped {chunk_skipped}")
 
+                # New points - drop the flight's tiles and rebuild once batches stop
+                if points_added:
+                    scoring_tile_store.invalidate(db, flight_uuid)
+
                 # Commit once after all operations
                 db.commit()
                 
@@ -193,6 +293,105 @@ async def create_scoring_track_batch(
         )
 
 
+@router.post("/batch/stream", status_code=201, response_model=ScoringTrackBatchResponse)
+async def stream_scoring_track_batch(
+    request: Request,
+    flight_uuid: Optional[UUID] = Query(
+        None, description="Optional flight UUID for migration. If not provided, a new UUID will be generated"),
+    derive: bool = Query(
+        False, description="Compute speed, smoothed values, takeoff and in-flight flags server-side"),
+    token_data: Dict = Depends(require_api_token)
+):
+    """
+    Insert a large scoring track streamed as NDJSON (one track point object per line).
+    The body may be gzip compressed (Content-Encoding: gzip). Points are validated while
+    the body is read, and every full chunk is inserted in a short transaction of its own,
+    so no transaction waits on the client. A stream rejected halfway keeps the chunks
+    inserted before; sending it again is safe, those points are skipped as duplicates.
+    With derive=true the derived columns are computed over the whole streamed track, so
+    the points are held until the body has been read and inserted afterwards.
+    Requires an API token (Authorization: Bearer).
+    """
+    flight_uuid = flight_uuid or uuid.uuid4()
+    points_added = 0
+    points_received = 0
+    chunk = []
+
+    try:
+        line_number = 0
+        async for line in _ndjson_lines(request):
+            line_number += 1
+            try:
+                track = ScoringTrackBase.model_validate_json(line)
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=400, detail=f"Invalid track point on line {line_number}: {e}"
+                )
+
+            points_received += 1
+            if points_received > SCORING_STREAM_MAX_POINTS:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Stream exceeds maximum of {SCORING_STREAM_MAX_POINTS} points"
+                )
+
+            track.flight_uuid = flight_uuid
+            chunk.append(track.model_dump(exclude={"geom"}))
+            if not derive and len(chunk) >= SCORING_INSERT_CHUNK_SIZE:
+                points_added += await asyncio.to_thread(_commit_scoring_chunk, chunk)
+                chunk = []
+
+        if points_received == 0:
+            raise HTTPException(
+                status_code=400, detail="No track points provided in the stream"
+            )
+
+        if derive:
+            # Speeds and smoothed values depend on neighbouring points, across chunk boundaries
+            derive_scoring_fields(chunk)
+        for i in range(0, len(chunk), SCORING_INSERT_CHUNK_SIZE):
+            points_added += await asyncio.to_thread(
+                _commit_scoring_chunk, chunk[i:i + SCORING_INSERT_CHUNK_SIZE])
+
+        logger.info(
+            f"Stream batch complete for {flight_uuid}: {points_added} added, "
+            f"{points_received - points_added} skipped (duplicates)")
+
+        return ScoringTrackBatchResponse(
+            flight_uuid=flight_uuid,
+            points_added=points_added,
+            points_skipped=points_received - points_added,
+            queued=False
+        )
+
+    except HTTPException:
+        raise
+
+    except SQLAlchemyError as e:
+        logger.error(
+            f"Database error while streaming scoring track batch: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Database error while creating scoring track batch"
+        )
+
+    except Exception as e:
+        logger.error(
+            f"Unexpected error streaming scoring track batch: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail="An unexpected error occurred while processing track stream"
+        )
+
+    finally:
+        # New points, even of a stream that failed later on - drop the flight's tiles
+        if points_added:
+            try:
+                await asyncio.to_thread(_invalidate_scoring_tiles, flight_uuid)
+            except Exception as e:
+                logger.error(f"Could not invalidate scoring tiles of {flight_uuid}: {e}")
+
+
 @router.delete("/flight/{flight_uuid}", status_code=200, response_model=FlightDeleteResponse)
 async def delete_flight_tracks(
     flight_uuid: uuid.UUID,
@@ -221,6 +420,10 @@ async def delete_flight_tracks(
             ScoringTracks.flight_uuid == flight_uuid
         ).delete(synchronize_session=False)
 
+        # Drop the flight's tiles with it
+        scoring_tile_store.invalidate(db, flight_uuid)
+        scoring_tile_store.unschedule(db, flight_uuid)
+
         # Commit the transaction
         db.commit()
 
@@ -325,6 +528,9 @@ async def update_flight_tracks(
                 )
                 db.execute(stmt, track_objects)
 
+            # Replaced points - rebuild the flight's tiles
+            scoring_tile_store.invalidate(db, flight_uuid)
+
             # Commit the transaction
             db.commit()
 
@@ -808,6 +1014,8 @@ async def get_track_preview(
 @router.get("/flight/{flight_uuid}/points", status_code=200)
 async def get_flight_points(
     flight_uuid: UUID,
+    request: Request,
+    response: Response,
     format: str = Query(
         "default", description="Response format: 'default' or 'geojson'"),
     db: Session = Depends(get_db)
@@ -826,6 +1034,24 @@ async def get_flight_points(
         # Log the request
         logger.info(f"Fetching points for flight UUID: {flight_uuid}")
 
+        # Version from a hash of every served column, so a rewrite that keeps the
+        # coordinates (e.g. re-derived speeds or flags) still changes the ETag
+        version = db.execute(text("""
+            SELECT count(*), min(date_time), max(date_time),
+                   md5(string_agg(ROW(date_time, lat, lon, gps_alt, time, speed, elevation,
+                                      altitude_diff, pressure_alt, speed_smooth, altitude_diff_smooth,
+                                      takeoff_condition, in_flight)::text, ','
+                                  ORDER BY date_time, lat, lon))
+            FROM scoring_tracks WHERE flight_uuid = CAST(:flight_uuid AS uuid)
+        """), {"flight_uuid": str(flight_uuid)}).fetchone()
+        if version[0]:
+            not_modified, cache_headers = check_not_modified(
+                request, make_etag('scoring-points', flight_uuid, format.lower(), *version),
+                SCORING_CACHE_CONTROL, version[2])
+            if not_modified:
+                return not_modified
+            response.headers.update(cache_headers)
+
         # Query to get all track points for the flight
         track_points = db.query(ScoringTracks).filter(
             ScoringTracks.flight_uuid == flight_uuid
@@ -945,380 +1171,66 @@ async def get_flight_points(
         )
 
 
+async def _serve_scoring_tile(z: int, x: int, y: int, flight_uuids: List[UUID],
+                              if_none_match: Optional[str], db: Session) -> Response:
+    """Look up (or render) each flight's tile, compose them and answer with a strong ETag"""
+    order = [str(flight_uuid) for flight_uuid in dict.fromkeys(flight_uuids)]
+    tiles = await scoring_tile_store.get_tiles(db, order, z, x, y)
+    etag = scoring_tile_store.combined_etag(z, x, y, tiles)
+    headers = {"ETag": f'"{etag}"', "Cache-Control": SCORING_CACHE_CONTROL}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    content = scoring_tile_store.compose(etag, order, tiles)
+    return Response(content=content, media_type="application/x-protobuf", headers=headers)
+
+
 @router.post("/postgis-mvt/daily/{z}/{x}/{y}")
 async def get_daily_tracks_tile(
     z: int,
     x: int,
     y: int,
     request: MVTRequest,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
     Serve vector tiles for all tracks from today for a specific race.
     Returns track points and lines with different colors per pilot.
+    Tiles come from the precomputed per-flight pyramid (api/scoring_tiles.py); tiles
+    not built yet are rendered for that flight only.
 
     Parameters:
     - z/x/y: Tile coordinates
     - request: MVTRequest containing flight UUIDs to include in the tile
     """
     try:
-        # Log the request
-        logger.info(
-            f"MVT request received for z={z}, x={x}, y={y} with {len(request.flight_uuids)} flight UUIDs")
         if not request.flight_uuids:
             # No flights found, return empty tile
             logger.warning("No flight UUIDs provided, returning empty tile")
             return Response(content=b"", media_type="application/x-protobuf")
 
-        # Format UUIDs as a string list for the SQL query
-        # Convert each UUID to string before joining
-        flight_uuids_str = "', '".join(str(uuid)
-                                       for uuid in request.flight_uuids)
-        if flight_uuids_str:
-            flight_uuids_str = f"('{flight_uuids_str}')"
-            logger.info(f"Formatted UUIDs string: {flight_uuids_str}")
-        else:
-            # Use NULL to ensure valid SQL when list is empty
-            flight_uuids_str = "(NULL)"
+        return await _serve_scoring_tile(z, x, y, request.flight_uuids, if_none_match, db)
 
-        # SQL query using ST_AsMVT
-        # This generates MVT tiles with both points and lines for all flights
-        query = f"""
-        WITH 
-        bounds AS (
-            SELECT ST_TileEnvelope({z}, {x}, {y}) AS geom
-        ),
-        -- Assign colors to flights based on their UUID for consistent coloring
-        flights_colors AS (
-            SELECT 
-                DISTINCT flight_uuid,
-                -- Use hash of flight_uuid for color assignment
-                (('x' || substr(md5(flight_uuid::text), 1, 6))::bit(24)::int % 10) as color_index
-            FROM scoring_tracks 
-            WHERE flight_uuid::text IN {flight_uuids_str}
-        ),
-        -- First get all points with row numbers for sampling
-        numbered_points AS (
-            SELECT 
-                ROW_NUMBER() OVER (PARTITION BY t.flight_uuid ORDER BY t.date_time) as point_num,
-                t.*,
-                fc.color_index
-            FROM scoring_tracks t
-            -- Join with the colors CTE to get consistent coloring
-            LEFT JOIN flights_colors fc ON t.flight_uuid = fc.flight_uuid
-            WHERE t.flight_uuid::text IN {flight_uuids_str}
-            -- Apply basic coordinate validation regardless of zoom level to exclude bogus data
-            AND t.lat BETWEEN -90 AND 90 
-            AND t.lon BETWEEN -180 AND 180
-        ),
-        -- For each flight, find the last point to always include
-        last_points AS (
-            SELECT DISTINCT ON (flight_uuid) 
-                *
-            FROM numbered_points
-            ORDER BY flight_uuid, date_time DESC
-        ),
-        -- Select and filter points within this tile - improved filtering for different zoom levels
-        filtered_points AS (
-            SELECT 
-                np.point_num as id,
-                ST_SetSRID(ST_MakePoint(np.lon, np.lat, COALESCE(np.gps_alt, 0)), 4326) as geom,
-                np.gps_alt as elevation,
-                np.date_time as datetime,
-                np.lat,
-                np.lon,
-                np.flight_uuid,
-                np.color_index
-            FROM numbered_points np
-            WHERE 1=1
-            -- Apply appropriate spatial filtering based on zoom level
-            {
-            "" if z == 0 else
-            "AND (np.lat BETWEEN -85 AND 85 AND np.lon BETWEEN -180 AND 180)" if z <= 2 else
-            "AND ST_Intersects(ST_Transform(ST_SetSRID(ST_MakePoint(np.lon, np.lat), 4326), 3857), (SELECT geom FROM bounds))"
-        }
-            -- Apply sampling based on zoom level and point number
-            AND (
-                {
-            "1=1" if z == 0 else
-            "np.point_num % 60 = 0" if z < 3 else
-            "np.point_num % 30 = 0" if z < 7 else
-            "np.point_num % 10 = 0" if z < 10 else
-            "1=1"
-        }
-                -- Always include the last point of each flight
-                OR EXISTS (
-                    SELECT 1 FROM last_points lp 
-                    WHERE lp.flight_uuid = np.flight_uuid AND lp.date_time = np.date_time
-                )
-            )
-            ORDER BY np.flight_uuid, np.date_time
-        ),
-        -- Create the points layer
-        point_mvt AS (
-            SELECT 
-                ST_AsMVTGeom(
-                    ST_Transform(fp.geom, 3857), 
-                    (SELECT geom FROM bounds),
-                    4096,    -- Resolution: standard is 4096 for MVT
-                    256,     -- Buffer: to avoid clipping at tile edges
-                    true     -- Clip geometries
-                ) AS geom,
-                fp.elevation::float as elevation,
-                fp.datetime::text as datetime,
-                fp.lat::float as lat,
-                fp.lon::float as lon,
-                fp.flight_uuid::text as flight_uuid,
-                fp.color_index
-            FROM filtered_points fp
-        ),
-        -- First group points by flight to form lines
-        flight_lines AS (
-            SELECT 
-                fp.flight_uuid,
-                fp.color_index,
-                ST_MakeLine(fp.geom ORDER BY fp.datetime) AS line_geom,
-                count(fp.id) as point_count,
-                min(fp.datetime) as start_time,
-                max(fp.datetime) as end_time
-            FROM filtered_points fp
-            GROUP BY fp.flight_uuid, fp.color_index
-            HAVING count(fp.id) > 1  -- Ensure we have at least 2 points to form a valid line
-        ),
-        -- Then create the MVT geometries for the lines
-        line_data AS (
-            SELECT 
-                ST_AsMVTGeom(
-                    ST_Transform(fl.line_geom, 3857),
-                    (SELECT geom FROM bounds),
-                    4096,
-                    256,
-                    true
-                ) AS geom,
-                fl.flight_uuid::text as flight_uuid,
-                fl.color_index,
-                fl.point_count,
-                fl.start_time,
-                fl.end_time
-            FROM flight_lines fl
-            WHERE fl.line_geom IS NOT NULL
-        )
-        -- Final SELECT statement to generate MVT - using a better approach for empty results
-        SELECT 
-            (
-                SELECT COALESCE(
-                    (SELECT ST_AsMVT(l.*, 'track_lines') FROM line_data l),
-                    ''
-                )
-            ) || 
-            (
-                SELECT COALESCE(
-                    (SELECT ST_AsMVT(p.*, 'track_points') FROM point_mvt p),
-                    ''
-                )
-            ) AS mvt
-        """
-
-        # Add a debug query to check if we have any points for these UUIDs
-        debug_query = f"""
-        SELECT COUNT(*) FROM scoring_tracks WHERE flight_uuid::text IN {flight_uuids_str};
-        """
-        debug_result = db.execute(text(debug_query)).fetchone()
-        point_count = debug_result[0] if debug_result else 0
-        logger.info(
-            f"Found {point_count} points for the requested flight UUIDs")
-
-        # Add a debug query to check if points are within the tile bounds
-        if point_count > 0:
-            bounds_query = f"""
-            WITH bounds AS (SELECT ST_TileEnvelope({z}, {x}, {y}) AS geom)
-            SELECT COUNT(*) FROM scoring_tracks t, bounds b 
-            WHERE flight_uuid::text IN {flight_uuids_str}
-            AND ST_Intersects(
-                ST_Transform(ST_SetSRID(ST_MakePoint(t.lon, t.lat), 4326), 3857), 
-                b.geom
-            );
-            """
-            bounds_result = db.execute(text(bounds_query)).fetchone()
-            bounds_count = bounds_result[0] if bounds_result else 0
-            logger.info(
-                f"Found {bounds_count} points within the requested tile bounds")
-
-        try:
-            # Execute the query and get the tile with better error handling
-            result = db.execute(text(query)).fetchone()
-
-            # Add more detailed diagnostic logging for points and lines
-
-            # Add a check specifically for line generation issues
-            line_check_query = f"""
-            WITH 
-            bounds AS (SELECT ST_TileEnvelope({z}, {x}, {y}) AS geom),
-            -- Use same numbered_points CTE as the main query
-            numbered_points AS (
-                SELECT 
-                    ROW_NUMBER() OVER (PARTITION BY t.flight_uuid ORDER BY t.date_time) as point_num,
-                    t.*
-                FROM scoring_tracks t
-                WHERE t.flight_uuid::text IN {flight_uuids_str}
-                AND t.lat BETWEEN -90 AND 90 
-                AND t.lon BETWEEN -180 AND 180
-            ),
-            -- Sample for different zoom levels - same logic as main query
-            sampled_points AS (
-                SELECT 
-                    np.flight_uuid,
-                    ST_SetSRID(ST_MakePoint(np.lon, np.lat), 4326) as geom,
-                    np.date_time
-                FROM numbered_points np
-                WHERE (
-                    {
-                "1=1" if z == 0 else
-                "np.point_num % 60 = 0" if z < 3 else
-                "np.point_num % 30 = 0" if z < 7 else
-                "np.point_num % 10 = 0" if z < 10 else
-                "1=1"
-            }
-                )
-            ),
-            -- Group by flight to check line formation
-            line_formation AS (
-                SELECT 
-                    flight_uuid,
-                    ST_NPoints(ST_MakeLine(geom ORDER BY date_time)) as line_points,
-                    COUNT(*) as num_points
-                FROM sampled_points 
-                GROUP BY flight_uuid
-            )
-            SELECT 
-                COUNT(*) as flights_with_lines,
-                SUM(CASE WHEN line_points >= 2 THEN 1 ELSE 0 END) as valid_lines,
-                AVG(line_points) as avg_points_per_line,
-                MAX(line_points) as max_points_in_line
-            FROM line_formation
-            WHERE num_points > 1;
-            """
-
-            try:
-                line_check_result = db.execute(
-                    text(line_check_query)).fetchone()
-                if line_check_result:
-                    logger.info(
-                        f"Line diagnostic: {line_check_result[0]} flights with {line_check_result[1]} valid lines, " +
-                        f"avg {int(line_check_result[2]) if line_check_result[2] else 0} points/line, " +
-                        f"max {line_check_result[3]} points in a line"
-                    )
-            except Exception as e:
-                logger.warning(f"Line diagnostic query failed: {str(e)}")
-
-            # Run a simplified query to check if points are being properly filtered
-            check_filtered_points_query = f"""
-            WITH 
-            bounds AS (SELECT ST_TileEnvelope({z}, {x}, {y}) AS geom),
-            -- First get all points with row numbers for sampling
-            numbered_points AS (
-                SELECT 
-                    ROW_NUMBER() OVER (PARTITION BY t.flight_uuid ORDER BY t.date_time) as point_num,
-                    t.*
-                FROM scoring_tracks t
-                WHERE t.flight_uuid::text IN {flight_uuids_str}
-                -- Apply basic coordinate validation regardless of zoom level
-                AND t.lat BETWEEN -90 AND 90 
-                AND t.lon BETWEEN -180 AND 180
-            ),
-            -- For each flight, find the last point to always include
-            last_points AS (
-                SELECT DISTINCT ON (flight_uuid) 
-                    *
-                FROM numbered_points
-                ORDER BY flight_uuid, date_time DESC
-            ),
-            -- Apply the same filtering as the main query
-            filtered_check AS (
-                SELECT COUNT(*) as filtered_count
-                FROM numbered_points np
-                WHERE 1=1
-                -- Apply appropriate spatial filtering based on zoom level
-                {
-                "" if z == 0 else
-                "AND (np.lat BETWEEN -85 AND 85 AND np.lon BETWEEN -180 AND 180)" if z <= 2 else
-                "AND ST_Intersects(ST_Transform(ST_SetSRID(ST_MakePoint(np.lon, np.lat), 4326), 3857), (SELECT geom FROM bounds))"
-            }
-                -- Apply sampling based on zoom level and point number
-                AND (
-                    {
-                "1=1" if z == 0 else
-                "np.point_num % 60 = 0" if z < 3 else
-                "np.point_num % 30 = 0" if z < 7 else
-                "np.point_num % 10 = 0" if z < 10 else
-                "1=1"
-            }
-                    -- Always include the last point of each flight
-                    OR EXISTS (
-                        SELECT 1 FROM last_points lp 
-                        WHERE lp.flight_uuid = np.flight_uuid AND lp.date_time = np.date_time
-                    )
-                )
-            )
-            SELECT filtered_count FROM filtered_check;
-            """
-            filtered_check_result = db.execute(
-                text(check_filtered_points_query)).fetchone()
-            filtered_count = filtered_check_result[0] if filtered_check_result else 0
-
-            logger.info(
-                f"Diagnostic - Points after filtering: {filtered_count}")
-            logger.info(
-                f"Diagnostic - MVT result is {'present' if result and result[0] else 'missing'}")
-            if result and result[0]:
-                logger.info(
-                    f"MVT result type: {type(result[0])}, size: {len(result[0])}")
-
-        except Exception as e:
-            logger.error(
-                f"MVT generation or diagnostic queries failed: {str(e)}")
-            # If the main query failed, return empty tile
-            result = None
-
-        # Create a simpler but more robust tile generation approach
-        if result and result[0] is not None:
-            # Always return the MVT tile as binary data, even if it's empty
-            mvt_size = len(result[0])
-            logger.info(
-                f"Generated MVT tile successfully with size: {mvt_size} bytes")
-
-            # Add debug info but don't block valid MVT returns
-            if mvt_size > 0:
-                logger.info(
-                    f"MVT structure hex sample: {result[0][:20].hex()}")
-            else:
-                logger.warning("Empty MVT structure returned")
-
-            return Response(content=result[0], media_type="application/x-protobuf")
-        else:
-            # Create a minimal valid MVT if the result is None
-            logger.warning(
-                "No MVT tile was generated, creating minimal empty MVT response")
-
-            # Use a simple empty tile fallback query
-            fallback_query = """
-            WITH empty_table AS (
-                SELECT NULL::geometry AS geom 
-                WHERE false
-            )
-            SELECT ST_AsMVT(empty_table.*, 'empty_layer') FROM empty_table
-            """
-            try:
-                fallback_result = db.execute(text(fallback_query)).fetchone()
-                if fallback_result and fallback_result[0]:
-                    logger.info("Returning fallback empty MVT structure")
-                    return Response(content=fallback_result[0], media_type="application/x-protobuf")
-            except Exception as e:
-                logger.error(f"Failed to generate fallback MVT: {str(e)}")
+    except Exception as e:
+        logger.error(f"Error generating daily tracks vector tile: {str(e)}")
+        raise HTTPException(
+            status_code=500, detail=f"Failed to generate daily tracks tile: {str(e)}")
 
-            # Last resort: return empty content with proper content type
-            return Response(content=b"", media_type="application/x-protobuf")
 
+@router.get("/postgis-mvt/daily/{z}/{x}/{y}")
+async def get_daily_tracks_tile_get(
+    z: int,
+    x: int,
+    y: int,
+    flight_uuids: List[UUID] = Query(..., description="Flights to include in the tile"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """GET form of the daily tracks tile, cacheable by browsers and CDNs"""
+    try:
+        return await _serve_scoring_tile(z, x, y, flight_uuids, if_none_match, db)
     except Exception as e:
         logger.error(f"Error generating daily tracks vector tile: {str(e)}")
         raise HTTPException(
@@ -0,0 +1,111 @@
+"""
+Server-side derivation of scoring track columns
+Computes speed, speed_smooth, altitude_diff, altitude_diff_smooth, takeoff_condition
+and in_flight for a whole batch at once with NumPy, using the flight state thresholds
+from api/flight_state.py, so clients can send raw fixes to /scoring/batch?derive=true.
+"""
+import os
+from typing import Dict, List
+
+import numpy as np
+
+from api.flight_state import (
+    ALTITUDE_CHANGE_WINDOW,
+    FLYING_BUFFER_TIME,
+    FLYING_MIN_SPEED,
+    SIGNIFICANT_ALTITUDE_CHANGE,
+)
+from utils.track_kernels import haversine
+
+# Points in the centered moving average used for the *_smooth columns
+SCORING_SMOOTH_POINTS = int(os.getenv('SCORING_SMOOTH_POINTS', '5'))
+
+DERIVED_FIELDS = ('speed', 'speed_smooth', 'altitude_diff', 'altitude_diff_smooth',
+                  'takeoff_condition', 'in_flight')
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Centered moving average that ignores NaN and shrinks at the edges"""
+    n = len(values)
+    if n == 0 or window <= 1:
+        return values.copy()
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    index = np.arange(n)
+    lo = np.clip(index - window // 2, 0, n)
+    hi = np.clip(index + (window - 1) // 2 + 1, 0, n)
+    window_counts = counts[hi] - counts[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(window_counts > 0, (sums[hi] - sums[lo]) / window_counts, np.nan)
+
+
+def derive_arrays(epoch: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                  gps_alt: np.ndarray, elevation: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Derive the scoring columns for one time-sorted track.
+    elevation is ground elevation (NaN where unknown); speed of a point is the speed
+    of the segment ending at it, the first point takes the first segment's speed.
+    """
+    n = len(epoch)
+    speed = np.zeros(n)
+    if n > 1:
+        dt = np.diff(epoch)
+        distance = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            speed[1:] = np.where(dt > 0, distance / dt, 0.0)
+        speed[0] = speed[1]
+    speed_smooth = rolling_mean(speed, SCORING_SMOOTH_POINTS)
+
+    altitude_diff = gps_alt - elevation
+    altitude_diff_smooth = rolling_mean(altitude_diff, SCORING_SMOOTH_POINTS)
+
+    # Climb or sink over the trailing altitude window, as detect_flight_state does
+    window_start = np.searchsorted(epoch, epoch - ALTITUDE_CHANGE_WINDOW.total_seconds(), side='left')
+    altitude_change = gps_alt - gps_alt[window_start]
+
+    takeoff_condition = (speed_smooth >= FLYING_MIN_SPEED) | \
+        (np.abs(altitude_change) >= SIGNIFICANT_ALTITUDE_CHANGE)
+
+    # In flight from the first takeoff condition until it has been false for FLYING_BUFFER_TIME
+    last_takeoff = np.maximum.accumulate(np.where(takeoff_condition, epoch, -np.inf))
+    in_flight = (epoch - last_takeoff) <= FLYING_BUFFER_TIME.total_seconds()
+
+    return {
+        'speed': speed,
+        'speed_smooth': speed_smooth,
+        'altitude_diff': altitude_diff,
+        'altitude_diff_smooth': altitude_diff_smooth,
+        'takeoff_condition': takeoff_condition,
+        'in_flight': in_flight
+    }
+
+
+def derive_scoring_fields(rows: List[Dict], overwrite: bool = False) -> List[Dict]:
+    """
+    Fill the derived columns of scoring track rows (dicts as inserted into scoring_tracks)
+    in place. Values sent by the client are kept unless overwrite is set.
+    """
+    if not rows:
+        return rows
+
+    ordered = sorted(rows, key=lambda row: row['date_time'])
+    epoch = np.fromiter((row['date_time'].timestamp() for row in ordered), dtype=float, count=len(ordered))
+    lat = np.fromiter((row['lat'] for row in ordered), dtype=float, count=len(ordered))
+    lon = np.fromiter((row['lon'] for row in ordered), dtype=float, count=len(ordered))
+    gps_alt = np.fromiter((row['gps_alt'] for row in ordered), dtype=float, count=len(ordered))
+    elevation = np.array([row.get('elevation') for row in ordered], dtype=float)
+
+    derived = derive_arrays(epoch, lat, lon, gps_alt, elevation)
+
+    for field in DERIVED_FIELDS:
+        values = derived[field]
+        if values.dtype == bool:
+            column = values.tolist()
+        else:
+            # NaN (no ground elevation) becomes NULL
+            column = np.where(np.isnan(values), None, values).tolist()
+        for row, value in zip(ordered, column):
+            if overwrite or row.get(field) is None:
+                row[field] = value
+    return rows
@@ -0,0 +1,542 @@
+"""
+Precomputed tile pyramid for scoring tracks
+Scoring tracks do not change once a flight's batches are in, so each flight's MVT tiles
+are built once (after its last batch) into the scoring_tiles table and served by primary
+key lookup. Multi-flight requests compose the per-flight tiles instead of re-running the
+sampling query over every point of every flight.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Zoom levels built up front; deeper tiles are built on first request and stored
+SCORING_TILE_PREBUILD_MAX_ZOOM = int(os.getenv('SCORING_TILE_PREBUILD_MAX_ZOOM', '12'))
+# Seconds without new batches before a flight's pyramid is (re)built
+SCORING_TILE_BUILD_DELAY = int(os.getenv('SCORING_TILE_BUILD_DELAY', '15'))
+SCORING_TILE_COMPOSE_CACHE_SIZE = int(os.getenv('SCORING_TILE_COMPOSE_CACHE_SIZE', '2000'))
+# Due flights one builder claims per poll, and seconds before a claim of a dead builder is retaken
+SCORING_TILE_BUILD_BATCH = int(os.getenv('SCORING_TILE_BUILD_BATCH', '10'))
+SCORING_TILE_BUILD_LEASE = int(os.getenv('SCORING_TILE_BUILD_LEASE', '600'))
+
+TILE_EXTENT = 4096
+TILE_BUFFER = 256
+# Share of a tile's width covered by the ST_AsMVTGeom buffer on each side
+BUFFER_FRACTION = TILE_BUFFER / TILE_EXTENT
+EMPTY_ETAG = hashlib.md5(b'').hexdigest()
+# Width of the EPSG:3857 world square in meters
+WEB_MERCATOR_WIDTH = 40075016.685578488
+
+
+def tiles_sql(z: int) -> str:
+    """
+    MVTs of a list of tiles (:xs, :ys) of one zoom level for one flight, from a single pass
+    over its points - the same sampling, layers and attributes as the original multi-flight
+    query, filtered on the flight_uuid key so the primary key index is used.
+    """
+    if z == 0:
+        tile_join = "FROM sampled_points sp JOIN tiles tl ON true"
+    elif z <= 2:
+        tile_join = "FROM sampled_points sp JOIN tiles tl ON sp.lat BETWEEN -85 AND 85 AND sp.lon BETWEEN -180 AND 180"
+    else:
+        # Only the tiles around the point's own are candidates (a hash join), then the exact test
+        tile_size = WEB_MERCATOR_WIDTH / 2 ** z
+        tile_join = f"""FROM (
+            SELECT
+                sp.*,
+                floor((ST_X(m.geom) + {WEB_MERCATOR_WIDTH / 2!r}) / {tile_size!r})::int as tx,
+                floor(({WEB_MERCATOR_WIDTH / 2!r} - ST_Y(m.geom)) / {tile_size!r})::int as ty,
+                m.geom as geom_3857
+            FROM sampled_points sp
+            CROSS JOIN LATERAL (
+                SELECT ST_Transform(ST_SetSRID(ST_MakePoint(sp.lon, sp.lat), 4326), 3857) AS geom
+            ) m
+        ) sp
+        CROSS JOIN (VALUES (-1), (0), (1)) AS dx(d)
+        CROSS JOIN (VALUES (-1), (0), (1)) AS dy(d)
+        JOIN tiles tl ON tl.x = sp.tx + dx.d AND tl.y = sp.ty + dy.d
+        AND ST_Intersects(sp.geom_3857, tl.geom)"""
+    sampling = (
+        "1=1" if z == 0 else
+        "np.point_num % 60 = 0" if z < 3 else
+        "np.point_num % 30 = 0" if z < 7 else
+        "np.point_num % 10 = 0" if z < 10 else
+        "1=1"
+    )
+    return f"""
+    WITH
+    tiles AS (
+        SELECT t.x, t.y, ST_TileEnvelope(:z, t.x, t.y) AS geom
+        FROM unnest(CAST(:xs AS integer[]), CAST(:ys AS integer[])) AS t(x, y)
+    ),
+    numbered_points AS (
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY t.date_time) as point_num,
+            t.*,
+            (('x' || substr(md5(t.flight_uuid::text), 1, 6))::bit(24)::int % 10) as color_index
+        FROM scoring_tracks t
+        WHERE t.flight_uuid = CAST(:flight_uuid AS uuid)
+        AND t.lat BETWEEN -90 AND 90
+        AND t.lon BETWEEN -180 AND 180
+    ),
+    last_point AS (
+        SELECT date_time FROM numbered_points ORDER BY date_time DESC LIMIT 1
+    ),
+    sampled_points AS (
+        SELECT
+            np.point_num as id,
+            ST_SetSRID(ST_MakePoint(np.lon, np.lat, COALESCE(np.gps_alt, 0)), 4326) as geom,
+            np.gps_alt as elevation,
+            np.date_time as datetime,
+            np.lat,
+            np.lon,
+            np.flight_uuid,
+            np.color_index
+        FROM numbered_points np
+        WHERE (
+            {sampling}
+            -- Always include the last point of the flight
+            OR np.date_time = (SELECT date_time FROM last_point)
+        )
+    ),
+    filtered_points AS (
+        SELECT
+            tl.x,
+            tl.y,
+            tl.geom as bounds,
+            sp.id,
+            sp.geom,
+            sp.elevation,
+            sp.datetime,
+            sp.lat,
+            sp.lon,
+            sp.flight_uuid,
+            sp.color_index
+        {tile_join}
+    ),
+    point_mvt AS (
+        SELECT fp.x, fp.y, ST_AsMVT(feature, 'track_points' ORDER BY fp.datetime) AS mvt
+        FROM filtered_points fp
+        CROSS JOIN LATERAL (
+            SELECT
+                ST_AsMVTGeom(ST_Transform(fp.geom, 3857), fp.bounds,
+                             {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                fp.elevation::float as elevation,
+                fp.datetime::text as datetime,
+                fp.lat::float as lat,
+                fp.lon::float as lon,
+                fp.flight_uuid::text as flight_uuid,
+                fp.color_index
+        ) AS feature
+        GROUP BY fp.x, fp.y
+    ),
+    flight_lines AS (
+        SELECT
+            fp.x,
+            fp.y,
+            fp.flight_uuid,
+            fp.color_index,
+            ST_MakeLine(fp.geom ORDER BY fp.datetime) AS line_geom,
+            count(fp.id) as point_count,
+            min(fp.datetime) as start_time,
+            max(fp.datetime) as end_time
+        FROM filtered_points fp
+        GROUP BY fp.x, fp.y, fp.flight_uuid, fp.color_index
+        HAVING count(fp.id) > 1
+    ),
+    line_mvt AS (
+        SELECT fl.x, fl.y, ST_AsMVT(feature, 'track_lines') AS mvt
+        FROM flight_lines fl
+        CROSS JOIN LATERAL (
+            SELECT
+                ST_AsMVTGeom(ST_Transform(fl.line_geom, 3857), ST_TileEnvelope(:z, fl.x, fl.y),
+                             {TILE_EXTENT}, {TILE_BUFFER}, true) AS geom,
+                fl.flight_uuid::text as flight_uuid,
+                fl.color_index,
+                fl.point_count,
+                fl.start_time,
+                fl.end_time
+        ) AS feature
+        WHERE fl.line_geom IS NOT NULL
+        GROUP BY fl.x, fl.y
+    )
+    SELECT
+        tl.x,
+        tl.y,
+        COALESCE(lm.mvt, '') || COALESCE(pm.mvt, '') AS mvt
+    FROM tiles tl
+    LEFT JOIN line_mvt lm ON lm.x = tl.x AND lm.y = tl.y
+    LEFT JOIN point_mvt pm ON pm.x = tl.x AND pm.y = tl.y
+    """
+
+
+def tile_etag(mvt: bytes) -> str:
+    return hashlib.md5(mvt).hexdigest()
+
+
+def fractional_tile(lat: float, lon: float, z: int) -> Tuple[float, float]:
+    """Web Mercator tile coordinates of a point, with the fractional position kept"""
+    n = 2 ** z
+    lat = max(-85.0511, min(85.0511, lat))
+    lat_rad = math.radians(lat)
+    fx = (lon + 180.0) / 360.0 * n
+    fy = (1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n
+    return fx, fy
+
+
+def covering_tiles(points: List[Tuple[float, float]], z: int) -> set:
+    """Tiles whose buffered envelope contains at least one point"""
+    n = 2 ** z
+    tiles = set()
+    for lat, lon in points:
+        fx, fy = fractional_tile(lat, lon, z)
+        for tx in {int(fx - BUFFER_FRACTION), int(fx), int(fx + BUFFER_FRACTION)}:
+            for ty in {int(fy - BUFFER_FRACTION), int(fy), int(fy + BUFFER_FRACTION)}:
+                if 0 <= tx < n and 0 <= ty < n:
+                    tiles.add((tx, ty))
+    return tiles
+
+
+def tile_may_contain(manifest, z: int, x: int, y: int) -> bool:
+    """False when the buffered tile cannot touch the flight's bounds"""
+    min_fx, max_fy = fractional_tile(manifest.min_lat, manifest.min_lon, z)
+    max_fx, min_fy = fractional_tile(manifest.max_lat, manifest.max_lon, z)
+    return (x - BUFFER_FRACTION <= max_fx and x + 1 + BUFFER_FRACTION >= min_fx and
+            y - BUFFER_FRACTION <= max_fy and y + 1 + BUFFER_FRACTION >= min_fy)
+
+
+def render_tiles(db: Session, flight_uuid, z: int, tiles: List[Tuple[int, int]]) -> Dict[Tuple[int, int], bytes]:
+    """MVT of each (x, y) tile of zoom z for one flight, in one query"""
+    if not tiles:
+        return {}
+    rows = db.execute(text(tiles_sql(z)), {
+        'flight_uuid': str(flight_uuid), 'z': z,
+        'xs': [x for x, _ in tiles], 'ys': [y for _, y in tiles]
+    }).fetchall()
+    return {(row.x, row.y): bytes(row.mvt) if row.mvt is not None else b'' for row in rows}
+
+
+def render_tile(db: Session, flight_uuid, z: int, x: int, y: int) -> bytes:
+    return render_tiles(db, flight_uuid, z, [(x, y)]).get((x, y), b'')
+
+
+def compose_tiles(tiles: List[bytes]) -> bytes:
+    """
+    Merge per-flight tiles into one tile with a single layer per name.
+    Concatenating the protobufs would repeat layer names, which clients collapse.
+    """
+    tiles = [tile for tile in tiles if tile]
+    if not tiles:
+        return b''
+    if len(tiles) == 1:
+        return tiles[0]
+
+    import mapbox_vector_tile
+
+    layers: "OrderedDict[str, List[Dict]]" = OrderedDict()
+    for tile in tiles:
+        for name, layer in mapbox_vector_tile.decode(tile).items():
+            features = layers.setdefault(name, [])
+            for feature in layer['features']:
+                merged = {'geometry': feature['geometry'], 'properties': feature['properties']}
+                if feature.get('id') is not None:
+                    merged['id'] = feature['id']
+                features.append(merged)
+
+    return mapbox_vector_tile.encode(
+        [{'name': name, 'features': features} for name, features in layers.items()],
+        default_options={'extents': TILE_EXTENT}
+    )
+
+
+class ScoringTileStore:
+    """Tile lookup, on-demand building and pyramid builds for scoring flights"""
+
+    def __init__(self, prebuild_max_zoom: int = SCORING_TILE_PREBUILD_MAX_ZOOM,
+                 build_delay: int = SCORING_TILE_BUILD_DELAY):
+        self.prebuild_max_zoom = prebuild_max_zoom
+        self.build_delay = build_delay
+        self.running = False
+        self._task = None
+        self._composed: OrderedDict = OrderedDict()
+        # Written by the builder task, off the request path
+        self._to_store: List[Dict] = []
+        self._unbuilt: set = set()
+        self._pending_builds = 0
+        self.stats = {
+            'stored_hits': 0,
+            'outside_bounds': 0,
+            'rendered_on_demand': 0,
+            'composed': 0,
+            'compose_cache_hits': 0,
+            'builds': 0,
+            'tiles_built': 0,
+            'build_seconds': 0.0,
+            'invalidations': 0,
+            'errors': 0
+        }
+
+    # ---- ingest side ----
+
+    def invalidate(self, db: Session, flight_uuid):
+        """Drop a flight's tiles and schedule a rebuild, in the caller's transaction"""
+        db.execute(text("DELETE FROM scoring_tile_flights WHERE flight_uuid = CAST(:f AS uuid)"), {'f': str(flight_uuid)})
+        db.execute(text("DELETE FROM scoring_tiles WHERE flight_uuid = CAST(:f AS uuid)"), {'f': str(flight_uuid)})
+        self.schedule(db, flight_uuid)
+        self.stats['invalidations'] += 1
+
+    def schedule(self, db: Session, flight_uuid):
+        """(Re)start the flight's build delay; any worker's builder picks it up once due"""
+        db.execute(text(
+            "INSERT INTO scoring_tile_builds (flight_uuid, requested_at) VALUES (CAST(:f AS uuid), now()) "
+            "ON CONFLICT (flight_uuid) DO UPDATE SET requested_at = EXCLUDED.requested_at, claimed_at = NULL"
+        ), {'f': str(flight_uuid)})
+
+    def unschedule(self, db: Session, flight_uuid):
+        db.execute(text("DELETE FROM scoring_tile_builds WHERE flight_uuid = CAST(:f AS uuid)"), {'f': str(flight_uuid)})
+
+    # ---- request side ----
+
+    async def get_tiles(self, db: Session, flight_uuids: List, z: int, x: int, y: int) -> Dict[str, Tuple[bytes, str]]:
+        """(mvt, etag) per flight for one tile, rendering tiles that were not stored"""
+        # The lookup is a synchronous query and a cold tile a PostGIS render: run them in a
+        # thread so they don't stall the websockets served by this worker. The request
+        # only reads; rendered tiles are stored and unbuilt flights scheduled by the builder.
+        tiles, found = await asyncio.to_thread(self._find_tiles, db, flight_uuids, z, x, y)
+        for name in ('stored_hits', 'outside_bounds', 'rendered_on_demand'):
+            self.stats[name] += found[name]
+        self._to_store.extend(found['store'])
+        self._unbuilt.update(found['unbuilt'])
+        return tiles
+
+    @staticmethod
+    def _find_tiles(db: Session, flight_uuids: List, z: int, x: int, y: int) -> Tuple[Dict, Dict]:
+        keys = [str(flight_uuid) for flight_uuid in flight_uuids]
+        tiles = {}
+        found = {'stored_hits': 0, 'outside_bounds': 0, 'rendered_on_demand': 0, 'store': [], 'unbuilt': []}
+
+        rows = db.execute(text(
+            "SELECT flight_uuid, mvt, etag FROM scoring_tiles "
+            "WHERE z = :z AND x = :x AND y = :y AND flight_uuid = ANY(CAST(:ids AS uuid[]))"
+        ), {'z': z, 'x': x, 'y': y, 'ids': keys}).fetchall()
+        for row in rows:
+            tiles[str(row.flight_uuid)] = (bytes(row.mvt), row.etag)
+        found['stored_hits'] = len(rows)
+
+        missing = [key for key in keys if key not in tiles]
+        if not missing:
+            return tiles, found
+
+        manifests = {str(row.flight_uuid): row for row in db.execute(text(
+            "SELECT flight_uuid, min_lat, min_lon, max_lat, max_lon, built_at FROM scoring_tile_flights "
+            "WHERE flight_uuid = ANY(CAST(:ids AS uuid[]))"
+        ), {'ids': missing}).fetchall()}
+
+        for key in missing:
+            manifest = manifests.get(key)
+            if manifest is not None and not tile_may_contain(manifest, z, x, y):
+                tiles[key] = (b'', EMPTY_ETAG)
+                found['outside_bounds'] += 1
+                continue
+
+            mvt = render_tile(db, key, z, x, y)
+            tiles[key] = (mvt, tile_etag(mvt))
+            found['rendered_on_demand'] += 1
+            if manifest is not None:
+                # Built flight - keep the deeper tile for the next request
+                found['store'].append({'f': key, 'z': z, 'x': x, 'y': y, 'mvt': mvt,
+                                       'etag': tiles[key][1], 'built_at': manifest.built_at})
+            else:
+                # Not built yet (still ingesting, or from before tiles existed)
+                found['unbuilt'].append(key)
+        return tiles, found
+
+    @staticmethod
+    def combined_etag(z: int, x: int, y: int, tiles: Dict[str, Tuple[bytes, str]]) -> str:
+        """Strong validator for a composed tile, derived from its parts"""
+        parts = [f"{key}:{tiles[key][1]}" for key in sorted(tiles)]
+        return hashlib.md5(f"{z}/{x}/{y}|{'|'.join(parts)}".encode()).hexdigest()
+
+    def compose(self, etag: str, flight_order: List[str], tiles: Dict[str, Tuple[bytes, str]]) -> bytes:
+        cached = self._composed.get(etag)
+        if cached is not None:
+            self._composed.move_to_end(etag)
+            self.stats['compose_cache_hits'] += 1
+            return cached
+
+        mvt = compose_tiles([tiles[key][0] for key in flight_order])
+        self.stats['composed'] += 1
+        self._composed[etag] = mvt
+        while len(self._composed) > SCORING_TILE_COMPOSE_CACHE_SIZE:
+            self._composed.popitem(last=False)
+        return mvt
+
+    # ---- build job ----
+
+    def build_flight(self, flight_uuid, requested_at=None) -> int:
+        """
+        Render and store a flight's pyramid up to prebuild_max_zoom; returns tiles written.
+        The flight's points are read once per zoom level, for all of that level's tiles.
+        With requested_at, the flight's build request is completed unless it was renewed.
+        """
+        from database.db_replica import PrimarySession
+
+        db = PrimarySession()
+        try:
+            points = [(row.lat, row.lon) for row in db.execute(text(
+                "SELECT lat, lon FROM scoring_tracks WHERE flight_uuid = CAST(:f AS uuid) "
+                "AND lat BETWEEN -90 AND 90 AND lon BETWEEN -180 AND 180"
+            ), {'f': str(flight_uuid)})]
+
+            db.execute(text("DELETE FROM scoring_tiles WHERE flight_uuid = CAST(:f AS uuid)"), {'f': str(flight_uuid)})
+            db.execute(text("DELETE FROM scoring_tile_flights WHERE flight_uuid = CAST(:f AS uuid)"), {'f': str(flight_uuid)})
+            if requested_at is not None:
+                db.execute(text(
+                    "DELETE FROM scoring_tile_builds WHERE flight_uuid = CAST(:f AS uuid) AND requested_at = :requested_at"
+                ), {'f': str(flight_uuid), 'requested_at': requested_at})
+            if not points:
+                db.commit()
+                return 0
+
+            rows = []
+            for z in range(self.prebuild_max_zoom + 1):
+                rendered = render_tiles(db, flight_uuid, z, sorted(covering_tiles(points, z)))
+                for (x, y), mvt in sorted(rendered.items()):
+                    rows.append({'f': str(flight_uuid), 'z': z, 'x': x, 'y': y,
+                                 'mvt': mvt, 'etag': tile_etag(mvt)})
+
+            db.execute(text(
+                "INSERT INTO scoring_tiles (flight_uuid, z, x, y, mvt, etag) "
+                "VALUES (CAST(:f AS uuid), :z, :x, :y, :mvt, :etag)"
+            ), rows)
+            lats = [lat for lat, _ in points]
+            lons = [lon for _, lon in points]
+            db.execute(text(
+                "INSERT INTO scoring_tile_flights (flight_uuid, min_lat, min_lon, max_lat, max_lon, "
+                "point_count, max_zoom, tile_count, built_at) "
+                "VALUES (CAST(:f AS uuid), :min_lat, :min_lon, :max_lat, :max_lon, :points, :max_zoom, :tiles, :now)"
+            ), {'f': str(flight_uuid), 'min_lat': min(lats), 'min_lon': min(lons),
+                'max_lat': max(lats), 'max_lon': max(lons), 'points': len(points),
+                'max_zoom': self.prebuild_max_zoom, 'tiles': len(rows), 'now': datetime.now(timezone.utc)})
+            db.commit()
+            logger.info(f"Built {len(rows)} scoring tiles for flight {flight_uuid} ({len(points)} points)")
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _claim_builds(self, stored: List[Dict], unbuilt: List[str]) -> List:
+        """
+        Store the tiles requests rendered, schedule the flights they found unbuilt, and
+        claim the flights whose build delay has passed (SKIP LOCKED, so each due flight
+        goes to one worker). Claims of a builder that died are retaken after the lease.
+        """
+        from database.db_replica import PrimarySession
+
+        with PrimarySession() as db:
+            if stored:
+                # Only while the manifest the tile was rendered against is still there
+                db.execute(text(
+                    "INSERT INTO scoring_tiles (flight_uuid, z, x, y, mvt, etag) "
+                    "SELECT CAST(:f AS uuid), :z, :x, :y, :mvt, :etag WHERE EXISTS ("
+                    "SELECT 1 FROM scoring_tile_flights WHERE flight_uuid = CAST(:f AS uuid) AND built_at = :built_at) "
+                    "ON CONFLICT DO NOTHING"
+                ), stored)
+            for key in unbuilt:
+                db.execute(text(
+                    "INSERT INTO scoring_tile_builds (flight_uuid, requested_at) VALUES (CAST(:f AS uuid), now()) "
+                    "ON CONFLICT DO NOTHING"
+                ), {'f': key})
+            claimed = db.execute(text(
+                "UPDATE scoring_tile_builds SET claimed_at = now() WHERE flight_uuid IN ("
+                "SELECT flight_uuid FROM scoring_tile_builds "
+                "WHERE requested_at <= now() - make_interval(secs => :delay) "
+                "AND (claimed_at IS NULL OR claimed_at < now() - make_interval(secs => :lease)) "
+                "ORDER BY requested_at LIMIT :limit FOR UPDATE SKIP LOCKED) "
+                "RETURNING flight_uuid, requested_at"
+            ), {'delay': self.build_delay, 'lease': SCORING_TILE_BUILD_LEASE,
+                'limit': SCORING_TILE_BUILD_BATCH}).fetchall()
+            self._pending_builds = db.execute(text("SELECT count(*) FROM scoring_tile_builds")).scalar()
+            db.commit()
+        return claimed
+
+    def _retry_build(self, flight_uuid):
+        """Release a failed build; it is retried after another delay"""
+        from database.db_replica import PrimarySession
+
+        with PrimarySession() as db:
+            db.execute(text(
+                "UPDATE scoring_tile_builds SET claimed_at = NULL, requested_at = now() "
+                "WHERE flight_uuid = CAST(:f AS uuid)"
+            ), {'f': str(flight_uuid)})
+            db.commit()
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Scoring tile builder started (build delay: {self.build_delay}s)")
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Scoring tile builder stopped")
+
+    async def _run(self):
+        while self.running:
+            await asyncio.sleep(max(1, self.build_delay // 3))
+            stored, self._to_store = self._to_store, []
+            unbuilt, self._unbuilt = list(self._unbuilt), set()
+            try:
+                claimed = await asyncio.to_thread(self._claim_builds, stored, unbuilt)
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"Error claiming scoring tile builds: {e}")
+                continue
+
+            for row in claimed:
+                started = time.perf_counter()
+                try:
+                    tiles = await asyncio.to_thread(self.build_flight, row.flight_uuid, row.requested_at)
+                    self.stats['builds'] += 1
+                    self.stats['tiles_built'] += tiles
+                    self.stats['build_seconds'] += time.perf_counter() - started
+                except Exception as e:
+                    self.stats['errors'] += 1
+                    logger.error(f"Error building scoring tiles for flight {row.flight_uuid}: {e}")
+                    try:
+                        await asyncio.to_thread(self._retry_build, row.flight_uuid)
+                    except Exception as retry_error:
+                        # The claim lease runs out and another builder retakes it
+                        logger.error(f"Could not release scoring tile build {row.flight_uuid}: {retry_error}")
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'build_seconds': round(self.stats['build_seconds'], 3),
+            'pending_builds': self._pending_builds,
+            'composed_cached': len(self._composed),
+            'prebuild_max_zoom': self.prebuild_max_zoom
+        }
+
+
+scoring_tile_store = ScoringTileStore()
@@ -11,6 +11,7 @@ import asyncio
 import json
 from typing import List, Tuple, Optional
 from ws_tile_conn import tile_manager
+from utils.ws_frames import negotiate_binary
 from services.tile_generation_service import tile_service
 
 logger = logging.getLogger(__name__)
@@ -23,13 +24,15 @@ async def websocket_tile_tracking_endpoint(
     websocket: WebSocket,
     race_id: str,
     client_id: str = Query(...),
-    token: Optional[str] = Query(None)
+    token: Optional[str] = Query(None),
+    protocol: Optional[str] = Query(None, description="'binary' for binary frames (or offer subprotocol hfss-frames.v1)")
 ):
     """WebSocket endpoint for tile-based real-time tracking updates"""
     db = None
 
     # Accept the WebSocket connection first
-    await websocket.accept()
+    subprotocol, binary = negotiate_binary(websocket, protocol)
+    await websocket.accept(subprotocol=subprotocol)
 
     try:
         # Token verification is now optional
@@ -60,7 +63,7 @@ async def websocket_tile_tracking_endpoint(
                 return
 
         # Connect this client to the tile-based system
-        await tile_manager.connect(websocket, race_id, client_id)
+        await tile_manager.connect(websocket, race_id, client_id, binary=binary)
         
         # Initialize tile service if needed
         if not tile_service.redis_client:
@@ -2,24 +2,23 @@
 Optimized summary endpoint for HFSS tracker page
 Returns minimal data needed for initial page load
 """
-from fastapi import APIRouter, HTTPException, Query, Security, Depends
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi import APIRouter, HTTPException, Query, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any, List
-import jwt
 import logging
 from cachetools import TTLCache
 from threading import Lock
 
 from database.db_conf import get_db
 from database.models import Flight, LiveTrackPoint, UploadedTrackPoint
-from config import settings
+from api.auth import require_contest_token, contest_race_id
+from api.flight_stats import flight_stats_store, format_stats
+from api.race_index import race_index
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/tracking")
-security = HTTPBearer()
 
 # Cache for summary data (TTL = 30 seconds)
 summary_cache = TTLCache(maxsize=100, ttl=30)
@@ -32,7 +31,7 @@ async def get_live_summary(
     closetime: Optional[str] = Query(
         None, description="End time for tracking window (ISO 8601 format)"),
     source: Optional[str] = Query(None, regex="^.*(?:live|upload).*$"),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
@@ -53,31 +52,7 @@ async def get_live_summary(
             closetime_dt = datetime.fromisoformat(
                 closetime.strip().replace('Z', '+00:00'))
         
-        # Validate JWT token
-        token = credentials.credentials
-        try:
-            payload = jwt.decode(
-                token,
-                settings.SECRET_KEY,
-                algorithms=["HS256"],
-                audience="api.hikeandfly.app",
-                issuer="hikeandfly.app",
-                verify=True
-            )
-            
-            if not payload.get("sub", "").startswith("contest:"):
-                raise HTTPException(
-                    status_code=403,
-                    detail="Invalid token subject"
-                )
-            
-            race_id = payload["sub"].split(":")[1]
-            
-        except jwt.ExpiredSignatureError:
-            raise HTTPException(status_code=401, detail="Token has expired")
-        except Exception as e:
-            logger.error(f"Token validation error: {e}")
-            raise HTTPException(status_code=401, detail="Invalid token")
+        race_id = contest_race_id(token_data)
         
         # Check cache
         cache_key = f"{race_id}:{opentime}:{closetime}:{source}"
@@ -151,6 +126,26 @@ async def get_live_summary(
                 "lastUpdate": pilot.last_activity.isoformat() if pilot.last_activity else None,
                 "flights": []  # Empty for now, loaded on demand
             }
+
+        # Current live flight of each pilot (last fix, state) from the race index
+        current_flights = await race_index.current_flight_map(race_id, pilots_dict.keys())
+        if current_flights is None:
+            # Index not built or lost: newest live flight of each pilot from the database
+            current_flights = {
+                str(flight.pilot_id): flight
+                for flight in db.query(Flight).filter(
+                    Flight.race_id == race_id,
+                    Flight.pilot_id.in_(list(pilots_dict.keys())),
+                    Flight.source.contains('live')
+                ).distinct(Flight.pilot_id).order_by(Flight.pilot_id, Flight.created_at.desc()).all()
+            } if pilots_dict else {}
+        for pilot_id_str, current in current_flights.items():
+            pilots_dict[pilot_id_str]["currentFlight"] = {
+                "uuid": str(current.id),
+                "source": current.source,
+                "lastFix": current.last_fix,
+                "flightState": (current.flight_state or {}).get('state', 'unknown')
+            }
         
         response = {
             "pilots": pilots_dict,  # HFSS expects 'pilots' as a dict
@@ -187,7 +182,7 @@ async def get_pilot_flights(
     opentime: str = Query(..., description="Start time"),
     closetime: Optional[str] = Query(None, description="End time"),
     source: Optional[str] = Query(None),
-    credentials: HTTPAuthorizationCredentials = Security(security),
+    token_data: Dict = Depends(require_contest_token),
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
     """
@@ -205,16 +200,7 @@ async def get_pilot_flights(
             closetime_dt = datetime.fromisoformat(
                 closetime.strip().replace('Z', '+00:00'))
         
-        # Validate token (simplified - reuse from above)
-        token = credentials.credentials
-        payload = jwt.decode(
-            token,
-            settings.SECRET_KEY,
-            algorithms=["HS256"],
-            audience="api.hikeandfly.app",
-            issuer="hikeandfly.app"
-        )
-        race_id = payload["sub"].split(":")[1]
+        race_id = contest_race_id(token_data)
         
         # Get flights for specific pilot
         flights_query = db.query(Flight).filter(
@@ -228,6 +214,7 @@ async def get_pilot_flights(
             flights_query = flights_query.filter(Flight.source == source)
         
         flights = flights_query.order_by(Flight.created_at.desc()).limit(20).all()
+        flight_stats = flight_stats_store.get_many(db, flights)
         
         # Build response with essential flight data
         flight_list = []
@@ -244,7 +231,8 @@ async def get_pilot_flights(
                     "duration_seconds": (
                         datetime.fromisoformat(flight.last_fix['datetime'].replace('Z', '+00:00')) -
                         datetime.fromisoformat(flight.first_fix['datetime'].replace('Z', '+00:00'))
-                    ).total_seconds() if flight.first_fix and flight.last_fix else 0
+                    ).total_seconds() if flight.first_fix and flight.last_fix else 0,
+                    "stats": format_stats(flight_stats.get(flight.id))
                 })
         
         return {
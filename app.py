@@ -34,6 +34,12 @@ from database.db_conf import engine, test_db_connection
 import sqlalchemy
 from redis_queue_system.redis_queue import redis_queue
 from redis_queue_system.point_processor import point_processor
+from api.flight_state import flight_state_engine
+from api.scoring_tiles import scoring_tile_store
+from api.flight_stats import flight_stats_store
+from api.race_index import race_index
+from api.delay_line import delay_line
+from api.broadcast_bus import broadcast_bus
 from middleware.db_recovery import setup_database_recovery
 from config import settings
 
@@ -77,6 +83,12 @@ async def lifespan(app):
         logger.error(f"Failed to initialize Redis connection: {e}")
         logger.warning("Queue functionality will not be available")
 
+    # Share broadcast leadership and payloads with the other workers
+    try:
+        await broadcast_bus.start()
+    except Exception as e:
+        logger.error(f"Failed to start broadcast bus: {e}")
+
     # Start background point processors
     try:
         await point_processor.start()
@@ -84,6 +96,37 @@ async def lifespan(app):
     except Exception as e:
         logger.error(f"Failed to start background processors: {e}")
 
+    # Start batched flight state recomputation
+    try:
+        await flight_state_engine.start()
+    except Exception as e:
+        logger.error(f"Failed to start flight state engine: {e}")
+
+    # Recount flight stats left behind by out-of-order batches
+    try:
+        await flight_stats_store.start()
+    except Exception as e:
+        logger.error(f"Failed to start flight stats rebuilds: {e}")
+
+    # Build scoring tile pyramids after scoring batches
+    try:
+        await scoring_tile_store.start()
+    except Exception as e:
+        logger.error(f"Failed to start scoring tile builder: {e}")
+
+    # Rebuild the per-race current flight index in Redis
+    try:
+        await race_index.start()
+    except Exception as e:
+        logger.error(f"Failed to start race index rebuild: {e}")
+
+    # Release live fixes when their competition delay expires
+    try:
+        delay_line.add_listener(tile_service.invalidate_released)
+        await delay_line.start()
+    except Exception as e:
+        logger.error(f"Failed to start delay line: {e}")
+
     # Initialize Firebase for FCM notifications
     try:
         from api.send_notifications import initialize_firebase
@@ -158,6 +201,36 @@ async def lifespan(app):
         logger.info("Background processors stopped")
     except Exception as e:
         logger.error(f"Error stopping background processors: {e}")
+
+    try:
+        await flight_state_engine.stop()
+    except Exception as e:
+        logger.error(f"Error stopping flight state engine: {e}")
+
+    try:
+        await flight_stats_store.stop()
+    except Exception as e:
+        logger.error(f"Error stopping flight stats rebuilds: {e}")
+
+    try:
+        await scoring_tile_store.stop()
+    except Exception as e:
+        logger.error(f"Error stopping scoring tile builder: {e}")
+
+    try:
+        await race_index.stop()
+    except Exception as e:
+        logger.error(f"Error stopping race index rebuild: {e}")
+
+    try:
+        await delay_line.stop()
+    except Exception as e:
+        logger.error(f"Error stopping delay line: {e}")
+
+    try:
+        await broadcast_bus.stop()
+    except Exception as e:
+        logger.error(f"Error stopping broadcast bus: {e}")
     
     # Stop metrics pusher
     try:
@@ -212,6 +285,28 @@ async def lifespan(app):
     except Exception as e:
         logger.error(f"Error closing tile service: {e}")
 
+    # Close the shared geocoding HTTP client
+    try:
+        from services.geocoding_service import geocoding_service
+        await geocoding_service.close()
+    except Exception as e:
+        logger.error(f"Error closing geocoding service: {e}")
+
+    # Close the pooled XContest/HFSS client
+    try:
+        from services.xcontest_service import xcontest_service
+        await xcontest_service.close()
+    except Exception as e:
+        logger.error(f"Error closing XContest client: {e}")
+
+    # Close async database pools
+    try:
+        from database.db_replica import dispose_async_engines
+        await dispose_async_engines()
+        logger.info("Async database engines disposed")
+    except Exception as e:
+        logger.error(f"Error disposing async database engines: {e}")
+
     # Shut down the scheduler
     scheduler.shutdown()
     logger.info("Application shutdown completed")
@@ -291,6 +386,14 @@ try:
     logger.info("Async delete endpoints registered")
 except ImportError:
     logger.warning("Async delete endpoints not available")
+
+# Async persistence of live device flights
+try:
+    from api.async_persist import router as async_persist_router
+    app.include_router(async_persist_router, tags=['Async Operations'])
+    logger.info("Async persist endpoints registered")
+except ImportError:
+    logger.warning("Async persist endpoints not available")
 app.include_router(queue_admin_router, tags=['Queue Admin'])
 
 # TK905B GPS Tracker endpoint (learning mode)
@@ -471,6 +574,11 @@ async def queue_status():
             "redis_connected": True,
             "queue_stats": stats,
             "processor_stats": processor_stats,
+            "flight_state_stats": flight_state_engine.get_stats(),
+            "scoring_tile_stats": scoring_tile_store.get_stats(),
+            "race_index_stats": race_index.get_stats(),
+            "delay_line_stats": delay_line.get_stats(),
+            "broadcast_bus_stats": broadcast_bus.get_stats(),
             "timestamp": datetime.datetime.now().isoformat()
         }
     except Exception as e:
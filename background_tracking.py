@@ -7,7 +7,10 @@ import logging
 from zoneinfo import ZoneInfo
 from sqlalchemy import func  # Add this at the top with other imports
 from services.xcontest_service import xcontest_service
+from api.race_index import race_index
+from api.broadcast_bus import broadcast_bus
 from config import settings
+import json
 import jwt
 
 
@@ -23,9 +26,17 @@ async def periodic_tracking_update(interval_seconds: int = 30):
             # Wait for the specified interval
             await asyncio.sleep(interval_seconds)
 
+            # Forget races whose viewers didn't come back
+            manager.expire_vacated()
+
             # Get active races with connected clients
             active_races = list(manager.active_connections.keys())
 
+            # Let another worker take over races without viewers here
+            for name in broadcast_bus.held('track:'):
+                if name[len('track:'):] not in active_races:
+                    await broadcast_bus.resign(name)
+
             if not active_races:
                 continue
 
@@ -35,6 +46,10 @@ async def periodic_tracking_update(interval_seconds: int = 30):
                 if manager.get_active_viewers(race_id) == 0:
                     continue
 
+                # One worker computes each race's update and publishes it to all workers
+                if not await broadcast_bus.lead(f'track:{race_id}'):
+                    continue
+
                 # Get a read-only DB session from replica
                 with ReplicaSession() as db:
                     # Current server time in UTC
@@ -65,23 +80,28 @@ async def periodic_tracking_update(interval_seconds: int = 30):
                     # Get flights active today (with a small buffer before race day)
                     # Allow pilots who started slightly before race day
                     lookback_buffer = timedelta(hours=4)
-                    flights = (
-                        db.query(Flight)
-                        .filter(
-                            Flight.race_id == race_id,
-                            # Either the flight was created today
-                            ((Flight.created_at >= utc_day_start - lookback_buffer) &
-                            (Flight.created_at <= utc_day_end)) |
-                            # OR the flight has a last_fix during today (for flights spanning overnight)
-                            (func.json_extract_path_text(Flight.last_fix, 'datetime') >=
-                                utc_day_start.strftime('%Y-%m-%dT%H:%M:%SZ')) &
-                            (func.json_extract_path_text(Flight.last_fix, 'datetime') <=
-                                utc_day_end.strftime('%Y-%m-%dT%H:%M:%SZ')),
-                            Flight.source.in_(['live', 'flymaster_live', 'tk905b_live', 'digifly_live'])
+                    # Current flight per pilot from the race index; scan the flights
+                    # table only while the index is unavailable
+                    flights = await race_index.current_flights(
+                        race_id, utc_day_start - lookback_buffer, utc_day_end)
+                    if flights is None:
+                        flights = (
+                            db.query(Flight)
+                            .filter(
+                                Flight.race_id == race_id,
+                                # Either the flight was created today
+                                ((Flight.created_at >= utc_day_start - lookback_buffer) &
+                                (Flight.created_at <= utc_day_end)) |
+                                # OR the flight has a last_fix during today (for flights spanning overnight)
+                                (func.json_extract_path_text(Flight.last_fix, 'datetime') >=
+                                    utc_day_start.strftime('%Y-%m-%dT%H:%M:%SZ')) &
+                                (func.json_extract_path_text(Flight.last_fix, 'datetime') <=
+                                    utc_day_end.strftime('%Y-%m-%dT%H:%M:%SZ')),
+                                Flight.source.in_(['live', 'flymaster_live', 'tk905b_live', 'digifly_live'])
+                            )
+                            .order_by(Flight.created_at.desc())
+                            .all()
                         )
-                        .order_by(Flight.created_at.desc())
-                        .all()
-                    )
 
                     # # Further filter to only pilots who have been active in the last hour
                     # active_threshold = current_time - timedelta(minutes=60)
@@ -195,6 +215,7 @@ async def periodic_tracking_update(interval_seconds: int = 30):
                                             if primary_flight:
                                                 primary_flight.flight_state = state_info
                                                 primary_db.commit()
+                                        await race_index.record_state(flight, state_info)
 
                                         # Include the flight state info but no points
                                         flight_info["flight_state"] = "inactive"
@@ -300,8 +321,8 @@ async def periodic_tracking_update(interval_seconds: int = 30):
                     
                     # Only send update if there are valid flights with updates
                     if flight_updates:
-                        # Broadcast update to all clients for this race
-                        await manager.send_update(race_id, flight_updates)
+                        # Broadcast update to all clients for this race, in every worker
+                        await broadcast_bus.publish('track', race_id, json.dumps(flight_updates).encode('utf-8'))
 
         except Exception as e:
             logger.error(f"Error in periodic tracking update: {str(e)}")
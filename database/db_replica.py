@@ -2,7 +2,7 @@ from config import settings
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool, QueuePool
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
 import logging
 import time
 import os
@@ -342,4 +342,145 @@ def get_replica_health():
     }
 
 # Backward compatibility - export Session for read operations that should use replica
-Session = ReplicaSession
\ No newline at end of file
+Session = ReplicaSession
+
+# ============== Async engines ==============
+# Async sessions let async route handlers wait on Postgres without blocking the event loop.
+# Same primary/replica routing as the sync sessions above, on the asyncpg driver.
+
+def to_async_uri(database_uri):
+    """Rewrite a postgresql:// URI for asyncpg; libpq-only query options are moved to connect args"""
+    from sqlalchemy.engine import make_url
+
+    url = make_url(database_uri).set(drivername='postgresql+asyncpg')
+    query = dict(url.query)
+    connect_args = {}
+
+    sslmode = query.pop('sslmode', None)
+    if sslmode and sslmode != 'disable':
+        connect_args['ssl'] = sslmode if sslmode in ('require', 'verify-ca', 'verify-full') else True
+    for libpq_only in ('channel_binding', 'connect_timeout', 'options', 'application_name'):
+        query.pop(libpq_only, None)
+
+    return url.set(query=query), connect_args
+
+
+def create_async_db_engine(database_uri, pool_size_override=None, max_overflow_override=None):
+    """Create an async engine mirroring create_db_engine's pool configuration"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url, connect_args = to_async_uri(database_uri)
+    connect_args['timeout'] = 10
+
+    if is_neon and '-pooler' in database_uri:
+        # PgBouncer transaction mode - prepared statements cannot be reused
+        connect_args['statement_cache_size'] = 0
+        connect_args['prepared_statement_cache_size'] = 0
+
+    if is_neon and '-pooler' not in database_uri:
+        return create_async_engine(url, poolclass=NullPool, pool_pre_ping=True,
+                                   echo=False, connect_args=connect_args)
+
+    return create_async_engine(
+        url,
+        pool_size=pool_size_override or 50,
+        max_overflow=max_overflow_override or 50,
+        pool_pre_ping=True,
+        pool_recycle=300,
+        pool_timeout=30,
+        pool_use_lifo=True,
+        echo=False,
+        connect_args=connect_args
+    )
+
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async_primary_engine = create_async_db_engine(primary_database_uri, pool_size_override=40, max_overflow_override=40)
+    async_replica_engine = (async_primary_engine if replica_database_uri == primary_database_uri
+                            else create_async_db_engine(replica_database_uri, pool_size_override=50, max_overflow_override=50))
+
+    AsyncPrimarySession = sessionmaker(bind=async_primary_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+    AsyncReplicaSession = sessionmaker(bind=async_replica_engine, class_=AsyncSession,
+                                       autoflush=False, expire_on_commit=False)
+    async_available = True
+except ImportError as e:
+    # asyncpg not installed - only the sync sessions are usable
+    logger.warning(f"Async database engines unavailable: {e}")
+    async_primary_engine = async_replica_engine = None
+    AsyncPrimarySession = AsyncReplicaSession = None
+    async_available = False
+
+
+async def get_async_db():
+    """Get async primary database session for write operations"""
+    if not async_available:
+        raise RuntimeError("Async database engine unavailable - install asyncpg")
+    async with AsyncPrimarySession() as session:
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+
+
+async def get_async_replica_db():
+    """
+    Get async read session - replica when healthy, primary otherwise.
+    Shares replica_health_status with get_read_db_with_fallback, so a failing replica
+    is skipped for 30 seconds before being retried.
+    """
+    from datetime import datetime, timedelta
+    from sqlalchemy.exc import OperationalError, DBAPIError, DisconnectionError
+
+    if not async_available:
+        raise RuntimeError("Async database engine unavailable - install asyncpg")
+
+    use_replica = async_replica_engine is not async_primary_engine
+    if use_replica and not replica_health_status['healthy'] and replica_health_status['last_check']:
+        if datetime.now() - replica_health_status['last_check'] < timedelta(seconds=30):
+            use_replica = False
+
+    session = None
+    if use_replica:
+        session = AsyncReplicaSession()
+        try:
+            # Check out the connection before handing the session to the route
+            await session.connection()
+            if not replica_health_status['healthy']:
+                logger.info(f"Replica recovered after {replica_health_status['consecutive_failures']} failures")
+                replica_health_status['healthy'] = True
+                replica_health_status['consecutive_failures'] = 0
+                replica_health_status['last_error'] = None
+        except (OperationalError, DBAPIError, DisconnectionError, OSError) as e:
+            await session.close()
+            session = None
+            replica_health_status['healthy'] = False
+            replica_health_status['consecutive_failures'] += 1
+            replica_health_status['last_check'] = datetime.now()
+            replica_health_status['last_error'] = str(e)[:200]
+            logger.warning(f"Async replica failed (consecutive failures: {replica_health_status['consecutive_failures']}), using primary")
+
+    if session is None:
+        session = AsyncPrimarySession()
+
+    try:
+        yield session
+    finally:
+        # Read-only - nothing to commit
+        await session.close()
+
+
+# Async context manager for code outside FastAPI dependencies (websockets, background tasks)
+async_replica_db_context = asynccontextmanager(get_async_replica_db)
+
+
+async def dispose_async_engines():
+    """Close pooled async connections on shutdown"""
+    if async_primary_engine is not None:
+        await async_primary_engine.dispose()
+    if async_replica_engine is not None and async_replica_engine is not async_primary_engine:
+        await async_replica_engine.dispose()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, MetaData, CHAR, BigInteger, Index, Integer, JSON, ForeignKey, UniqueConstraint, text, Boolean
+from sqlalchemy import Column, String, Float, DateTime, MetaData, CHAR, BigInteger, Index, Integer, JSON, ForeignKey, UniqueConstraint, text, Boolean, LargeBinary
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
@@ -227,6 +227,77 @@ class ScoringTracks(Base):
         return f"<ScoringTrack(datetime={self.date_time}, lat={self.lat}, lon={self.lon})>"
 
 
+class FlightStats(Base):
+    """Track statistics of a live/uploaded flight, extended by every committed batch (api/flight_stats.py)"""
+    __tablename__ = 'flight_stats'
+
+    flight_uuid = Column(UUID(as_uuid=True), ForeignKey(
+        'flights.id', ondelete='CASCADE'), primary_key=True, nullable=False)
+    point_count = Column(Integer, nullable=False, default=0)
+    start_time = Column(DateTime(timezone=True), nullable=True)
+    end_time = Column(DateTime(timezone=True), nullable=True)
+    distance = Column(Float(precision=53), nullable=False, default=0)      # meters along the track
+    max_speed = Column(Float(precision=53), nullable=False, default=0)     # m/s between consecutive fixes
+    min_elevation = Column(Float(precision=53), nullable=True)
+    max_elevation = Column(Float(precision=53), nullable=True)
+    elevation_gain = Column(Float(precision=53), nullable=False, default=0)
+    elevation_loss = Column(Float(precision=53), nullable=False, default=0)
+    # Newest fix, so the next batch continues the sums from it
+    last_lat = Column(Float(precision=53), nullable=True)
+    last_lon = Column(Float(precision=53), nullable=True)
+    last_elevation = Column(Float(precision=53), nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False,
+                        default=lambda: datetime.now(timezone.utc))
+
+
+class ScoringTileFlight(Base):
+    """Build manifest for a flight's precomputed scoring tiles"""
+    __tablename__ = 'scoring_tile_flights'
+
+    flight_uuid = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    # Point bounds - tiles outside them are empty without a lookup
+    min_lat = Column(Float(precision=53), nullable=False)
+    min_lon = Column(Float(precision=53), nullable=False)
+    max_lat = Column(Float(precision=53), nullable=False)
+    max_lon = Column(Float(precision=53), nullable=False)
+    point_count = Column(Integer, nullable=False)
+    max_zoom = Column(Integer, nullable=False)
+    tile_count = Column(Integer, nullable=False)
+    built_at = Column(DateTime(timezone=True), nullable=False,
+                      default=lambda: datetime.now(timezone.utc))
+
+
+class ScoringTileBuild(Base):
+    """Flights whose scoring tiles need a (re)build, shared by every worker's builder"""
+    __tablename__ = 'scoring_tile_builds'
+
+    flight_uuid = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    # Last batch of the flight; built once no batch came for the build delay
+    requested_at = Column(DateTime(timezone=True), nullable=False,
+                          default=lambda: datetime.now(timezone.utc))
+    # Set by the worker building it, cleared when the flight is invalidated again
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class ScoringTile(Base):
+    """Per-flight MVT for the scoring tracks tile endpoint (empty bytes for empty tiles)"""
+    __tablename__ = 'scoring_tiles'
+
+    flight_uuid = Column(UUID(as_uuid=True), primary_key=True, nullable=False)
+    z = Column(Integer, primary_key=True, nullable=False)
+    x = Column(Integer, primary_key=True, nullable=False)
+    y = Column(Integer, primary_key=True, nullable=False)
+    mvt = Column(LargeBinary, nullable=False)
+    etag = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False,
+                        default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Multi-flight requests look up one tile for many flights
+        Index('idx_scoring_tiles_zxy', 'z', 'x', 'y'),
+    )
+
+
 # Flymaster table removed - data now goes directly to live_track_points
 # Flymaster devices are tracked through the flights table with source='flymaster'
 
@@ -0,0 +1,208 @@
+"""
+Retention and bulk deletion of track points
+The point tables are TimescaleDB hypertables with 1-day chunks (see README). Expired 'live'
+flights are deleted with their points, each flight's points in bounded batches committed on
+their own and limited to the flight's time range so only the chunks it spans are touched.
+Flight rows are deleted last with a plain DELETE: the ORM relationship cascade would load
+every point first, and the database's ON DELETE CASCADE has next to nothing left to do by then.
+Expired live points are removed by dropping whole chunks (drop_chunks), a catalog operation
+instead of millions of row deletes. A chunk holds the points of every live source, so the
+device flights it would take along are persisted as uploads first (api/async_persist.py);
+if any of them can't be, the run falls back to deleting the 'live' flights row by row.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+
+from sqlalchemy import delete, or_, select, text
+from sqlalchemy.orm import Session
+
+from database.models import Flight, LiveTrackPoint, UploadedTrackPoint
+
+logger = logging.getLogger(__name__)
+
+# Live points older than this are dropped, a chunk (day) at a time
+LIVE_RETENTION_DAYS = int(os.getenv('LIVE_RETENTION_DAYS', '5'))
+# Rows per delete transaction, small enough not to stall live ingest
+DELETE_BATCH_SIZE = int(os.getenv('DELETE_BATCH_SIZE', '5000'))
+FLIGHT_DELETE_BATCH_SIZE = int(os.getenv('FLIGHT_DELETE_BATCH_SIZE', '200'))
+# Expire live points by dropping whole chunks, after persisting the device live flights
+# ('flymaster_live', 'tk905b_live', ...) whose points they hold; false deletes only the
+# 'live' flights row by row and keeps device flights
+LIVE_RETENTION_DROP_CHUNKS = os.getenv('LIVE_RETENTION_DROP_CHUNKS', 'true').lower() in ('1', 'true', 'yes')
+
+# Points can be stored slightly outside a flight's first and last fix
+RANGE_MARGIN = timedelta(hours=1)
+
+POINT_TABLES = (LiveTrackPoint.__tablename__, UploadedTrackPoint.__tablename__)
+
+# Flights whose points are stored in live_track_points: 'live' and the device sources
+LIVE_SOURCE = or_(Flight.source == 'live', Flight.source.like('%\\_live'))
+
+
+def _point_table(table: str) -> str:
+    if table not in POINT_TABLES:
+        raise ValueError(f"Not a track point table: {table}")
+    return table
+
+
+def drop_expired_chunks(db: Session, table: str, older_than: datetime) -> Dict:
+    """
+    Remove the points of table older than older_than: drop the chunks that end before it,
+    or delete in batches when the table isn't a hypertable
+    """
+    table = _point_table(table)
+    try:
+        chunks = db.execute(text("SELECT drop_chunks(CAST(:table AS regclass), older_than => :older_than)"),
+                            {'table': table, 'older_than': older_than}).scalars().all()
+        db.commit()
+        return {'method': 'drop_chunks', 'chunks': len(chunks)}
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"drop_chunks unavailable on {table}, deleting in batches: {e}")
+    return {'method': 'delete', 'rows': delete_points_before(db, table, older_than)}
+
+
+def delete_points_before(db: Session, table: str, older_than: datetime,
+                         batch_size: int = DELETE_BATCH_SIZE) -> int:
+    """Delete the points of table older than older_than in committed batches"""
+    table = _point_table(table)
+    statement = text(f"""
+        DELETE FROM {table} WHERE (datetime, id) IN (
+            SELECT datetime, id FROM {table} WHERE datetime < :older_than LIMIT :batch_size)
+    """)
+    total = 0
+    while True:
+        deleted = db.execute(statement, {'older_than': older_than, 'batch_size': batch_size}).rowcount
+        db.commit()
+        total += deleted
+        if deleted < batch_size:
+            return total
+
+
+def _fix_time(fix) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(fix['datetime'].replace('Z', '+00:00'))
+    except (TypeError, KeyError, AttributeError, ValueError):
+        return None
+
+
+def flight_time_range(flight: Flight) -> Optional[Tuple[datetime, datetime]]:
+    """Time range holding a flight's points, from its first and last fix"""
+    start, end = _fix_time(flight.first_fix), _fix_time(flight.last_fix)
+    if start is None or end is None:
+        return None
+    return min(start, end) - RANGE_MARGIN, max(start, end) + RANGE_MARGIN
+
+
+def iter_delete_flight_points(db: Session, flight: Flight, batch_size: int = DELETE_BATCH_SIZE) -> Iterator[int]:
+    """
+    Delete a flight's points in committed batches, yielding the number deleted so far after
+    each batch. Points outside the flight's fix range are left to the flight row's cascade.
+    """
+    table = LiveTrackPoint.__tablename__ if 'live' in flight.source else UploadedTrackPoint.__tablename__
+    conditions = ["flight_uuid = :flight_uuid"]
+    params = {'flight_uuid': flight.id, 'batch_size': batch_size}
+    time_range = flight_time_range(flight)
+    if time_range:
+        conditions.append("datetime BETWEEN :start AND :end")
+        params['start'], params['end'] = time_range
+    statement = text(f"""
+        DELETE FROM {table} WHERE (datetime, id) IN (
+            SELECT datetime, id FROM {table} WHERE {' AND '.join(conditions)} LIMIT :batch_size)
+    """)
+    total = 0
+    while True:
+        deleted = db.execute(statement, params).rowcount
+        db.commit()
+        total += deleted
+        yield total
+        if deleted < batch_size:
+            return
+
+
+def delete_flight_row(db: Session, flight_uuid) -> None:
+    """Delete a flight row without the ORM loading its points; the caller commits"""
+    db.execute(delete(Flight).where(Flight.id == flight_uuid))
+
+
+def delete_flights_where(db: Session, *criteria, batch_size: int = FLIGHT_DELETE_BATCH_SIZE) -> int:
+    """Delete the flight rows matching criteria, batch_size rows per transaction"""
+    total = 0
+    while True:
+        ids = db.execute(select(Flight.id).where(*criteria).limit(batch_size)).scalars().all()
+        if not ids:
+            return total
+        db.execute(delete(Flight).where(Flight.id.in_(ids)))
+        db.commit()
+        total += len(ids)
+
+
+def delete_flights_with_points(db: Session, *criteria, batch_size: int = FLIGHT_DELETE_BATCH_SIZE) -> Dict:
+    """Delete the flights matching criteria, each one's points in committed batches first"""
+    flights = points = 0
+    while True:
+        batch = db.execute(select(Flight).where(*criteria).limit(batch_size)).scalars().all()
+        if not batch:
+            return {'flights': flights, 'points': points}
+        for flight in batch:
+            flight_uuid = flight.id
+            for deleted in iter_delete_flight_points(db, flight):
+                pass
+            delete_flight_row(db, flight_uuid)
+            db.commit()
+            flights += 1
+            points += deleted
+
+
+def persist_expiring_flights(db: Session, older_than: datetime) -> Dict:
+    """
+    Persist as uploads the device live flights created before older_than that have no upload
+    copy yet, each in its own transaction. 'failed' counts the flights that could not be copied.
+    """
+    from api.async_persist import persist_flight, persistable
+
+    flights = [flight for flight in db.execute(select(Flight).where(
+        LIVE_SOURCE, Flight.source != 'live', Flight.created_at < older_than
+    ).order_by(Flight.created_at)).scalars().all() if persistable(flight)]
+    copied = set(db.execute(select(Flight.flight_id).where(
+        Flight.flight_id.in_([f"{flight.flight_id}-upload" for flight in flights]),
+        Flight.source.like('%upload')
+    )).scalars().all()) if flights else set()
+
+    counts = {'persisted': 0, 'already_persisted': 0, 'empty': 0, 'failed': 0}
+    for flight in flights:
+        if f"{flight.flight_id}-upload" in copied:
+            counts['already_persisted'] += 1
+            continue
+        try:
+            counts['persisted' if persist_flight(db, flight) else 'empty'] += 1
+        except Exception as e:
+            db.rollback()
+            counts['failed'] += 1
+            logger.error(f"Could not persist live flight {flight.flight_id} before expiry: {e}")
+    return counts
+
+
+def expire_live_data(db: Session, older_than: datetime, drop_chunks: bool = LIVE_RETENTION_DROP_CHUNKS) -> Dict:
+    """
+    Expire the live tracking data created before older_than. With drop_chunks the device live
+    flights are persisted as uploads, then the expired chunks of live_track_points are dropped
+    and the flight rows of every live source go with them, so no flight outlives its points
+    with stale fixes and totals. Without (or when a device flight could not be persisted) only
+    'live' flights and their points are deleted; device live flights are left alone.
+    """
+    persisted = None
+    if drop_chunks:
+        persisted = persist_expiring_flights(db, older_than)
+        if not persisted['failed']:
+            expired = drop_expired_chunks(db, LiveTrackPoint.__tablename__, older_than)
+            expired['flights'] = delete_flights_where(db, LIVE_SOURCE, Flight.created_at < older_than)
+            return {**expired, 'persisted': persisted}
+        logger.error(f"Keeping the expired live chunks, {persisted['failed']} device flights were not persisted")
+
+    expired = {'method': 'flights', **delete_flights_with_points(db, Flight.source == 'live', Flight.created_at < older_than)}
+    if persisted:
+        expired['persisted'] = persisted
+    return expired
@@ -1,11 +1,13 @@
 from datetime import datetime, timezone, timedelta
+import asyncio
 import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from sqlalchemy import and_, delete
+from sqlalchemy import and_
 from sqlalchemy.exc import SQLAlchemyError
 from database.db_replica import PrimarySession as Session  # Use primary for deletes
 from database.models import Flight
+from database.retention import LIVE_RETENTION_DAYS, expire_live_data
 from config import settings
 
 # Set up logging
@@ -62,37 +64,22 @@ async def auto_close_inactive_flights():
 
 async def cleanup_old_flights():
     """
-    Delete all live flight tracking data that is older than 5 days.
+    Delete all live flight tracking data that is older than LIVE_RETENTION_DAYS (5 days).
+    Device live flights are persisted as uploads, then the expired chunks are dropped
+    (database/retention.py); with LIVE_RETENTION_DROP_CHUNKS=false old 'live' flights are
+    deleted with their points in small batches instead.
     This task runs at midnight every night.
     """
     try:
         logger.info("Starting cleanup of old live flight data")
 
-        # Calculate the cutoff time (5 days ago)
-        cutoff_time = datetime.now(timezone.utc) - timedelta(days=5)
+        # Calculate the cutoff time
+        cutoff_time = datetime.now(timezone.utc) - timedelta(days=LIVE_RETENTION_DAYS)
 
-        # Create a new database session
-        with Session() as db:
-            # Count records to be deleted for logging
-            count_query = db.query(Flight).filter(
-                and_(
-                    Flight.source == 'live',
-                    Flight.created_at < cutoff_time
-                )
-            ).count()
-
-            # Delete records older than 5 days
-            delete_stmt = delete(Flight).where(
-                and_(
-                    Flight.source == 'live',
-                    Flight.created_at < cutoff_time
-                )
-            )
-
-            result = db.execute(delete_stmt)
-            db.commit()
-
-            logger.info(f"Deleted {count_query} old live flight records")
+        # The scheduler runs jobs on the event loop: keep the synchronous copies and
+        # deletes in a thread
+        expired = await asyncio.to_thread(_expire_live_data, cutoff_time)
+        logger.info(f"Expired live data older than {cutoff_time}: {expired}")
 
     except SQLAlchemyError as e:
         logger.error(f"Database error during flight cleanup: {str(e)}")
@@ -100,6 +87,11 @@ async def cleanup_old_flights():
         logger.error(f"Unexpected error during flight cleanup: {str(e)}")
 
 
+def _expire_live_data(cutoff_time: datetime) -> dict:
+    with Session() as db:
+        return expire_live_data(db, cutoff_time)
+
+
 def setup_scheduler():
     """
     Set up the APScheduler to run cleanup and auto-close tasks.
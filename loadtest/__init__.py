@@ -0,0 +1,5 @@
+"""
+End-to-end load testing for the ingest pipeline
+Replays recorded or synthetic device traces through the TCP server and
+/tracking/live, and measures delivery through Redis, Postgres and the websocket.
+"""
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Storage and read latency of a track point hypertable before and after compression
+
+Measures the table's size and the per-flight reads the API runs on it (whole track in
+time order, newest points, count/time range version), including shared buffer hits and
+reads, then compresses the chunks the policy would (sql/compression_policies.sql, which
+must have been applied) and measures again. Compression rewrites chunks: run it against
+a restored copy of the database, not production.
+
+Usage:
+    python -m loadtest.compression --database-url $DATABASE_URL --table uploaded_track_points \\
+        --flights 50 --repeat 5 --output compression_report.json
+    python -m loadtest.compression ... --no-compress    # measure the current state only
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+# Add parent directory to path so imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from loadtest.metrics import LatencyRecorder
+
+# Time column, elevation column and policy compress_after of each hypertable
+TABLES = {
+    'live_track_points': ('datetime', 'elevation', '2 days'),
+    'uploaded_track_points': ('datetime', 'elevation', '7 days'),
+    'scoring_tracks': ('date_time', 'gps_alt', '7 days')
+}
+
+
+def read_queries(table: str) -> Dict[str, str]:
+    time_column, elevation_column, _ = TABLES[table]
+    return {
+        'flight_points': f"SELECT {time_column}, lat, lon, {elevation_column} FROM {table} "
+                         f"WHERE flight_uuid = CAST(:flight_uuid AS uuid) ORDER BY {time_column}",
+        'recent_points': f"SELECT {time_column}, lat, lon, {elevation_column} FROM {table} "
+                         f"WHERE flight_uuid = CAST(:flight_uuid AS uuid) ORDER BY {time_column} DESC LIMIT 50",
+        'flight_version': f"SELECT count(*), min({time_column}), max({time_column}) FROM {table} "
+                          f"WHERE flight_uuid = CAST(:flight_uuid AS uuid)"
+    }
+
+
+def sample_flights(conn, table: str, count: int, seed: int) -> List[str]:
+    """Flights with points in chunks old enough to be compressed"""
+    time_column, _, compress_after = TABLES[table]
+    rows = conn.execute(text(f"""
+        SELECT DISTINCT flight_uuid FROM (
+            SELECT flight_uuid FROM {table}
+            WHERE {time_column} < now() - CAST(:compress_after AS interval)
+            LIMIT 200000
+        ) recent
+    """), {'compress_after': compress_after}).scalars().all()
+    flights = sorted(str(flight_uuid) for flight_uuid in rows)
+    random.Random(seed).shuffle(flights)
+    return flights[:count]
+
+
+def table_size(conn, table: str) -> Dict[str, Any]:
+    size = {'total_bytes': conn.execute(text("SELECT hypertable_size(CAST(:table AS regclass))"),
+                                        {'table': table}).scalar()}
+    stats = conn.execute(text("SELECT * FROM hypertable_compression_stats(CAST(:table AS regclass))"),
+                         {'table': table}).mappings().first()
+    if stats:
+        size.update({key: stats[key] for key in ('total_chunks', 'number_compressed_chunks',
+                                                  'before_compression_total_bytes',
+                                                  'after_compression_total_bytes')})
+    return size
+
+
+def buffers(conn, sql: str, flight_uuid: str) -> Dict[str, int]:
+    """Shared buffer hits and reads of one execution"""
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}"),
+                        {'flight_uuid': flight_uuid}).scalar()
+    top = (plan if isinstance(plan, list) else json.loads(plan))[0]['Plan']
+    return {'shared_hit': top.get('Shared Hit Blocks', 0), 'shared_read': top.get('Shared Read Blocks', 0)}
+
+
+def measure(conn, table: str, flights: List[str], repeat: int) -> Dict[str, Any]:
+    recorder = LatencyRecorder()
+    blocks: Dict[str, Dict[str, int]] = {}
+    for name, sql in read_queries(table).items():
+        statement = text(sql)
+        totals = {'shared_hit': 0, 'shared_read': 0}
+        for flight_uuid in flights:
+            for key, value in buffers(conn, sql, flight_uuid).items():
+                totals[key] += value
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(statement, {'flight_uuid': flight_uuid}).fetchall()
+                recorder.add(name, time.perf_counter() - started)
+        blocks[name] = totals
+    return {'size': table_size(conn, table), 'latency': recorder.summary(), 'buffers': blocks}
+
+
+def compress(conn, table: str) -> Dict[str, Any]:
+    _, _, compress_after = TABLES[table]
+    enabled = conn.execute(text("""
+        SELECT count(*) FROM timescaledb_information.compression_settings WHERE hypertable_name = :table
+    """), {'table': table}).scalar()
+    if not enabled:
+        raise SystemExit(f"Compression is not enabled on {table}: apply sql/compression_policies.sql first")
+    started = time.perf_counter()
+    chunks = conn.execute(text("""
+        SELECT compress_chunk(c, if_not_compressed => true)
+        FROM show_chunks(CAST(:table AS regclass), older_than => CAST(:compress_after AS interval)) c
+    """), {'table': table, 'compress_after': compress_after}).scalars().all()
+    conn.execute(text(f"ANALYZE {table}"))
+    return {'chunks': len(chunks), 'elapsed_s': round(time.perf_counter() - started, 3)}
+
+
+def ratio(after, before):
+    return round(after / before, 3) if after is not None and before else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Track point hypertable size and reads before/after compression')
+    parser.add_argument('--database-url', default=os.getenv('LOADTEST_DATABASE_URL'),
+                        help='postgresql:// URL (default: $LOADTEST_DATABASE_URL)')
+    parser.add_argument('--table', choices=sorted(TABLES), default='uploaded_track_points')
+    parser.add_argument('--flights', type=int, default=50, help='Sampled flights')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed executions per flight and query')
+    parser.add_argument('--seed', type=int, default=1, help='Flight sample seed')
+    parser.add_argument('--no-compress', action='store_true', help='Only measure the current state')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error('--database-url or LOADTEST_DATABASE_URL is required')
+
+    engine = create_engine(args.database_url)
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        flights = sample_flights(conn, args.table, args.flights, args.seed)
+        if not flights:
+            raise SystemExit(f"No flights in {args.table} old enough to be compressed")
+
+        report = {
+            'config': {'table': args.table, 'flights': len(flights), 'repeat': args.repeat, 'seed': args.seed},
+            'before': measure(conn, args.table, flights, args.repeat)
+        }
+        if not args.no_compress:
+            report['compression'] = compress(conn, args.table)
+            report['after'] = measure(conn, args.table, flights, args.repeat)
+            before, after = report['before'], report['after']
+            report['change'] = {
+                'total_bytes': ratio(after['size']['total_bytes'], before['size']['total_bytes']),
+                **{f'{name}_p50': ratio(after['latency'][name].get('p50_ms'), stats.get('p50_ms'))
+                   for name, stats in before['latency'].items()},
+                **{f'{name}_buffers': ratio(sum(after['buffers'][name].values()), sum(blocks.values()))
+                   for name, blocks in before['buffers'].items()}
+            }
+    engine.dispose()
+
+    output = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
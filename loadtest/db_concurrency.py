@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Event-loop concurrency benchmark for database access from async handlers
+
+Runs a mix of slow (pg_sleep) and fast (SELECT 1) queries concurrently on one event
+loop, the way FastAPI serves them, and reports p50/p95/p99 latency of each kind:
+- sync: blocking Session calls inside coroutines (how `async def` routes used get_db)
+- async: AsyncSession on asyncpg (database.db_replica.get_async_db)
+A ticker coroutine measures event loop stalls; with sync access every slow query
+blocks all other requests, so fast-query tail latency tracks the slow query time.
+
+Usage:
+    python -m loadtest.db_concurrency --database-url $DATABASE_URL --requests 400 \\
+        --slow-ratio 0.1 --slow-seconds 0.2 --concurrency 50 --output db_report.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict
+
+# Add parent directory to path so imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from loadtest.metrics import LatencyRecorder
+
+FAST_SQL = text("SELECT 1")
+SLOW_SQL = text("SELECT pg_sleep(:seconds)")
+
+
+def async_url(database_url: str):
+    url = make_url(database_url)
+    # asyncpg takes ssl instead of the libpq sslmode parameter
+    query = {k: v for k, v in url.query.items() if k != 'sslmode'}
+    return url.set(drivername='postgresql+asyncpg', query=query)
+
+
+def build_workload(args):
+    rng = random.Random(args.seed)
+    return ['slow' if rng.random() < args.slow_ratio else 'fast' for _ in range(args.requests)]
+
+
+async def ticker(recorder: LatencyRecorder, stop: asyncio.Event, interval: float = 0.01):
+    """Record how late the loop wakes a 10 ms sleeper"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        recorder.add('loop_lag', max(0.0, time.perf_counter() - started - interval))
+
+
+async def run_mode(mode: str, args, workload) -> Dict[str, Any]:
+    recorder = LatencyRecorder()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    if mode == 'sync':
+        engine = create_engine(args.database_url, pool_size=args.concurrency, max_overflow=0)
+        Session = sessionmaker(bind=engine)
+
+        async def execute(statement, params):
+            db = Session()
+            try:
+                db.execute(statement, params).fetchall()
+            finally:
+                db.close()
+    else:
+        engine = create_async_engine(async_url(args.database_url), pool_size=args.concurrency,
+                                     max_overflow=0)
+        Session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+        async def execute(statement, params):
+            async with Session() as db:
+                (await db.execute(statement, params)).fetchall()
+
+    async def request(kind: str):
+        async with semaphore:
+            started = time.perf_counter()
+            if kind == 'slow':
+                await execute(SLOW_SQL, {'seconds': args.slow_seconds})
+            else:
+                await execute(FAST_SQL, {})
+            recorder.add(kind, time.perf_counter() - started)
+
+    # Warm the pool so connection setup is not measured
+    await asyncio.gather(*(execute(FAST_SQL, {}) for _ in range(args.concurrency)))
+
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(recorder, stop))
+    started = time.perf_counter()
+    await asyncio.gather(*(request(kind) for kind in workload))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+
+    if mode == 'sync':
+        engine.dispose()
+    else:
+        await engine.dispose()
+
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'requests_per_s': round(len(workload) / elapsed, 1) if elapsed else None,
+        'latency': recorder.summary()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async database access under mixed load')
+    parser.add_argument('--database-url', default=os.getenv('LOADTEST_DATABASE_URL'),
+                        help='postgresql:// URL (default: $LOADTEST_DATABASE_URL)')
+    parser.add_argument('--requests', type=int, default=400, help='Queries per mode')
+    parser.add_argument('--slow-ratio', type=float, default=0.1, help='Share of slow queries')
+    parser.add_argument('--slow-seconds', type=float, default=0.2, help='pg_sleep per slow query')
+    parser.add_argument('--concurrency', type=int, default=50, help='In-flight queries / pool size')
+    parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    parser.add_argument('--seed', type=int, default=1, help='Workload seed')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    args = parser.parse_args()
+
+    if not args.database_url:
+        parser.error('--database-url or LOADTEST_DATABASE_URL is required')
+
+    workload = build_workload(args)
+    modes = ['sync', 'async'] if args.mode == 'both' else [args.mode]
+    report = {
+        'config': {k: getattr(args, k) for k in ('requests', 'slow_ratio', 'slow_seconds',
+                                                 'concurrency', 'seed')},
+        'modes': {mode: asyncio.run(run_mode(mode, args, workload)) for mode in modes}
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Latency recording and regression comparison for load test reports
+"""
+import math
+from typing import Any, Dict, List, Optional
+
+
+class LatencyRecorder:
+    """Collects latency samples (seconds) per pipeline stage"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Percentiles in milliseconds for every stage"""
+        return {stage: summarize(values) for stage, values in sorted(self.samples.items())}
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    """Count, mean and p50/p95/p99/max of second samples, reported in ms"""
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+
+    def ms(value):
+        return round(value * 1000.0, 2)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': ms(sum(ordered) / len(ordered)),
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1])
+    }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    tolerance: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Compare latency percentiles, durations and throughput of two reports.
+    Returns one row per metric; rows flagged 'regressed' exceed the tolerance.
+    """
+    rows = []
+
+    for stage, stats in current.get('latency', {}).items():
+        base_stats = baseline.get('latency', {}).get(stage)
+        if not base_stats:
+            continue
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = base_stats.get(key), stats.get(key)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old if old else 0.0
+            rows.append({'metric': f'latency.{stage}.{key}', 'baseline': old, 'current': new,
+                         'change': round(change, 4), 'regressed': change > tolerance})
+
+    for key, new in current.get('duration', {}).items():
+        old = baseline.get('duration', {}).get(key)
+        if not isinstance(new, (int, float)) or not old:
+            continue
+        change = (new - old) / old
+        # Taking longer is the regression
+        rows.append({'metric': f'duration.{key}', 'baseline': old, 'current': new,
+                     'change': round(change, 4), 'regressed': change > tolerance})
+
+    for key, new in current.get('throughput', {}).items():
+        old = baseline.get('throughput', {}).get(key)
+        # Version 1 reports kept the durations here
+        if not isinstance(new, (int, float)) or not old or key.endswith('_seconds'):
+            continue
+        change = (new - old) / old
+        # Lower throughput is the regression
+        rows.append({'metric': f'throughput.{key}', 'baseline': old, 'current': new,
+                     'change': round(change, 4), 'regressed': change < -tolerance})
+
+    return rows
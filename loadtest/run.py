@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Reproducible end-to-end load test for the ingest pipeline
+
+Drives N simulated devices over TCP and N phones over HTTP /tracking/live, plus
+websocket viewers on /tracking/ws/track/{race_id}, and measures for every fix:
+- tcp_ack / http_ack: frame or request sent -> acknowledged by the server
+- commit: fix sent -> row committed in Postgres (flights.total_points, maintained by triggers)
+- queue_lag: /tracking/live acknowledged (queued in Redis) -> row committed
+- websocket: fix sent -> delivered to a viewer in a track_update message
+The report is JSON so runs can be diffed against a baseline (--compare).
+
+Usage:
+    python -m loadtest.run --api http://localhost:8000 --http-devices 200 --duration 120 \\
+        --viewers 20 --database-url $DATABASE_URL --redis-url redis://localhost:6379/0 \\
+        --output report.json
+    python -m loadtest.run --raw-archive logs/raw_archive --tcp localhost:9090 --speed 5
+    python -m loadtest.run ... --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+# Add parent directory to path so imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+import jwt
+
+from loadtest.metrics import LatencyRecorder, compare_reports
+from loadtest.traces import (fix_datetime, load_trace, save_trace, split_by_device,
+                             synthetic_trace, tcp_device_id, trace_from_raw_archive,
+                             watch_frame)
+
+logger = logging.getLogger(__name__)
+
+REPORT_VERSION = 2
+
+
+def coord_key(lat: float, lon: float) -> tuple:
+    """Key used to match fixes coming back from the websocket"""
+    return (round(float(lat), 6), round(float(lon), 6))
+
+
+class LoadTestRun:
+    """State shared by all simulated clients of one run"""
+
+    def __init__(self, args):
+        self.args = args
+        self.latency = LatencyRecorder()
+        self.counters = {
+            'fixes_sent': 0,
+            'tcp_frames_sent': 0,
+            'http_requests': 0,
+            'http_errors': 0,
+            'tcp_errors': 0,
+            'ws_messages': 0,
+            'ws_fixes_delivered': 0,
+            'ws_errors': 0,
+            'committed': 0
+        }
+        self.queue_depths: List[int] = []
+        # Per device send/ack times in send order, used to attribute commits
+        self.sent_times: Dict[str, List[float]] = {}
+        self.ack_times: Dict[str, List[Optional[float]]] = {}
+        self.committed: Dict[str, int] = {}
+        # Coordinate -> send time, to match websocket deliveries
+        self.sent_by_coord: Dict[tuple, float] = {}
+        self.base_time = datetime.now(timezone.utc)
+        self.start = None
+        self.finished = asyncio.Event()
+
+    def record_sent(self, device: str, fixes: List[Dict[str, Any]], sent_at: float):
+        times = self.sent_times.setdefault(device, [])
+        acks = self.ack_times.setdefault(device, [])
+        for fix in fixes:
+            times.append(sent_at)
+            acks.append(None)
+            self.sent_by_coord[coord_key(fix['lat'], fix['lon'])] = sent_at
+        self.counters['fixes_sent'] += len(fixes)
+
+    def record_ack(self, device: str, count: int, acked_at: float):
+        acks = self.ack_times[device]
+        for i in range(len(acks) - count, len(acks)):
+            acks[i] = acked_at
+
+    def record_committed(self, device: str, total: int, seen_at: float):
+        """Attribute newly committed rows to the oldest uncommitted fixes of a device"""
+        previous = self.committed.get(device, 0)
+        sent = self.sent_times.get(device, [])
+        total = min(total, len(sent))
+        for i in range(previous, total):
+            self.latency.add('commit', seen_at - sent[i])
+            acked = self.ack_times[device][i]
+            if acked is not None:
+                self.latency.add('queue_lag', seen_at - acked)
+        if total > previous:
+            self.counters['committed'] += total - previous
+            self.committed[device] = total
+
+    async def sleep_until(self, offset: float):
+        """Sleep until a trace offset, scaled by --speed"""
+        if self.args.speed <= 0:
+            return
+        delay = self.start + offset / self.args.speed - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def make_pilot_token(args, device: str) -> str:
+    """Pilot token with the same payload /tracking/generate-token issues"""
+    end_date = datetime.now(timezone.utc).date() + timedelta(days=1)
+    payload = {
+        'pilot_id': f"{args.run_id}-{device}",
+        'race_id': args.race_id,
+        'pilot_name': f"Load Test {device}",
+        'exp': int(datetime.combine(end_date, datetime.max.time(), tzinfo=timezone.utc).timestamp()),
+        'race': {
+            'name': 'Load Test',
+            'date': datetime.now(timezone.utc).date().isoformat(),
+            'timezone': 'UTC',
+            'location': 'Load Test',
+            'end_date': end_date.isoformat()
+        },
+        'endpoints': {'live': '/tracking/live', 'upload': '/tracking/upload'}
+    }
+    return jwt.encode(payload, args.secret, algorithm='HS256')
+
+
+def make_contest_token(args) -> str:
+    """Viewer token accepted by the race websocket"""
+    return jwt.encode({
+        'sub': f"contest:{args.race_id}",
+        'aud': 'api.hikeandfly.app',
+        'iss': 'hikeandfly.app',
+        'exp': int(time.time()) + 86400
+    }, args.secret, algorithm='HS256')
+
+
+async def run_http_device(run: LoadTestRun, client: httpx.AsyncClient, device: str,
+                          fixes: List[Dict[str, Any]]):
+    """Phone posting its fixes to /tracking/live every --post-interval seconds"""
+    args = run.args
+    token = make_pilot_token(args, device)
+    flight_id = f"{args.run_id}-{device}"
+    url = f"{args.api.rstrip('/')}/tracking/live"
+    pending = 0
+    next_post = args.post_interval
+
+    while pending < len(fixes):
+        await run.sleep_until(next_post)
+        # Everything recorded up to now goes in this request
+        batch = []
+        while pending < len(fixes) and fixes[pending]['t'] <= next_post:
+            batch.append(fixes[pending])
+            pending += 1
+        next_post += args.post_interval
+        if not batch:
+            continue
+
+        body = {
+            'flight_id': flight_id,
+            'device_id': device,
+            'track_points': [{
+                'lat': fix['lat'],
+                'lon': fix['lon'],
+                'elevation': fix['alt'],
+                'datetime': fix_datetime(run.base_time, fix).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            } for fix in batch]
+        }
+
+        sent_at = time.perf_counter()
+        run.record_sent(flight_id, batch, sent_at)
+        run.counters['http_requests'] += 1
+        try:
+            response = await client.post(url, params={'token': token}, json=body)
+            acked_at = time.perf_counter()
+            if response.status_code == 202:
+                run.latency.add('http_ack', acked_at - sent_at)
+                run.record_ack(flight_id, len(batch), acked_at)
+            else:
+                run.counters['http_errors'] += 1
+                logger.debug(f"{device}: HTTP {response.status_code} {response.text[:200]}")
+        except httpx.HTTPError as e:
+            run.counters['http_errors'] += 1
+            logger.debug(f"{device}: request failed: {e}")
+
+
+async def run_tcp_device(run: LoadTestRun, device: str, fixes: List[Dict[str, Any]]):
+    """Tracker sending one frame per fix over a persistent TCP connection"""
+    args = run.args
+    host, _, port = args.tcp.rpartition(':')
+    numeric_id = tcp_device_id(device) if not fixes or 'frame' not in fixes[0] else device
+
+    try:
+        reader, writer = await asyncio.open_connection(host or 'localhost', int(port))
+    except OSError as e:
+        run.counters['tcp_errors'] += 1
+        logger.debug(f"{device}: connect failed: {e}")
+        return
+
+    # Recorded batch frames (UD3) carry several fixes - send each frame once
+    groups: List[List[Dict[str, Any]]] = []
+    for fix in fixes:
+        if groups and fix.get('frame') and groups[-1][0].get('frame') == fix['frame']:
+            groups[-1].append(fix)
+        else:
+            groups.append([fix])
+
+    try:
+        writer.write(f"[3G*{numeric_id}*0008*LK,0,0,90]".encode('ascii'))
+        await writer.drain()
+        for group in groups:
+            fix = group[0]
+            await run.sleep_until(fix['t'])
+            frame = bytes.fromhex(fix['frame']) if 'frame' in fix else \
+                watch_frame(numeric_id, fix, fix_datetime(run.base_time, fix))
+
+            sent_at = time.perf_counter()
+            run.record_sent(numeric_id, group, sent_at)
+            writer.write(frame)
+            await writer.drain()
+            run.counters['tcp_frames_sent'] += 1
+            try:
+                if await asyncio.wait_for(reader.read(1024), timeout=2.0):
+                    run.latency.add('tcp_ack', time.perf_counter() - sent_at)
+            except asyncio.TimeoutError:
+                run.counters['tcp_errors'] += 1
+    except (ConnectionError, OSError) as e:
+        run.counters['tcp_errors'] += 1
+        logger.debug(f"{device}: connection dropped: {e}")
+    finally:
+        writer.close()
+
+
+async def run_viewer(run: LoadTestRun, index: int):
+    """Websocket viewer measuring fix -> track_update delivery"""
+    import websockets
+
+    args = run.args
+    base = args.api.rstrip('/').replace('http://', 'ws://').replace('https://', 'wss://')
+    url = (f"{base}/tracking/ws/track/{args.race_id}"
+           f"?client_id={args.run_id}-viewer-{index}&token={make_contest_token(args)}")
+
+    try:
+        async with websockets.connect(url, max_size=None) as ws:
+            while not run.finished.is_set():
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    continue
+                received_at = time.perf_counter()
+                run.counters['ws_messages'] += 1
+
+                message = json.loads(raw)
+                if message.get('type') != 'track_update':
+                    continue
+                for flight in message.get('flights', []):
+                    coordinates = (flight.get('track_update') or {}).get('coordinates', [])
+                    for coordinate in coordinates:
+                        sent_at = run.sent_by_coord.get(coord_key(coordinate[1], coordinate[0]))
+                        if sent_at is not None:
+                            run.latency.add('websocket', received_at - sent_at)
+                            run.counters['ws_fixes_delivered'] += 1
+    except Exception as e:
+        run.counters['ws_errors'] += 1
+        logger.warning(f"Viewer {index} failed: {e}")
+
+
+async def poll_commits(run: LoadTestRun):
+    """Poll Postgres for committed rows per device"""
+    from sqlalchemy import create_engine, text
+
+    engine = create_engine(run.args.database_url, pool_size=1, max_overflow=0)
+    query = text("""
+        SELECT flight_id, device_id, COALESCE(total_points, 0)
+        FROM flights
+        WHERE flight_id = ANY(:flight_ids)
+           OR (device_id = ANY(:device_ids) AND created_at >= :since)
+    """)
+
+    def fetch():
+        # HTTP phones are keyed by flight_id, TCP trackers by their numeric device ID
+        keys = list(run.sent_times)
+        with engine.connect() as conn:
+            return conn.execute(query, {
+                'flight_ids': [k for k in keys if not k.isdigit()],
+                'device_ids': [k for k in keys if k.isdigit()],
+                'since': run.base_time - timedelta(minutes=1)
+            }).fetchall()
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                rows = await loop.run_in_executor(None, fetch)
+            except Exception as e:
+                logger.warning(f"Commit poll failed: {e}")
+                await asyncio.sleep(1.0)
+                continue
+            seen_at = time.perf_counter()
+
+            totals: Dict[str, int] = {}
+            for flight_id, device_id, total_points in rows:
+                key = flight_id if flight_id in run.sent_times else device_id
+                totals[key] = totals.get(key, 0) + total_points
+            for device, total in totals.items():
+                run.record_committed(device, total, seen_at)
+
+            if run.finished.is_set():
+                break
+            await asyncio.sleep(run.args.poll_interval)
+    finally:
+        engine.dispose()
+
+
+async def sample_queue(run: LoadTestRun):
+    """Sample the live points queue depth in Redis"""
+    import redis.asyncio as redis
+
+    client = redis.from_url(run.args.redis_url, decode_responses=True)
+    try:
+        while not run.finished.is_set():
+            try:
+                run.queue_depths.append(await client.zcard('queue:live_points'))
+            except Exception as e:
+                logger.warning(f"Queue sample failed: {e}")
+            await asyncio.sleep(0.5)
+    finally:
+        await client.aclose()
+
+
+def build_trace(args) -> List[Dict[str, Any]]:
+    """Load or generate the trace for this run"""
+    if args.raw_archive:
+        from tcp_server.raw_archive import list_segments
+        return trace_from_raw_archive(list_segments(args.raw_archive))
+    if args.trace:
+        return load_trace(args.trace)
+    return synthetic_trace(args.http_devices + args.tcp_devices, args.duration,
+                           args.fix_interval, args.seed)
+
+
+async def execute(args) -> Dict[str, Any]:
+    """Run the load test and build the report"""
+    fixes = build_trace(args)
+    if args.save_trace:
+        save_trace(fixes, args.save_trace)
+
+    devices = split_by_device(fixes)
+    names = sorted(devices)
+    if args.raw_archive:
+        # Recorded frames always go back over TCP
+        tcp_names, http_names = names, []
+    else:
+        tcp_names, http_names = names[:args.tcp_devices], names[args.tcp_devices:]
+
+    if http_names and not args.secret:
+        raise SystemExit("--secret (or SECRET_KEY) is required to sign pilot tokens")
+
+    run = LoadTestRun(args)
+    trace_duration = max((f['t'] for f in fixes), default=0.0)
+    logger.info(f"Run {args.run_id}: {len(fixes)} fixes, {len(http_names)} HTTP devices, "
+                f"{len(tcp_names)} TCP devices, {args.viewers} viewers, trace {trace_duration:.0f}s")
+
+    limits = httpx.Limits(max_connections=args.max_connections,
+                          max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        background = []
+        if args.viewers and args.secret:
+            background += [asyncio.create_task(run_viewer(run, i)) for i in range(args.viewers)]
+        if args.redis_url:
+            background.append(asyncio.create_task(sample_queue(run)))
+
+        # Give viewers time to receive their initial snapshot
+        await asyncio.sleep(2.0 if args.viewers else 0)
+
+        run.start = time.perf_counter()
+        if args.database_url:
+            # Flight list is only known once devices start sending
+            background.append(asyncio.create_task(poll_commits(run)))
+
+        clients = [run_http_device(run, client, name, devices[name]) for name in http_names]
+        clients += [run_tcp_device(run, name, devices[name]) for name in tcp_names] if args.tcp else []
+        await asyncio.gather(*clients)
+        send_elapsed = time.perf_counter() - run.start
+
+        # Let the queue drain and the last broadcasts go out
+        drain_deadline = time.perf_counter() + args.drain
+        while time.perf_counter() < drain_deadline:
+            if args.database_url and run.counters['committed'] >= run.counters['fixes_sent']:
+                break
+            await asyncio.sleep(0.5)
+        total_elapsed = time.perf_counter() - run.start
+
+        run.finished.set()
+        await asyncio.gather(*background, return_exceptions=True)
+
+    depths = run.queue_depths
+    return {
+        'report_version': REPORT_VERSION,
+        'run_id': args.run_id,
+        'started_at': run.base_time.isoformat(),
+        'config': {
+            'http_devices': len(http_names),
+            'tcp_devices': len(tcp_names),
+            'viewers': args.viewers,
+            'fixes': len(fixes),
+            'trace_seconds': trace_duration,
+            'fix_interval': args.fix_interval,
+            'post_interval': args.post_interval,
+            'speed': args.speed,
+            'seed': args.seed,
+            'trace': args.trace or args.raw_archive or 'synthetic'
+        },
+        'throughput': {
+            'fixes_per_s': round(run.counters['fixes_sent'] / send_elapsed, 2) if send_elapsed else None,
+            'http_requests_per_s': round(run.counters['http_requests'] / send_elapsed, 2) if send_elapsed else None,
+            'committed_per_s': round(run.counters['committed'] / total_elapsed, 2)
+            if args.database_url and total_elapsed else None
+        },
+        'duration': {
+            'send_seconds': round(send_elapsed, 2),
+            'total_seconds': round(total_elapsed, 2)
+        },
+        'latency': run.latency.summary(),
+        'queue': {
+            'samples': len(depths),
+            'max_depth': max(depths) if depths else None,
+            'mean_depth': round(sum(depths) / len(depths), 2) if depths else None
+        },
+        'counters': run.counters,
+        'uncommitted': run.counters['fixes_sent'] - run.counters['committed'] if args.database_url else None
+    }
+
+
+def init_schema(database_url: str):
+    """Create tables and flight triggers on an empty Postgres stand-in"""
+    from sqlalchemy import create_engine, text
+    from database.models import Base
+
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS postgis"))
+    Base.metadata.create_all(engine)
+
+    triggers = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'sql', 'flight_update_triggers.sql')
+    with open(triggers) as f, engine.begin() as conn:
+        conn.exec_driver_sql(f.read())
+    engine.dispose()
+    logger.info("Schema and flight triggers created")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end ingest load test')
+    parser.add_argument('--api', default='http://localhost:8000', help='API base URL')
+    parser.add_argument('--tcp', help='host:port of the GPS TCP server (enables TCP devices)')
+    parser.add_argument('--http-devices', type=int, default=50, help='Phones posting to /tracking/live')
+    parser.add_argument('--tcp-devices', type=int, default=0, help='Trackers sending over TCP')
+    parser.add_argument('--viewers', type=int, default=5, help='Websocket viewers of the race')
+    parser.add_argument('--duration', type=float, default=60, help='Synthetic trace length (s)')
+    parser.add_argument('--fix-interval', type=float, default=1.0, help='Seconds between fixes')
+    parser.add_argument('--post-interval', type=float, default=5.0, help='Seconds between phone posts')
+    parser.add_argument('--speed', type=float, default=1.0, help='Replay time scaling (0 = no pacing)')
+    parser.add_argument('--seed', type=int, default=1, help='Synthetic trace seed')
+    parser.add_argument('--trace', help='JSONL trace to replay instead of a synthetic one')
+    parser.add_argument('--raw-archive', help='Raw archive directory to replay over TCP')
+    parser.add_argument('--save-trace', help='Write the trace used for this run as JSONL')
+    parser.add_argument('--race-id', help='Race ID (default: loadtest-<seed>)')
+    parser.add_argument('--secret', default=os.getenv('SECRET_KEY'), help='JWT secret')
+    parser.add_argument('--database-url', default=os.getenv('LOADTEST_DATABASE_URL'),
+                        help='Postgres URL for commit latency (optional)')
+    parser.add_argument('--redis-url', default=os.getenv('LOADTEST_REDIS_URL'),
+                        help='Redis URL for queue depth sampling (optional)')
+    parser.add_argument('--init-schema', action='store_true', help='Create tables on --database-url first')
+    parser.add_argument('--poll-interval', type=float, default=0.2, help='Commit poll interval (s)')
+    parser.add_argument('--drain', type=float, default=30, help='Max seconds to wait for the pipeline to drain')
+    parser.add_argument('--max-connections', type=int, default=200, help='HTTP connection pool size')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    parser.add_argument('--compare', help='Baseline report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed regression ratio')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s',
+                        stream=sys.stderr)
+
+    args.race_id = args.race_id or f"loadtest-{args.seed}"
+    args.run_id = f"lt{int(time.time())}"
+
+    if args.init_schema:
+        if not args.database_url:
+            parser.error('--init-schema requires --database-url')
+        init_schema(args.database_url)
+
+    report = asyncio.run(execute(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            rows = compare_reports(json.load(f), report, args.tolerance)
+        regressed = [row for row in rows if row['regressed']]
+        for row in rows:
+            marker = 'REGRESSED' if row['regressed'] else 'ok'
+            print(f"{row['metric']:<40} {row['baseline']:>12} -> {row['current']:>12} "
+                  f"({row['change']:+.1%}) {marker}", file=sys.stderr)
+        sys.exit(1 if regressed else 0)
+
+
+if __name__ == '__main__':
+    main()
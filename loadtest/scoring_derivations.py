@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Benchmark of the server-side scoring derivations (api/scoring_derivations.py)
+
+Generates a synthetic track (ground walk, launch, thermalling flight, landing) and times
+derive_scoring_fields against a per-point Python loop built on calculate_distance, the
+way clients compute the same columns. Both results are compared so the report also
+shows the two agree; vectorized_kernel is the NumPy part without the row dict conversion.
+
+Usage:
+    python -m loadtest.scoring_derivations --points 50000 --repeat 5 --output derive_report.json
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+import numpy as np
+
+# Add parent directory to path so imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.flight_state import (
+    ALTITUDE_CHANGE_WINDOW,
+    FLYING_BUFFER_TIME,
+    FLYING_MIN_SPEED,
+    SIGNIFICANT_ALTITUDE_CHANGE,
+    calculate_distance,
+    calculate_speed,
+)
+from api.scoring_derivations import DERIVED_FIELDS, SCORING_SMOOTH_POINTS, derive_arrays, derive_scoring_fields
+
+
+def generate_track(points: int) -> List[Dict]:
+    """1 Hz track: 5 minutes walking, then flight, the last 5 minutes on the ground again"""
+    start = datetime(2025, 6, 1, 10, 0, tzinfo=timezone.utc)
+    walk = min(300, points // 4)
+    rows = []
+    lat, lon, alt = 46.0, 7.0, 1500.0
+    for i in range(points):
+        flying = walk <= i < points - walk
+        step = 0.00008 if flying else 0.00001
+        lat += step * math.cos(i / 60.0)
+        lon += step * math.sin(i / 60.0)
+        if flying:
+            alt += 1.5 * math.sin(i / 120.0)
+        rows.append({
+            'date_time': start + timedelta(seconds=i),
+            'lat': lat,
+            'lon': lon,
+            'gps_alt': alt,
+            'elevation': 1500.0 - (i % 100) * 0.1
+        })
+    return rows
+
+
+def derive_per_point(rows: List[Dict]) -> List[Dict]:
+    """Reference: the same derivations with one Python iteration per point"""
+    rows = sorted(rows, key=lambda row: row['date_time'])
+    n = len(rows)
+    speeds = [0.0] * n
+    for i in range(1, n):
+        p1, p2 = rows[i - 1], rows[i]
+        distance = calculate_distance(p1['lat'], p1['lon'], p2['lat'], p2['lon'])
+        speeds[i] = calculate_speed(distance, (p2['date_time'] - p1['date_time']).total_seconds())
+    if n > 1:
+        speeds[0] = speeds[1]
+
+    def smooth(values):
+        half, result = SCORING_SMOOTH_POINTS // 2, []
+        for i in range(n):
+            window = [v for v in values[max(0, i - half):i + (SCORING_SMOOTH_POINTS - 1) // 2 + 1]
+                      if v is not None]
+            result.append(sum(window) / len(window) if window else None)
+        return result
+
+    diffs = [row['gps_alt'] - row['elevation'] if row.get('elevation') is not None else None
+             for row in rows]
+    speed_smooth, diff_smooth = smooth(speeds), smooth(diffs)
+
+    start, last_takeoff = 0, None
+    for i, row in enumerate(rows):
+        while rows[start]['date_time'] < row['date_time'] - ALTITUDE_CHANGE_WINDOW:
+            start += 1
+        change = row['gps_alt'] - rows[start]['gps_alt']
+        takeoff = speed_smooth[i] >= FLYING_MIN_SPEED or abs(change) >= SIGNIFICANT_ALTITUDE_CHANGE
+        if takeoff:
+            last_takeoff = row['date_time']
+        row.update(speed=speeds[i], speed_smooth=speed_smooth[i], altitude_diff=diffs[i],
+                   altitude_diff_smooth=diff_smooth[i], takeoff_condition=takeoff,
+                   in_flight=last_takeoff is not None and row['date_time'] - last_takeoff <= FLYING_BUFFER_TIME)
+    return rows
+
+
+def compare(vectorized: List[Dict], reference: List[Dict]) -> Dict:
+    """Max absolute difference per numeric column, mismatch count per flag"""
+    result = {}
+    for field in DERIVED_FIELDS:
+        pairs = [(a[field], b[field]) for a, b in zip(vectorized, reference)]
+        if isinstance(pairs[0][1], bool):
+            result[field] = {'mismatches': sum(1 for a, b in pairs if a != b)}
+        else:
+            result[field] = {'max_abs_diff': max(
+                (abs(a - b) for a, b in pairs if a is not None and b is not None), default=0.0)}
+    return result
+
+
+def timed(func, rows: List[Dict], repeat: int) -> Dict:
+    samples = []
+    for _ in range(repeat):
+        copy = [dict(row) for row in rows]
+        started = time.perf_counter()
+        func(copy)
+        samples.append(time.perf_counter() - started)
+    best = min(samples)
+    return {
+        'best_ms': round(best * 1000, 2),
+        'median_ms': round(statistics.median(samples) * 1000, 2),
+        'points_per_s': round(len(rows) / best) if best else None
+    }
+
+
+def timed_kernel(rows: List[Dict], repeat: int) -> Dict:
+    """derive_arrays alone, without converting row dicts to and from arrays"""
+    arrays = [np.array([row[key] for row in rows], dtype=float)
+              for key in ('lat', 'lon', 'gps_alt', 'elevation')]
+    epoch = np.array([row['date_time'].timestamp() for row in rows])
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        derive_arrays(epoch, *arrays)
+        samples.append(time.perf_counter() - started)
+    return {'best_ms': round(min(samples) * 1000, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vectorized vs per-point scoring derivations')
+    parser.add_argument('--points', type=int, default=50000, help='Points in the synthetic track')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per implementation')
+    parser.add_argument('--output', help='Write the JSON report here (default: stdout)')
+    args = parser.parse_args()
+
+    rows = generate_track(args.points)
+    vectorized = derive_scoring_fields([dict(row) for row in rows])
+    reference = derive_per_point([dict(row) for row in rows])
+
+    report = {
+        'points': args.points,
+        'vectorized': timed(derive_scoring_fields, rows, args.repeat),
+        'vectorized_kernel': timed_kernel(rows, args.repeat),
+        'per_point': timed(derive_per_point, rows, args.repeat),
+        'agreement': compare(sorted(vectorized, key=lambda row: row['date_time']), reference)
+    }
+    report['speedup'] = round(report['per_point']['best_ms'] / report['vectorized']['best_ms'], 1) \
+        if report['vectorized']['best_ms'] else None
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""
+Load test traces
+A trace is a time-ordered list of fixes, one dict per fix:
+    {"device": str, "t": seconds since trace start, "lat": float, "lon": float, "alt": float}
+Traces are generated synthetically from a seed (reproducible) or loaded from JSONL files,
+including frames recorded by the TCP server's raw archive.
+"""
+import json
+import math
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+
+def synthetic_trace(
+    devices: int,
+    duration: float,
+    fix_interval: float = 1.0,
+    seed: int = 1,
+    prefix: str = 'lt'
+) -> List[Dict[str, Any]]:
+    """
+    Generate paraglider-like tracks for N devices.
+    Every fix position is unique per device, so downstream copies can be matched back to it.
+    """
+    rng = random.Random(seed)
+    fixes = []
+
+    for i in range(devices):
+        device = f"{prefix}{i:05d}"
+        # Spread launches over an Alpine-sized area
+        lat = 46.0 + rng.uniform(0, 1.0)
+        lon = 7.0 + rng.uniform(0, 2.0)
+        alt = rng.uniform(1200, 2500)
+        heading = rng.uniform(0, 2 * math.pi)
+        speed = rng.uniform(8, 14)  # m/s
+        # Devices start staggered within the first fix interval
+        t = rng.uniform(0, fix_interval)
+
+        while t < duration:
+            fixes.append({'device': device, 't': round(t, 3), 'lat': round(lat, 7),
+                          'lon': round(lon, 7), 'alt': round(alt, 1)})
+
+            heading += rng.uniform(-0.3, 0.3)
+            step = speed * fix_interval
+            lat += (step * math.cos(heading)) / 111320.0
+            lon += (step * math.sin(heading)) / (111320.0 * math.cos(math.radians(lat)))
+            alt += rng.uniform(-2.5, 2.0)
+            t += fix_interval
+
+    fixes.sort(key=lambda f: f['t'])
+    return fixes
+
+
+def save_trace(fixes: List[Dict[str, Any]], path: str):
+    """Write a trace as JSONL"""
+    with open(path, 'w') as f:
+        for fix in fixes:
+            f.write(json.dumps(fix, separators=(',', ':')) + '\n')
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """Load a JSONL trace written by save_trace"""
+    with open(path) as f:
+        fixes = [json.loads(line) for line in f if line.strip()]
+    fixes.sort(key=lambda f: f['t'])
+    return fixes
+
+
+def trace_from_raw_archive(paths: List[str], device: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Build a trace from raw archive segments (tcp_server/raw_archive.py).
+    Frames are parsed with the TCP server's parsers; each location becomes a fix and the
+    original frame is kept under 'frame' so TCP clients can replay it byte for byte.
+    """
+    from tcp_server.raw_archive import iter_frames
+    from tcp_server.replay_raw_archive import parse_frame
+
+    fixes = []
+    start = None
+    for frame in iter_frames(paths):
+        if device and frame['device_id'] != device:
+            continue
+        parsed = parse_frame(frame['data'])
+        if not parsed:
+            continue
+
+        points = parsed.get('points') if parsed.get('batch') else [parsed]
+        for point in points:
+            if 'latitude' not in point or not point.get('valid', True):
+                continue
+            if start is None:
+                start = frame['timestamp']
+            fixes.append({
+                'device': parsed.get('device_id') or frame['device_id'],
+                't': round(frame['timestamp'] - start, 3),
+                'lat': point['latitude'],
+                'lon': point['longitude'],
+                'alt': point.get('altitude', 0),
+                'frame': frame['data'].hex()
+            })
+
+    fixes.sort(key=lambda f: f['t'])
+    return fixes
+
+
+def watch_frame(device: str, fix: Dict[str, Any], when: datetime) -> bytes:
+    """Encode a fix as a TK905B watch protocol UD2 frame"""
+    lat, lon = fix['lat'], fix['lon']
+    lat_deg = int(abs(lat))
+    lon_deg = int(abs(lon))
+    return (
+        f"[3G*{device}*0079*UD2,"
+        f"{when.strftime('%d%m%y')},{when.strftime('%H%M%S')},A,"
+        f"{lat_deg:02d}{(abs(lat) - lat_deg) * 60:07.4f},{'N' if lat >= 0 else 'S'},"
+        f"{lon_deg:03d}{(abs(lon) - lon_deg) * 60:07.4f},{'E' if lon >= 0 else 'W'},"
+        f"36.0,0.0,{fix['alt']:.1f},9,80,90,0,0,00000008]"
+    ).encode('ascii')
+
+
+def tcp_device_id(device: str) -> str:
+    """Map a trace device name to the numeric ID watch protocol devices use"""
+    digits = ''.join(c for c in device if c.isdigit())
+    return ('88' + digits.zfill(8))[-10:]
+
+
+def split_by_device(fixes: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group trace fixes per device, preserving time order"""
+    devices: Dict[str, List[Dict[str, Any]]] = {}
+    for fix in fixes:
+        devices.setdefault(fix['device'], []).append(fix)
+    return devices
+
+
+def fix_datetime(base: datetime, fix: Dict[str, Any]) -> datetime:
+    """Absolute timestamp for a fix when the trace is replayed from base"""
+    return base + timedelta(seconds=fix['t'])
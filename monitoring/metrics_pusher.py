@@ -145,6 +145,12 @@ class MetricsPusher:
             self.statsd_client.gauge('queue.total_pending', summary.get('total_pending', 0))
             self.statsd_client.gauge('queue.total_dlq', summary.get('total_dlq', 0))
             
+            # Verified-token cache
+            auth = metrics.get('auth', {})
+            self.statsd_client.gauge('auth.token_cache.size', auth.get('size', 0))
+            self.statsd_client.gauge('auth.token_cache.hit_ratio', auth.get('hit_ratio', 0))
+            self.statsd_client.gauge('auth.token_cache.decode_ms_saved', auth.get('decode_ms_saved', 0))
+            
             # Platform health
             health = metrics.get('platform_health', {})
             health_value = 1 if health.get('status') == 'healthy' else 0
@@ -11,6 +11,7 @@ from sqlalchemy.dialects.postgresql import insert
 from database.db_replica import PrimarySession as Session  # Use primary for writes
 from database.models import LiveTrackPoint, UploadedTrackPoint, ScoringTracks, Flight
 from redis_queue_system.redis_queue import redis_queue, QUEUE_NAMES
+from api.flight_stats import flight_stats_store, stats_columns
 
 logger = logging.getLogger(__name__)
 
@@ -182,8 +183,9 @@ class EnhancedPointProcessor:
             with Session() as db:
                 stmt = insert(LiveTrackPoint).on_conflict_do_nothing(
                     index_elements=['flight_id', 'lat', 'lon', 'datetime']
-                )
-                db.execute(stmt, points)
+                ).returning(*stats_columns(LiveTrackPoint))
+                inserted = db.execute(stmt, points).all()
+                flight_stats_store.apply(db, LiveTrackPoint, inserted)
                 db.commit()
                 logger.info(f"Successfully processed {len(points)} live points")
                 return True
@@ -197,8 +199,9 @@ class EnhancedPointProcessor:
             with Session() as db:
                 stmt = insert(UploadedTrackPoint).on_conflict_do_nothing(
                     index_elements=['flight_id', 'lat', 'lon', 'datetime']
-                )
-                db.execute(stmt, points)
+                ).returning(*stats_columns(UploadedTrackPoint))
+                inserted = db.execute(stmt, points).all()
+                flight_stats_store.apply(db, UploadedTrackPoint, inserted)
                 db.commit()
                 logger.info(f"Successfully processed {len(points)} upload points")
                 return True
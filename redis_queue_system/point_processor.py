@@ -16,6 +16,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils.flight_separator import FlightSeparator
 from geoalchemy2.functions import ST_SetSRID, ST_MakePoint
 from redis_queue_system.redis_queue import redis_queue, QUEUE_NAMES
+from api.scoring_tiles import scoring_tile_store
+from api.flight_stats import flight_stats_store, stats_columns
+from api.race_index import race_index
+from api.delay_line import delay_line
 
 logger = logging.getLogger(__name__)
 
@@ -189,10 +193,18 @@ class PointProcessor:
                 # Batch insert with conflict handling
                 stmt = insert(LiveTrackPoint).on_conflict_do_nothing(
                     index_elements=['flight_id', 'lat', 'lon', 'datetime']
-                )
-                db.execute(stmt, points)
+                ).returning(*stats_columns(LiveTrackPoint))
+                inserted = db.execute(stmt, points).all()
+
+                # Extend flight statistics with the fixes that were actually new
+                flight_stats_store.apply(db, LiveTrackPoint, inserted)
                 db.commit()
 
+                # Move pilots' current flights in the race index and start the
+                # competition delay of the new fixes
+                races = await race_index.record_batch(db, inserted)
+                delay_line.admit_batch(races, inserted)
+
                 logger.debug(
                     f"Successfully processed {len(points)} live points")
                 return True
@@ -223,8 +235,10 @@ class PointProcessor:
                 # Batch insert with conflict handling
                 stmt = insert(UploadedTrackPoint).on_conflict_do_nothing(
                     index_elements=['flight_id', 'lat', 'lon', 'datetime']
-                )
-                db.execute(stmt, processed_points)
+                ).returning(*stats_columns(UploadedTrackPoint))
+                inserted = db.execute(stmt, processed_points).all()
+
+                flight_stats_store.apply(db, UploadedTrackPoint, inserted)
                 db.commit()
 
                 logger.info(
@@ -287,9 +301,13 @@ class PointProcessor:
                 if live_points:
                     stmt = insert(LiveTrackPoint).on_conflict_do_nothing(
                         index_elements=['flight_id', 'lat', 'lon', 'datetime']
-                    )
-                    db.execute(stmt, live_points)
+                    ).returning(*stats_columns(LiveTrackPoint))
+                    inserted = db.execute(stmt, live_points).all()
+
+                    flight_stats_store.apply(db, LiveTrackPoint, inserted)
                     db.commit()
+                    races = await race_index.record_batch(db, inserted)
+                    delay_line.admit_batch(races, inserted)
                     
                     logger.info(
                         f"Successfully converted {len(live_points)} Flymaster points to live tracking")
@@ -420,6 +438,10 @@ class PointProcessor:
                     index_elements=['flight_uuid', 'date_time', 'lat', 'lon']
                 )
                 db.execute(stmt, points)
+
+                # Drop stale tiles of these flights; they are rebuilt once batches stop
+                for flight_uuid in {str(point['flight_uuid']) for point in points}:
+                    scoring_tile_store.invalidate(db, flight_uuid)
                 db.commit()
 
                 logger.info(
@@ -0,0 +1,256 @@
+"""
+Reverse geocoding with a two-level cache
+Launch sites repeat across flights, so results are cached per quantized lat/lon cell:
+an in-process LRU in front of Redis (shared by all workers, long TTL). Concurrent
+lookups of the same cell share one upstream request, and all upstream calls go
+through a single pooled HTTP client.
+Set GEOCODER=stub to answer from a deterministic local geocoder (tests, load tests).
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+
+from config import settings
+from redis_queue_system.redis_queue import redis_queue
+
+logger = logging.getLogger(__name__)
+
+GEOCODER = os.getenv('GEOCODER', 'google')
+# 3 decimals is a ~110 m cell - well inside one launch site or town
+GEOCODE_CELL_DECIMALS = int(os.getenv('GEOCODE_CELL_DECIMALS', '3'))
+GEOCODE_CACHE_SIZE = int(os.getenv('GEOCODE_CACHE_SIZE', '5000'))
+GEOCODE_REDIS_TTL = int(os.getenv('GEOCODE_REDIS_TTL', str(30 * 24 * 3600)))
+GEOCODE_TIMEOUT = float(os.getenv('GEOCODE_TIMEOUT', '5'))
+GEOCODE_MAX_CONCURRENT = int(os.getenv('GEOCODE_MAX_CONCURRENT', '10'))
+
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+REDIS_KEY_PREFIX = "geocode:"
+
+
+def parse_geocode_result(data: Dict) -> Dict:
+    """
+    Reduce a Geocoding API response to the fields the API returns to clients.
+    location_name is the first locality / admin level 2 / admin level 1 component,
+    the rest follow the track preview fields.
+    """
+    location = {
+        'formatted_address': None,
+        'location_name': None,
+        'locality': None,
+        'administrative_area': None,
+        'country': None
+    }
+    if not data.get('results'):
+        return location
+
+    result = data['results'][0]
+    location['formatted_address'] = result.get('formatted_address')
+    for component in result.get('address_components', []):
+        types = component['types']
+        if location['location_name'] is None and (
+                'locality' in types or 'administrative_area_level_2' in types
+                or 'administrative_area_level_1' in types):
+            location['location_name'] = component['long_name']
+        if 'locality' in types:
+            location['locality'] = component['long_name']
+        elif 'administrative_area_level_1' in types:
+            location['administrative_area'] = component['long_name']
+        elif 'country' in types:
+            location['country'] = component['long_name']
+    return location
+
+
+class GoogleGeocoder:
+    """Google Geocoding API over one shared aiohttp session"""
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=GEOCODE_TIMEOUT),
+                connector=aiohttp.TCPConnector(limit=GEOCODE_MAX_CONCURRENT, ttl_dns_cache=300)
+            )
+        return self._session
+
+    async def reverse(self, lat: float, lon: float) -> Optional[Dict]:
+        """Returns parsed location, or None on a transient failure (not cached)"""
+        params = {'latlng': f"{lat},{lon}", 'key': self.api_key}
+        async with self._get_session().get(GEOCODE_URL, params=params) as response:
+            if response.status != 200:
+                logger.warning(f"Geocoding API returned HTTP {response.status}")
+                return None
+            data = await response.json()
+            if data.get('status') not in ('OK', 'ZERO_RESULTS'):
+                logger.warning(f"Geocoding API status {data.get('status')}")
+                return None
+            return parse_geocode_result(data)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+
+class StubGeocoder:
+    """Deterministic offline geocoder - names are derived from the cell coordinates"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def reverse(self, lat: float, lon: float) -> Optional[Dict]:
+        self.calls += 1
+        name = f"Cell {lat:.{GEOCODE_CELL_DECIMALS}f},{lon:.{GEOCODE_CELL_DECIMALS}f}"
+        return {
+            'formatted_address': f"{name}, Stubland",
+            'location_name': name,
+            'locality': name,
+            'administrative_area': 'Stub Region',
+            'country': 'Stubland'
+        }
+
+    async def close(self):
+        pass
+
+
+class GeocodingService:
+    """Cached, de-duplicated reverse geocoding keyed by quantized lat/lon cell"""
+
+    def __init__(self, geocoder=None, maxsize: int = GEOCODE_CACHE_SIZE,
+                 decimals: int = GEOCODE_CELL_DECIMALS, use_redis: bool = True):
+        if geocoder is None:
+            geocoder = StubGeocoder() if GEOCODER == 'stub' else GoogleGeocoder(settings.GOOGLE_MAPS_API_KEY)
+        self.geocoder = geocoder
+        self.maxsize = maxsize
+        self.decimals = decimals
+        self.use_redis = use_redis
+        self._lru: OrderedDict = OrderedDict()
+        self._lock = Lock()
+        self._inflight: Dict[Tuple[float, float], asyncio.Future] = {}
+        self._semaphore = asyncio.Semaphore(GEOCODE_MAX_CONCURRENT)
+        self.stats = {
+            'memory_hits': 0,
+            'redis_hits': 0,
+            'upstream_calls': 0,
+            'upstream_errors': 0,
+            'deduplicated': 0,
+            'upstream_seconds': 0.0
+        }
+
+    def cell(self, lat: float, lon: float) -> Tuple[float, float]:
+        return (round(float(lat), self.decimals), round(float(lon), self.decimals))
+
+    def _redis(self):
+        return redis_queue.redis_client if self.use_redis else None
+
+    def _memory_get(self, key) -> Optional[Dict]:
+        with self._lock:
+            location = self._lru.get(key)
+            if location is not None:
+                self._lru.move_to_end(key)
+                self.stats['memory_hits'] += 1
+            return location
+
+    def _memory_put(self, key, location: Dict):
+        with self._lock:
+            self._lru[key] = location
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    async def reverse(self, lat: float, lon: float) -> Optional[Dict]:
+        """Location fields for a point, or None if it could not be resolved"""
+        key = self.cell(lat, lon)
+        location = self._memory_get(key)
+        if location is not None:
+            return location
+
+        # Join a lookup of the same cell that is already running
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats['deduplicated'] += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            location = await self._lookup(key, lat, lon)
+            future.set_result(location)
+            return location
+        except Exception as e:
+            logger.error(f"Error reverse geocoding {lat},{lon}: {e}")
+            return None
+        finally:
+            # Release waiters even if this lookup failed or was cancelled
+            if not future.done():
+                future.set_result(None)
+            self._inflight.pop(key, None)
+
+    async def _lookup(self, key, lat: float, lon: float) -> Optional[Dict]:
+        redis_key = f"{REDIS_KEY_PREFIX}{self.decimals}:{key[0]}:{key[1]}"
+        client = self._redis()
+
+        if client is not None:
+            try:
+                cached = await client.get(redis_key)
+                if cached is not None:
+                    location = json.loads(cached)
+                    self.stats['redis_hits'] += 1
+                    self._memory_put(key, location)
+                    return location
+            except Exception as e:
+                logger.warning(f"Geocode cache read failed: {e}")
+
+        async with self._semaphore:
+            started = time.perf_counter()
+            self.stats['upstream_calls'] += 1
+            try:
+                location = await self.geocoder.reverse(lat, lon)
+            except Exception as e:
+                self.stats['upstream_errors'] += 1
+                logger.error(f"Error fetching location name: {e}")
+                location = None
+            finally:
+                self.stats['upstream_seconds'] += time.perf_counter() - started
+
+        if location is None:
+            return None
+
+        self._memory_put(key, location)
+        if client is not None:
+            try:
+                await client.set(redis_key, json.dumps(location), ex=GEOCODE_REDIS_TTL)
+            except Exception as e:
+                logger.warning(f"Geocode cache write failed: {e}")
+        return location
+
+    async def reverse_many(self, points: Iterable[Tuple[float, float]]) -> List[Optional[Dict]]:
+        """Resolve many points concurrently; results are in input order"""
+        return await asyncio.gather(*(self.reverse(lat, lon) for lat, lon in points))
+
+    async def close(self):
+        await self.geocoder.close()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            size = len(self._lru)
+        lookups = self.stats['memory_hits'] + self.stats['redis_hits'] + self.stats['upstream_calls']
+        hits = self.stats['memory_hits'] + self.stats['redis_hits']
+        return {
+            **self.stats,
+            'upstream_seconds': round(self.stats['upstream_seconds'], 3),
+            'size': size,
+            'geocoder': type(self.geocoder).__name__,
+            'hit_ratio': round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+geocoding_service = GeocodingService()
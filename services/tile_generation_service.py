@@ -6,14 +6,19 @@ import redis.asyncio as redis
 import hashlib
 import base64
 import json
+import math
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 from database.db_replica import get_replica_db, get_db
 from database.models import Flight, LiveTrackPoint, Race
 from config import settings
+from api.delay_line import delay_line
 
 logger = logging.getLogger(__name__)
 
+# Longest track history drawn on live tiles
+LIVE_TILE_LOOKBACK = timedelta(days=7)
+
 
 class TileGenerationService:
     def __init__(self):
@@ -84,6 +89,19 @@ class TileGenerationService:
         except Exception as e:
             logger.error(f"Error caching tile: {str(e)}")
 
+    def _race_track_start(self, db: Session, race_id: str, delayed_time: datetime) -> datetime:
+        """
+        Earliest live fix of the race, at most LIVE_TILE_LOOKBACK before delayed_time. Live
+        tiles read points from here on: every day of a multi-day race, but no chunks before it.
+        """
+        earliest = delayed_time - LIVE_TILE_LOOKBACK
+        first_fix = db.execute(text("""
+            SELECT MIN((first_fix->>'datetime')::timestamptz)
+            FROM flights
+            WHERE race_id = :race_id AND source LIKE '%live%'
+        """), {"race_id": race_id}).scalar()
+        return max(first_fix, earliest) if first_fix else earliest
+
     async def generate_live_tile(self, race_id: str, z: int, x: int, y: int,
                                 db: Session, since_timestamp: Optional[datetime] = None,
                                 delay_seconds: int = 60) -> bytes:
@@ -105,10 +123,16 @@ class TileGenerationService:
                 logger.warning(f"Invalid zoom level: {z} (must be 0-20)")
                 return b''
 
-            # Calculate delayed timestamp for "live" data
-            delayed_time = datetime.now(timezone.utc) - timedelta(seconds=delay_seconds)
+            # Calculate delayed timestamp for "live" data: the race's delay line cutoff for
+            # the competition delay, so tiles only change when fixes are released
+            if delay_seconds == delay_line.delay:
+                delayed_time = delay_line.cutoff(race_id)
+            else:
+                delayed_time = datetime.now(timezone.utc) - timedelta(seconds=delay_seconds)
             logger.debug(f"Generating tile {z}/{x}/{y} for race {race_id}, delayed_time: {delayed_time}")
             
+            track_start = self._race_track_start(db, race_id, delayed_time)
+
             # Build the time filter
             time_filter = ""
             if since_timestamp:
@@ -130,7 +154,8 @@ class TileGenerationService:
                     WHERE f.race_id = :race_id
                     AND f.source LIKE '%live%'
                 ),
-                -- Historical simplified paths (everything before delay)
+                -- Historical simplified paths (everything before delay, since the race's
+                -- first live fix, so compressed chunks older than the race aren't read)
                 historical_paths AS (
                     SELECT 
                         ltp.flight_uuid,
@@ -157,7 +182,7 @@ class TileGenerationService:
                     JOIN flight_colors fc ON fc.flight_uuid = ltp.flight_uuid
                     CROSS JOIN bounds
                     WHERE ltp.datetime <= :delayed_time
-                    AND ltp.datetime > :delayed_time - INTERVAL '7 days'
+                    AND ltp.datetime >= :track_start
                     AND ST_Intersects(
                         ST_SetSRID(ST_MakePoint(ltp.lon, ltp.lat), 4326),
                         ST_Transform(bounds.geom, 4326)
@@ -183,7 +208,7 @@ class TileGenerationService:
                     JOIN flight_colors fc ON fc.flight_uuid = ltp.flight_uuid
                     CROSS JOIN bounds
                     WHERE ltp.datetime <= :delayed_time
-                    AND ltp.datetime > :delayed_time - INTERVAL '7 days'
+                    AND ltp.datetime >= :track_start
                     AND ST_Intersects(
                         ST_SetSRID(ST_MakePoint(ltp.lon, ltp.lat), 4326),
                         ST_Transform(bounds.geom, 4326)
@@ -294,7 +319,8 @@ class TileGenerationService:
             result = db.execute(query, {
                 "z": z, "x": x, "y": y,
                 "race_id": race_id,
-                "delayed_time": delayed_time
+                "delayed_time": delayed_time,
+                "track_start": track_start
             }).scalar()
             
             if result:
@@ -480,6 +506,34 @@ class TileGenerationService:
         except Exception as e:
             logger.error(f"Error invalidating tiles: {str(e)}")
 
+    async def invalidate_released(self, race_id: str, flights: Dict[str, List]):
+        """Delay line listener: drop cached live tiles that contain newly released fixes"""
+        if not self.redis_client:
+            return
+        from ws_tile_conn import tile_manager
+
+        zoom_levels = tile_manager.get_active_zoom_levels(race_id)
+        if not zoom_levels:
+            return
+        try:
+            keys = {
+                self._get_tile_cache_key(race_id, z, *self._tile_for_point(fix.lat, fix.lon, z))
+                for fixes in flights.values() for fix in fixes for z in zoom_levels
+            }
+            await self.redis_client.delete(*keys)
+            logger.debug(f"Invalidated {len(keys)} tiles for race {race_id} after release")
+        except Exception as e:
+            logger.error(f"Error invalidating released tiles: {str(e)}")
+
+    @staticmethod
+    def _tile_for_point(lat: float, lon: float, z: int) -> Tuple[int, int]:
+        """Web Mercator tile (x, y) containing a point"""
+        n = 2 ** z
+        lat_rad = math.radians(lat)
+        x = int((lon + 180) / 360 * n)
+        y = int((1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * n)
+        return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
     def calculate_tiles_for_viewport(self, bbox: List[float], zoom: int) -> List[Tuple[int, int, int]]:
         """Calculate which tiles cover a given bounding box at a zoom level"""
         min_lon, min_lat, max_lon, max_lat = bbox
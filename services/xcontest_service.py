@@ -1,29 +1,199 @@
 import httpx
 import asyncio
+import json
 import logging
+import os
+import time as time_module
+from collections import deque
 from typing import Dict, List, Optional, Any, Set
 from datetime import datetime, timedelta, timezone, time
 from sqlalchemy.orm import Session
 from database.models import Race, Flight
 import jwt
 from config import settings
+from redis_queue_system.redis_queue import redis_queue
 
 logger = logging.getLogger(__name__)
 
+# Base URL of the XContest Livedata API (point at tests/fake_xcontest_server.py for tests)
+XCONTEST_API_URL = os.getenv('XCONTEST_API_URL', 'https://api.xcontest.org/livedata').rstrip('/')
+# Race config and pilot lists barely change during a race day
+RACE_CONFIG_TTL = int(os.getenv('XCONTEST_CONFIG_TTL', '300'))
+XCONTEST_MAX_CONCURRENT = int(os.getenv('XCONTEST_MAX_CONCURRENT', '8'))
+XCONTEST_TIMEOUT = float(os.getenv('XCONTEST_TIMEOUT', '30'))
+RACE_CONFIG_KEY_PREFIX = "xcontest:race_config:"
+LATENCY_SAMPLES = 500
+
 
 class XContestService:
     """Service for fetching and processing XContest live tracking data"""
     
     def __init__(self):
         # XContest Livedata API endpoints
-        self.users_url = "https://api.xcontest.org/livedata/users"
-        self.track_url = "https://api.xcontest.org/livedata/track"
-        
+        self.users_url = f"{XCONTEST_API_URL}/users"
+        self.track_url = f"{XCONTEST_API_URL}/track"
+
+        # One pooled keep-alive client for HFSS and XContest, created on first use
+        self._client: Optional[httpx.AsyncClient] = None
+        self._track_semaphore = asyncio.Semaphore(XCONTEST_MAX_CONCURRENT)
+
+        # race_id -> (expires_at, config); concurrent misses share one fetch
+        self._config_cache: Dict[str, tuple] = {}
+        self._config_inflight: Dict[str, asyncio.Future] = {}
+        # race_id -> XContest API key; the key is a third-party secret, never written to Redis
+        self._api_keys: Dict[str, str] = {}
+
+        self.stats = {
+            'config_memory_hits': 0,
+            'config_redis_hits': 0,
+            'api_key_fetches': 0,
+            'config_fetches': 0,
+            'config_deduplicated': 0,
+            'requests': 0,
+            'request_errors': 0
+        }
+        self._latency: Dict[str, deque] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                timeout=XCONTEST_TIMEOUT,
+                limits=httpx.Limits(max_connections=XCONTEST_MAX_CONCURRENT * 4,
+                                    max_keepalive_connections=XCONTEST_MAX_CONCURRENT * 2,
+                                    keepalive_expiry=60)
+            )
+        return self._client
+
+    async def _get(self, endpoint: str, url: str, **kwargs) -> httpx.Response:
+        """GET through the shared client, recording latency per endpoint"""
+        started = time_module.perf_counter()
+        self.stats['requests'] += 1
+        try:
+            return await self._get_client().get(url, **kwargs)
+        except Exception:
+            self.stats['request_errors'] += 1
+            raise
+        finally:
+            self._latency.setdefault(endpoint, deque(maxlen=LATENCY_SAMPLES)).append(
+                time_module.perf_counter() - started)
+
+    async def close(self):
+        """Close pooled connections on shutdown"""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+
+    def invalidate_race_config(self, race_id: str):
+        """Drop the in-process race config (Redis copy expires on its own)"""
+        self._config_cache.pop(race_id, None)
+        self._api_keys.pop(race_id, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        # Lookups that joined an in-flight fetch did not reach HFSS either
+        hits = (self.stats['config_memory_hits'] + self.stats['config_redis_hits']
+                + self.stats['config_deduplicated'])
+        lookups = hits + self.stats['config_fetches']
+        latency = {}
+        for endpoint, samples in self._latency.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            latency[endpoint] = {
+                'samples': len(ordered),
+                'avg_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+                'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+                'max_ms': round(ordered[-1] * 1000, 2)
+            }
+        return {
+            **self.stats,
+            'cached_races': len(self._config_cache),
+            'config_ttl_seconds': RACE_CONFIG_TTL,
+            'config_hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            'latency': latency
+        }
+
     async def get_race_config_and_pilots(
-        self, 
+        self,
         race_id: str,
         token: str
     ) -> Dict[str, Any]:
+        """
+        Race configuration and pilot map, cached per race for RACE_CONFIG_TTL seconds
+        in process and in Redis. The XContest API key is only held in process.
+        Failed fetches are not cached.
+        """
+        cached = self._config_cache.get(race_id)
+        if cached and cached[0] > time_module.time():
+            self.stats['config_memory_hits'] += 1
+            return cached[1]
+
+        pending = self._config_inflight.get(race_id)
+        if pending is not None:
+            self.stats['config_deduplicated'] += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._config_inflight[race_id] = future
+        try:
+            config = await self._load_race_config(race_id, token)
+            future.set_result(config)
+            return config
+        finally:
+            if not future.done():
+                future.set_result({'success': False, 'pilots': [], 'xcontest_map': {}})
+            self._config_inflight.pop(race_id, None)
+
+    async def _load_race_config(self, race_id: str, token: str) -> Dict[str, Any]:
+        redis_key = f"{RACE_CONFIG_KEY_PREFIX}{race_id}"
+        client = redis_queue.redis_client
+
+        if client is not None:
+            try:
+                cached = await client.get(redis_key)
+            except Exception as e:
+                cached = None
+                logger.warning(f"Race config cache read failed: {e}")
+            if cached is not None:
+                # The shared copy has no API key: use this worker's or fetch just the key
+                api_key = self._api_keys.get(race_id)
+                if api_key is None:
+                    api_key = await self._fetch_xc_api_key(token)
+                if api_key is not None:
+                    config = {**json.loads(cached), 'xc_api_key': api_key}
+                    self.stats['config_redis_hits'] += 1
+                    self._api_keys[race_id] = api_key
+                    self._config_cache[race_id] = (time_module.time() + RACE_CONFIG_TTL, config)
+                    return config
+
+        self.stats['config_fetches'] += 1
+        config = await self._fetch_race_config_and_pilots(token)
+        if config.get('success'):
+            self._api_keys[race_id] = config['xc_api_key']
+            self._config_cache[race_id] = (time_module.time() + RACE_CONFIG_TTL, config)
+            if client is not None:
+                try:
+                    shared = {key: value for key, value in config.items() if key != 'xc_api_key'}
+                    await client.set(redis_key, json.dumps(shared), ex=RACE_CONFIG_TTL)
+                except Exception as e:
+                    logger.warning(f"Race config cache write failed: {e}")
+        return config
+
+    async def _fetch_xc_api_key(self, token: str) -> Optional[str]:
+        """Fetch only the race's XContest API key from HFSS; None if it can't be fetched"""
+        self.stats['api_key_fetches'] += 1
+        try:
+            response = await self._get('hfss_xc_api_key', f"{settings.HFSS_SERVER}race/xc_api_key",
+                                       headers={"accept": "application/json",
+                                                "Authorization": f"Bearer {token}"})
+            if response.status_code != 200:
+                logger.warning(f"Failed to fetch XContest API key: {response.status_code}")
+                return None
+            xc_key_data = response.json()
+            return xc_key_data.get('xc_api_key', '') if xc_key_data else ''
+        except Exception as e:
+            logger.error(f"Error fetching XContest API key: {str(e)}")
+            return None
+
+    async def _fetch_race_config_and_pilots(self, token: str) -> Dict[str, Any]:
         """Fetch race configuration and pilots from HFSS API"""
         try:
             headers = {
@@ -31,56 +201,49 @@ class XContestService:
                 "Authorization": f"Bearer {token}"
             }
             
-            async with httpx.AsyncClient() as client:
-                # Get XContest API key for this race (race_id is in the token)
-                xc_key_response = await client.get(
-                    f"{settings.HFSS_SERVER}race/xc_api_key",
-                    headers=headers
-                )
+            # XContest API key and pilots for this race (race_id is in the token)
+            xc_key_response, pilots_response = await asyncio.gather(
+                self._get('hfss_xc_api_key', f"{settings.HFSS_SERVER}race/xc_api_key", headers=headers),
+                self._get('hfss_pilots', f"{settings.HFSS_SERVER}race/pilots", headers=headers)
+            )
+
+            if xc_key_response.status_code == 200 and pilots_response.status_code == 200:
+                xc_key_data = xc_key_response.json()
+                pilots_data = pilots_response.json()
                 
-                # Get pilots (race_id is in the token)
-                pilots_response = await client.get(
-                    f"{settings.HFSS_SERVER}race/pilots",
-                    headers=headers
-                )
+                # Extract XContest handles from pilots
+                # pilots_data is likely a list directly, not a dict with 'pilots' key
+                xcontest_pilot_map = {}
+                pilots_list = pilots_data if isinstance(pilots_data, list) else pilots_data.get('pilots', [])
                 
-                if xc_key_response.status_code == 200 and pilots_response.status_code == 200:
-                    xc_key_data = xc_key_response.json()
-                    pilots_data = pilots_response.json()
-                    
-                    # Extract XContest handles from pilots
-                    # pilots_data is likely a list directly, not a dict with 'pilots' key
-                    xcontest_pilot_map = {}
-                    pilots_list = pilots_data if isinstance(pilots_data, list) else pilots_data.get('pilots', [])
-                    
-                    for pilot in pilots_list:
-                        xcontest_handle = pilot.get('xcontest') if isinstance(pilot, dict) else None
-                        if xcontest_handle:
-                            xc_id = xcontest_handle.strip().lower()
-                            xcontest_pilot_map[xc_id] = {
-                                'pilot_id': pilot.get('_id'),
-                                'name': pilot.get('name', ''),
-                                'surname': pilot.get('surname', ''),
-                                # 'team_id': pilot.get('team_id'),
-                                # 'task_id': pilot.get('task_id'),
-                                'xcontest': xcontest_handle
-                            }
-                    
-                    return {
-                        'success': True,
-                        'xc_entity': xc_key_data.get('xc_entity', '').rstrip() if xc_key_data else '',
-                        'xc_api_key': xc_key_data.get('xc_api_key', '') if xc_key_data else '',
-                        'pilots': pilots_list,
-                        'xcontest_map': xcontest_pilot_map
-                    }
+                for pilot in pilots_list:
+                    xcontest_handle = pilot.get('xcontest') if isinstance(pilot, dict) else None
+                    if xcontest_handle:
+                        xc_id = xcontest_handle.strip().lower()
+                        xcontest_pilot_map[xc_id] = {
+                            'pilot_id': pilot.get('_id'),
+                            'name': pilot.get('name', ''),
+                            'surname': pilot.get('surname', ''),
+                            # 'team_id': pilot.get('team_id'),
+                            # 'task_id': pilot.get('task_id'),
+                            'xcontest': xcontest_handle
+                        }
+                
+                return {
+                    'success': True,
+                    'xc_entity': xc_key_data.get('xc_entity', '').rstrip() if xc_key_data else '',
+                    'xc_api_key': xc_key_data.get('xc_api_key', '') if xc_key_data else '',
+                    'pilots': pilots_list,
+                    'xcontest_map': xcontest_pilot_map
+                }
+            else:
+                # Log as info, not error - authentication issues are expected
+                if xc_key_response.status_code == 401 or pilots_response.status_code == 401:
+                    logger.info("Unable to authenticate with HFSS API for XContest data - skipping XContest integration")
                 else:
-                    # Log as info, not error - authentication issues are expected
-                    if xc_key_response.status_code == 401 or pilots_response.status_code == 401:
-                        logger.info("Unable to authenticate with HFSS API for XContest data - skipping XContest integration")
-                    else:
-                        logger.warning(f"Failed to fetch data: xc_key={xc_key_response.status_code}, pilots={pilots_response.status_code}")
-                    return {'success': False, 'pilots': [], 'xcontest_map': {}}
-                    
+                    logger.warning(f"Failed to fetch data: xc_key={xc_key_response.status_code}, pilots={pilots_response.status_code}")
+                return {'success': False, 'pilots': [], 'xcontest_map': {}}
+                
         except Exception as e:
             logger.error(f"Error fetching race config and pilots: {str(e)}")
             return {'success': False, 'pilots': [], 'xcontest_map': {}}
@@ -104,18 +267,14 @@ class XContestService:
             
             logger.debug(f"XContest API request params: {params}")
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    self.users_url,
-                    params=params,
-                    headers=headers
-                )
-                
-                if response.status_code == 200:
-                    return response.json(), 200
-                else:
-                    logger.error(f"XContest API error: {response.status_code}")
-                    return None, response.status_code
+            response = await self._get('xcontest_users', self.users_url,
+                                       params=params, headers=headers)
+
+            if response.status_code == 200:
+                return response.json(), 200
+            else:
+                logger.error(f"XContest API error: {response.status_code}")
+                return None, response.status_code
                     
         except Exception as e:
             logger.error(f"Error fetching XContest users: {str(e)}")
@@ -143,19 +302,17 @@ class XContestService:
                 
             headers = {"Authorization": f"Bearer {api_key}"}
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(
-                    self.track_url,
-                    params=params,
-                    headers=headers
-                )
-                
-                if response.status_code == 200:
-                    track_response = response.json()
-                    return self._process_track_coordinates(track_response)
-                else:
-                    logger.error(f"Failed to fetch track for flight {flight_uuid}: {response.status_code}")
-                    return None
+            # Bounded parallelism across concurrent per-track fetches
+            async with self._track_semaphore:
+                response = await self._get('xcontest_track', self.track_url,
+                                           params=params, headers=headers)
+
+            if response.status_code == 200:
+                track_response = response.json()
+                return self._process_track_coordinates(track_response)
+            else:
+                logger.error(f"Failed to fetch track for flight {flight_uuid}: {response.status_code}")
+                return None
                     
         except Exception as e:
             logger.error(f"Error fetching track for flight {flight_uuid}: {str(e)}")
@@ -274,6 +431,7 @@ class XContestService:
         
         # Process flights
         pilot_flights = []
+        selected = []
         for user_id, user_data in filtered_users.items():
             xcontest_id = user_data['username']
             pilot_info = xcontest_pilot_map.get(xcontest_id.lower())
@@ -311,67 +469,69 @@ class XContestService:
                 logger.info(f"Pilot {xcontest_id}: {flights_found} flights found, {flights_filtered} filtered out (not today), using latest from today")
             
             if latest_flight:
-                # Fetch track data
-                track_data = await self.fetch_track_data(
-                    latest_flight['uuid'],
-                    xc_entity,
-                    xc_api_key
-                )
+                selected.append((xcontest_id, pilot_info, latest_flight))
+
+        # Fetch the selected tracks concurrently (bounded by the track semaphore)
+        track_results = await asyncio.gather(*(
+            self.fetch_track_data(latest_flight['uuid'], xc_entity, xc_api_key)
+            for _, _, latest_flight in selected
+        ))
+
+        for (xcontest_id, pilot_info, latest_flight), track_data in zip(selected, track_results):
+            if track_data and track_data.get('coordinates'):
+                # Convert to format compatible with WebSocket endpoint
+                downsampled_points = []
+                last_added_time = None
                 
-                if track_data and track_data.get('coordinates'):
-                    # Convert to format compatible with WebSocket endpoint
-                    downsampled_points = []
-                    last_added_time = None
-                    
-                    for point in track_data['coordinates']:
-                        current_time = point['timestamp']
-                        if last_added_time is None or (current_time - last_added_time).total_seconds() >= 3:
-                            downsampled_points.append({
-                                "lat": float(point['lat']),
-                                "lon": float(point['lon']),
-                                "elevation": float(point['gps_alt']) if point['gps_alt'] is not None else 0,
-                                "baro_altitude": float(point['baro_alt']) if point['baro_alt'] is not None else None,
-                                "datetime": current_time.strftime("%Y-%m-%dT%H:%M:%SZ")
-                            })
-                            last_added_time = current_time
-                    
-                    # Create flight data structure
-                    first_fix = latest_flight.get('firstFix', [])
-                    last_fix = latest_flight.get('lastFix', [])
-                    
-                    pilot_flight = {
-                        "uuid": f"xc_{latest_flight['uuid']}",  # Prefix to distinguish from HFSS flights
-                        "pilot_id": pilot_info['pilot_id'],
-                        "pilot_name": f"{pilot_info['name']} {pilot_info['surname']}",
-                        "firstFix": {
-                            "lat": first_fix[1] if len(first_fix) > 1 else 0,
-                            "lon": first_fix[0] if len(first_fix) > 0 else 0,
-                            "elevation": first_fix[2] if len(first_fix) > 2 else 0,
-                            "datetime": first_fix[3].get('t') if len(first_fix) > 3 and isinstance(first_fix[3], dict) else None
-                        },
-                        "lastFix": {
-                            "lat": last_fix[1] if len(last_fix) > 1 else 0,
-                            "lon": last_fix[0] if len(last_fix) > 0 else 0,
-                            "elevation": last_fix[2] if len(last_fix) > 2 else 0,
-                            "datetime": last_fix[3].get('t') if len(last_fix) > 3 and isinstance(last_fix[3], dict) else None
-                        },
-                        "trackHistory": downsampled_points,
-                        "totalPoints": len(track_data['coordinates']),
-                        "downsampledPoints": len(downsampled_points),
-                        "source": "XC",  # Mark as XContest data
-                        "lastFixTime": last_fix[3].get('t') if len(last_fix) > 3 and isinstance(last_fix[3], dict) else None,
-                        "isActive": not latest_flight.get('landed', False),
-                        "flight_state": "flying" if not latest_flight.get('landed', False) else "landed",
-                        "flight_state_info": {
-                            "state": "flying" if not latest_flight.get('landed', False) else "landed",
-                            "landed": latest_flight.get('landed', False)
-                        },
-                        "glider": latest_flight.get('glider', ''),
-                        "xcontest_id": xcontest_id
-                    }
-                    
-                    pilot_flights.append(pilot_flight)
-                    logger.info(f"Added XContest flight for {xcontest_id} from today (last fix: {pilot_flight['lastFixTime']})")
+                for point in track_data['coordinates']:
+                    current_time = point['timestamp']
+                    if last_added_time is None or (current_time - last_added_time).total_seconds() >= 3:
+                        downsampled_points.append({
+                            "lat": float(point['lat']),
+                            "lon": float(point['lon']),
+                            "elevation": float(point['gps_alt']) if point['gps_alt'] is not None else 0,
+                            "baro_altitude": float(point['baro_alt']) if point['baro_alt'] is not None else None,
+                            "datetime": current_time.strftime("%Y-%m-%dT%H:%M:%SZ")
+                        })
+                        last_added_time = current_time
+                
+                # Create flight data structure
+                first_fix = latest_flight.get('firstFix', [])
+                last_fix = latest_flight.get('lastFix', [])
+                
+                pilot_flight = {
+                    "uuid": f"xc_{latest_flight['uuid']}",  # Prefix to distinguish from HFSS flights
+                    "pilot_id": pilot_info['pilot_id'],
+                    "pilot_name": f"{pilot_info['name']} {pilot_info['surname']}",
+                    "firstFix": {
+                        "lat": first_fix[1] if len(first_fix) > 1 else 0,
+                        "lon": first_fix[0] if len(first_fix) > 0 else 0,
+                        "elevation": first_fix[2] if len(first_fix) > 2 else 0,
+                        "datetime": first_fix[3].get('t') if len(first_fix) > 3 and isinstance(first_fix[3], dict) else None
+                    },
+                    "lastFix": {
+                        "lat": last_fix[1] if len(last_fix) > 1 else 0,
+                        "lon": last_fix[0] if len(last_fix) > 0 else 0,
+                        "elevation": last_fix[2] if len(last_fix) > 2 else 0,
+                        "datetime": last_fix[3].get('t') if len(last_fix) > 3 and isinstance(last_fix[3], dict) else None
+                    },
+                    "trackHistory": downsampled_points,
+                    "totalPoints": len(track_data['coordinates']),
+                    "downsampledPoints": len(downsampled_points),
+                    "source": "XC",  # Mark as XContest data
+                    "lastFixTime": last_fix[3].get('t') if len(last_fix) > 3 and isinstance(last_fix[3], dict) else None,
+                    "isActive": not latest_flight.get('landed', False),
+                    "flight_state": "flying" if not latest_flight.get('landed', False) else "landed",
+                    "flight_state_info": {
+                        "state": "flying" if not latest_flight.get('landed', False) else "landed",
+                        "landed": latest_flight.get('landed', False)
+                    },
+                    "glider": latest_flight.get('glider', ''),
+                    "xcontest_id": xcontest_id
+                }
+                
+                pilot_flights.append(pilot_flight)
+                logger.info(f"Added XContest flight for {xcontest_id} from today (last fix: {pilot_flight['lastFixTime']})")
         
         logger.info(f"Returning {len(pilot_flights)} XContest flights from today for race")
         return pilot_flights
@@ -414,6 +574,7 @@ class XContestService:
         logger.info("="*60)
         
         flight_updates = []
+        pending_fetches = []
         
         # For each tracked flight, fetch new points since last fix time
         for xc_flight_id, flight_info in active_xc_flights.items():
@@ -435,15 +596,20 @@ class XContestService:
                 continue
             
             logger.debug(f"Fetching updates for flight {xc_flight_id} since {last_known_time}")
-            
-            # Fetch incremental track data directly
-            track_data = await self.fetch_track_data(
+            pending_fetches.append((xc_flight_id, flight_uuid, last_known_time, pilot_id, pilot_name))
+
+        # Fetch incremental track data for all flights concurrently
+        track_results = await asyncio.gather(*(
+            self.fetch_track_data(
                 flight_uuid,
                 xc_entity,
                 xc_api_key,
                 lastfixtime=last_known_time  # Get only points after this time
             )
-            
+            for _, flight_uuid, last_known_time, _, _ in pending_fetches
+        ))
+
+        for (xc_flight_id, flight_uuid, last_known_time, pilot_id, pilot_name), track_data in zip(pending_fetches, track_results):
             if track_data and track_data.get('coordinates'):
                 logger.info(f"Got {len(track_data['coordinates'])} new points for flight {xc_flight_id}")
                 
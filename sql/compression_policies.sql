@@ -0,0 +1,57 @@
+-- TimescaleDB compression for the track point hypertables
+-- Safe to re-run: settings are only applied to tables without them, policies use if_not_exists.
+-- Requires TimescaleDB 2.11+ (inserts, updates and deletes on compressed chunks: late fixes,
+-- persist-live-flight replacing an upload copy, scoring track PUTs).
+--
+-- Segments are one flight's points (segmentby flight_uuid) in time order, so the point reads,
+-- which all filter on flight_uuid and order by time, decompress only that flight's segments.
+-- Every column of a unique constraint has to be part of segmentby or orderby, hence
+-- flight_id (1:1 with flight_uuid) and the trailing lat, lon, id.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM timescaledb_information.compression_settings
+                   WHERE hypertable_name = 'live_track_points') THEN
+        ALTER TABLE live_track_points SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'flight_uuid, flight_id',
+            timescaledb.compress_orderby = 'datetime, lat, lon, id'
+        );
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM timescaledb_information.compression_settings
+                   WHERE hypertable_name = 'uploaded_track_points') THEN
+        ALTER TABLE uploaded_track_points SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'flight_uuid, flight_id',
+            timescaledb.compress_orderby = 'datetime, lat, lon, id'
+        );
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM timescaledb_information.compression_settings
+                   WHERE hypertable_name = 'scoring_tracks') THEN
+        ALTER TABLE scoring_tracks SET (
+            timescaledb.compress,
+            timescaledb.compress_segmentby = 'flight_uuid',
+            timescaledb.compress_orderby = 'date_time, lat, lon'
+        );
+    END IF;
+END $$;
+
+-- Live points: today's and yesterday's chunks take the ingest and the live tiles,
+-- older ones are only read per flight until retention drops them (LIVE_RETENTION_DAYS, 5)
+SELECT add_compression_policy('live_track_points', compress_after => INTERVAL '2 days', if_not_exists => true);
+
+-- Uploads and scoring tracks are written once per flight and read per flight
+SELECT add_compression_policy('uploaded_track_points', compress_after => INTERVAL '7 days', if_not_exists => true);
+SELECT add_compression_policy('scoring_tracks', compress_after => INTERVAL '7 days', if_not_exists => true);
+
+-- Verify
+SELECT hypertable_name, attname, segmentby_column_index, orderby_column_index
+FROM timescaledb_information.compression_settings
+WHERE hypertable_name IN ('live_track_points', 'uploaded_track_points', 'scoring_tracks')
+ORDER BY hypertable_name, segmentby_column_index NULLS LAST, orderby_column_index;
+
+SELECT hypertable_name, job_id, schedule_interval, config
+FROM timescaledb_information.jobs
+WHERE proc_name = 'policy_compression';
@@ -0,0 +1,19 @@
+-- Rollback script for compression_policies.sql
+-- Removes the policies, decompresses every chunk and turns compression off.
+-- Decompressing needs the uncompressed size on disk again; check hypertable_compression_stats first.
+
+SELECT remove_compression_policy('live_track_points', if_exists => true);
+SELECT remove_compression_policy('uploaded_track_points', if_exists => true);
+SELECT remove_compression_policy('scoring_tracks', if_exists => true);
+
+SELECT decompress_chunk(c, if_compressed => true) FROM show_chunks('live_track_points') c;
+SELECT decompress_chunk(c, if_compressed => true) FROM show_chunks('uploaded_track_points') c;
+SELECT decompress_chunk(c, if_compressed => true) FROM show_chunks('scoring_tracks') c;
+
+ALTER TABLE live_track_points SET (timescaledb.compress = false);
+ALTER TABLE uploaded_track_points SET (timescaledb.compress = false);
+ALTER TABLE scoring_tracks SET (timescaledb.compress = false);
+
+-- Verify (should be empty)
+SELECT hypertable_name FROM timescaledb_information.compression_settings
+WHERE hypertable_name IN ('live_track_points', 'uploaded_track_points', 'scoring_tracks');
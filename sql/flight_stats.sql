@@ -0,0 +1,20 @@
+-- Materialized per-flight track statistics (api/flight_stats.py)
+-- Deploy directly to Neon primary endpoint
+-- Rows are created on first ingest or first read of a flight, so no backfill is needed
+
+CREATE TABLE IF NOT EXISTS flight_stats (
+    flight_uuid UUID PRIMARY KEY REFERENCES flights(id) ON DELETE CASCADE,
+    point_count INTEGER NOT NULL DEFAULT 0,
+    start_time TIMESTAMPTZ,
+    end_time TIMESTAMPTZ,
+    distance DOUBLE PRECISION NOT NULL DEFAULT 0,
+    max_speed DOUBLE PRECISION NOT NULL DEFAULT 0,
+    min_elevation DOUBLE PRECISION,
+    max_elevation DOUBLE PRECISION,
+    elevation_gain DOUBLE PRECISION NOT NULL DEFAULT 0,
+    elevation_loss DOUBLE PRECISION NOT NULL DEFAULT 0,
+    last_lat DOUBLE PRECISION,
+    last_lon DOUBLE PRECISION,
+    last_elevation DOUBLE PRECISION,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
@@ -0,0 +1,36 @@
+-- Precomputed scoring track tiles (api/scoring_tiles.py)
+-- Deploy directly to Neon primary endpoint
+
+CREATE TABLE IF NOT EXISTS scoring_tile_flights (
+    flight_uuid UUID PRIMARY KEY,
+    min_lat DOUBLE PRECISION NOT NULL,
+    min_lon DOUBLE PRECISION NOT NULL,
+    max_lat DOUBLE PRECISION NOT NULL,
+    max_lon DOUBLE PRECISION NOT NULL,
+    point_count INTEGER NOT NULL,
+    max_zoom INTEGER NOT NULL,
+    tile_count INTEGER NOT NULL,
+    built_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS scoring_tiles (
+    flight_uuid UUID NOT NULL,
+    z INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    mvt BYTEA NOT NULL,
+    etag VARCHAR NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (flight_uuid, z, x, y)
+);
+
+-- Multi-flight requests look up one tile for many flights
+CREATE INDEX IF NOT EXISTS idx_scoring_tiles_zxy ON scoring_tiles (z, x, y);
+
+-- Flights whose tiles need a (re)build; ingest upserts them, every worker's builder
+-- claims due rows, so invalidations reach the builder whichever worker took the batch
+CREATE TABLE IF NOT EXISTS scoring_tile_builds (
+    flight_uuid UUID PRIMARY KEY,
+    requested_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    claimed_at TIMESTAMPTZ
+);
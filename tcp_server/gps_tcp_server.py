@@ -4,7 +4,6 @@ Supports TK905B (watch protocol) and TK103 protocol devices
 """
 import asyncio
 import logging
-import json
 import time
 import signal
 import sys
@@ -23,6 +22,11 @@ except ImportError:
     create_response = None
     get_supported_protocols = None
 
+try:
+    from tcp_server.raw_archive import raw_archive
+except ImportError:
+    from raw_archive import raw_archive
+
 logger = logging.getLogger(__name__)
 
 # Server configuration constants
@@ -761,6 +765,9 @@ class GPSClientProtocol(asyncio.Protocol):
     async def process_message(self, message: bytes):
         """Process a complete GPS message with error handling"""
         try:
+            # Archive every frame, including the ones rejected below
+            self.server.raw_archive.record(message, self.conn_id, str(self.peername), self.device_id)
+
             # Decode message
             try:
                 text = message.decode('utf-8', errors='ignore').strip()
@@ -857,37 +864,14 @@ class GPSClientProtocol(asyncio.Protocol):
             logger.error(f"Error processing message: {e}\n{traceback.format_exc()}")
             
     async def queue_gps_data(self, parsed: Dict[str, Any]):
-        """Log GPS data for now - will queue to Redis later"""
+        """Account for a GPS fix - raw frames are archived in process_message"""
         try:
-            # Enhanced logging with connection info
-            logger.info(f"=== GPS DATA RECEIVED ===")
-            logger.info(f"Connection: {self.conn_id}")
-            logger.info(f"Message #: {self.message_count}")
-            logger.info(f"Protocol: {parsed.get('protocol', 'unknown')}")
-            logger.info(f"Device ID: {parsed.get('device_id', 'unknown')}")
-            logger.info(f"Timestamp: {parsed.get('timestamp', 'N/A')}")
-            logger.info(f"Location: {parsed.get('latitude', 0)}, {parsed.get('longitude', 0)}")
-            logger.info(f"Altitude: {parsed.get('altitude', 0)} m")
-            logger.info(f"Speed: {parsed.get('speed', 0)} km/h")
-            logger.info(f"Heading: {parsed.get('heading', 0)}°")
-            logger.info(f"Satellites: {parsed.get('satellites', 0)}")
-            logger.info(f"Battery: {parsed.get('battery', 0)}%")
-            logger.info(f"Valid: {parsed.get('valid', False)}")
-            logger.info(f"========================")
-            
-            # Save to log file as JSON
-            with open('gps_tcp_data.log', 'a') as f:
-                log_entry = {
-                    'timestamp': datetime.now().isoformat(),
-                    'connection_id': self.conn_id,
-                    'message_count': self.message_count,
-                    'parsed_data': parsed,
-                    'source_ip': str(self.peername)
-                }
-                # Convert datetime objects to strings
-                if isinstance(parsed.get('timestamp'), datetime):
-                    log_entry['parsed_data']['timestamp'] = parsed['timestamp'].isoformat()
-                f.write(json.dumps(log_entry) + '\n')
+            logger.debug(
+                f"GPS fix from {parsed.get('device_id', 'unknown')} ({parsed.get('protocol', 'unknown')}): "
+                f"{parsed.get('latitude', 0)}, {parsed.get('longitude', 0)} "
+                f"alt={parsed.get('altitude', 0)}m speed={parsed.get('speed', 0)}km/h "
+                f"valid={parsed.get('valid', False)} at {parsed.get('timestamp', 'N/A')}"
+            )
             
             # Update statistics
             self.server.stats['messages_received'] += 1
@@ -1009,6 +993,7 @@ class GPSTrackerTCPServer:
         self.conn_manager = ConnectionManager()
         self.rate_limiter = RateLimiter()
         self.packet_validator = PacketValidator()
+        self.raw_archive = raw_archive
         self.stats = {
             'start_time': None,
             'messages_received': 0,
@@ -1025,6 +1010,9 @@ class GPSTrackerTCPServer:
         try:
             self.stats['start_time'] = datetime.now()
             
+            # Start background writer for the raw message archive
+            await self.raw_archive.start()
+            
             loop = asyncio.get_event_loop()
             
             # Set up signal handlers for graceful shutdown
@@ -1075,6 +1063,9 @@ class GPSTrackerTCPServer:
             self.server.close()
             await self.server.wait_closed()
             
+        # Flush archived frames still held in memory
+        await self.raw_archive.stop()
+            
         self.shutdown_event.set()
         logger.info("GPS TCP Server stopped")
         
@@ -1140,6 +1131,7 @@ class GPSTrackerTCPServer:
             'total_messages': self.stats['messages_received'],
             'valid_locations': self.stats['valid_locations'],
             'blacklisted_ips': list(self.conn_manager.blacklisted_ips),
+            'raw_archive': self.raw_archive.get_status(),
             'connections': [
                 {
                     'id': conn_id,
@@ -0,0 +1,230 @@
+"""
+Raw GPS message archive
+Keeps received frames in an in-memory ring buffer and flushes them from a
+background writer into size/time rotated, gzip compressed, append-only
+segment files. Recording a frame is a deque append - no I/O on the event loop.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Archive configuration (overridable through the environment)
+ARCHIVE_DIR = os.getenv('GPS_RAW_ARCHIVE_DIR', 'logs/raw_archive')
+ARCHIVE_ENABLED = os.getenv('GPS_RAW_ARCHIVE_ENABLED', 'true').lower() == 'true'
+RING_BUFFER_SIZE = int(os.getenv('GPS_RAW_ARCHIVE_BUFFER', '50000'))  # Frames held in memory
+FLUSH_INTERVAL = float(os.getenv('GPS_RAW_ARCHIVE_FLUSH_SECONDS', '5'))  # Seconds between flushes
+SEGMENT_MAX_BYTES = int(os.getenv('GPS_RAW_ARCHIVE_SEGMENT_BYTES', str(64 * 1024 * 1024)))  # Compressed size
+SEGMENT_MAX_AGE = int(os.getenv('GPS_RAW_ARCHIVE_SEGMENT_SECONDS', '3600'))  # Rotate at least hourly
+SEGMENT_PREFIX = 'raw-'
+SEGMENT_SUFFIX = '.jsonl.gz'
+
+
+class RawArchive:
+    """Non-blocking raw frame archive with a background segment writer"""
+
+    def __init__(
+        self,
+        directory: str = ARCHIVE_DIR,
+        buffer_size: int = RING_BUFFER_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        segment_max_bytes: int = SEGMENT_MAX_BYTES,
+        segment_max_age: int = SEGMENT_MAX_AGE,
+        enabled: bool = ARCHIVE_ENABLED
+    ):
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age = segment_max_age
+        self.enabled = enabled
+
+        self._buffer: deque = deque(maxlen=buffer_size)
+        self._writer_task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+        # Segment state - only touched from the writer thread
+        self._segment_file = None
+        self._segment_raw = None
+        self._segment_path: Optional[str] = None
+        self._segment_opened_at = 0.0
+
+        self.stats = {
+            'frames_recorded': 0,
+            'frames_written': 0,
+            'frames_dropped': 0,
+            'flushes': 0,
+            'segments_rotated': 0,
+            'write_errors': 0
+        }
+
+    def record(self, data: bytes, conn_id: Optional[str] = None,
+               peer: Optional[str] = None, device_id: Optional[str] = None):
+        """Record a raw frame. O(1), never performs I/O."""
+        if not self.enabled or not data:
+            return
+
+        if len(self._buffer) == self.buffer_size:
+            # Ring buffer is full - the oldest frame is about to be overwritten
+            self.stats['frames_dropped'] += 1
+
+        self._buffer.append((time.time(), conn_id, peer, device_id, bytes(data)))
+        self.stats['frames_recorded'] += 1
+
+    async def start(self):
+        """Start the background writer"""
+        if not self.enabled or self._writer_task:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._stopping.clear()
+        self._writer_task = asyncio.create_task(self._writer_loop())
+        logger.info(f"Raw GPS archive writing to {self.directory} "
+                    f"(buffer: {self.buffer_size} frames, flush: {self.flush_interval}s)")
+
+    async def stop(self):
+        """Stop the writer, flush pending frames and close the open segment"""
+        if self._writer_task:
+            # Let the writer finish a batch in progress rather than cancelling it:
+            # a cancelled flush leaves its executor thread writing the segment
+            self._stopping.set()
+            await self._writer_task
+            self._writer_task = None
+
+        if self.enabled:
+            await self.flush()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._close_segment)
+
+    async def flush(self):
+        """Hand all buffered frames to the writer thread"""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+
+            # Swap buffers on the loop thread; the writer owns the old one
+            batch = self._buffer
+            self._buffer = deque(maxlen=self.buffer_size)
+
+            loop = asyncio.get_running_loop()
+            try:
+                await loop.run_in_executor(None, self._write_batch, batch)
+                self.stats['frames_written'] += len(batch)
+                self.stats['flushes'] += 1
+            except Exception as e:
+                self.stats['write_errors'] += 1
+                logger.error(f"Error writing raw GPS archive batch ({len(batch)} frames): {e}")
+
+    async def _writer_loop(self):
+        """Periodically flush the ring buffer until stop() is called"""
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def _write_batch(self, batch: deque):
+        """Serialize and append a batch to the current segment (writer thread)"""
+        self._maybe_rotate()
+
+        lines = []
+        for ts, conn_id, peer, device_id, data in batch:
+            lines.append(json.dumps({
+                't': ts,
+                'c': conn_id,
+                'p': peer,
+                'd': device_id,
+                'f': data.hex()
+            }, separators=(',', ':')))
+
+        self._segment_file.write(('\n'.join(lines) + '\n').encode('utf-8'))
+        # Sync flush so a crash loses at most one flush interval
+        self._segment_file.flush()
+
+    def _maybe_rotate(self):
+        """Open a new segment if none is open or the current one is full/old"""
+        if self._segment_file is not None:
+            too_big = self._segment_raw.tell() >= self.segment_max_bytes
+            too_old = time.time() - self._segment_opened_at >= self.segment_max_age
+            if not (too_big or too_old):
+                return
+            self._close_segment()
+            self.stats['segments_rotated'] += 1
+
+        name = f"{SEGMENT_PREFIX}{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{os.getpid()}{SEGMENT_SUFFIX}"
+        self._segment_path = os.path.join(self.directory, name)
+        # Append-only: an existing segment with the same name gets a new gzip member
+        self._segment_raw = open(self._segment_path, 'ab')
+        self._segment_file = gzip.GzipFile(fileobj=self._segment_raw, mode='ab')
+        self._segment_opened_at = time.time()
+
+    def _close_segment(self):
+        """Finish the gzip stream of the open segment"""
+        if self._segment_file is None:
+            return
+        try:
+            self._segment_file.close()
+            self._segment_raw.close()
+        finally:
+            self._segment_file = None
+            self._segment_raw = None
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get archive statistics"""
+        return {
+            'enabled': self.enabled,
+            'directory': self.directory,
+            'buffered_frames': len(self._buffer),
+            'current_segment': self._segment_path,
+            **self.stats
+        }
+
+
+def list_segments(directory: str = ARCHIVE_DIR) -> List[str]:
+    """List archive segment files in chronological order"""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted(
+        n for n in os.listdir(directory)
+        if n.startswith(SEGMENT_PREFIX) and n.endswith(SEGMENT_SUFFIX)
+    )
+    return [os.path.join(directory, n) for n in names]
+
+
+def iter_frames(paths: List[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yield archived frames from segment files.
+    Each frame is a dict with timestamp, conn_id, peer, device_id and raw bytes.
+    Segments that were not closed cleanly are read up to the last complete line.
+    """
+    for path in paths:
+        try:
+            with gzip.open(path, 'rb') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Partial trailing line of an unclosed segment
+                        continue
+                    yield {
+                        'timestamp': entry['t'],
+                        'conn_id': entry.get('c'),
+                        'peer': entry.get('p'),
+                        'device_id': entry.get('d'),
+                        'data': bytes.fromhex(entry['f'])
+                    }
+        except EOFError:
+            logger.warning(f"Segment {path} is truncated, replayed up to the last complete frame")
+        except OSError as e:
+            logger.error(f"Error reading segment {path}: {e}")
+
+
+# Global archive instance shared by GPS TCP servers in this process
+raw_archive = RawArchive()
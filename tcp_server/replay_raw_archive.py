@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Replay frames from the raw GPS archive
+- parse mode: feed archived frames back through the protocol parsers for debugging
+- send mode: replay frames over TCP against a running server for load testing,
+  one connection per archived connection, honouring the original timing
+Usage:
+    python tcp_server/replay_raw_archive.py [--dir logs/raw_archive] [--device ID] [--verbose]
+    python tcp_server/replay_raw_archive.py --target localhost:9090 --speed 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+# Add parent directory to path so imports work
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tcp_server.raw_archive import ARCHIVE_DIR, iter_frames, list_segments
+
+
+def filter_frames(frames, device=None, since=None, until=None):
+    """Filter archived frames by device and time window"""
+    for frame in frames:
+        if device and frame['device_id'] != device:
+            continue
+        if since and frame['timestamp'] < since:
+            continue
+        if until and frame['timestamp'] > until:
+            continue
+        yield frame
+
+
+def parse_frame(data: bytes):
+    """Run a raw frame through the same parsers the servers use"""
+    from tcp_server.gps_tcp_server import GPSProtocolParser
+    from tcp_server.protocols import parse_message
+
+    if data[0:1] == b'\x7E':
+        # Binary JT808 frame - handlers work on hex strings
+        return parse_message(data.hex())
+
+    text = data.decode('utf-8', errors='ignore').strip()
+    return GPSProtocolParser.parse(text) or parse_message(data.hex())
+
+
+def replay_parse(frames, verbose: bool = False):
+    """Parse every frame and print a summary"""
+    totals = Counter()
+    devices = Counter()
+    start = time.perf_counter()
+
+    for frame in frames:
+        totals['frames'] += 1
+        try:
+            parsed = parse_frame(frame['data'])
+        except Exception as e:
+            totals['errors'] += 1
+            print(f"❌ {datetime.fromtimestamp(frame['timestamp']).isoformat()} "
+                  f"{frame['device_id']}: parser raised {e}")
+            continue
+
+        if not parsed:
+            totals['unparsed'] += 1
+            if verbose:
+                print(f"⚠️  {datetime.fromtimestamp(frame['timestamp']).isoformat()} "
+                      f"unparsed: {frame['data'][:80]!r}")
+            continue
+
+        totals['parsed'] += 1
+        totals[f"protocol:{parsed.get('protocol')}"] += 1
+        devices[parsed.get('device_id') or frame['device_id']] += 1
+        if verbose:
+            print(f"✅ {datetime.fromtimestamp(frame['timestamp']).isoformat()} {parsed}")
+
+    elapsed = time.perf_counter() - start
+    print("\n" + "=" * 60)
+    print("REPLAY SUMMARY")
+    print("=" * 60)
+    for key, value in sorted(totals.items()):
+        print(f"  {key}: {value}")
+    print(f"  devices: {len(devices)}")
+    if elapsed > 0:
+        print(f"  parse rate: {totals['frames'] / elapsed:.0f} frames/s")
+
+
+async def _replay_connection(host: str, port: int, frames, speed: float, stats: Counter):
+    """Replay the frames of one archived connection over a new TCP connection"""
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        stats['connect_errors'] += 1
+        print(f"❌ Could not connect to {host}:{port}: {e}")
+        return
+
+    try:
+        previous = None
+        for frame in frames:
+            if previous is not None and speed > 0:
+                await asyncio.sleep(max(0.0, (frame['timestamp'] - previous) / speed))
+            previous = frame['timestamp']
+
+            writer.write(frame['data'])
+            await writer.drain()
+            stats['frames_sent'] += 1
+
+            # Drain ACKs so the server never blocks on a full socket
+            try:
+                await asyncio.wait_for(reader.read(1024), timeout=0.05)
+            except asyncio.TimeoutError:
+                pass
+    except (ConnectionError, OSError) as e:
+        stats['send_errors'] += 1
+        print(f"❌ Connection dropped while replaying: {e}")
+    finally:
+        writer.close()
+
+
+async def replay_send(frames, target: str, speed: float):
+    """Replay frames against a running TCP server"""
+    host, _, port = target.rpartition(':')
+
+    by_connection = {}
+    for frame in frames:
+        by_connection.setdefault(frame['conn_id'] or frame['device_id'], []).append(frame)
+
+    if not by_connection:
+        print("No frames to replay")
+        return
+
+    # Offset each connection so they start relative to the first archived frame
+    first = min(f[0]['timestamp'] for f in by_connection.values())
+    stats = Counter()
+
+    async def delayed(conn_frames):
+        if speed > 0:
+            await asyncio.sleep((conn_frames[0]['timestamp'] - first) / speed)
+        await _replay_connection(host or 'localhost', int(port), conn_frames, speed, stats)
+
+    print(f"Replaying {sum(len(f) for f in by_connection.values())} frames over "
+          f"{len(by_connection)} connections to {target} (speed: {f'{speed}x' if speed else 'max'})")
+    start = time.perf_counter()
+    await asyncio.gather(*(delayed(f) for f in by_connection.values()))
+    elapsed = time.perf_counter() - start
+
+    print(f"✅ Sent {stats['frames_sent']} frames in {elapsed:.1f}s "
+          f"({stats['frames_sent'] / elapsed if elapsed else 0:.0f} frames/s), "
+          f"connect errors: {stats['connect_errors']}, send errors: {stats['send_errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay raw GPS archive segments')
+    parser.add_argument('segments', nargs='*', help='Segment files (default: all in --dir)')
+    parser.add_argument('--dir', default=ARCHIVE_DIR, help='Archive directory')
+    parser.add_argument('--device', help='Only replay frames of this device ID')
+    parser.add_argument('--since', help='ISO datetime lower bound (local time)')
+    parser.add_argument('--until', help='ISO datetime upper bound (local time)')
+    parser.add_argument('--target', help='host:port to replay frames to instead of parsing')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='Time scaling for --target (0 = as fast as possible)')
+    parser.add_argument('--verbose', action='store_true', help='Print every parsed frame')
+    args = parser.parse_args()
+
+    paths = args.segments or list_segments(args.dir)
+    if not paths:
+        print(f"No archive segments found in {args.dir}")
+        sys.exit(1)
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    until = datetime.fromisoformat(args.until).timestamp() if args.until else None
+    frames = filter_frames(iter_frames(paths), args.device, since, until)
+
+    if args.target:
+        asyncio.run(replay_send(frames, args.target, args.speed))
+    else:
+        replay_parse(frames, args.verbose)
+
+
+if __name__ == '__main__':
+    main()
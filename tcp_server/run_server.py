@@ -41,7 +41,7 @@ async def main():
     logger.info("Server will log all received data to:")
     logger.info("  - Console output")
     logger.info("  - gps_tcp_server.log (server logs)")
-    logger.info("  - gps_tcp_data.log (parsed GPS data in JSON)")
+    logger.info("  - logs/raw_archive/ (compressed raw frame archive)")
     logger.info("Press Ctrl+C to stop")
     
     try:
@@ -23,9 +23,11 @@ from redis_queue_system.redis_queue import redis_queue
 from config import settings
 import signal
 
-# Configure logging with DEBUG level for raw data inspection
+# Configure logging
+# Raw frames are kept in the compressed archive (tcp_server/raw_archive.py);
+# set GPS_TCP_LOG_LEVEL=DEBUG for byte-level dumps in the log as well
 logging.basicConfig(
-    level=logging.DEBUG,
+    level=os.getenv('GPS_TCP_LOG_LEVEL', 'INFO').upper(),
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
         logging.StreamHandler(),
@@ -68,7 +70,8 @@ class RawLoggingProtocol(GPSClientProtocol):
         super().connection_made(transport)
     
     def data_received(self, data):
-        """Log raw data at byte level before processing"""
+        """Archive raw data and dump it at byte level before processing"""
+        parsed = None
         try:
             # Process localhost connections normally if they contain JT808 data
             if hasattr(self, 'is_localhost') and self.is_localhost:
@@ -81,67 +84,34 @@ class RawLoggingProtocol(GPSClientProtocol):
                     super().data_received(data)
                     return
             
-            # Log raw bytes for real connections
-            logger.info("=" * 60)
-            logger.info(f"📨 RAW DATA RECEIVED from {self.peername}")
-            logger.info(f"  Timestamp: {datetime.now().isoformat()}")
-            logger.info(f"  Size: {len(data)} bytes")
-            logger.info(f"  Raw bytes: {data}")
             hex_data = binascii.hexlify(data).decode('ascii')
-            logger.info(f"  Hex dump: {hex_data}")
-            
-            # Try to decode as various encodings
-            for encoding in ['utf-8', 'ascii', 'latin-1', 'cp1252']:
-                try:
-                    decoded = data.decode(encoding)
-                    logger.info(f"  Decoded ({encoding}): {repr(decoded)}")
-                    # Show printable version
-                    printable = ''.join(c if c.isprintable() or c in '\r\n\t' else f'\\x{ord(c):02x}' for c in decoded)
-                    logger.info(f"  Printable: {printable}")
-                    break
-                except Exception as e:
-                    logger.debug(f"  Could not decode as {encoding}: {e}")
-            
-            # Show ASCII representation with non-printable as dots
-            ascii_repr = ''.join(chr(b) if 32 <= b < 127 else '.' for b in data)
-            logger.info(f"  ASCII view: {ascii_repr}")
             
-            # Hex dump in traditional format (16 bytes per line)
-            hex_lines = []
-            for i in range(0, len(data), 16):
-                chunk = data[i:i+16]
-                hex_part = ' '.join(f'{b:02x}' for b in chunk)
-                ascii_part = ''.join(chr(b) if 32 <= b < 127 else '.' for b in chunk)
-                hex_lines.append(f"  {i:04x}: {hex_part:<48} {ascii_part}")
-            if hex_lines:
-                logger.info("  Hex dump (formatted):")
-                for line in hex_lines:
-                    logger.info(line)
+            # Byte-level dumps are expensive - only build them when debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                self._log_raw_dump(data, hex_data)
             
             # Try to parse with JT808 protocol handler
-            parsed = None
             response = None
             
             # Check if this is JT808 binary protocol (starts with 0x7E)
             if data[0:1] == b'\x7E':
-                logger.info("  🔍 Detected JT808 binary protocol (0x7E frame)")
+                logger.debug("  🔍 Detected JT808 binary protocol (0x7E frame)")
                 from tcp_server.protocols.jt808_production import JT808ProductionHandler
                 jt808_handler = JT808ProductionHandler()
                 parsed = jt808_handler.parse_message(hex_data)
                 if parsed:
-                    logger.info("  ✅ JT808 MESSAGE PARSED:")
-                    logger.info(f"    Message ID: 0x{parsed.get('msg_id', 0):04X}")
-                    logger.info(f"    Device ID: {parsed.get('device_id')}")
-                    logger.info(f"    Message Type: {parsed.get('message')}")
+                    logger.debug(f"  ✅ JT808 MESSAGE PARSED: 0x{parsed.get('msg_id', 0):04X} "
+                                 f"from {parsed.get('device_id')} ({parsed.get('message')})")
             elif parse_message:
                 # Try parsing with other protocol handlers
                 parsed = parse_message(hex_data)
             
             if parsed:
-                    logger.info("  ✅ PROTOCOL PARSED:")
-                    logger.info(f"    Protocol: {parsed.get('protocol')}")
-                    logger.info(f"    Message: {parsed.get('message')}")
-                    logger.info(f"    Device ID: {parsed.get('device_id')}")
+                    # Frames handled here bypass GPSClientProtocol.process_message, archive them now
+                    self.server.raw_archive.record(data, self.conn_id, str(self.peername),
+                                                   parsed.get('device_id') or self.device_id)
+                    logger.debug(f"  ✅ PROTOCOL PARSED: {parsed.get('protocol')} {parsed.get('message')} "
+                                 f"from {parsed.get('device_id')}")
                     
                     # Process GPS data through JT808 processor
                     if parsed.get('protocol') == 'JT808' and parsed.get('msg_id') == 0x0200:
@@ -181,25 +151,14 @@ class RawLoggingProtocol(GPSClientProtocol):
                     if response:
                             # Convert hex response to bytes
                             response_bytes = bytes.fromhex(response)
-                            logger.info(f"  📤 SENDING ACK RESPONSE:")
-                            logger.info(f"    Message Type: {parsed.get('message', 'Unknown')}")
-                            logger.info(f"    Response Hex: {response}")
-                            logger.info(f"    Response Bytes: {response_bytes}")
                             
                             # Identify response type
-                            if len(response_bytes) > 2:
+                            if logger.isEnabledFor(logging.DEBUG) and len(response_bytes) > 2:
                                 msg_id = (response_bytes[1] << 8) | response_bytes[2] if response_bytes[0] == 0x7E else 0
-                                if msg_id == 0x8100:
-                                    logger.info(f"    ✅ Registration ACK (0x8100) sent to {self.peername}!")
-                                elif msg_id == 0x8001:
-                                    logger.info(f"    ✅ General ACK (0x8001) sent to {self.peername}!")
-                                else:
-                                    logger.info(f"    ✅ ACK sent to {self.peername}!")
+                                logger.debug(f"  📤 Sending ACK 0x{msg_id:04X} for {parsed.get('message', 'Unknown')} "
+                                             f"to {self.peername}: {response}")
                             
                             self.transport.write(response_bytes)
-                            logger.info(f"    ✅ ACK DELIVERED successfully!")
-            
-            logger.info("=" * 60)
             
             # Store parsed data for parent class
             self.last_parsed = parsed
@@ -211,6 +170,35 @@ class RawLoggingProtocol(GPSClientProtocol):
         if not parsed:
             super().data_received(data)
     
+    def _log_raw_dump(self, data: bytes, hex_data: str):
+        """Log raw bytes in several representations for protocol debugging"""
+        logger.debug("=" * 60)
+        logger.debug(f"📨 RAW DATA RECEIVED from {self.peername}")
+        logger.debug(f"  Timestamp: {datetime.now().isoformat()}")
+        logger.debug(f"  Size: {len(data)} bytes")
+        logger.debug(f"  Raw bytes: {data}")
+        logger.debug(f"  Hex dump: {hex_data}")
+        
+        # Try to decode as various encodings
+        for encoding in ['utf-8', 'ascii', 'latin-1', 'cp1252']:
+            try:
+                decoded = data.decode(encoding)
+                logger.debug(f"  Decoded ({encoding}): {repr(decoded)}")
+                # Show printable version
+                printable = ''.join(c if c.isprintable() or c in '\r\n\t' else f'\\x{ord(c):02x}' for c in decoded)
+                logger.debug(f"  Printable: {printable}")
+                break
+            except Exception as e:
+                logger.debug(f"  Could not decode as {encoding}: {e}")
+        
+        # Hex dump in traditional format (16 bytes per line)
+        for i in range(0, len(data), 16):
+            chunk = data[i:i+16]
+            hex_part = ' '.join(f'{b:02x}' for b in chunk)
+            ascii_part = ''.join(chr(b) if 32 <= b < 127 else '.' for b in chunk)
+            logger.debug(f"  {i:04x}: {hex_part:<48} {ascii_part}")
+        logger.debug("=" * 60)
+    
     async def _process_location_data(self, parsed_data):
         """Process location data through JT808 processor"""
         try:
@@ -246,7 +234,6 @@ class StandaloneGPSServer(GPSTrackerTCPServer):
         super().__init__(host, port or settings.GPS_TCP_PORT)
         self.redis_queue = None
         self.db_connected = False
-        self.raw_data_file = None
         
     async def initialize_connections(self):
         """Initialize database and Redis connections"""
@@ -283,19 +270,7 @@ class StandaloneGPSServer(GPSTrackerTCPServer):
     
     async def queue_gps_data_to_redis(self, device_id: str, parsed_data: dict):
         """Log GPS data with enhanced debugging"""
-        logger.info("=" * 60)
-        logger.info(f"🗺️  PARSED GPS DATA")
-        logger.info(f"  Device ID: {device_id}")
-        logger.info(f"  Timestamp: {datetime.now().isoformat()}")
-        logger.info(f"  Parsed data:")
-        for key, value in parsed_data.items():
-            logger.info(f"    {key}: {value}")
-        logger.info("=" * 60)
-        
-        # Save to raw data file
-        if self.raw_data_file:
-            self.raw_data_file.write(f"{datetime.now().isoformat()} | Device: {device_id} | Data: {parsed_data}\n")
-            self.raw_data_file.flush()
+        logger.debug(f"🗺️  PARSED GPS DATA from {device_id}: {parsed_data}")
         
         # Redis queueing disabled for debugging
         # TODO: Implement Redis queueing when ready
@@ -304,9 +279,8 @@ class StandaloneGPSServer(GPSTrackerTCPServer):
         """Start the GPS TCP server with raw logging protocol"""
         await self.initialize_connections()
         
-        # Open raw data file for logging
-        self.raw_data_file = open('gps_raw_data.txt', 'a')
-        logger.info(f"Raw data logging to: gps_raw_data.txt")
+        # Start background writer for the raw message archive
+        await self.raw_archive.start()
         
         # Override the protocol factory to use our enhanced logging version
         loop = asyncio.get_running_loop()
@@ -332,8 +306,7 @@ class StandaloneGPSServer(GPSTrackerTCPServer):
         logger.info(f"  Log files:")
         logger.info(f"    - Console: STDOUT")
         logger.info(f"    - Raw logs: gps_tcp_raw.log")
-        logger.info(f"    - GPS data: gps_tcp_data.log")
-        logger.info(f"    - Raw data: gps_raw_data.txt")
+        logger.info(f"    - Raw archive: {self.raw_archive.directory}")
         logger.info("=" * 60)
         
         # Hook up the queue method
@@ -357,8 +330,6 @@ class StandaloneGPSServer(GPSTrackerTCPServer):
     async def shutdown(self):
         """Clean shutdown"""
         logger.info("Shutting down GPS TCP server...")
-        if self.raw_data_file:
-            self.raw_data_file.close()
         await super().shutdown()
 
 
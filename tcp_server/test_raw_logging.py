@@ -76,8 +76,7 @@ def test_raw_logging(host='localhost', port=9090):
         print("Check the server logs for raw data output:")
         print("  - Console output")
         print("  - gps_tcp_raw.log")
-        print("  - gps_raw_data.txt")
-        print("  - gps_tcp_data.log")
+        print("  - logs/raw_archive/ (python tcp_server/replay_raw_archive.py --verbose)")
         
         # Keep connection open for a bit
         time.sleep(2)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Fake XContest Livedata + HFSS race API for local testing
+
+Serves the endpoints XContestService calls with generated pilots and tracks:
+    GET /race/xc_api_key, GET /race/pilots            (HFSS)
+    GET /livedata/users, GET /livedata/track          (XContest)
+    GET /_stats                                       (request counts per endpoint)
+
+Run it and point the API at it:
+    python tests/fake_xcontest_server.py --port 8099 --pilots 20 --delay 0.2
+    HFSS_SERVER=http://localhost:8099/ XCONTEST_API_URL=http://localhost:8099/livedata uvicorn app:app
+"""
+import argparse
+import asyncio
+import math
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import uvicorn
+from fastapi import FastAPI, Query
+
+app = FastAPI()
+state = {'pilots': 10, 'delay': 0.0, 'points': 600}
+request_counts = Counter()
+
+
+def pilot_handle(i: int) -> str:
+    return f"fakepilot{i:03d}"
+
+
+def flight_start() -> datetime:
+    # Flights start an hour ago so they always fall in today's window
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    return now - timedelta(hours=1)
+
+
+def fix(i: int, n: int, when: datetime) -> list:
+    lat = 46.0 + i * 0.01 + 0.0001 * n * math.cos(n / 50.0)
+    lon = 7.0 + i * 0.01 + 0.0001 * n * math.sin(n / 50.0)
+    return [round(lon, 6), round(lat, 6), 1500 + (n % 200), {'t': when.strftime('%Y-%m-%dT%H:%M:%SZ')}]
+
+
+async def respond(endpoint: str):
+    request_counts[endpoint] += 1
+    if state['delay']:
+        await asyncio.sleep(state['delay'])
+
+
+@app.get("/race/xc_api_key")
+async def xc_api_key():
+    await respond('hfss_xc_api_key')
+    return {'xc_entity': 'contest:fake', 'xc_api_key': 'fake-key'}
+
+
+@app.get("/race/pilots")
+async def pilots():
+    await respond('hfss_pilots')
+    return [{'_id': f"pilot{i:03d}", 'name': 'Fake', 'surname': f"Pilot {i}",
+             'xcontest': pilot_handle(i)} for i in range(state['pilots'])]
+
+
+@app.get("/livedata/users")
+async def users(entity: str = Query(...), opentime: str = Query(...), closetime: str = Query(...)):
+    await respond('xcontest_users')
+    start = flight_start()
+    last = start + timedelta(seconds=state['points'] - 1)
+    return {'users': {
+        str(i): {
+            'username': pilot_handle(i),
+            'flights': [{
+                'uuid': f"fake-flight-{i:03d}",
+                'firstFix': fix(i, 0, start),
+                'lastFix': fix(i, state['points'] - 1, last),
+                'landed': False,
+                'glider': 'Fake Glider'
+            }]
+        } for i in range(state['pilots'])
+    }}
+
+
+@app.get("/livedata/track")
+async def track(entity: str = Query(...), flight: str = Query(...), lastfixtime: str = Query(None)):
+    await respond('xcontest_track')
+    i = int(flight.rsplit('-', 1)[-1])
+    start = flight_start()
+    first = 0
+    if lastfixtime:
+        since = datetime.strptime(lastfixtime, '%Y-%m-%dT%H:%M:%SZ').replace(tzinfo=timezone.utc)
+        first = max(0, min(state['points'], int((since - start).total_seconds()) + 1))
+    coordinates = [fix(i, n, start)[:3] + [{'dt': 1}] for n in range(first, state['points'])]
+    return {'flight': {
+        'geometry': {'type': 'LineString', 'coordinates': coordinates},
+        'properties': {'firstFixTime': (start + timedelta(seconds=first - 1)).strftime('%Y-%m-%dT%H:%M:%SZ')}
+    }}
+
+
+@app.get("/_stats")
+async def stats():
+    return dict(request_counts)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fake XContest/HFSS server')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--pilots', type=int, default=10)
+    parser.add_argument('--points', type=int, default=600, help='Fixes per flight')
+    parser.add_argument('--delay', type=float, default=0.0, help='Seconds added to every response')
+    args = parser.parse_args()
+    state.update(pilots=args.pilots, delay=args.delay, points=args.points)
+    uvicorn.run(app, host='127.0.0.1', port=args.port)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Persistence of device live flights as uploads (api/async_persist.py)
+
+The SQL tests need only the app's dependencies. The persist tests need a PostgreSQL/PostGIS
+database with the app's schema and are skipped when TEST_DATABASE_URL isn't set; everything
+they create is under a race of its own, deleted afterwards.
+
+Run the tests:   TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_async_persist.py
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.async_persist import copy_points_sql, persist_flight  # noqa: E402
+
+DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+requires_db = pytest.mark.skipif(not DATABASE_URL, reason='TEST_DATABASE_URL is not set')
+
+START = datetime(2025, 6, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def where_clause(statement):
+    sql = ' '.join(str(statement).split())
+    return sql[sql.index(' WHERE ') + 7:sql.index(' ORDER BY ')]
+
+
+def test_copy_without_time_bounds():
+    statement = copy_points_sql(None, None)
+    assert where_clause(statement) == 'flight_uuid = :flight_uuid'
+    assert 'ON CONFLICT (flight_id, lat, lon, datetime) DO NOTHING' in str(statement)
+
+
+def test_copy_with_time_bounds():
+    assert where_clause(copy_points_sql(START, START + timedelta(hours=1))) == (
+        'flight_uuid = :flight_uuid AND datetime >= :start_datetime AND datetime <= :end_datetime')
+    assert where_clause(copy_points_sql(START, None)) == 'flight_uuid = :flight_uuid AND datetime >= :start_datetime'
+    assert where_clause(copy_points_sql(None, START)) == 'flight_uuid = :flight_uuid AND datetime <= :end_datetime'
+
+
+@pytest.fixture
+def db():
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import sessionmaker
+
+    from database.models import Race
+
+    engine = create_engine(DATABASE_URL)
+    session = sessionmaker(bind=engine)()
+    race = Race(race_id=f"persist-{uuid.uuid4().hex[:12]}", name='Persist test', date=START,
+                end_date=START + timedelta(days=1), timezone='UTC', location='Test')
+    session.add(race)
+    session.commit()
+    session.info['race'] = race
+    yield session
+    session.rollback()
+    session.execute(text("DELETE FROM races WHERE id = :id"), {'id': race.id})
+    session.commit()
+    session.close()
+    engine.dispose()
+
+
+def add_device_flight(db, points=10):
+    from database.models import Flight, LiveTrackPoint
+
+    race = db.info['race']
+    fixes = [{'lat': 46.0 + i * 1e-4, 'lon': 7.0, 'elevation': 1000.0 + i,
+              'datetime': (START + timedelta(seconds=10 * i)).isoformat()} for i in range(points)]
+    flight = Flight(flight_id=f"flymaster-{uuid.uuid4().hex[:12]}", race_uuid=race.id, race_id=race.race_id,
+                    pilot_id='p1', pilot_name='Pilot', source='flymaster_live', created_at=START,
+                    first_fix=fixes[0], last_fix=fixes[-1], total_points=points)
+    db.add(flight)
+    db.flush()
+    db.add_all(LiveTrackPoint(datetime=START + timedelta(seconds=10 * i), flight_uuid=flight.id,
+                              flight_id=flight.flight_id, lat=fix['lat'], lon=fix['lon'],
+                              elevation=fix['elevation']) for i, fix in enumerate(fixes))
+    db.commit()
+    return flight
+
+
+def uploaded_times(db, upload_uuid):
+    from sqlalchemy import select
+
+    from database.models import UploadedTrackPoint
+
+    return db.execute(select(UploadedTrackPoint.datetime).where(UploadedTrackPoint.flight_uuid == upload_uuid)
+                      .order_by(UploadedTrackPoint.datetime)).scalars().all()
+
+
+@requires_db
+def test_persist_copies_points_in_range_and_replaces_the_copy(db):
+    from database.models import Flight
+
+    flight = add_device_flight(db)
+
+    details = persist_flight(db, flight, START + timedelta(seconds=20), START + timedelta(seconds=50))
+    assert details['points_copied'] == 4
+    upload_uuid = uuid.UUID(details['upload_flight_uuid'])
+    assert uploaded_times(db, upload_uuid) == [START + timedelta(seconds=s) for s in (20, 30, 40, 50)]
+
+    # Without bounds the copy is replaced by all the points
+    details = persist_flight(db, flight)
+    assert details['points_copied'] == 10 and details['upload_flight_uuid'] == str(upload_uuid)
+    assert len(uploaded_times(db, upload_uuid)) == 10
+
+    upload = db.get(Flight, upload_uuid)
+    db.refresh(upload)
+    assert upload.source == 'flymaster_upload' and upload.total_points == 10
+    assert upload.last_fix['elevation'] == 1009.0
+
+
+@requires_db
+def test_persist_without_points_in_range_keeps_the_copy(db):
+    flight = add_device_flight(db)
+    details = persist_flight(db, flight)
+
+    assert persist_flight(db, flight, START + timedelta(days=1)) is None
+    assert len(uploaded_times(db, uuid.UUID(details['upload_flight_uuid']))) == 10
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Delivery of broadcast bus payloads when the Redis listener is down
+
+Run the tests:   python -m pytest tests/test_broadcast_bus.py
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import broadcast_bus as broadcast_bus_module
+from api.broadcast_bus import BroadcastBus
+
+
+class FakePubSub:
+    """Subscription whose listen() fails while the server has `failures` left to report"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = asyncio.Queue()
+
+    async def psubscribe(self, pattern):
+        self.redis.subscriptions += 1
+        self.redis.subscribers.append(self)
+
+    async def listen(self):
+        if self.redis.failures:
+            self.redis.failures -= 1
+            raise ConnectionError('connection lost')
+        while True:
+            yield await self.messages.get()
+
+    async def close(self):
+        if self in self.redis.subscribers:
+            self.redis.subscribers.remove(self)
+
+
+class FakeRedis:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.subscriptions = 0
+        self.subscribers = []
+        self.published = []
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def publish(self, channel, data):
+        # Like Redis, only current subscribers get the message
+        self.published.append(channel)
+        for subscriber in self.subscribers:
+            await subscriber.messages.put({'type': 'pmessage', 'channel': channel.encode('utf-8'), 'data': data})
+
+
+def make_bus(redis):
+    bus = BroadcastBus()
+    bus.client = redis
+    delivered = []
+
+    async def handler(key, payload, local):
+        delivered.append((key, payload, local))
+
+    bus.subscribe('race', handler)
+    return bus, delivered
+
+
+async def start(bus):
+    await bus._subscribe()
+    bus._task = asyncio.create_task(bus._listen())
+    await asyncio.sleep(0)
+
+
+def test_publish_goes_through_redis_while_listening():
+    async def scenario():
+        bus, delivered = make_bus(FakeRedis())
+        await start(bus)
+        await bus.publish('race', 'r1', b'update')
+        await asyncio.sleep(0.01)
+        assert delivered == [('r1', b'update', True)]
+        assert bus.stats['delivered_locally'] == 0
+        bus._task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_dead_listener_is_restarted_and_payload_delivered_locally():
+    async def scenario():
+        redis = FakeRedis()
+        bus, delivered = make_bus(redis)
+
+        async def crashed():
+            raise RuntimeError('listener bug')
+
+        bus._task = asyncio.create_task(crashed())
+        await asyncio.sleep(0)
+        assert bus._task.done() and not bus.listening
+
+        await bus.publish('race', 'r1', b'first')
+        # Sent to the other workers and handed to this worker's sockets directly
+        assert redis.published == ['broadcast:race:r1']
+        assert delivered == [('r1', b'first', True)]
+        assert bus.stats['listener_restarts'] == 1
+
+        await asyncio.sleep(0.01)
+        assert bus.listening
+        await bus.publish('race', 'r1', b'second')
+        await asyncio.sleep(0.01)
+        assert delivered == [('r1', b'first', True), ('r1', b'second', True)]
+        bus._task.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_listener_resubscribes_after_losing_the_connection(monkeypatch):
+    monkeypatch.setattr(broadcast_bus_module, 'LISTENER_RETRY_SECONDS', 0.01)
+
+    async def scenario():
+        redis = FakeRedis(failures=1)
+        bus, delivered = make_bus(redis)
+        await start(bus)
+        assert not bus.listening
+
+        await bus.publish('race', 'r1', b'during outage')
+        assert delivered == [('r1', b'during outage', True)]
+
+        await asyncio.sleep(0.05)
+        assert bus.listening and redis.subscriptions == 2
+        bus._task.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Release timing tests for the competition delay line
+
+The line runs on a fake clock, so every release happens at an exact, known time.
+
+Run the tests:   python -m pytest tests/test_delay_line.py
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.delay_line import DelayLine
+
+START = datetime(2025, 6, 1, 12, 0, tzinfo=timezone.utc)
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def fix(seconds, lat=46.0, lon=7.0):
+    return {'datetime': START + timedelta(seconds=seconds), 'lat': lat + seconds * 1e-4, 'lon': lon,
+            'elevation': 1000.0 + seconds}
+
+
+def make_line(delay=60):
+    clock = FakeClock(START.timestamp())
+    return DelayLine(delay=delay, clock=clock), clock
+
+
+def test_fixes_are_released_exactly_when_delay_expires():
+    line, _ = make_line()
+    line.admit('race', 'flight', [fix(0), fix(1), fix(2)])
+    assert line.next_due() == START.timestamp() + 60
+
+    assert line.release(START.timestamp() + 59.999) == {}
+    released = line.release(START.timestamp() + 60)
+    assert [point.datetime for point in released['race']['flight']] == [START]
+
+    released = line.release(START.timestamp() + 62)
+    assert len(released['race']['flight']) == 2
+    assert line.next_due() is None
+    assert line.version('race') == 2
+
+
+def test_late_fixes_are_released_on_next_release():
+    line, _ = make_line()
+    line.admit('race', 'flight', [fix(-600)])
+    assert len(line.release(START.timestamp())['race']['flight']) == 1
+
+
+def test_releases_are_per_race():
+    line, _ = make_line()
+    line.admit('a', 'flight-a', [fix(0)])
+    line.admit('b', 'flight-b', [fix(5)])
+    assert list(line.release(START.timestamp() + 60)) == ['a']
+    assert line.version('a') == 1 and line.version('b') == 0
+    assert list(line.release(START.timestamp() + 65)) == ['b']
+
+
+def test_window_is_ordered_and_deduplicated():
+    line, _ = make_line()
+    line._task = SimpleNamespace(done=lambda: False)  # serve windows as if running
+    line.seed('flight', [SimpleNamespace(**fix(0)), SimpleNamespace(**fix(1))])
+    line.admit('race', 'flight', [fix(3), fix(1), fix(2)])
+    line.release(START.timestamp() + 120)
+    window = line.window('flight')
+    assert [point.datetime for point in window] == [START + timedelta(seconds=s) for s in range(4)]
+
+
+def test_window_misses_until_seeded_or_when_incomplete():
+    line, _ = make_line()
+    line._task = SimpleNamespace(done=lambda: False)
+    line.admit('race', 'flight', [fix(10), fix(11)])
+    line.release(START.timestamp() + 100)
+    assert line.window('flight') is None
+
+    line.seed('flight', [])
+    assert len(line.window('flight')) == 2
+    # Nothing known before the window's first fix
+    assert line.window('flight', since=START) is None
+    assert line.window('flight', since=START + timedelta(seconds=10)) is not None
+    assert line.window('flight', min_points=3) is None
+
+
+def test_cutoff_follows_releases():
+    line, clock = make_line()
+    line._task = SimpleNamespace(done=lambda: False)
+    clock.now = START.timestamp() + 300
+    line.admit('race', 'flight', [fix(200)])
+    line.release(START.timestamp() + 260)
+    assert line.cutoff('race') == START + timedelta(seconds=200)
+    # Without new releases the cutoff holds still
+    clock.now = START.timestamp() + 400
+    assert line.cutoff('race') == START + timedelta(seconds=200)
+    # Races without releases only show fixes from before startup
+    assert line.cutoff('other') == START
+
+
+def test_cutoff_without_running_line_is_now_minus_delay():
+    line, clock = make_line()
+    clock.now = START.timestamp() + 1000
+    assert line.cutoff('race') == START + timedelta(seconds=940)
+
+
+def test_wait_returns_on_release():
+    async def scenario():
+        line, _ = make_line()
+        line.admit('race', 'flight', [fix(0)])
+        waiter = asyncio.create_task(line.wait('race', 0, timeout=5))
+        await asyncio.sleep(0)
+        line.release(START.timestamp() + 60)
+        return await asyncio.wait_for(waiter, 1)
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_prune_drops_idle_flights():
+    line, _ = make_line()
+    line.admit('race', 'flight', [fix(0)])
+    line.release(START.timestamp() + 60)
+    assert line.prune(START.timestamp() + 60 + 6 * 3600 + 1) == 1
+    assert line.get_stats()['flights'] == 0
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+State transitions and inactivity of the incremental flight state engine (api/flight_state.py),
+with its windows kept in memory and the database calls replaced
+
+Run the tests:   python -m pytest tests/test_flight_state_engine.py
+"""
+import asyncio
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api import flight_state as flight_state_module
+from api.flight_state import INACTIVITY_THRESHOLD, FlightStateEngine
+
+
+def make_engine(monkeypatch, stored_states=None):
+    engine = FlightStateEngine()
+    monkeypatch.setattr(FlightStateEngine, 'client', None)
+    written = []
+    monkeypatch.setattr(flight_state_module, '_load_recent_points', lambda flight_uuids: {})
+    monkeypatch.setattr(flight_state_module, '_load_states', lambda flight_uuids: dict(stored_states or {}))
+    monkeypatch.setattr(flight_state_module, '_write_states',
+                        lambda rows: written.extend((row['id'], json.loads(row['state'])) for row in rows))
+    return engine, written
+
+
+def track(start, count, step_degrees):
+    """One fix per second heading north, step_degrees of latitude apart"""
+    return [{'datetime': start + timedelta(seconds=i), 'lat': 46.0 + step_degrees * i,
+             'lon': 7.0, 'elevation': 1000.0} for i in range(count)]
+
+
+def test_landing_follows_flying(monkeypatch):
+    engine, written = make_engine(monkeypatch)
+    flight_uuid = uuid.uuid4()
+    start = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+    engine.add_points(flight_uuid, track(start, 20, 1e-4))
+    asyncio.run(engine.flush())
+    engine.add_points(flight_uuid, track(start + timedelta(seconds=20), 20, 0.0))
+    asyncio.run(engine.flush())
+
+    assert [state['state'] for _, state in written] == ['flying', 'landing']
+
+
+def test_launch_continues_from_stored_state(monkeypatch):
+    flight_uuid = uuid.uuid4()
+    engine, written = make_engine(monkeypatch, {flight_uuid: 'stationary'})
+
+    engine.add_points(flight_uuid, track(datetime.now(timezone.utc), 10, 1e-4))
+    asyncio.run(engine.flush())
+
+    assert written[-1][1]['state'] == 'launch'
+
+
+def test_flights_that_stop_sending_become_inactive(monkeypatch):
+    engine, written = make_engine(monkeypatch)
+    flight_uuid = uuid.uuid4()
+    start = datetime.now(timezone.utc) - INACTIVITY_THRESHOLD - timedelta(minutes=1)
+
+    engine.add_points(flight_uuid, track(start, 10, 1e-4))
+    asyncio.run(engine.flush())
+    asyncio.run(engine.flush())
+
+    flight, state = written[-1]
+    assert flight == flight_uuid and state['state'] == 'inactive'
+    assert state['previous_state'] == 'flying'
+    assert flight_uuid not in engine.windows
+    # Only reported once
+    asyncio.run(engine.flush())
+    assert len(written) == 2
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tests for resuming tracking websocket sessions from the per-race replay log
+
+Run the tests:   python -m pytest tests/test_replay_log.py
+"""
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from starlette.websockets import WebSocketState
+
+import ws_conn
+from ws_conn import ConnectionManager, ReplayLog
+
+
+class FakeSocket:
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, message):
+        self.sent.append(message)
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+def flight(uuid, lat=46.0, lon=7.0):
+    return {'uuid': uuid, 'lastFix': {'lat': lat, 'lon': lon}}
+
+
+def test_log_replays_only_missed_updates():
+    log = ReplayLog(size=3)
+    for index in range(5):
+        log.append({'type': 'track_update', 'flights': [index]})
+    assert log.seq == 5
+    assert [json.loads(text)['seq'] for text in log.since(log.session, 3)] == [4, 5]
+    assert log.since(log.session, 5) == []
+    # Beyond the log, from another session or from the future: start over
+    assert log.since(log.session, 1) is None
+    assert log.since('other', 4) is None
+    assert log.since(log.session, 6) is None
+
+
+def test_reconnecting_client_resumes_after_its_last_seq():
+    async def scenario():
+        manager = ConnectionManager()
+        first = FakeSocket()
+        await manager.connect(first, 'race', 'client')
+        await manager.send_update('race', [flight('a')])
+        session, seq = manager.replay_log('race').session, first.sent[-1]['seq']
+
+        # The only viewer drops, updates were logged while it is away
+        await manager.disconnect(first, 'client')
+        manager.replay_log('race').append({'type': 'track_update', 'race_id': 'race', 'flights': [flight('b')]})
+
+        second = FakeSocket()
+        await manager.connect(second, 'race', 'client')
+        assert await manager.resume(second, 'race', session, seq)
+        resumed = second.sent[-1]
+        assert resumed['type'] == 'resumed' and resumed['seq'] == seq + 1
+        assert [update['flights'][0]['uuid'] for update in resumed['updates']] == ['b']
+
+        assert not await manager.resume(FakeSocket(), 'race', 'stale', seq)
+
+    asyncio.run(scenario())
+
+
+def test_updates_sent_while_vacated_are_replayed(monkeypatch):
+    manager = ConnectionManager()
+    monkeypatch.setattr(ws_conn, 'manager', manager)
+
+    async def scenario():
+        first = FakeSocket()
+        await manager.connect(first, 'race', 'client')
+        await ws_conn._deliver_track_update('race', json.dumps([flight('a')]).encode(), True)
+        session, seq = manager.replay_log('race').session, first.sent[-1]['seq']
+
+        await manager.disconnect(first, 'client')
+        assert 'race' in manager.vacated
+        # Delivered through the broadcast bus while nobody is watching
+        await ws_conn._deliver_track_update('race', json.dumps([flight('b')]).encode(), True)
+        await ws_conn._deliver_track_update('race', json.dumps([flight('c')]).encode(), True)
+        # Races this worker never served are not logged
+        await ws_conn._deliver_track_update('other', json.dumps([flight('x')]).encode(), True)
+        assert 'other' not in manager.replay_logs
+
+        second = FakeSocket()
+        await manager.connect(second, 'race', 'client')
+        assert await manager.resume(second, 'race', session, seq)
+        resumed = second.sent[-1]
+        assert resumed['seq'] == seq + 2
+        assert [update['flights'][0]['uuid'] for update in resumed['updates']] == ['b', 'c']
+
+    asyncio.run(scenario())
+
+
+def test_viewport_updates_carry_the_logged_seq():
+    async def scenario():
+        manager = ConnectionManager()
+        everything, filtered = FakeSocket(), FakeSocket()
+        await manager.connect(everything, 'race', 'a')
+        await manager.connect(filtered, 'race', 'b')
+        manager.set_viewport(filtered, [6.9, 45.9, 7.1, 46.1], 12)
+        await manager.send_update('race', [flight('in'), flight('out', lat=47.0)])
+        assert everything.sent[-1]['seq'] == filtered.sent[-1]['seq'] == manager.replay_log('race').seq
+        assert [f['uuid'] for f in filtered.sent[-1]['flights']] == ['in']
+
+    asyncio.run(scenario())
+
+
+def test_race_state_expires_after_grace(monkeypatch):
+    async def scenario():
+        manager = ConnectionManager()
+        socket = FakeSocket()
+        await manager.connect(socket, 'race', 'client')
+        await manager.send_update('race', [flight('a')])
+        await manager.disconnect(socket, 'client')
+        assert 'race' in manager.replay_logs
+
+        monkeypatch.setattr(ws_conn, 'REPLAY_GRACE_SECONDS', -1)
+        manager.expire_vacated()
+        assert 'race' not in manager.replay_logs
+
+    asyncio.run(scenario())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Nightly live retention against a real database
+
+Needs a PostgreSQL/PostGIS database with the app's schema (TimescaleDB for the drop_chunks
+test) and the app's dependencies; the tests are skipped when TEST_DATABASE_URL isn't set. Everything they create is
+under a race of its own, deleted afterwards, but the drop_chunks test drops every live point
+chunk older than 5 days: point it at a scratch database.
+
+Run the tests:   TEST_DATABASE_URL=postgresql://... python -m pytest tests/test_retention.py
+"""
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+if not DATABASE_URL:
+    pytest.skip('TEST_DATABASE_URL is not set', allow_module_level=True)
+
+from sqlalchemy import create_engine, func, select, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from database.models import Flight, LiveTrackPoint, Race, UploadedTrackPoint  # noqa: E402
+from database.retention import expire_live_data  # noqa: E402
+
+NOW = datetime.now(timezone.utc)
+CUTOFF = NOW - timedelta(days=5)
+OLD = NOW - timedelta(days=8)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(DATABASE_URL)
+    session = sessionmaker(bind=engine)()
+    race = Race(race_id=f"retention-{uuid.uuid4().hex[:12]}", name='Retention test', date=OLD,
+                end_date=OLD + timedelta(days=1), timezone='UTC', location='Test')
+    session.add(race)
+    session.commit()
+    session.info['race'] = race
+    yield session
+    session.rollback()
+    session.execute(text("DELETE FROM races WHERE id = :id"), {'id': race.id})
+    session.commit()
+    session.close()
+    engine.dispose()
+
+
+def add_flight(db, source, start, points=10):
+    race = db.info['race']
+    fixes = [{'lat': 46.0 + i * 1e-4, 'lon': 7.0, 'elevation': 1000.0,
+              'datetime': (start + timedelta(seconds=10 * i)).isoformat()} for i in range(points)]
+    flight = Flight(flight_id=f"{source}-{uuid.uuid4().hex[:12]}", race_uuid=race.id, race_id=race.race_id,
+                    pilot_id='p1', pilot_name='Pilot', source=source, created_at=start,
+                    first_fix=fixes[0], last_fix=fixes[-1], total_points=points)
+    db.add(flight)
+    db.flush()
+    db.add_all(LiveTrackPoint(datetime=start + timedelta(seconds=10 * i), flight_uuid=flight.id,
+                              flight_id=flight.flight_id, lat=fix['lat'], lon=fix['lon'],
+                              elevation=fix['elevation']) for i, fix in enumerate(fixes))
+    db.commit()
+    return flight.id
+
+
+def point_count(db, flight_uuid):
+    return db.execute(select(func.count()).select_from(LiveTrackPoint)
+                      .where(LiveTrackPoint.flight_uuid == flight_uuid)).scalar()
+
+
+def flight_exists(db, flight_uuid):
+    return db.execute(select(Flight.id).where(Flight.id == flight_uuid)).first() is not None
+
+
+def test_default_keeps_device_flights_and_their_points(db):
+    live = add_flight(db, 'live', OLD)
+    devices = [add_flight(db, source, OLD) for source in ('flymaster_live', 'tk905b_live', 'digifly_live')]
+    recent = add_flight(db, 'live', NOW - timedelta(hours=1))
+
+    expired = expire_live_data(db, CUTOFF, drop_chunks=False)
+
+    assert expired['method'] == 'flights'
+    assert not flight_exists(db, live) and point_count(db, live) == 0
+    for flight_uuid in devices:
+        assert flight_exists(db, flight_uuid)
+        assert point_count(db, flight_uuid) == 10
+    assert flight_exists(db, recent) and point_count(db, recent) == 10
+
+
+def test_dropping_chunks_persists_device_flights_first(db):
+    try:
+        db.execute(text("SELECT 1 FROM timescaledb_information.hypertables "
+                        "WHERE hypertable_name = 'live_track_points'")).one()
+    except Exception:
+        db.rollback()
+        pytest.skip('live_track_points is not a hypertable')
+    old = [add_flight(db, source, OLD) for source in ('live', 'flymaster_live')]
+    device_flight_id = db.execute(select(Flight.flight_id).where(Flight.id == old[1])).scalar()
+    recent = add_flight(db, 'flymaster_live', NOW - timedelta(hours=1))
+
+    expired = expire_live_data(db, CUTOFF, drop_chunks=True)
+
+    assert expired['persisted']['persisted'] == 1 and expired['persisted']['failed'] == 0
+    for flight_uuid in old:
+        assert not flight_exists(db, flight_uuid)
+    assert flight_exists(db, recent) and point_count(db, recent) == 10
+
+    upload = db.execute(select(Flight).where(Flight.flight_id == f"{device_flight_id}-upload")).scalar_one()
+    assert upload.source == 'flymaster_upload' and upload.total_points == 10
+    assert db.execute(select(func.count()).select_from(UploadedTrackPoint)
+                      .where(UploadedTrackPoint.flight_uuid == upload.id)).scalar() == 10
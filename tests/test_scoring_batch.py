@@ -8,9 +8,14 @@ import uuid
 from datetime import datetime, timezone
 import random
 import time
+import gzip
+import os
 
 # Configuration
 API_URL = "http://localhost:8000/scoring/batch"
+STREAM_URL = "http://localhost:8000/scoring/batch/stream"
+# api.hikeandfly.app token required by the stream endpoint
+API_TOKEN = os.getenv("API_TOKEN", "")
 
 
 def generate_track_points(count=10):
@@ -76,6 +81,85 @@ def test_batch_upload(batch_size=100):
     return response
 
 
+def test_stream_upload(batch_size=10000, compress=True):
+    """Test the NDJSON stream endpoint (optionally gzip compressed)"""
+    print(f"Testing stream upload with {batch_size} points (gzip={compress})...")
+
+    tracks = generate_track_points(batch_size)
+    body = "\n".join(json.dumps(track) for track in tracks).encode()
+    headers = {"Content-Type": "application/x-ndjson", "Authorization": f"Bearer {API_TOKEN}"}
+    if compress:
+        body = gzip.compress(body)
+        headers["Content-Encoding"] = "gzip"
+
+    start_time = time.time()
+    response = requests.post(STREAM_URL, data=body, headers=headers)
+    elapsed_time = time.time() - start_time
+
+    print(f"Status code: {response.status_code}")
+    print(f"Response: {response.text}")
+    print(f"Body size: {len(body) / 1024:.1f} KiB")
+    print(f"Elapsed time: {elapsed_time:.2f} seconds")
+    print(f"Points per second: {batch_size / elapsed_time:.2f}")
+
+    # Re-sending the same points must report them all as skipped duplicates
+    if response.status_code == 201:
+        flight_uuid = response.json()["flight_uuid"]
+        repeat = requests.post(STREAM_URL, params={"flight_uuid": flight_uuid},
+                               data=body, headers=headers)
+        print(f"Repeat upload: {repeat.text}")
+
+    return response
+
+
+def test_stream_limits():
+    """Oversized streams are rejected while they are read"""
+    headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip",
+               "Authorization": f"Bearer {API_TOKEN}"}
+
+    # A gzip bomb: a few hundred KiB expanding past the decompressed size limit
+    bomb = gzip.compress(b"\n" * (300 * 1024 * 1024))
+    response = requests.post(STREAM_URL, data=bomb, headers=headers)
+    print(f"Gzip bomb ({len(bomb) / 1024:.0f} KiB): {response.status_code} {response.text}")
+    assert response.status_code == 413
+
+    # One line without a newline, longer than the line limit
+    response = requests.post(STREAM_URL, data=gzip.compress(b"x" * (1024 * 1024)), headers=headers)
+    print(f"Long line: {response.status_code} {response.text}")
+    assert response.status_code == 400
+
+    # Concatenated gzip members are one body; a truncated one is rejected
+    lines = [json.dumps(track).encode() + b"\n" for track in generate_track_points(20)]
+    members = gzip.compress(b"".join(lines[:10])) + gzip.compress(b"".join(lines[10:]))
+    response = requests.post(STREAM_URL, data=members, headers=headers)
+    print(f"Two gzip members: {response.status_code} {response.text}")
+    assert response.status_code == 201 and response.json()["points_added"] == 20
+    response = requests.post(STREAM_URL, data=members[:-4], headers=headers)
+    print(f"Truncated gzip: {response.status_code} {response.text}")
+    assert response.status_code == 400
+
+    response = requests.post(STREAM_URL, data=b"{}", headers={"Content-Type": "application/x-ndjson"})
+    print(f"Without a token: {response.status_code}")
+    assert response.status_code in (401, 403)
+
+
+def test_throughput(batch_sizes=(1000, 10000)):
+    """Compare points/second of the JSON batch and NDJSON stream endpoints"""
+    results = []
+    for batch_size in batch_sizes:
+        for name, run in (("json", lambda: test_batch_upload(batch_size)),
+                          ("ndjson+gzip", lambda: test_stream_upload(batch_size))):
+            start_time = time.time()
+            response = run()
+            elapsed_time = time.time() - start_time
+            results.append((name, batch_size, response.status_code, batch_size / elapsed_time))
+            print("-" * 40)
+
+    print(f"{'endpoint':<12} {'points':>8} {'status':>6} {'points/s':>10}")
+    for name, batch_size, status, rate in results:
+        print(f"{name:<12} {batch_size:>8} {status:>6} {rate:>10.0f}")
+
+
 if __name__ == "__main__":
     # Test with different batch sizes
     test_batch_upload(10)
@@ -83,3 +167,6 @@ if __name__ == "__main__":
     # test_batch_upload(100)
     # print("-" * 40)
     # test_batch_upload(1000)
+    print("-" * 40)
+    test_stream_upload(10)
+    # test_throughput()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Edge cases of the server-side scoring column derivation (api/scoring_derivations.py)
+
+Run the tests:   python -m pytest tests/test_scoring_derivations.py
+"""
+import math
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.scoring_derivations import DERIVED_FIELDS, derive_scoring_fields
+
+START = datetime(2025, 6, 1, 10, 0, tzinfo=timezone.utc)
+
+
+def make_rows(count, step=1, climb=0.0, elevation=1000.0):
+    """Track heading north at about 11 m/s (1e-4 deg per second)"""
+    return [{
+        'date_time': START + timedelta(seconds=step * i),
+        'lat': 46.0 + 1e-4 * step * i,
+        'lon': 7.0,
+        'gps_alt': 1500.0 + climb * i,
+        'elevation': elevation
+    } for i in range(count)]
+
+
+def test_empty_batch():
+    assert derive_scoring_fields([]) == []
+
+
+def test_single_point():
+    rows = derive_scoring_fields(make_rows(1))
+    row = rows[0]
+    assert row['speed'] == 0.0
+    assert row['speed_smooth'] == 0.0
+    assert row['altitude_diff'] == 500.0
+    assert row['altitude_diff_smooth'] == 500.0
+    assert row['takeoff_condition'] is False
+    assert row['in_flight'] is False
+
+
+def test_duplicate_timestamps_give_finite_speeds():
+    rows = make_rows(6)
+    # Two fixes in the same second, at different positions
+    duplicate = dict(rows[3], lat=rows[3]['lat'] + 1e-4)
+    rows.insert(4, duplicate)
+
+    derive_scoring_fields(rows)
+
+    for row in rows:
+        assert math.isfinite(row['speed']) and math.isfinite(row['speed_smooth'])
+    assert duplicate['speed'] == 0.0
+    assert rows[1]['speed'] > 10
+
+
+def test_missing_elevation_leaves_altitude_diff_null():
+    rows = make_rows(5)
+    rows[2]['elevation'] = None
+    del rows[3]['elevation']
+
+    derive_scoring_fields(rows)
+
+    assert rows[2]['altitude_diff'] is None and rows[3]['altitude_diff'] is None
+    assert rows[0]['altitude_diff'] == 500.0
+    # Smoothed over the neighbours that have an elevation
+    assert rows[2]['altitude_diff_smooth'] == 500.0
+    # Speed and flags don't need the elevation
+    assert all(row['speed'] > 10 and row['in_flight'] for row in rows)
+
+
+def test_no_elevation_at_all():
+    rows = derive_scoring_fields(make_rows(4, elevation=None))
+    assert all(row['altitude_diff'] is None and row['altitude_diff_smooth'] is None for row in rows)
+    assert all(row['takeoff_condition'] for row in rows)
+
+
+def test_unsorted_rows_are_derived_in_time_order():
+    ordered = derive_scoring_fields(make_rows(8))
+    shuffled = make_rows(8)
+    shuffled = shuffled[::2] + shuffled[1::2]
+    derive_scoring_fields(shuffled)
+    by_time = sorted(shuffled, key=lambda row: row['date_time'])
+    for expected, row in zip(ordered, by_time):
+        for field in DERIVED_FIELDS:
+            assert row[field] == expected[field]
+
+
+def test_client_values_kept_unless_overwrite():
+    rows = make_rows(3)
+    rows[1]['speed'] = 42.0
+    derive_scoring_fields(rows)
+    assert rows[1]['speed'] == 42.0
+
+    derive_scoring_fields(rows, overwrite=True)
+    assert rows[1]['speed'] != 42.0
+
+
+def test_climb_without_speed_is_takeoff():
+    # Stationary but climbing 1 m/s: 5 m over the altitude window counts as flying
+    rows = [dict(row, lat=46.0) for row in make_rows(40, climb=1.0)]
+    derive_scoring_fields(rows)
+    assert rows[0]['speed'] == 0.0
+    assert not rows[0]['takeoff_condition']
+    assert rows[-1]['takeoff_condition'] and rows[-1]['in_flight']
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Equivalence tests and microbenchmark for the vectorized track kernels
+
+The per-point implementations below are the loops detect_flight_state and
+calculate_flight_dynamics used before they moved onto utils/track_kernels.py.
+
+Run the tests:       python -m pytest tests/test_track_kernels.py
+Run the benchmark:   python tests/test_track_kernels.py
+"""
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.flight_state import (ALTITUDE_CHANGE_WINDOW, calculate_distance, calculate_speed,
+                              classify_flight_state, detect_flight_state)
+from utils.flight_dynamics import (KERNEL_MIN_POINTS, calculate_bearing, calculate_distance_haversine,
+                                   calculate_flight_dynamics, calculate_flight_dynamics_from_dicts,
+                                   calculate_vario)
+
+
+def generate_points(count, seed=1, as_strings=False, missing_elevation=0.0):
+    """Random 1-3 s track with occasional duplicate timestamps and missing elevations"""
+    rng = random.Random(seed)
+    when = datetime(2025, 6, 1, 10, 0, tzinfo=timezone.utc)
+    lat, lon, elevation = 46.0, 7.0, 1500.0
+    points = []
+    for _ in range(count):
+        when += timedelta(seconds=rng.choice([0, 1, 1, 1, 2, 3]))
+        lat += rng.uniform(-0.0002, 0.0002)
+        lon += rng.uniform(-0.0002, 0.0002)
+        elevation += rng.uniform(-3, 3)
+        points.append({
+            'datetime': when.strftime('%Y-%m-%dT%H:%M:%SZ') if as_strings else when,
+            'lat': lat,
+            'lon': lon,
+            'elevation': None if rng.random() < missing_elevation else elevation
+        })
+    rng.shuffle(points)
+    return points
+
+
+def reference_detect_flight_state(track_points, previous_state=None, min_points=5):
+    def parse(value):
+        return datetime.fromisoformat(value.replace('Z', '+00:00')) if isinstance(value, str) else value
+
+    if not track_points or len(track_points) < min_points:
+        return previous_state or 'unknown', {'confidence': 'low', 'reason': 'insufficient_data'}
+    sorted_points = sorted(track_points, key=lambda p: parse(p['datetime']))
+    speeds, altitude_changes, total_distance, total_time = [], [], 0, 0
+    for p1, p2 in zip(sorted_points, sorted_points[1:]):
+        t1, t2 = parse(p1['datetime']), parse(p2['datetime'])
+        time_diff = (t2 - t1).total_seconds()
+        if time_diff <= 0:
+            continue
+        distance = calculate_distance(p1['lat'], p1['lon'], p2['lat'], p2['lon'])
+        total_distance += distance
+        total_time += time_diff
+        speeds.append(calculate_speed(distance, time_diff))
+        if p1.get('elevation') is not None and p2.get('elevation') is not None:
+            altitude_changes.append((p2['elevation'] - p1['elevation'], t2))
+    if not speeds:
+        return previous_state or 'unknown', {'confidence': 'low', 'reason': 'no_speed_data'}
+    recent_altitude_change = 0
+    if altitude_changes:
+        window_start = altitude_changes[-1][1] - ALTITUDE_CHANGE_WINDOW
+        recent_altitude_change = sum(change for change, t in altitude_changes if t >= window_start)
+    return classify_flight_state(sum(speeds) / len(speeds), max(speeds),
+                                 total_distance / total_time if total_time > 0 else 0,
+                                 len(speeds), recent_altitude_change, previous_state, min_points)
+
+
+def reference_flight_dynamics(recent_points, vario_smoothing=3):
+    result = {'speed': 0.0, 'heading': 0.0, 'vario': 0.0}
+    if len(recent_points) < 2:
+        return result
+    p1, p2 = recent_points[1], recent_points[0]
+    time_diff = (p2.datetime - p1.datetime).total_seconds()
+    if time_diff > 0:
+        result['heading'] = calculate_bearing(p1.lat, p1.lon, p2.lat, p2.lon)
+        if len(recent_points) >= vario_smoothing and vario_smoothing > 1:
+            oldest = recent_points[min(vario_smoothing - 1, len(recent_points) - 1)]
+            if oldest.elevation is not None and p2.elevation is not None:
+                total_time = (p2.datetime - oldest.datetime).total_seconds()
+                if total_time > 0:
+                    result['vario'] = (p2.elevation - oldest.elevation) / total_time
+        elif p1.elevation is not None and p2.elevation is not None:
+            result['vario'] = calculate_vario(p1.elevation, p2.elevation, time_diff)
+        result['speed'] = calculate_distance_haversine(p1.lat, p1.lon, p2.lat, p2.lon) / time_diff
+    return result
+
+
+def assert_state_equal(actual, expected):
+    assert actual[0] == expected[0]
+    assert actual[1].keys() == expected[1].keys()
+    for key, value in expected[1].items():
+        if isinstance(value, float):
+            assert math.isclose(actual[1][key], value, rel_tol=1e-9, abs_tol=1e-9), key
+        else:
+            assert actual[1][key] == value, key
+
+
+def assert_dynamics_equal(actual, expected):
+    for key in ('speed', 'heading', 'vario'):
+        assert math.isclose(actual[key], expected[key], rel_tol=1e-9, abs_tol=1e-9), key
+
+
+def test_detect_flight_state_matches_reference():
+    for seed in range(20):
+        for count in (5, 6, 20, 300):
+            points = generate_points(count, seed=seed, missing_elevation=0.1)
+            for previous_state in (None, 'flying', 'walking'):
+                assert_state_equal(detect_flight_state(points, previous_state),
+                                   reference_detect_flight_state(points, previous_state))
+
+
+def test_detect_flight_state_parses_iso_strings():
+    points = generate_points(50, seed=3, as_strings=True)
+    assert_state_equal(detect_flight_state(points), reference_detect_flight_state(points))
+
+
+def test_detect_flight_state_without_speed_data():
+    when = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    points = [{'datetime': when, 'lat': 46.0, 'lon': 7.0, 'elevation': 1000.0}] * 6
+    assert detect_flight_state(points) == ('unknown', {'confidence': 'low', 'reason': 'no_speed_data'})
+
+
+def test_flight_dynamics_matches_reference():
+    for seed in range(20):
+        points = sorted(generate_points(6, seed=seed, missing_elevation=0.2),
+                        key=lambda p: p['datetime'], reverse=True)
+        objects = [SimpleNamespace(**p) for p in points]
+        for smoothing in (1, 2, 3, 6, 10):
+            for count in (1, 2, 3, 6):
+                assert_dynamics_equal(calculate_flight_dynamics(objects[:count], vario_smoothing=smoothing),
+                                      reference_flight_dynamics(objects[:count], smoothing))
+        assert_dynamics_equal(calculate_flight_dynamics_from_dicts(points),
+                              reference_flight_dynamics(objects, vario_smoothing=1))
+
+
+def test_long_window_dynamics_match_reference():
+    # Windows of KERNEL_MIN_POINTS or more go through the array kernels
+    for seed in range(5):
+        points = sorted(generate_points(100, seed=seed, missing_elevation=0.2),
+                        key=lambda p: p['datetime'], reverse=True)
+        objects = [SimpleNamespace(**p) for p in points]
+        for smoothing in (KERNEL_MIN_POINTS, 80, 100):
+            assert_dynamics_equal(calculate_flight_dynamics(objects, vario_smoothing=smoothing),
+                                  reference_flight_dynamics(objects, smoothing))
+
+
+def benchmark(func, *args, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    print(f"{'points':>8} {'per-point ms':>13} {'kernel ms':>10} {'speedup':>8}")
+    for count in (20, 1000, 10000, 50000):
+        points = generate_points(count, as_strings=True)
+        reference_ms = benchmark(reference_detect_flight_state, points)
+        kernel_ms = benchmark(detect_flight_state, points)
+        print(f"{count:>8} {reference_ms:>13.2f} {kernel_ms:>10.2f} {reference_ms / kernel_ms:>7.1f}x")
+
+    objects = [SimpleNamespace(**p) for p in sorted(generate_points(3), key=lambda p: p['datetime'], reverse=True)]
+    reference_us = benchmark(lambda: [reference_flight_dynamics(objects) for _ in range(1000)])
+    current_us = benchmark(lambda: [calculate_flight_dynamics(objects) for _ in range(1000)])
+    print(f"calculate_flight_dynamics (3 points): reference {reference_us:.1f} us, "
+          f"current {current_us:.1f} us per call")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the tracking websocket viewport and level-of-detail helpers
+
+Run the tests:   python -m pytest tests/test_viewport.py
+"""
+import math
+import os
+import random
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.track_kernels import EARTH_RADIUS_M, simplify_indices
+from utils.viewport import (PositionGrid, key_bounds, overview_zoom, subscription_key, thin_coordinates,
+                            zoom_tolerance)
+
+
+def test_nearby_viewports_share_a_key():
+    a = subscription_key([6.90, 45.90, 7.10, 46.10], 11)
+    b = subscription_key([6.9001, 45.9002, 7.0999, 46.0998], 11.4)
+    assert a == b
+    assert subscription_key([6.9, 45.9, 7.1, 46.1], 12) != a
+
+
+def test_key_bounds_cover_the_bbox():
+    west, south, east, north = key_bounds(subscription_key([6.9, 45.9, 7.1, 46.1], 11))
+    assert west < 6.9 and south < 45.9 and east > 7.1 and north > 46.1
+
+
+def test_invalid_viewports_are_not_filtered():
+    assert subscription_key(None, 10) is None
+    assert subscription_key([7.1, 45.9, 6.9, 46.1], 10) is None
+    assert subscription_key([1, 2, 3], 10) is None
+    assert subscription_key([6.9, 45.9, 7.1, 46.1], 'x') is None
+
+
+def test_grid_query_matches_brute_force():
+    rng = random.Random(5)
+    positions = [(rng.uniform(45, 47), rng.uniform(6, 9)) for _ in range(500)] + [None]
+    grid = PositionGrid(positions)
+    for _ in range(50):
+        west, east = sorted(rng.uniform(5.5, 9.5) for _ in range(2))
+        south, north = sorted(rng.uniform(44.5, 47.5) for _ in range(2))
+        expected = [index for index, position in enumerate(positions)
+                    if position is None or (south <= position[0] <= north and west <= position[1] <= east)]
+        assert grid.query(west, south, east, north) == expected
+
+
+def test_thinning_keeps_ends_and_total_time():
+    coordinates = [[7.0 + i * 1e-5, 46.0, 1000, {'dt': 0}] if i == 0 else
+                   ([7.0 + i * 1e-5, 46.0, 1000, {'dt': 3}] if i == 5 else [7.0 + i * 1e-5, 46.0, 1000])
+                   for i in range(20)]
+    total = sum(point[3]['dt'] if len(point) > 3 else 1 for point in coordinates)
+
+    thinned = thin_coordinates(coordinates, 8)
+    assert thinned[0] == coordinates[0] and thinned[-1][:3] == coordinates[-1][:3]
+    assert len(thinned) == 2
+    assert sum(point[3]['dt'] if len(point) > 3 else 1 for point in thinned) == total
+
+    # At street level nothing is dropped
+    assert len(thin_coordinates(coordinates, 20)) == len(coordinates)
+
+
+def _reference_douglas_peucker(x, y, tolerance, start, end, keep):
+    """Recursive Douglas-Peucker over projected coordinates"""
+    best, index = 0.0, None
+    for i in range(start + 1, end):
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        length = math.hypot(dx, dy)
+        distance = (abs(dx * (y[i] - y[start]) - dy * (x[i] - x[start])) / length if length
+                    else math.hypot(x[i] - x[start], y[i] - y[start]))
+        if distance > best:
+            best, index = distance, i
+    if index is not None and best > tolerance:
+        keep.add(index)
+        _reference_douglas_peucker(x, y, tolerance, start, index, keep)
+        _reference_douglas_peucker(x, y, tolerance, index, end, keep)
+
+
+def _random_track(count, seed):
+    rng = np.random.default_rng(seed)
+    return 46 + np.cumsum(rng.normal(0, 1e-4, count)), 7 + np.cumsum(rng.normal(0, 1e-4, count))
+
+
+def test_simplify_matches_douglas_peucker_without_budget():
+    lat, lon = _random_track(600, 3)
+    y = np.radians(lat) * EARTH_RADIUS_M
+    x = np.radians(lon) * EARTH_RADIUS_M * math.cos(math.radians(np.mean(lat)))
+    for tolerance in (5.0, 50.0, 500.0):
+        keep = {0, len(lat) - 1}
+        _reference_douglas_peucker(x.tolist(), y.tolist(), tolerance, 0, len(lat) - 1, keep)
+        assert simplify_indices(lat, lon, tolerance, len(lat)).tolist() == sorted(keep)
+
+
+def test_simplify_respects_budget_and_keeps_ends():
+    lat, lon = _random_track(20000, 4)
+    kept = simplify_indices(lat, lon, zoom_tolerance(18, 46), 300)
+    assert len(kept) == 300
+    assert kept[0] == 0 and kept[-1] == len(lat) - 1
+    assert np.all(np.diff(kept) > 0)
+    assert simplify_indices(lat[:2], lon[:2], 1.0, 10).tolist() == [0, 1]
+
+
+def test_overview_zoom_fits_the_race():
+    assert overview_zoom([(46.0, 7.0), (46.3, 7.5)]) == 11
+    assert overview_zoom([(46.0, 7.0), (47.0, 12.0)]) < 11
+    assert overview_zoom([]) == 5
+    assert overview_zoom([(46.0, 7.0)]) == 14
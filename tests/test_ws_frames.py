@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Round-trip tests for the binary websocket frames
+
+Run the tests:   python -m pytest tests/test_ws_frames.py
+"""
+import gzip
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ws_frames import (BINARY_SUBPROTOCOL, FLAG_DELTA, FLAG_GZIP, FRAME_DELTA_UPDATE, FRAME_TILE,
+                             HEADER, decode_frame, encode_frame, negotiate_binary)
+
+
+def test_tile_frame_round_trip():
+    mvt = bytes(range(256)) * 3
+    frame = encode_frame(FRAME_TILE, 'race-42', mvt, z=14, x=8529, y=5843, flags=FLAG_DELTA)
+    assert len(frame) == HEADER.size + len('race-42') + len(mvt)
+    assert decode_frame(frame) == {'type': FRAME_TILE, 'flags': FLAG_DELTA, 'z': 14, 'x': 8529, 'y': 5843,
+                                   'race_id': 'race-42', 'payload': mvt}
+
+
+def test_delta_frame_carries_raw_gzip():
+    delta = {'type': 'delta', 'updates': [{'pilot_id': '1', 'lat': 46.1, 'lon': 7.2}]}
+    frame = encode_frame(FRAME_DELTA_UPDATE, 'race', gzip.compress(json.dumps(delta).encode('utf-8')), flags=FLAG_GZIP)
+    decoded = decode_frame(frame)
+    assert decoded['type'] == FRAME_DELTA_UPDATE and decoded['flags'] & FLAG_GZIP
+    assert json.loads(gzip.decompress(decoded['payload'])) == delta
+
+
+def test_negotiation():
+    offered = SimpleNamespace(scope={'subprotocols': ['other', BINARY_SUBPROTOCOL]})
+    plain = SimpleNamespace(scope={})
+    assert negotiate_binary(offered) == (BINARY_SUBPROTOCOL, True)
+    assert negotiate_binary(plain, 'binary') == (None, True)
+    assert negotiate_binary(plain) == (None, False)
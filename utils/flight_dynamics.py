@@ -1,11 +1,19 @@
 """
 Flight dynamics calculation utilities for speed, heading, and vario.
+Long windows run on the array kernels in utils/track_kernels.py; the usual
+few-point windows are cheaper point by point.
 """
 
 import math
 from typing import Optional, Tuple, List, Dict, Any
 from datetime import datetime
 
+import numpy as np
+
+from utils.track_kernels import point_arrays, segment_dynamics, window_vario
+
+# Windows shorter than this are computed point by point: building the arrays costs more than the loop
+KERNEL_MIN_POINTS = 64
 
 def calculate_distance_haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
@@ -119,41 +127,54 @@ def calculate_flight_dynamics(recent_points: List[Any],
     if len(recent_points) < 2:
         return result
 
-    # Points are ordered newest first
-    p1 = recent_points[1]  # Older point
-    p2 = recent_points[0]  # Newer point
+    if min(len(recent_points), vario_smoothing) < KERNEL_MIN_POINTS:
+        # Points are ordered newest first
+        p1 = recent_points[1]  # Older point
+        p2 = recent_points[0]  # Newer point
+        time_diff = (p2.datetime - p1.datetime).total_seconds()
+
+        if time_diff > 0:
+            result['heading'] = calculate_bearing(p1.lat, p1.lon, p2.lat, p2.lon)
+
+            # Calculate smoothed vario using multiple points if available
+            if len(recent_points) >= vario_smoothing and vario_smoothing > 1:
+                oldest_point = recent_points[min(vario_smoothing - 1, len(recent_points) - 1)]
+                if oldest_point.elevation is not None and p2.elevation is not None:
+                    total_time = (p2.datetime - oldest_point.datetime).total_seconds()
+                    if total_time > 0:
+                        result['vario'] = (p2.elevation - oldest_point.elevation) / total_time
+            elif p1.elevation is not None and p2.elevation is not None:
+                # Fall back to instant vario between last 2 points
+                result['vario'] = calculate_vario(p1.elevation, p2.elevation, time_diff)
 
-    # Extract coordinates
-    lat1, lon1 = p1.lat, p1.lon
-    lat2, lon2 = p2.lat, p2.lon
+            # Calculate instant speed if not from flight_state
+            if result['speed'] == 0:
+                distance = calculate_distance_haversine(p1.lat, p1.lon, p2.lat, p2.lon)
+                result['speed'] = calculate_speed(distance, time_diff)
+        return result
 
-    # Calculate time difference
-    time_diff = (p2.datetime - p1.datetime).total_seconds()
+    # Points are ordered newest first; the kernels take them oldest first
+    window = list(recent_points[:max(2, vario_smoothing)])[::-1]
+    epoch, lat, lon, alt = point_arrays(window)
+    segments = segment_dynamics(epoch[-2:], lat[-2:], lon[-2:], alt[-2:])
 
-    if time_diff > 0:
+    if segments['time_diff'][-1] > 0:
         # Calculate heading
-        result['heading'] = calculate_bearing(lat1, lon1, lat2, lon2)
+        result['heading'] = float(segments['bearing'][-1])
 
         # Calculate smoothed vario using multiple points if available
         if len(recent_points) >= vario_smoothing and vario_smoothing > 1:
-            # Calculate vario over a longer period for smoothing
-            oldest_point = recent_points[min(vario_smoothing - 1, len(recent_points) - 1)]
-            newest_point = recent_points[0]
-
-            if (oldest_point.elevation is not None and newest_point.elevation is not None):
-                total_time = (newest_point.datetime - oldest_point.datetime).total_seconds()
-                if total_time > 0:
-                    total_altitude_change = newest_point.elevation - oldest_point.elevation
-                    result['vario'] = total_altitude_change / total_time
+            # Vario over the whole window for smoothing
+            vario = window_vario(epoch, alt, vario_smoothing)[-1]
         else:
             # Fall back to instant vario between last 2 points
-            if p1.elevation is not None and p2.elevation is not None:
-                result['vario'] = calculate_vario(p1.elevation, p2.elevation, time_diff)
+            vario = segments['vario'][-1]
+        if not np.isnan(vario):
+            result['vario'] = float(vario)
 
         # Calculate instant speed if not from flight_state
         if result['speed'] == 0:
-            distance = calculate_distance_haversine(lat1, lon1, lat2, lon2)
-            result['speed'] = calculate_speed(distance, time_diff)
+            result['speed'] = float(segments['speed'][-1])
 
     return result
 
@@ -189,14 +210,10 @@ def calculate_flight_dynamics_from_dicts(recent_points: List[Dict[str, Any]],
     if len(recent_points) < 2:
         return result
 
-    # Points are ordered newest first
+    # Points are ordered newest first; only the last two are used, so no kernels here
     p1 = recent_points[1]  # Older point
     p2 = recent_points[0]  # Newer point
 
-    # Extract coordinates
-    lat1, lon1 = p1['lat'], p1['lon']
-    lat2, lon2 = p2['lat'], p2['lon']
-
     # Parse datetime if string
     dt1 = p1['datetime']
     dt2 = p2['datetime']
@@ -205,12 +222,11 @@ def calculate_flight_dynamics_from_dicts(recent_points: List[Dict[str, Any]],
     if isinstance(dt2, str):
         dt2 = datetime.fromisoformat(dt2.replace('Z', '+00:00'))
 
-    # Calculate time difference
     time_diff = (dt2 - dt1).total_seconds()
 
     if time_diff > 0:
         # Calculate heading
-        result['heading'] = calculate_bearing(lat1, lon1, lat2, lon2)
+        result['heading'] = calculate_bearing(p1['lat'], p1['lon'], p2['lat'], p2['lon'])
 
         # Calculate vario from actual altitude changes
         if p1.get('elevation') is not None and p2.get('elevation') is not None:
@@ -218,7 +234,7 @@ def calculate_flight_dynamics_from_dicts(recent_points: List[Dict[str, Any]],
 
         # Calculate instant speed if not from flight_state
         if result['speed'] == 0:
-            distance = calculate_distance_haversine(lat1, lon1, lat2, lon2)
+            distance = calculate_distance_haversine(p1['lat'], p1['lon'], p2['lat'], p2['lon'])
             result['speed'] = calculate_speed(distance, time_diff)
 
-    return result
\ No newline at end of file
+    return result
@@ -0,0 +1,145 @@
+"""
+Vectorized track kernels for distance, speed, bearing and vario.
+
+All kernels take contiguous float arrays ordered oldest point first: epoch seconds,
+lat, lon and altitude (NaN where unknown), and compute every segment of a track at once.
+"""
+
+import heapq
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Sequence, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+
+
+def to_epoch(values: Iterable[Any]) -> np.ndarray:
+    """
+    Convert datetimes or ISO 8601 strings to epoch seconds, parsing each value once.
+    Naive datetimes are taken as UTC.
+    """
+    values = list(values)
+    if values and all(isinstance(value, str) and value.endswith('Z') for value in values):
+        # UTC strings ('...Z', as stored in fixes) parse in a single NumPy call
+        try:
+            return np.array([value[:-1] for value in values], dtype='datetime64[us]').astype(np.int64) / 1e6
+        except ValueError:
+            pass
+
+    def seconds(value):
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp()
+
+    return np.array([seconds(value) for value in values], dtype=float)
+
+
+def point_arrays(points: Sequence[Any], altitude_key: str = 'elevation') -> Tuple[np.ndarray, ...]:
+    """
+    Split track points (dicts or objects with lat, lon, datetime and altitude) into
+    (epoch, lat, lon, alt) arrays in the given order. Missing altitudes become NaN.
+    """
+    if points and isinstance(points[0], dict):
+        epoch = to_epoch([point['datetime'] for point in points])
+        lat = np.array([point['lat'] for point in points], dtype=float)
+        lon = np.array([point['lon'] for point in points], dtype=float)
+        alt = np.array([point.get(altitude_key) for point in points], dtype=float)
+    else:
+        epoch = to_epoch([point.datetime for point in points])
+        lat = np.array([point.lat for point in points], dtype=float)
+        lon = np.array([point.lon for point in points], dtype=float)
+        alt = np.array([getattr(point, altitude_key, None) for point in points], dtype=float)
+    return epoch, lat, lon, alt
+
+
+def haversine(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Element-wise great circle distance in meters"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + \
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_M * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def bearing(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Element-wise initial bearing from point 1 to point 2 in degrees (0-360)"""
+    lat1, lat2 = np.radians(lat1), np.radians(lat2)
+    dlon = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return (np.degrees(np.arctan2(y, x)) + 360) % 360
+
+
+def segment_dynamics(epoch: np.ndarray, lat: np.ndarray, lon: np.ndarray,
+                     alt: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Per-segment (point i-1 to point i) time_diff, distance, speed, bearing and vario.
+    Speed and vario are 0 where time_diff <= 0, like calculate_speed/calculate_vario;
+    vario is NaN where either altitude is unknown.
+    """
+    time_diff = np.diff(epoch)
+    distance = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    moving = time_diff > 0
+    speed = np.divide(distance, time_diff, out=np.zeros_like(distance), where=moving)
+    vario = np.divide(np.diff(alt), time_diff, out=np.zeros_like(distance), where=moving)
+    vario[np.isnan(alt[:-1]) | np.isnan(alt[1:])] = np.nan
+    return {
+        'time_diff': time_diff,
+        'distance': distance,
+        'speed': speed,
+        'bearing': bearing(lat[:-1], lon[:-1], lat[1:], lon[1:]),
+        'vario': vario
+    }
+
+
+def window_vario(epoch: np.ndarray, alt: np.ndarray, points: int) -> np.ndarray:
+    """
+    Smoothed vario at each point: altitude change over the last `points` points divided
+    by their time span. NaN where the window is incomplete, has no time span or an
+    altitude at either end is unknown.
+    """
+    result = np.full(len(epoch), np.nan)
+    span = points - 1
+    if span < 1 or len(epoch) <= span:
+        return result
+    time_span = epoch[span:] - epoch[:-span]
+    np.divide(alt[span:] - alt[:-span], time_span, out=result[span:], where=time_span > 0)
+    return result
+
+
+def simplify_indices(lat: np.ndarray, lon: np.ndarray, tolerance: float, budget: int) -> np.ndarray:
+    """
+    Sorted indices of the points a Douglas-Peucker simplification keeps at `tolerance`
+    meters. Segments are refined most significant first, so at most `budget` points
+    (at least the two ends) are kept. Each refinement scans its whole segment, the first
+    one all n points, so the work is O(n) at best: callers bound n themselves.
+    """
+    n = len(lat)
+    if n <= 2:
+        return np.arange(n)
+    # Local equirectangular projection in meters
+    y = np.radians(lat) * EARTH_RADIUS_M
+    x = np.radians(lon) * EARTH_RADIUS_M * np.cos(np.radians(np.mean(lat)))
+
+    def farthest(start, end, queue):
+        if end - start < 2:
+            return
+        dx, dy = x[end] - x[start], y[end] - y[start]
+        px, py = x[start + 1:end] - x[start], y[start + 1:end] - y[start]
+        length = np.hypot(dx, dy)
+        distance = np.abs(dx * py - dy * px) / length if length > 0 else np.hypot(px, py)
+        index = int(np.argmax(distance))
+        if distance[index] > tolerance:
+            heapq.heappush(queue, (-distance[index], start, end, start + 1 + index))
+
+    keep = [0, n - 1]
+    queue = []
+    farthest(0, n - 1, queue)
+    while queue and len(keep) < max(budget, 2):
+        _, start, end, index = heapq.heappop(queue)
+        keep.append(index)
+        farthest(start, index, queue)
+        farthest(index, end, queue)
+    return np.sort(np.array(keep))
@@ -0,0 +1,141 @@
+"""
+Viewport subscriptions for the race tracking websocket.
+
+Clients declare a bbox and zoom; the bbox is snapped outward to the Web Mercator tile
+grid at that zoom (plus one tile of margin), so clients looking at nearly the same area
+share one subscription key and one serialized payload. A uniform grid over the current
+pilot positions answers which pilots each subscription sees, and track updates are
+thinned to points at least THIN_PIXELS apart at the subscription's zoom.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+GRID_CELL_DEGREES = 0.25
+THIN_PIXELS = 2
+TILE_SIZE = 256
+MAX_ZOOM = 20
+MAX_LAT = 85.0511
+# Web Mercator meters per pixel at zoom 0 on the equator
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+
+def _tile_x(lon: float, z: int) -> int:
+    return min(max(int((lon + 180) / 360 * 2 ** z), 0), 2 ** z - 1)
+
+
+def _tile_y(lat: float, z: int) -> int:
+    lat_rad = math.radians(min(max(lat, -MAX_LAT), MAX_LAT))
+    y = (1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * 2 ** z
+    return min(max(int(y), 0), 2 ** z - 1)
+
+
+def _tile_lon(x: int, z: int) -> float:
+    return x / 2 ** z * 360 - 180
+
+
+def _tile_lat(y: int, z: int) -> float:
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / 2 ** z))))
+
+
+def subscription_key(bbox: Optional[Sequence[float]], zoom) -> Optional[Tuple[int, int, int, int, int]]:
+    """
+    (zoom, min x, min y, max x, max y) tile range covering bbox [west, south, east, north],
+    or None (no filtering) for a missing or invalid bbox
+    """
+    try:
+        west, south, east, north = (float(value) for value in bbox)
+        z = min(max(int(zoom), 0), MAX_ZOOM)
+    except (TypeError, ValueError):
+        return None
+    if west > east or south > north:
+        return None
+    last = 2 ** z - 1
+    return (z, max(_tile_x(west, z) - 1, 0), max(_tile_y(north, z) - 1, 0),
+            min(_tile_x(east, z) + 1, last), min(_tile_y(south, z) + 1, last))
+
+
+def key_bounds(key: Tuple[int, int, int, int, int]) -> Tuple[float, float, float, float]:
+    """(west, south, east, north) of a subscription key's tile range"""
+    z, min_x, min_y, max_x, max_y = key
+    return _tile_lon(min_x, z), _tile_lat(max_y + 1, z), _tile_lon(max_x + 1, z), _tile_lat(min_y, z)
+
+
+class PositionGrid:
+    """Uniform lat/lon grid over positions; entries without a position match every query"""
+
+    def __init__(self, positions: Sequence[Optional[Tuple[float, float]]], cell_degrees: float = GRID_CELL_DEGREES):
+        self.cell = cell_degrees
+        self.positions = positions
+        self.cells: Dict[Tuple[int, int], List[int]] = {}
+        self.unplaced: List[int] = []
+        for index, position in enumerate(positions):
+            if position is None:
+                self.unplaced.append(index)
+            else:
+                self.cells.setdefault(self._cell(*position), []).append(index)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell), math.floor(lon / self.cell)
+
+    def query(self, west: float, south: float, east: float, north: float) -> List[int]:
+        """Indices of positions inside the bounds (and all unplaced ones), in input order"""
+        min_row, min_col = self._cell(south, west)
+        max_row, max_col = self._cell(north, east)
+        found = list(self.unplaced)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self.cells):
+            # Bounds larger than the occupied area: scan the occupied cells instead
+            candidates = (index for indices in self.cells.values() for index in indices)
+        else:
+            candidates = (index for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)
+                          for index in self.cells.get((row, col), ()))
+        for index in candidates:
+            lat, lon = self.positions[index]
+            if south <= lat <= north and west <= lon <= east:
+                found.append(index)
+        return sorted(found)
+
+
+def thin_coordinates(coordinates: List[list], zoom: int) -> List[list]:
+    """
+    Drop track update coordinates ([lon, lat, elevation, {"dt": seconds}?], dt omitted
+    when 1) closer than THIN_PIXELS to the previous kept one at zoom. The first and last
+    points are kept and dropped points' time is added to the next kept point's dt.
+    """
+    if len(coordinates) <= 2:
+        return coordinates
+    tolerance = THIN_PIXELS * 360 / (TILE_SIZE * 2 ** zoom)
+    kept = [coordinates[0]]
+    elapsed = 0
+    last = len(coordinates) - 1
+    for index in range(1, len(coordinates)):
+        point = coordinates[index]
+        extra = point[3] if len(point) > 3 and isinstance(point[3], dict) else None
+        elapsed += extra.get('dt', 1) if extra else 1
+        previous = kept[-1]
+        if index != last and abs(point[0] - previous[0]) < tolerance and abs(point[1] - previous[1]) < tolerance:
+            continue
+        thinned = point[:3]
+        if elapsed != 1:
+            thinned.append({**(extra or {}), 'dt': elapsed})
+        kept.append(thinned)
+        elapsed = 0
+    return kept
+
+
+def zoom_tolerance(zoom: float, lat: float, pixels: float = 1.0) -> float:
+    """Ground distance in meters covered by `pixels` at zoom and latitude"""
+    return pixels * METERS_PER_PIXEL_Z0 * math.cos(math.radians(lat)) / 2 ** zoom
+
+
+def overview_zoom(positions: Sequence[Tuple[float, float]], width: int = 1024,
+                  min_zoom: int = 5, max_zoom: int = 14) -> int:
+    """Zoom at which all (lat, lon) positions fit in a view `width` pixels wide"""
+    if not positions:
+        return min_zoom
+    lats = [lat for lat, _ in positions]
+    lons = [lon for _, lon in positions]
+    span = max(max(lons) - min(lons), (max(lats) - min(lats)) / max(math.cos(math.radians(sum(lats) / len(lats))), 0.1))
+    if span <= 0:
+        return max_zoom
+    return min(max(int(math.log2(360 * width / (TILE_SIZE * span))), min_zoom), max_zoom)
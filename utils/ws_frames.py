@@ -0,0 +1,68 @@
+"""
+Binary websocket frames for tiles and live deltas.
+
+Clients that negotiate binary frames (subprotocol 'hfss-frames.v1' or ?protocol=binary)
+receive raw MVT bytes and gzipped delta JSON behind a fixed header instead of base64
+inside JSON. All integers are big-endian:
+
+    offset  size  field
+    0       1     version (1)
+    1       1     frame type (FRAME_TILE, FRAME_DELTA_UPDATE)
+    2       1     flags (FLAG_GZIP, FLAG_DELTA)
+    3       1     zoom
+    4       4     tile x
+    8       4     tile y
+    12      2     race_id length n
+    14      n     race_id (UTF-8)
+    14 + n  ...   payload
+
+Frames are built once per broadcast and the same bytes are sent to every recipient.
+"""
+
+import struct
+from typing import Any, Dict, Optional, Tuple
+
+FRAME_VERSION = 1
+BINARY_SUBPROTOCOL = 'hfss-frames.v1'
+
+# Frame types
+FRAME_TILE = 1
+FRAME_DELTA_UPDATE = 2
+
+# Flags
+FLAG_GZIP = 0x01
+FLAG_DELTA = 0x02
+
+HEADER = struct.Struct('>BBBBIIH')
+
+
+def encode_frame(frame_type: int, race_id: str, payload: bytes, z: int = 0, x: int = 0, y: int = 0,
+                 flags: int = 0) -> bytes:
+    """Header followed by the payload bytes"""
+    race = race_id.encode('utf-8')
+    return HEADER.pack(FRAME_VERSION, frame_type, flags, z, x, y, len(race)) + race + payload
+
+
+def decode_frame(frame: bytes) -> Dict[str, Any]:
+    """Split a frame into its header fields and payload (for clients and tests)"""
+    version, frame_type, flags, z, x, y, race_length = HEADER.unpack_from(frame)
+    if version != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version {version}")
+    start = HEADER.size + race_length
+    return {
+        'type': frame_type,
+        'flags': flags,
+        'z': z,
+        'x': x,
+        'y': y,
+        'race_id': frame[HEADER.size:start].decode('utf-8'),
+        'payload': frame[start:]
+    }
+
+
+def negotiate_binary(websocket, protocol: Optional[str] = None) -> Tuple[Optional[str], bool]:
+    """Subprotocol to accept the websocket with (or None) and whether the client gets binary frames"""
+    offered = websocket.scope.get('subprotocols') or []
+    if BINARY_SUBPROTOCOL in offered:
+        return BINARY_SUBPROTOCOL, True
+    return None, protocol == 'binary'
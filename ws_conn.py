@@ -1,6 +1,50 @@
+from collections import deque
 from fastapi import WebSocket
 from starlette.websockets import WebSocketState
 from typing import Dict, Set, List, Optional
+import json
+import os
+import time
+import uuid
+
+from api.broadcast_bus import broadcast_bus
+from utils.viewport import PositionGrid, key_bounds, subscription_key, thin_coordinates
+
+# Track updates kept per race for clients resuming after a dropped connection
+# (at the 30 s update interval, 120 updates cover an hour)
+REPLAY_LOG_SIZE = int(os.getenv('REPLAY_LOG_SIZE', '120'))
+# How long a race's tracking state outlives its last viewer, so that viewer can resume
+REPLAY_GRACE_SECONDS = int(os.getenv('REPLAY_GRACE_SECONDS', '300'))
+
+
+class ReplayLog:
+    """
+    Sequenced track updates of one race. Sequence numbers only mean something within
+    one session (a log created by this worker), so clients resume with both.
+    """
+
+    def __init__(self, size: int = REPLAY_LOG_SIZE):
+        self.session = uuid.uuid4().hex
+        self.seq = 0
+        self.entries = deque(maxlen=size)
+
+    def append(self, message: dict) -> str:
+        """Number message with the next seq, log it and return its serialized text"""
+        self.seq += 1
+        message['seq'] = self.seq
+        text = json.dumps(message)
+        self.entries.append((self.seq, text))
+        return text
+
+    def since(self, session: Optional[str], seq) -> Optional[List[str]]:
+        """Messages after seq, or None if the client has to start over from a snapshot"""
+        if session != self.session or not isinstance(seq, int) or seq > self.seq or seq < 0:
+            return None
+        if seq == self.seq:
+            return []
+        if not self.entries or self.entries[0][0] > seq + 1:
+            return None
+        return [text for entry_seq, text in self.entries if entry_seq > seq]
 
 
 class ConnectionManager:
@@ -18,6 +62,13 @@ class ConnectionManager:
         # Store valid HFSS API tokens per race for background updates
         # Structure: {race_id: token}
         self.hfss_tokens: Dict[str, str] = {}
+        # Viewport subscription of each socket that declared one (utils/viewport.py)
+        # Structure: {WebSocket: (zoom, min_x, min_y, max_x, max_y)}
+        self.viewports: Dict[WebSocket, tuple] = {}
+        # Sequenced track updates per race for resuming clients
+        self.replay_logs: Dict[str, ReplayLog] = {}
+        # Races whose last viewer left, and when; their state is kept for REPLAY_GRACE_SECONDS
+        self.vacated: Dict[str, float] = {}
 
     async def connect(self, websocket: WebSocket, race_id: str, client_id: str):
         """Connect a client to a specific race's updates"""
@@ -29,6 +80,7 @@ class ConnectionManager:
 
         # Add this connection to the race
         self.active_connections[race_id].add(websocket)
+        self.vacated.pop(race_id, None)
 
         # Track this user's subscriptions
         if client_id not in self.user_subscriptions:
@@ -51,26 +103,71 @@ class ConnectionManager:
             if websocket in self.active_connections[race_id]:
                 self.active_connections[race_id].remove(websocket)
 
-                # Clean up empty race connections
+                # Clean up empty race connections; the tracking state stays a while
+                # for viewers that reconnect
                 if len(self.active_connections[race_id]) == 0:
                     del self.active_connections[race_id]
-                    self.remove_race_tracking_data(race_id)
+                    self.vacated[race_id] = time.time()
 
         # Clean up user subscriptions
         if client_id in self.user_subscriptions:
             del self.user_subscriptions[client_id]
+        self.viewports.pop(websocket, None)
+        self.expire_vacated()
+
+    def expire_vacated(self):
+        """Drop the tracking state of races without viewers for REPLAY_GRACE_SECONDS"""
+        cutoff = time.time() - REPLAY_GRACE_SECONDS
+        for race_id, vacated_at in list(self.vacated.items()):
+            if vacated_at < cutoff:
+                del self.vacated[race_id]
+                if race_id not in self.active_connections:
+                    self.remove_race_tracking_data(race_id)
+
+    def replay_log(self, race_id: str) -> ReplayLog:
+        if race_id not in self.replay_logs:
+            self.replay_logs[race_id] = ReplayLog()
+        return self.replay_logs[race_id]
+
+    async def resume(self, websocket: WebSocket, race_id: str, session: Optional[str], last_seq) -> bool:
+        """
+        Send a reconnecting client the track updates it missed since last_seq, in one
+        "resumed" message; False if it is beyond the log and needs a fresh snapshot.
+        Clients ignore updates with a seq they have already applied.
+        """
+        log = self.replay_logs.get(race_id)
+        missed = log.since(session, last_seq) if log else None
+        if missed is None:
+            return False
+        # The logged messages are already serialized, splice them in as they are
+        await websocket.send_text(
+            f'{{"type": "resumed", "race_id": {json.dumps(race_id)}, "session": "{log.session}", '
+            f'"seq": {log.seq}, "updates": [{", ".join(missed)}]}}')
+        return True
+
+    def set_viewport(self, websocket: WebSocket, bbox, zoom) -> Optional[tuple]:
+        """Only send this client pilots inside bbox [west, south, east, north]; no bbox clears it"""
+        key = subscription_key(bbox, zoom) if bbox is not None else None
+        if key is None:
+            self.viewports.pop(websocket, None)
+        else:
+            self.viewports[websocket] = key
+        return key
 
     async def broadcast_to_race(self, race_id: str, message: dict):
         """Send message to all clients connected to a specific race"""
         if race_id not in self.active_connections:
             return
+        await self._send_text(race_id, list(self.active_connections[race_id]), json.dumps(message))
 
+    async def _send_text(self, race_id: str, connections: List[WebSocket], text: str):
+        """Send one serialized message to the given connections of a race"""
         inactive_connections = set()
 
-        for connection in self.active_connections[race_id]:
+        for connection in connections:
             try:
                 if connection.client_state == WebSocketState.CONNECTED:
-                    await connection.send_json(message)
+                    await connection.send_text(text)
             except RuntimeError:
                 # Connection is no longer valid
                 inactive_connections.add(connection)
@@ -88,12 +185,46 @@ class ConnectionManager:
         })
 
     async def send_update(self, race_id: str, flights_data: List[dict]):
-        """Send tracking updates to all clients in a race"""
-        await self.broadcast_to_race(race_id, {
-            "type": "track_update",
-            "race_id": race_id,
-            "flights": flights_data
-        })
+        """
+        Send tracking updates to all clients in a race. Clients with a viewport only get
+        the pilots inside it, with track updates thinned for their zoom; clients with the
+        same subscription share one serialized payload.
+        """
+        # The full update is logged for resuming clients; viewport payloads carry its seq
+        update = {"type": "track_update", "race_id": race_id, "flights": flights_data}
+        if not self.active_connections.get(race_id):
+            # Keep logging while the race's last viewers may still come back and resume
+            self.expire_vacated()
+            if race_id in self.replay_logs:
+                self.replay_logs[race_id].append(update)
+            return
+        full_text = self.replay_log(race_id).append(update)
+
+        groups: Dict[Optional[tuple], List[WebSocket]] = {}
+        for connection in self.active_connections[race_id]:
+            groups.setdefault(self.viewports.get(connection), []).append(connection)
+
+        grid = None
+        thinned: Dict[tuple, dict] = {}
+        for key, connections in groups.items():
+            if key is None:
+                flights = flights_data
+            else:
+                if grid is None:
+                    grid = PositionGrid([_position(flight) for flight in flights_data])
+                flights = []
+                for index in grid.query(*key_bounds(key)):
+                    if (index, key[0]) not in thinned:
+                        thinned[(index, key[0])] = _thin_flight(flights_data[index], key[0])
+                    flights.append(thinned[(index, key[0])])
+                if not flights:
+                    continue
+            await self._send_text(race_id, connections, full_text if key is None else json.dumps({
+                "type": "track_update",
+                "race_id": race_id,
+                "seq": update["seq"],
+                "flights": flights
+            }))
 
     def get_active_viewers(self, race_id: str) -> int:
         """Return count of active viewers for a race"""
@@ -127,6 +258,7 @@ class ConnectionManager:
             del self.xc_flights_tracking[race_id]
         if race_id in self.hfss_tokens:
             del self.hfss_tokens[race_id]
+        self.replay_logs.pop(race_id, None)
     
     def get_xc_flights_tracking(self, race_id: str) -> Dict[str, Dict]:
         """Get XContest flight tracking data for a race"""
@@ -159,5 +291,32 @@ class ConnectionManager:
         return self.hfss_tokens.get(race_id)
 
 
+def _position(flight: dict) -> Optional[tuple]:
+    """(lat, lon) of an update's last fix, None if it has none"""
+    last_fix = flight.get('lastFix')
+    if isinstance(last_fix, dict) and last_fix.get('lat') is not None and last_fix.get('lon') is not None:
+        return float(last_fix['lat']), float(last_fix['lon'])
+    return None
+
+
+def _thin_flight(flight: dict, zoom: int) -> dict:
+    track = flight.get('track_update')
+    if not track or not track.get('coordinates'):
+        return flight
+    return {**flight, 'track_update': {**track, 'coordinates': thin_coordinates(track['coordinates'], zoom)}}
+
+
 # Create a global connection manager for the application
 manager = ConnectionManager()
+
+
+async def _deliver_track_update(race_id: str, payload: bytes, local: bool):
+    """
+    Broadcast bus handler: send a race's tracking update to this worker's clients, or
+    only log it while the race is vacated
+    """
+    if manager.get_active_viewers(race_id) or race_id in manager.replay_logs:
+        await manager.send_update(race_id, json.loads(payload))
+
+
+broadcast_bus.subscribe('track', _deliver_track_update)
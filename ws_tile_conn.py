@@ -8,9 +8,78 @@ import hashlib
 import json
 import gzip
 import base64
+import time
+
+from api.broadcast_bus import broadcast_bus
+from utils.ws_frames import FLAG_DELTA, FLAG_GZIP, FRAME_DELTA_UPDATE, FRAME_TILE, decode_frame, encode_frame
 
 logger = logging.getLogger(__name__)
 
+# Points sent to a viewer the first time a flight appears, and kept for dynamics
+INITIAL_TRACK_POINTS = 100
+DYNAMICS_POINTS = 5
+
+# Broadcasts follow the delay line's releases, at most this often; without releases
+# the broadcaster still runs every BROADCAST_IDLE_SECONDS
+BROADCAST_MIN_INTERVAL = 1.0
+BROADCAST_IDLE_SECONDS = 10
+
+# Delayed window of every broadcast flight in one statement: the newest points up to
+# the delay cutoff (INITIAL_TRACK_POINTS for flights not sent yet, DYNAMICS_POINTS
+# otherwise) plus everything after the flight's last sent time
+DELAYED_WINDOWS_SQL = """
+    SELECT f.flight_uuid, p.datetime, p.lat, p.lon, p.elevation
+    FROM unnest(CAST(:flight_uuids AS uuid[]), CAST(:last_sent AS timestamptz[])) AS f(flight_uuid, last_sent)
+    CROSS JOIN LATERAL (
+        (SELECT t.datetime, t.lat, t.lon, t.elevation
+         FROM live_track_points t
+         WHERE t.flight_uuid = f.flight_uuid AND t.datetime <= :delayed_time
+         ORDER BY t.datetime DESC
+         LIMIT CASE WHEN f.last_sent IS NULL THEN :initial_points ELSE :dynamics_points END)
+        UNION
+        (SELECT t.datetime, t.lat, t.lon, t.elevation
+         FROM live_track_points t
+         WHERE t.flight_uuid = f.flight_uuid
+           AND t.datetime > f.last_sent AND t.datetime <= :delayed_time)
+    ) p
+    ORDER BY f.flight_uuid, p.datetime
+"""
+
+
+class EncodedTile:
+    """A tile's binary frame and JSON message, each built once on first use"""
+
+    def __init__(self, race_id: str, tile_coords: Tuple[int, int, int], tile_data: bytes, is_delta: bool):
+        self.race_id = race_id
+        self.tile_coords = tile_coords
+        self.tile_data = tile_data
+        self.is_delta = is_delta
+        self._frame = None
+        self._text = None
+
+    @property
+    def frame(self) -> bytes:
+        if self._frame is None:
+            z, x, y = self.tile_coords
+            self._frame = encode_frame(FRAME_TILE, self.race_id, self.tile_data, z, x, y,
+                                       flags=FLAG_DELTA if self.is_delta else 0)
+        return self._frame
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            z, x, y = self.tile_coords
+            self._text = json.dumps({
+                "type": "tile_delta" if self.is_delta else "tile_data",
+                "race_id": self.race_id,
+                "tile": {"z": z, "x": x, "y": y},
+                "format": "mvt",
+                "data": base64.b64encode(self.tile_data).decode('utf-8'),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "is_delta": self.is_delta
+            })
+        return self._text
+
 
 class TileConnectionManager:
     def __init__(self):
@@ -36,6 +105,9 @@ class TileConnectionManager:
         # Client WebSocket mapping for efficient lookups
         # Structure: {client_id: WebSocket}
         self.client_sockets: Dict[str, WebSocket] = {}
+
+        # Sockets that negotiated binary frames (utils/ws_frames.py); others get JSON
+        self.binary_clients: Set[WebSocket] = set()
         
         # Track pilots with sent data to prevent duplicates
         # Structure: {race_id: {pilot_uuid: last_sent_time}}
@@ -48,8 +120,18 @@ class TileConnectionManager:
         # Background task for broadcasting updates
         self.broadcast_tasks: Dict[str, asyncio.Task] = {}
 
-    async def connect(self, websocket: WebSocket, race_id: str, client_id: str):
-        """Connect a client to a specific race's tile updates"""
+        # Broadcast cycle timings across races
+        self.broadcast_stats = {
+            'cycles': 0,
+            'errors': 0,
+            'last_cycle_ms': 0.0,
+            'max_cycle_ms': 0.0,
+            'total_cycle_ms': 0.0,
+            'last_flights': 0
+        }
+
+    async def connect(self, websocket: WebSocket, race_id: str, client_id: str, binary: bool = False):
+        """Connect a client to a specific race's tile updates (binary: send binary frames)"""
         # WebSocket already accepted in the route handler
         
         # Initialize race_id list if needed
@@ -62,6 +144,8 @@ class TileConnectionManager:
         # Add this connection to the race
         self.active_connections[race_id].add(websocket)
         self.client_sockets[client_id] = websocket
+        if binary:
+            self.binary_clients.add(websocket)
         
         # Initialize client viewport tracking
         if client_id not in self.client_viewports:
@@ -74,10 +158,11 @@ class TileConnectionManager:
             "status": "connected",
             "race_id": race_id,
             "protocol": "tile-based",
+            "frames": "binary" if binary else "json",
             "active_viewers": len(self.active_connections[race_id])
         })
         
-        logger.info(f"Client {client_id} connected to race {race_id} (tile-based)")
+        logger.info(f"Client {client_id} connected to race {race_id} (tile-based, {'binary' if binary else 'json'} frames)")
         
         # Start broadcast task for this race if not already running
         if race_id not in self.broadcast_tasks or self.broadcast_tasks[race_id].done():
@@ -116,6 +201,7 @@ class TileConnectionManager:
         # Remove from client sockets
         if client_id in self.client_sockets:
             del self.client_sockets[client_id]
+        self.binary_clients.discard(websocket)
         
         logger.info(f"Client {client_id} disconnected from tile-based system")
         
@@ -163,160 +249,117 @@ class TileConnectionManager:
         return {"added": list(tiles_to_add), "removed": list(tiles_to_remove)}
 
     async def _broadcast_geojson_updates(self, race_id: str):
-        """Background task to broadcast GeoJSON updates every second with configurable delay"""
+        """Background task broadcasting GeoJSON updates as the delay line releases the race's fixes"""
         from config import settings
+        from api.delay_line import delay_line
         delay_seconds = settings.TRACKING_DELAY_SECONDS
 
         logger.info(f"Starting GeoJSON broadcast for race {race_id} with {delay_seconds}-second delay")
 
         # Initialize last update time to configured delay ago
         self.last_geojson_update[race_id] = datetime.now(timezone.utc) - timedelta(seconds=delay_seconds)
+        # Cycles woken by a release only send flights with newly released fixes
+        released_only = False
         
         while race_id in self.active_connections and self.active_connections[race_id]:
             try:
                 from database.db_replica import get_read_db_with_fallback
-                from database.models import Flight
+
+                cycle_started = time.perf_counter()
+                version = delay_line.version(race_id)
+
+                # One worker computes the race's updates; every worker gets them from the bus
+                if not await broadcast_bus.lead(f'live:{race_id}'):
+                    released_only = False
+                    await delay_line.wait(race_id, version, BROADCAST_IDLE_SECONDS)
+                    continue
                 
                 # Get database session
                 db = next(get_read_db_with_fallback())
                 
                 try:
-                    # Get active flights with configurable delay
-                    delayed_time = datetime.now(timezone.utc) - timedelta(seconds=delay_seconds)
+                    # Fixes up to the race's delay cutoff have been released
+                    delayed_time = delay_line.cutoff(race_id)
                     # Only get flights that have been active in the last 24 hours
                     cutoff_time = datetime.now(timezone.utc) - timedelta(hours=24)
-                    
-                    # Query flights directly - only recent ones
-                    all_flights = db.query(Flight).filter(
-                        Flight.race_id == race_id,
-                        Flight.source.like('%live%'),
-                        Flight.last_fix.isnot(None),
-                        Flight.created_at >= cutoff_time  # Only flights created in last 24 hours
-                    ).all()
-                    
-                    # Group by pilot_id and keep only the most recent flight for each pilot
-                    pilot_flights = {}
-                    for flight in all_flights:
-                        if flight.pilot_id not in pilot_flights:
-                            pilot_flights[flight.pilot_id] = flight
-                        else:
-                            # Always keep the more recent flight based on created_at
-                            if flight.created_at > pilot_flights[flight.pilot_id].created_at:
-                                pilot_flights[flight.pilot_id] = flight
-                    
-                    # Use only the most recent flight for each pilot
-                    flights = list(pilot_flights.values())
-                    
+
+                    # Current flight per pilot from the race index
+                    from api.race_index import race_index
+                    flights = await race_index.current_flights(race_id, cutoff_time)
+                    if flights is None:
+                        flights = self._latest_flights_from_db(db, race_id, cutoff_time)
+
+                    # Delayed position, dynamics points and new points of all flights
+                    windows = self._delayed_windows(db, race_id, flights, delayed_time)
+
+                    from utils.flight_dynamics import calculate_flight_dynamics
+                    from dateutil import parser
+
                     updates = []
                     for flight in flights:
-                        # For active flights, get the most recent point that's old enough to send
-                        from database.models import LiveTrackPoint
-
-                        # Get the most recent point that's older than the delay
-                        delayed_point = db.query(LiveTrackPoint).filter(
-                            LiveTrackPoint.flight_uuid == flight.id,
-                            LiveTrackPoint.datetime <= delayed_time
-                        ).order_by(LiveTrackPoint.datetime.desc()).first()
-
-                        if delayed_point:
-                            # Use the delayed point as our "current" position
-                            delayed_fix = {
-                                'lat': delayed_point.lat,
-                                'lon': delayed_point.lon,
-                                'elevation': delayed_point.elevation,
-                                'datetime': delayed_point.datetime.isoformat()
-                            }
-
-                            # Calculate flight dynamics using utility
-                            from utils.flight_dynamics import calculate_flight_dynamics
-
-                            # Get recent points around the delayed point for calculations
-                            recent_points = db.query(LiveTrackPoint).filter(
-                                LiveTrackPoint.flight_uuid == flight.id,
-                                LiveTrackPoint.datetime <= delayed_point.datetime
-                            ).order_by(LiveTrackPoint.datetime.desc()).limit(5).all()
-
-                            # Calculate dynamics with smoothed vario
-                            dynamics = calculate_flight_dynamics(
-                                recent_points=recent_points,
-                                flight_state=flight.flight_state,
-                                vario_smoothing=3  # Use 3 points for vario averaging
-                            )
-
-                            # Calculate flight time from first_fix to delayed point
-                            flight_time = 0
-                            if flight.first_fix:
-                                first_time_str = flight.first_fix.get('datetime')
-                                if first_time_str:
-                                    from dateutil import parser
-                                    first_time = parser.parse(first_time_str)
-                                    flight_time = (delayed_point.datetime - first_time).total_seconds()
-
-                            # Get last sent time for this flight
-                            flight_id_str = str(flight.id)
-                            last_sent_time = self.get_last_update_time(race_id, flight_id_str)
-
-                            # Query for all points since last update (up to the delayed time)
-                            track_points = []
-                            if last_sent_time:
-                                # Get points since last update
-                                new_points = db.query(LiveTrackPoint).filter(
-                                    LiveTrackPoint.flight_uuid == flight.id,
-                                    LiveTrackPoint.datetime > last_sent_time,
-                                    LiveTrackPoint.datetime <= delayed_time
-                                ).order_by(LiveTrackPoint.datetime.asc()).all()
-
-                                # Format points for frontend
-                                for point in new_points:
-                                    track_points.append({
-                                        'lat': float(point.lat),
-                                        'lon': float(point.lon),
-                                        'elevation': float(point.elevation) if point.elevation else 0,
-                                        'datetime': point.datetime.isoformat()
-                                    })
-                            else:
-                                # First update - send last N points to establish initial track
-                                initial_points = db.query(LiveTrackPoint).filter(
-                                    LiveTrackPoint.flight_uuid == flight.id,
-                                    LiveTrackPoint.datetime <= delayed_time
-                                ).order_by(LiveTrackPoint.datetime.desc()).limit(100).all()
-
-                                # Reverse to get chronological order
-                                initial_points.reverse()
-
-                                for point in initial_points:
-                                    track_points.append({
-                                        'lat': float(point.lat),
-                                        'lon': float(point.lon),
-                                        'elevation': float(point.elevation) if point.elevation else 0,
-                                        'datetime': point.datetime.isoformat()
-                                    })
-
-                            # Update last sent time to the most recent point
-                            if delayed_point:
-                                self.add_pilot_with_sent_data(race_id, flight_id_str, delayed_point.datetime)
-
-                            updates.append({
-                                'pilot_id': flight.pilot_id,
-                                'pilot_name': flight.pilot_name or 'Unknown',
-                                'flight_id': str(flight.id),
-                                'lat': float(delayed_fix['lat']),
-                                'lon': float(delayed_fix['lon']),
-                                'elevation': float(delayed_fix['elevation']),
-                                'timestamp': delayed_fix['datetime'],
-                                'speed': dynamics['speed'],
-                                'heading': dynamics['heading'],
-                                'vario': dynamics['vario'],
-                                'flight_time': flight_time,  # in seconds
-                                'source': flight.source,
-                                'total_points': flight.total_points,
-                                'flight_state': flight.flight_state.get('state', 'unknown') if flight.flight_state else 'unknown',
-                                'flight_state_info': flight.flight_state if flight.flight_state else {},
-                                'first_fix': flight.first_fix if flight.first_fix else None,
-                                'last_fix': flight.last_fix if flight.last_fix else None,
-                                'track_points': track_points,  # New: array of points since last update
-                                'delay_applied': delay_seconds  # So frontend knows the delay
-                            })
+                        flight_id_str = str(flight.id)
+                        points = windows.get(flight_id_str)
+                        if not points:
+                            continue
+
+                        # The newest point that's older than the delay is our "current" position
+                        delayed_point = points[-1]
+
+                        # Calculate dynamics with smoothed vario (newest point first)
+                        dynamics = calculate_flight_dynamics(
+                            recent_points=points[-DYNAMICS_POINTS:][::-1],
+                            flight_state=flight.flight_state,
+                            vario_smoothing=3  # Use 3 points for vario averaging
+                        )
+
+                        # Calculate flight time from first_fix to delayed point
+                        flight_time = 0
+                        if flight.first_fix:
+                            first_time_str = flight.first_fix.get('datetime')
+                            if first_time_str:
+                                first_time = parser.parse(first_time_str)
+                                flight_time = (delayed_point.datetime - first_time).total_seconds()
+
+                        # Points since the last update, or the last N points to establish the track
+                        last_sent_time = self.get_last_update_time(race_id, flight_id_str)
+                        if last_sent_time:
+                            new_points = [point for point in points if point.datetime > last_sent_time]
+                            if released_only and not new_points:
+                                continue
+                        else:
+                            new_points = points[-INITIAL_TRACK_POINTS:]
+
+                        track_points = [{
+                            'lat': float(point.lat),
+                            'lon': float(point.lon),
+                            'elevation': float(point.elevation) if point.elevation else 0,
+                            'datetime': point.datetime.isoformat()
+                        } for point in new_points]
+
+                        # Update last sent time to the most recent point
+                        self.add_pilot_with_sent_data(race_id, flight_id_str, delayed_point.datetime)
+
+                        updates.append({
+                            'pilot_id': flight.pilot_id,
+                            'pilot_name': flight.pilot_name or 'Unknown',
+                            'flight_id': flight_id_str,
+                            'lat': float(delayed_point.lat),
+                            'lon': float(delayed_point.lon),
+                            'elevation': float(delayed_point.elevation),
+                            'timestamp': delayed_point.datetime.isoformat(),
+                            'speed': dynamics['speed'],
+                            'heading': dynamics['heading'],
+                            'vario': dynamics['vario'],
+                            'flight_time': flight_time,  # in seconds
+                            'source': flight.source,
+                            'total_points': flight.total_points,
+                            'flight_state': flight.flight_state.get('state', 'unknown') if flight.flight_state else 'unknown',
+                            'flight_state_info': flight.flight_state if flight.flight_state else {},
+                            'first_fix': flight.first_fix if flight.first_fix else None,
+                            'last_fix': flight.last_fix if flight.last_fix else None,
+                            'track_points': track_points,  # New: array of points since last update
+                            'delay_applied': delay_seconds  # So frontend knows the delay
+                        })
                     
                     else:
                         logger.debug(f"No updates to send for race {race_id} - all fixes too recent (< {delay_seconds}s old)")
@@ -334,39 +377,152 @@ class TileConnectionManager:
                         json_str = json.dumps(delta_data)
                         compressed = gzip.compress(json_str.encode('utf-8'), compresslevel=6)
                         
-                        # Broadcast to all connected clients for this race
-                        message = {
-                            "type": "delta_update",
-                            "race_id": race_id,
-                            "data": base64.b64encode(compressed).decode('utf-8'),
-                            "timestamp": delta_data['timestamp'],
-                            "compression": "gzip",
-                            "update_count": len(updates)
-                        }
-                        
-                        await self.broadcast_to_race(race_id, message)
+                        # Publish the frame once; every worker sends it to its own viewers
+                        frame = encode_frame(FRAME_DELTA_UPDATE, race_id, compressed, flags=FLAG_GZIP)
+                        await broadcast_bus.publish('live', race_id, frame)
                         logger.debug(f"Broadcasted {len(updates)} pilot updates for race {race_id}")
                     
                     # Update last broadcast time (maintain configured delay)
                     self.last_geojson_update[race_id] = datetime.now(timezone.utc) - timedelta(seconds=delay_seconds)
+                    self._record_cycle(race_id, time.perf_counter() - cycle_started, len(flights))
                     
                 finally:
                     db.close()
                 
-                # Wait 10 seconds before next update (reduce database load)
-                await asyncio.sleep(10)
+                # Wait for the next release of this race's fixes
+                released_only = await delay_line.wait(race_id, version, BROADCAST_IDLE_SECONDS) != version
+                await asyncio.sleep(max(0.0, BROADCAST_MIN_INTERVAL - (time.perf_counter() - cycle_started)))
                 
             except asyncio.CancelledError:
                 logger.info(f"GeoJSON broadcast cancelled for race {race_id}")
                 break
             except Exception as e:
+                self.broadcast_stats['errors'] += 1
                 logger.error(f"Error in GeoJSON broadcast for race {race_id}: {e}")
                 await asyncio.sleep(5)  # Wait longer on error
         
+        await broadcast_bus.resign(f'live:{race_id}')
         logger.info(f"Stopped GeoJSON broadcast for race {race_id}")
     
-    async def broadcast_to_race(self, race_id: str, message: Dict[str, Any]):
-        """Broadcast a message to all clients connected to a race"""
+    @staticmethod
+    def _latest_flights_from_db(db, race_id: str, cutoff_time: datetime) -> List:
+        """Most recent live flight per pilot (by created_at), when the race index is unavailable"""
+        from database.models import Flight
+
+        all_flights = db.query(Flight).filter(
+            Flight.race_id == race_id,
+            Flight.source.like('%live%'),
+            Flight.last_fix.isnot(None),
+            Flight.created_at >= cutoff_time  # Only flights created in last 24 hours
+        ).all()
+
+        pilot_flights = {}
+        for flight in all_flights:
+            if flight.pilot_id not in pilot_flights or flight.created_at > pilot_flights[flight.pilot_id].created_at:
+                pilot_flights[flight.pilot_id] = flight
+        return list(pilot_flights.values())
+
+    def _delayed_windows(self, db, race_id: str, flights: List, delayed_time: datetime) -> Dict[str, List]:
+        """
+        Delayed windows (oldest first, keyed by flight UUID string) from the delay line's
+        released fixes. Flights it can't serve yet are read from the database in one query
+        and seeded into it, so later cycles don't query them again.
+        """
+        from api.delay_line import delay_line
+
+        windows: Dict[str, List] = {}
+        missing = []
+        for flight in flights:
+            flight_uuid = str(flight.id)
+            window = delay_line.window(flight_uuid, since=self.get_last_update_time(race_id, flight_uuid),
+                                       min_points=INITIAL_TRACK_POINTS)
+            if window is None:
+                missing.append(flight)
+            else:
+                windows[flight_uuid] = window
+
+        loaded = self._load_delayed_windows(db, race_id, missing, delayed_time)
+        for flight in missing:
+            flight_uuid = str(flight.id)
+            rows = loaded.get(flight_uuid, [])
+            if delay_line.running:
+                delay_line.seed(flight_uuid, rows)
+            if rows:
+                windows[flight_uuid] = rows
+        return windows
+
+    def _load_delayed_windows(self, db, race_id: str, flights: List, delayed_time: datetime) -> Dict[str, List]:
+        """
+        Points up to the delay cutoff for all flights in one query, oldest first, keyed by
+        flight UUID string: at least the last DYNAMICS_POINTS (INITIAL_TRACK_POINTS for
+        flights not sent yet) plus all points after the flight's last sent time.
+        """
+        if not flights:
+            return {}
+        from sqlalchemy import text
+
+        flight_uuids = [str(flight.id) for flight in flights]
+        result = db.execute(text(DELAYED_WINDOWS_SQL), {
+            'flight_uuids': flight_uuids,
+            'last_sent': [self.get_last_update_time(race_id, flight_uuid) for flight_uuid in flight_uuids],
+            'delayed_time': delayed_time,
+            'initial_points': INITIAL_TRACK_POINTS,
+            'dynamics_points': DYNAMICS_POINTS
+        })
+
+        windows: Dict[str, List] = {}
+        for row in result:
+            windows.setdefault(str(row.flight_uuid), []).append(row)
+        return windows
+
+    def _record_cycle(self, race_id: str, seconds: float, flights: int):
+        elapsed_ms = seconds * 1000
+        self.broadcast_stats['cycles'] += 1
+        self.broadcast_stats['last_cycle_ms'] = round(elapsed_ms, 2)
+        self.broadcast_stats['max_cycle_ms'] = round(max(self.broadcast_stats['max_cycle_ms'], elapsed_ms), 2)
+        self.broadcast_stats['total_cycle_ms'] += elapsed_ms
+        self.broadcast_stats['last_flights'] = flights
+
+        from monitoring.datadog_integration import datadog_metrics
+        datadog_metrics.timing('hfss.live.broadcast_cycle', elapsed_ms, tags=[f'race:{race_id}'])
+        datadog_metrics.gauge('hfss.live.broadcast_flights', flights, tags=[f'race:{race_id}'])
+
+    def get_broadcast_stats(self) -> Dict:
+        cycles = self.broadcast_stats['cycles']
+        return {
+            **self.broadcast_stats,
+            'total_cycle_ms': round(self.broadcast_stats['total_cycle_ms'], 2),
+            'avg_cycle_ms': round(self.broadcast_stats['total_cycle_ms'] / cycles, 2) if cycles else 0.0,
+            'broadcasting_races': sum(1 for task in self.broadcast_tasks.values() if not task.done())
+        }
+
+    async def _deliver_live_frame(self, race_id: str, frame: bytes, local: bool):
+        """Broadcast bus handler: send a race's delta frame to this worker's viewers"""
+        if not self.active_connections.get(race_id):
+            return
+        message = None
+        if self._has_json_clients(race_id):
+            # Raw gzip bytes for binary clients, base64 in JSON for the others
+            compressed = decode_frame(frame)['payload']
+            delta_data = json.loads(gzip.decompress(compressed))
+            message = {
+                "type": "delta_update",
+                "race_id": race_id,
+                "data": base64.b64encode(compressed).decode('utf-8'),
+                "timestamp": delta_data['timestamp'],
+                "compression": "gzip",
+                "update_count": len(delta_data['updates'])
+            }
+        await self.broadcast_to_race(race_id, message, frame)
+
+    def _has_json_clients(self, race_id: str) -> bool:
+        return any(websocket not in self.binary_clients for websocket in self.active_connections.get(race_id, ()))
+
+    async def broadcast_to_race(self, race_id: str, message: Optional[Dict[str, Any]], frame: Optional[bytes] = None):
+        """
+        Broadcast a message to all clients connected to a race: the binary frame to clients
+        that negotiated it, the JSON message (serialized once) to everyone else
+        """
         if race_id not in self.active_connections:
             logger.warning(f"No active connections for race {race_id}")
             return
@@ -376,15 +532,20 @@ class TileConnectionManager:
             logger.warning(f"Empty connection set for race {race_id}")
             return
 
-        logger.debug(f"Broadcasting {message['type']} to {num_clients} clients for race {race_id}")
+        message_type = message['type'] if message else 'frame'
+        logger.debug(f"Broadcasting {message_type} to {num_clients} clients for race {race_id}")
 
+        text = json.dumps(message) if message is not None else None
         disconnected = []
         sent_count = 0
 
-        for websocket in self.active_connections[race_id]:
+        for websocket in list(self.active_connections[race_id]):
             try:
                 if websocket.client_state == WebSocketState.CONNECTED:
-                    await websocket.send_json(message)
+                    if frame is not None and websocket in self.binary_clients:
+                        await websocket.send_bytes(frame)
+                    else:
+                        await websocket.send_text(text)
                     sent_count += 1
                 else:
                     disconnected.append(websocket)
@@ -397,33 +558,29 @@ class TileConnectionManager:
             self.active_connections[race_id].discard(ws)
 
         if sent_count > 0:
-            logger.debug(f"Successfully sent {message['type']} to {sent_count}/{num_clients} clients")
+            logger.debug(f"Successfully sent {message_type} to {sent_count}/{num_clients} clients")
         else:
-            logger.warning(f"Failed to send {message['type']} to any clients for race {race_id}")
+            logger.warning(f"Failed to send {message_type} to any clients for race {race_id}")
     
     async def send_tile_to_client(self, client_id: str, race_id: str, 
                                   tile_coords: Tuple[int, int, int], 
-                                  tile_data: bytes, is_delta: bool = False):
-        """Send a specific tile to a client"""
+                                  tile_data: bytes, is_delta: bool = False,
+                                  encoded: Optional['EncodedTile'] = None):
+        """Send a specific tile to a client (encoded: frames shared with other recipients)"""
         if client_id not in self.client_sockets:
             return False
         
         websocket = self.client_sockets[client_id]
-        z, x, y = tile_coords
+        if encoded is None:
+            encoded = EncodedTile(race_id, tile_coords, tile_data, is_delta)
         
         try:
             if websocket.client_state == WebSocketState.CONNECTED:
-                # For binary MVT data, we'll send as base64 in JSON
-                import base64
-                await websocket.send_json({
-                    "type": "tile_delta" if is_delta else "tile_data",
-                    "race_id": race_id,
-                    "tile": {"z": z, "x": x, "y": y},
-                    "format": "mvt",
-                    "data": base64.b64encode(tile_data).decode('utf-8'),
-                    "timestamp": datetime.now(timezone.utc).isoformat(),
-                    "is_delta": is_delta
-                })
+                if websocket in self.binary_clients:
+                    await websocket.send_bytes(encoded.frame)
+                else:
+                    # JSON clients get the MVT bytes as base64
+                    await websocket.send_text(encoded.text)
                 return True
         except Exception as e:
             logger.error(f"Failed to send tile to client {client_id}: {str(e)}")
@@ -442,10 +599,11 @@ class TileConnectionManager:
         
         clients = self.tile_subscribers[race_id][tile_coords].copy()
         sent_count = 0
+        encoded = EncodedTile(race_id, tile_coords, tile_data, is_delta)
         
         for client_id in clients:
             success = await self.send_tile_to_client(
-                client_id, race_id, tile_coords, tile_data, is_delta
+                client_id, race_id, tile_coords, tile_data, is_delta, encoded
             )
             if success:
                 sent_count += 1
@@ -551,4 +709,5 @@ class TileConnectionManager:
 
 
 # Create a global tile connection manager for the application
-tile_manager = TileConnectionManager()
\ No newline at end of file
+tile_manager = TileConnectionManager()
+broadcast_bus.subscribe('live', tile_manager._deliver_live_frame)
\ No newline at end of file